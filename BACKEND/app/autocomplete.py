@@ -0,0 +1,227 @@
+"""
+Índice en memoria para autocompletar nombres de pacientes y doctores
+
+Cada tabla de AUTOCOMPLETADOS tiene una lista ordenada de pares (palabra,
+código) con las palabras normalizadas (minúsculas y sin acentos, como en
+`app/search.py`) del nombre, los apellidos y el documento de cada registro. Una
+búsqueda es un `bisect` hasta el prefijo más largo escrito y un recorrido de las
+entradas que empiezan por él, sin consultar la base de datos.
+
+El índice se carga al iniciar la API y los routers lo actualizan después de cada
+alta, modificación o baja (`guardar` / `eliminar`). Cada actualización lleva la
+versión de la tabla leída en la misma transacción de escritura
+(`app/versions.py`); si se detecta un salto, por ejemplo porque otro proceso
+escribió en la base de datos, el índice se recarga completo en la siguiente
+búsqueda.
+"""
+import bisect
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.search import palabras
+from app.versions import leer_versiones
+
+logger = logging.getLogger(__name__)
+
+# Segundos que se espera a que un router aplique su cambio antes de suponer que
+# la tabla cambió fuera de la API y recargar el índice
+AUTOCOMPLETE_ESPERA = float(os.getenv("AUTOCOMPLETE_ESPERA", "1"))
+
+# Entradas del índice que se revisan como máximo en una búsqueda
+AUTOCOMPLETE_MAX_REVISADAS = int(os.getenv("AUTOCOMPLETE_MAX_REVISADAS", "5000"))
+
+
+class Autocompletado(NamedTuple):
+    # Tipo con el que se identifica en la API
+    tipo: str
+    # Columnas cuyas palabras se indexan
+    columnas: Tuple[str, ...]
+    # Columna que se muestra junto al nombre
+    detalle: str
+
+
+AUTOCOMPLETADOS: Dict[str, Autocompletado] = {
+    "pacientes": Autocompletado(
+        "paciente", ("Nombre", "Apellidos", "Numero_Identificacion"), "Numero_Identificacion"
+    ),
+    "doctor": Autocompletado(
+        "doctor", ("Nombre", "Apellidos", "Numero_Identificacion"), "Especialidad"
+    ),
+}
+
+
+# Los nombres y apellidos se repiten mucho entre registros: se normalizan una vez
+@functools.lru_cache(maxsize=65536)
+def _palabras_nombre(valor: Optional[str]) -> Tuple[str, ...]:
+    return tuple(sys.intern(palabra) for palabra in palabras(valor))
+
+
+class _Registro(NamedTuple):
+    texto: str
+    detalle: Optional[str]
+    palabras: Tuple[str, ...]
+
+
+def _registro(config: Autocompletado, fila: Any) -> _Registro:
+    encontradas: List[str] = []
+    for columna in config.columnas:
+        valor = fila[columna]
+        if columna != "Numero_Identificacion":
+            encontradas.extend(_palabras_nombre(valor))
+        elif valor:
+            # El documento también sin separadores: "12.345.678" -> "12345678"
+            documento = palabras(valor)
+            encontradas.extend(documento)
+            encontradas.append("".join(documento))
+    texto = " ".join(str(fila[columna]) for columna in ("Nombre", "Apellidos") if fila[columna])
+    detalle = fila[config.detalle]
+    return _Registro(
+        texto,
+        None if detalle is None else str(detalle),
+        tuple(sorted(set(encontradas))),
+    )
+
+
+class IndicePrefijos:
+    """Palabras de una tabla ordenadas para buscarlas por prefijo"""
+
+    def __init__(self, tabla: str):
+        self.tabla = tabla
+        self.config = AUTOCOMPLETADOS[tabla]
+        self.version: Optional[int] = None
+        self._entradas: List[Tuple[str, int]] = []
+        self._registros: Dict[int, _Registro] = {}
+        self._desfasado = False
+        self._atrasado_desde: Optional[float] = None
+        self._lock = threading.Lock()
+        self._lock_carga = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._registros)
+
+    def cargar(self, db_cursor) -> None:
+        """Reconstruye el índice completo desde la tabla"""
+        with self._lock_carga:
+            # La versión se lee antes que las filas: un cambio posterior se
+            # aplica otra vez al llegar, lo que no altera el resultado
+            version = leer_versiones(db_cursor, (self.tabla,)).get(self.tabla, 0)
+            columnas = sorted({"Codigo", "Nombre", "Apellidos", *self.config.columnas, self.config.detalle})
+            db_cursor.execute(f"SELECT {', '.join(columnas)} FROM {self.tabla}")
+            registros = {fila["Codigo"]: _registro(self.config, fila) for fila in db_cursor.fetchall()}
+            entradas = sorted(
+                (palabra, codigo) for codigo, registro in registros.items() for palabra in registro.palabras
+            )
+            with self._lock:
+                self._entradas, self._registros = entradas, registros
+                self.version, self._desfasado, self._atrasado_desde = version, False, None
+        logger.info(f"Índice de autocompletado de {self.tabla}: {len(registros)} registros")
+
+    def _quitar(self, codigo: int) -> None:
+        registro = self._registros.pop(codigo, None)
+        if registro is None:
+            return
+        for palabra in registro.palabras:
+            posicion = bisect.bisect_left(self._entradas, (palabra, codigo))
+            if posicion < len(self._entradas) and self._entradas[posicion] == (palabra, codigo):
+                del self._entradas[posicion]
+
+    def _aplicar(self, version: int, cambio: Callable[[], None]) -> None:
+        with self._lock:
+            if self.version is None or version <= self.version:
+                # Sin cargar, o el cambio ya está incluido en una recarga posterior
+                return
+            if version != self.version + 1:
+                # Falta algún cambio intermedio: se recarga en la siguiente búsqueda
+                self._desfasado = True
+                return
+            cambio()
+            self.version = version
+
+    def guardar(self, fila: Any, version: int) -> None:
+        """Agrega o reemplaza el registro de `fila` (con su versión de tabla)"""
+        codigo = fila["Codigo"]
+
+        def cambio():
+            self._quitar(codigo)
+            registro = _registro(self.config, fila)
+            self._registros[codigo] = registro
+            for palabra in registro.palabras:
+                bisect.insort(self._entradas, (palabra, codigo))
+
+        self._aplicar(version, cambio)
+
+    def eliminar(self, codigo: int, version: int) -> None:
+        self._aplicar(version, lambda: self._quitar(codigo))
+
+    def sincronizar(self, db_cursor) -> None:
+        """Recarga el índice si no está cargado o si la tabla cambió fuera de la API"""
+        actual = leer_versiones(db_cursor, (self.tabla,)).get(self.tabla, 0)
+        with self._lock:
+            if self.version is not None and not self._desfasado:
+                if actual <= self.version:
+                    self._atrasado_desde = None
+                    return
+                # Un router puede estar a punto de aplicar su cambio
+                ahora = time.monotonic()
+                if self._atrasado_desde is None:
+                    self._atrasado_desde = ahora
+                if ahora - self._atrasado_desde < AUTOCOMPLETE_ESPERA:
+                    return
+        if self._lock_carga.locked():
+            # Otra petición ya está recargando: se responde con el índice actual
+            return
+        self.cargar(db_cursor)
+
+    def buscar(self, texto: str, limite: int) -> List[Dict[str, Any]]:
+        """Registros con todas las palabras de `texto` como prefijo, en orden alfabético"""
+        buscadas = palabras(texto)
+        if not buscadas:
+            return []
+        # El prefijo más largo es el que menos entradas recorre
+        prefijo = max(buscadas, key=len)
+        resto = [palabra for palabra in buscadas if palabra is not prefijo]
+        resultados: List[Dict[str, Any]] = []
+        vistos = set()
+        with self._lock:
+            posicion = bisect.bisect_left(self._entradas, (prefijo,))
+            fin = min(len(self._entradas), posicion + AUTOCOMPLETE_MAX_REVISADAS)
+            while posicion < fin and len(resultados) < limite:
+                palabra, codigo = self._entradas[posicion]
+                posicion += 1
+                if not palabra.startswith(prefijo):
+                    break
+                if codigo in vistos:
+                    continue
+                vistos.add(codigo)
+                registro = self._registros[codigo]
+                if all(_tiene_prefijo(registro.palabras, buscada) for buscada in resto):
+                    resultados.append({
+                        "Tipo": self.config.tipo,
+                        "Codigo": codigo,
+                        "Texto": registro.texto,
+                        "Detalle": registro.detalle,
+                    })
+        return resultados
+
+
+def _tiene_prefijo(ordenadas: Sequence[str], prefijo: str) -> bool:
+    posicion = bisect.bisect_left(ordenadas, prefijo)
+    return posicion < len(ordenadas) and ordenadas[posicion].startswith(prefijo)
+
+
+_indices: Dict[str, IndicePrefijos] = {tabla: IndicePrefijos(tabla) for tabla in AUTOCOMPLETADOS}
+
+
+def get_indice(tabla: str) -> IndicePrefijos:
+    return _indices[tabla]
+
+
+def cargar_indices(db_cursor) -> None:
+    """Carga todos los índices (al iniciar la aplicación)"""
+    for indice in _indices.values():
+        indice.cargar(db_cursor)
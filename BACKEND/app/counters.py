@@ -0,0 +1,196 @@
+"""
+Contadores de filas mantenidos por triggers (tabla `stats_counters`)
+
+En SQLite `COUNT(*)` recorre la tabla (o un índice) completa. Para los totales
+del dashboard se guarda en `stats_counters` el número de filas de cada tabla y
+su desglose por algunas columnas (estado de citas, consultas y exámenes, rol de
+usuarios, mes de las citas). Los triggers AFTER INSERT/UPDATE/DELETE los ajustan
+dentro de la misma transacción que modifica la tabla, así que leerlos es una
+búsqueda por clave.
+
+Cada fila de `stats_counters` es (Tabla, Grupo, Clave, Total); el total de la
+tabla usa Grupo y Clave vacíos. Si los contadores se desajustan (por ejemplo,
+tras cambios hechos con los triggers desactivados), `reconstruir_contadores`
+los recalcula desde cero: ver `reconciliar_contadores.py`.
+"""
+import sqlite3
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+TABLA_CONTADORES = "stats_counters"
+
+
+class Desglose(NamedTuple):
+    # Nombre del grupo en stats_counters
+    grupo: str
+    # Expresión de la clave; {fila} es NEW, OLD o el nombre de la tabla
+    expresion: str
+    # Columnas de las que depende la clave (dispara el trigger de UPDATE)
+    columnas: Tuple[str, ...]
+
+
+# Tablas contadas y sus desgloses. Las claves nunca son NULL: se usa el
+# DEFAULT de la columna, igual que la API al mostrar un registro sin valor.
+CONTADORES: Dict[str, Tuple[Desglose, ...]] = {
+    "pacientes": (),
+    "doctor": (
+        Desglose("Estado", "COALESCE({fila}.Estado, 'Activo')", ("Estado",)),
+    ),
+    "citas": (
+        Desglose("Estado", "COALESCE({fila}.Estado, 'Programada')", ("Estado",)),
+        Desglose("Mes", "COALESCE(substr({fila}.Fecha_Hora, 1, 7), '')", ("Fecha_Hora",)),
+    ),
+    "consultas": (
+        Desglose("Estado", "COALESCE({fila}.Estado, 'Programada')", ("Estado",)),
+    ),
+    "receta": (),
+    "historial_medico": (),
+    "examenes": (
+        Desglose("Estado", "COALESCE({fila}.Estado, 'Pendiente')", ("Estado",)),
+    ),
+    "usuarios_sistema": (
+        Desglose("Rol", "COALESCE({fila}.Rol, 'Recepcionista')", ("Rol",)),
+    ),
+}
+
+
+def _sumar(tabla: str, grupo: str, clave: str, delta: int) -> str:
+    return (
+        f"INSERT INTO {TABLA_CONTADORES} (Tabla, Grupo, Clave, Total) "
+        f"VALUES ('{tabla}', '{grupo}', {clave}, {delta}) "
+        f"ON CONFLICT (Tabla, Grupo, Clave) DO UPDATE SET Total = Total + ({delta});"
+    )
+
+
+def _existe(conn: sqlite3.Connection, tabla: str) -> bool:
+    fila = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla,)
+    ).fetchone()
+    return fila is not None
+
+
+def _crear_tabla(conn: sqlite3.Connection) -> None:
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABLA_CONTADORES} (
+            Tabla TEXT NOT NULL,
+            Grupo TEXT NOT NULL,
+            Clave TEXT NOT NULL,
+            Total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (Tabla, Grupo, Clave)
+        ) WITHOUT ROWID
+    """)
+
+
+def crear_triggers(conn: sqlite3.Connection, tabla: str) -> None:
+    """Crea (si faltan) los triggers que mantienen los contadores de `tabla`"""
+    desgloses = CONTADORES[tabla]
+    insertar = [_sumar(tabla, "", "''", 1)]
+    eliminar = [_sumar(tabla, "", "''", -1)]
+    for desglose in desgloses:
+        insertar.append(_sumar(tabla, desglose.grupo, desglose.expresion.format(fila="NEW"), 1))
+        eliminar.append(_sumar(tabla, desglose.grupo, desglose.expresion.format(fila="OLD"), -1))
+
+    for operacion, sentencias in (("insert", insertar), ("delete", eliminar)):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS contador_{tabla}_{operacion}
+            AFTER {operacion.upper()} ON {tabla}
+            BEGIN
+                {' '.join(sentencias)}
+            END
+        """)
+
+    for desglose in desgloses:
+        # Solo cuando cambia la clave: se descuenta de la anterior y se suma a la nueva
+        anterior = desglose.expresion.format(fila="OLD")
+        nueva = desglose.expresion.format(fila="NEW")
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS contador_{tabla}_{desglose.grupo.lower()}_update
+            AFTER UPDATE OF {', '.join(desglose.columnas)} ON {tabla}
+            WHEN {anterior} IS NOT {nueva}
+            BEGIN
+                {_sumar(tabla, desglose.grupo, anterior, -1)}
+                {_sumar(tabla, desglose.grupo, nueva, 1)}
+            END
+        """)
+
+
+def _contar(conn: sqlite3.Connection, tabla: str) -> List[Tuple[str, str, str, int]]:
+    """Contadores de `tabla` calculados recorriendo la tabla"""
+    filas = [(tabla, "", "", conn.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0])]
+    for desglose in CONTADORES[tabla]:
+        clave = desglose.expresion.format(fila=tabla)
+        filas.extend(
+            (tabla, desglose.grupo, fila[0], fila[1])
+            for fila in conn.execute(f"SELECT {clave}, COUNT(*) FROM {tabla} GROUP BY 1").fetchall()
+        )
+    return filas
+
+
+def reconstruir_contadores(
+    conn: sqlite3.Connection, tabla: Optional[str] = None
+) -> List[Tuple[str, str, str, int, int]]:
+    """
+    Recalcula desde cero los contadores de `tabla` (o de todas) y retorna los
+    que estaban desajustados como (Tabla, Grupo, Clave, anterior, correcto).
+    Debe ejecutarse dentro de una transacción de escritura.
+    """
+    diferencias = []
+    for nombre in (tabla,) if tabla else CONTADORES:
+        anteriores = {
+            (fila[0], fila[1], fila[2]): fila[3]
+            for fila in conn.execute(
+                f"SELECT Tabla, Grupo, Clave, Total FROM {TABLA_CONTADORES} WHERE Tabla = ?", (nombre,)
+            ).fetchall()
+        }
+        conn.execute(f"DELETE FROM {TABLA_CONTADORES} WHERE Tabla = ?", (nombre,))
+        if not _existe(conn, nombre):
+            continue
+        correctos = _contar(conn, nombre)
+        conn.executemany(
+            f"INSERT INTO {TABLA_CONTADORES} (Tabla, Grupo, Clave, Total) VALUES (?, ?, ?, ?)",
+            correctos,
+        )
+        for tabla_c, grupo, clave, total in correctos:
+            anterior = anteriores.pop((tabla_c, grupo, clave), 0)
+            if anterior != total:
+                diferencias.append((tabla_c, grupo, clave, anterior, total))
+        # Claves que ya no tienen filas (los contadores en 0 no se guardan)
+        diferencias.extend((*clave, anterior, 0) for clave, anterior in anteriores.items() if anterior)
+    return diferencias
+
+
+def crear_contadores(
+    conn: sqlite3.Connection, tabla: Optional[str] = None
+) -> List[Tuple[str, str, str, int, int]]:
+    """
+    Crea la tabla de contadores y los triggers que falten de `tabla` (o de todas
+    las tablas contadas que existan) y recalcula sus valores; retorna los que
+    estaban desajustados. Se usa en las migraciones, al reconstruir o recrear una
+    tabla (sus triggers se eliminan con ella) y en `reconciliar_contadores.py`.
+    """
+    _crear_tabla(conn)
+    diferencias = []
+    for nombre in (tabla,) if tabla else CONTADORES:
+        if nombre not in CONTADORES or not _existe(conn, nombre):
+            continue
+        crear_triggers(conn, nombre)
+        diferencias.extend(reconstruir_contadores(conn, nombre))
+    return diferencias
+
+
+def leer_contadores(db_cursor) -> Dict[str, Dict[str, Dict[str, int]]]:
+    """Contadores como {tabla: {grupo: {clave: total}}}; el total de la tabla va en [""][""]"""
+    db_cursor.execute(f"SELECT Tabla, Grupo, Clave, Total FROM {TABLA_CONTADORES} WHERE Total <> 0")
+    contadores: Dict[str, Dict[str, Dict[str, int]]] = {}
+    for tabla, grupo, clave, total in db_cursor.fetchall():
+        contadores.setdefault(tabla, {}).setdefault(grupo, {})[clave] = total
+    return contadores
+
+
+def leer_total(db_cursor, tabla: str) -> int:
+    """Número de filas de `tabla` según stats_counters (sin recorrer la tabla)"""
+    db_cursor.execute(
+        f"SELECT Total FROM {TABLA_CONTADORES} WHERE Tabla = ? AND Grupo = '' AND Clave = ''",
+        (tabla,)
+    )
+    fila = db_cursor.fetchone()
+    return fila[0] if fila else 0
@@ -1,22 +1,41 @@
 """
 Configuración de la base de datos SQLite
 """
+import os
 import sqlite3
-from typing import Generator
+import threading
+import time
+from contextlib import contextmanager
+from typing import AsyncGenerator, Dict, Generator, List, Optional
+
+import anyio
 
 DATABASE_URL = "v1siscentro.db"
 
+# Tamaño máximo del pool de conexiones y tiempo máximo (segundos) que una
+# petición espera por una conexión libre antes de fallar.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# Número máximo de handlers que trabajan contra la base de datos a la vez.
+# Los routers son funciones síncronas que FastAPI ejecuta en su pool de threads
+# para no bloquear el event loop; este valor acota ese pool.
+DB_MAX_WORKERS = int(os.getenv("DB_MAX_WORKERS", str(DB_POOL_SIZE)))
+
+# Número máximo de threads esperando a la vez una conexión libre (ver get_db);
+# las peticiones que superen este número esperan sin ocupar un thread
+DB_MAX_ESPERAS = int(os.getenv("DB_MAX_ESPERAS", "100"))
 
-def get_db() -> Generator:
+
+def crear_conexion(database: str = DATABASE_URL) -> sqlite3.Connection:
     """
-    Generador de conexiones a la base de datos.
-    Cierra automáticamente la conexión después de usarla.
-    
+    Abre una conexión nueva y aplica los PRAGMAs de la aplicación.
+
     Nota: check_same_thread=False permite que SQLite se use en diferentes threads,
     necesario para FastAPI que maneja requests de forma asíncrona.
     """
     conn = sqlite3.connect(
-        DATABASE_URL,
+        database,
         check_same_thread=False  # Permite uso en diferentes threads
     )
     conn.row_factory = sqlite3.Row  # Permite acceso a columnas por nombre
@@ -24,8 +43,194 @@ def get_db() -> Generator:
     # Optimizaciones para mejor rendimiento
     conn.execute("PRAGMA journal_mode = WAL")  # Write-Ahead Logging para mejor concurrencia
     conn.execute("PRAGMA synchronous = NORMAL")  # Balance entre seguridad y rendimiento
+    conn.execute("PRAGMA busy_timeout = 5000")  # Esperar al lock de escritura en lugar de fallar
+    return conn
+
+
+class ConnectionPool:
+    """
+    Pool acotado de conexiones SQLite reutilizables.
+
+    Cada conexión se configura una sola vez al crearse, de modo que se conservan
+    la caché de páginas y la caché de sentencias entre peticiones. Al entregar
+    una conexión se verifica que siga viva y al devolverla se descarta cualquier
+    transacción que haya quedado abierta.
+    """
+
+    def __init__(self, database: str = DATABASE_URL, max_size: int = DB_POOL_SIZE,
+                 timeout: float = DB_POOL_TIMEOUT):
+        self.database = database
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self._libres: List[sqlite3.Connection] = []
+        self._cond = threading.Condition()
+        self._en_uso = 0
+        self._esperando = 0
+        self._creadas = 0
+        self._cerrado = False
+
+    def _conexion_sana(self, conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _descartar(self, conn: sqlite3.Connection) -> None:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def acquire(self) -> sqlite3.Connection:
+        """Obtiene una conexión del pool, esperando si todas están en uso"""
+        limite = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._cerrado:
+                    raise sqlite3.OperationalError("El pool de conexiones está cerrado")
+                if self._libres:
+                    conn = self._libres.pop()
+                    self._en_uso += 1
+                    break
+                if self._en_uso < self.max_size:
+                    # Reservar el hueco antes de crear la conexión fuera del lock
+                    self._en_uso += 1
+                    conn = None
+                    break
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    raise sqlite3.OperationalError(
+                        "Tiempo de espera agotado al obtener una conexión a la base de datos"
+                    )
+                self._esperando += 1
+                try:
+                    self._cond.wait(restante)
+                finally:
+                    self._esperando -= 1
+
+        try:
+            if conn is not None and self._conexion_sana(conn):
+                return conn
+            if conn is not None:
+                self._descartar(conn)
+            conn = crear_conexion(self.database)
+            with self._cond:
+                self._creadas += 1
+            return conn
+        except Exception:
+            with self._cond:
+                self._en_uso -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """Devuelve una conexión al pool"""
+        reutilizable = True
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            reutilizable = False
+
+        with self._cond:
+            self._en_uso -= 1
+            if reutilizable and not self._cerrado:
+                self._libres.append(conn)
+                conn = None
+            self._cond.notify()
+
+        if conn is not None:
+            self._descartar(conn)
+
+    @contextmanager
+    def connection(self) -> Generator[sqlite3.Connection, None, None]:
+        """Context manager que presta una conexión y la devuelve al salir"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self) -> Dict[str, int]:
+        """Estadísticas del pool: conexiones en uso, peticiones en espera y conexiones creadas"""
+        with self._cond:
+            return {
+                "tamano_maximo": self.max_size,
+                "en_uso": self._en_uso,
+                "libres": len(self._libres),
+                "esperando": self._esperando,
+                "creadas": self._creadas,
+            }
+
+    def close(self) -> None:
+        """Cierra las conexiones libres; las prestadas se cierran al devolverse"""
+        with self._cond:
+            self._cerrado = True
+            libres, self._libres = self._libres, []
+            self._cond.notify_all()
+        for conn in libres:
+            self._descartar(conn)
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def init_pool(database: str = DATABASE_URL, max_size: int = DB_POOL_SIZE) -> ConnectionPool:
+    """Crea el pool global (se llama desde el lifespan de la aplicación)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = ConnectionPool(database, max_size)
+        return _pool
+
+
+def get_pool() -> ConnectionPool:
+    """Retorna el pool global, creándolo bajo demanda si aún no existe"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+def close_pool() -> None:
+    """Cierra el pool global (se llama al apagar la aplicación)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+_limitador_esperas: Optional[anyio.CapacityLimiter] = None
+
+
+def _esperas() -> anyio.CapacityLimiter:
+    # Se crea dentro del event loop, la primera vez que se usa
+    global _limitador_esperas
+    if _limitador_esperas is None:
+        _limitador_esperas = anyio.CapacityLimiter(DB_MAX_ESPERAS)
+    return _limitador_esperas
+
+
+async def get_db() -> AsyncGenerator[sqlite3.Connection, None]:
+    """
+    Generador de conexiones a la base de datos.
+    Toma una conexión del pool y la devuelve automáticamente después de usarla.
+
+    La espera por una conexión libre ocurre en un thread del limitador
+    `DB_MAX_ESPERAS` y no en el pool de threads de los handlers: si las peticiones
+    que esperan ocuparan esos threads, las que ya tienen conexión no tendrían
+    dónde ejecutarse para devolverla y todas quedarían bloqueadas hasta agotar
+    DB_POOL_TIMEOUT.
+    """
+    pool = get_pool()
+    conn = await anyio.to_thread.run_sync(pool.acquire, limiter=_esperas())
     try:
         yield conn
     finally:
-        conn.close()
-
+        pool.release(conn)
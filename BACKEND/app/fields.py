@@ -0,0 +1,151 @@
+"""
+Proyección de columnas (?fields=) y expansiones opcionales (?include=)
+
+`fields` limita las columnas que devuelve un endpoint y se traslada al SELECT, de
+modo que SQLite no lee ni envía columnas que el cliente no usa (por ejemplo,
+`?fields=Nombre,Apellidos` para un selector). El código del registro se devuelve
+siempre.
+
+`include` activa la carga de relaciones, que ya no se hacen por defecto: por
+ejemplo `?include=examenes` agrega `Examenes_Asociados` a citas y consultas.
+Cada endpoint declara las expansiones que admite con un diccionario de
+`Expansion`.
+"""
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Set, Type
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+
+from app.schema import get_schema
+from app.serialization import RespuestaJSON, respuesta_modelo
+from app.streaming import Completar
+
+
+class Expansion(NamedTuple):
+    # Clave que la expansión agrega a cada registro
+    salida: str
+    # Columnas de la tabla necesarias para cargar la relación
+    columnas: Sequence[str] = ()
+    # Tablas que lee la relación (para el ETag, app/versions.py)
+    tablas: Sequence[str] = ()
+
+
+def _lista(valor: Optional[str]) -> List[str]:
+    return [parte.strip() for parte in (valor or "").split(",") if parte.strip()]
+
+
+class Proyeccion:
+    """
+    Dependencia de FastAPI con los parámetros `fields` e `include` de un endpoint.
+
+    Uso en un router:
+
+        columnas = proyeccion.columnas("citas", orden=("Fecha_Hora",), expansiones=EXPANSIONES_CITA)
+        query = f"SELECT {columnas} FROM citas WHERE 1=1"
+        ...
+        resultado = completar_citas(cursor, filas, examenes=proyeccion.incluye("examenes"))
+        return proyeccion.respuesta(resultado, Cita, paginacion.response.headers)
+    """
+
+    def __init__(
+        self,
+        fields: Optional[str] = Query(
+            None, description="Columnas a devolver separadas por comas (por defecto, todas)"
+        ),
+        include: Optional[str] = Query(
+            None, description="Relaciones a incluir separadas por comas (por ejemplo, examenes)"
+        ),
+    ):
+        self.campos: Optional[List[str]] = _lista(fields) or None
+        self.relaciones: Set[str] = set(_lista(include))
+        self._salida: Set[str] = set()
+
+    @property
+    def parcial(self) -> bool:
+        """Indica si se pidió un subconjunto de columnas"""
+        return self.campos is not None
+
+    def incluye(self, relacion: str) -> bool:
+        return relacion in self.relaciones
+
+    def tablas(self, expansiones: Mapping[str, Expansion]) -> List[str]:
+        """Tablas que leen las relaciones pedidas en `include`"""
+        return [
+            tabla
+            for nombre in sorted(self.relaciones & set(expansiones))
+            for tabla in expansiones[nombre].tablas
+        ]
+
+    def columnas(
+        self,
+        tabla: str,
+        clave: str = "Codigo",
+        orden: Iterable[str] = (),
+        expansiones: Mapping[str, Expansion] = {},
+    ) -> str:
+        """
+        Valida `fields` e `include` y retorna la lista de columnas para el SELECT.
+
+        Además de las columnas pedidas se leen la `clave`, las columnas de `orden`
+        (necesarias para el cursor de paginación) y las que usan las expansiones
+        pedidas; las que el cliente no pidió se quitan antes de responder.
+        """
+        desconocidas = sorted(self.relaciones - set(expansiones))
+        if desconocidas:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Relaciones no disponibles en 'include': {', '.join(desconocidas)}. "
+                       f"Disponibles: {', '.join(sorted(expansiones)) or 'ninguna'}"
+            )
+
+        if not self.parcial:
+            return "*"
+
+        disponibles = get_schema().columnas(tabla)
+        desconocidas = [campo for campo in self.campos if campo not in disponibles]
+        if desconocidas:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Columnas desconocidas en 'fields': {', '.join(desconocidas)}"
+            )
+
+        necesarias = [clave, *orden]
+        for nombre in self.relaciones:
+            necesarias.extend(expansiones[nombre].columnas)
+        self._salida = {clave, *self.campos, *(expansiones[nombre].salida for nombre in self.relaciones)}
+        return ", ".join(dict.fromkeys([*necesarias, *self.campos]))
+
+    def filtrar(self, registros: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Quita de cada registro las columnas leídas solo para uso interno"""
+        if not self.parcial:
+            return registros
+        return [{k: v for k, v in registro.items() if k in self._salida} for registro in registros]
+
+    def modelo(self, modelo: Type[BaseModel]) -> Optional[Type[BaseModel]]:
+        """Modelo con que validar los registros: ninguno si son parciales"""
+        return None if self.parcial else modelo
+
+    def completar(self, completar: Optional[Completar] = None) -> Optional[Completar]:
+        """Envuelve una función `completar_*` para que también filtre las columnas"""
+        if not self.parcial:
+            return completar
+        base = completar or (lambda cursor, filas: [dict(fila) for fila in filas])
+        return lambda cursor, filas: self.filtrar(base(cursor, filas))
+
+    def respuesta(
+        self,
+        registros: Any,
+        modelo: Type[BaseModel],
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> RespuestaJSON:
+        """
+        Respuesta JSON con los registros en el esquema de `modelo` (app/serialization.py)
+        o, si son parciales (no cumplen el modelo completo), solo con las columnas pedidas.
+        """
+        if not self.parcial:
+            return respuesta_modelo(registros, modelo, headers)
+        if isinstance(registros, dict):
+            contenido = self.filtrar([registros])[0]
+        else:
+            contenido = self.filtrar(registros)
+        return RespuestaJSON(content=contenido, headers=headers)
@@ -0,0 +1,266 @@
+"""
+Índices secundarios de la base de datos
+
+Cada índice se eligió a partir de las consultas reales de los routers y lleva
+asociada una consulta representativa. `verificar_indices` ejecuta
+EXPLAIN QUERY PLAN sobre cada una y comprueba que SQLite usa el índice en lugar
+de recorrer la tabla completa o de ordenar en un B-tree temporal.
+
+Las migraciones crean los índices por nombre (`crear_indices(..., nombres=...)`).
+Para agregar un índice, añadirlo a INDICES y crear una migración que lo cree;
+nunca cambiar las columnas ni la condición de un índice ya publicado, sino
+definir uno con otro nombre.
+
+Los índices con `condicion` son parciales: solo guardan las filas que la
+cumplen. SQLite los usa cuando el WHERE de la consulta incluye la misma
+condición, por eso los de citas activas se construyen con `condicion_activa()`,
+igual que las consultas de `app/scheduling.py`.
+"""
+import logging
+import sqlite3
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from app.scheduling import condicion_activa
+
+logger = logging.getLogger(__name__)
+
+
+class Indice(NamedTuple):
+    nombre: str
+    tabla: str
+    columnas: Tuple[str, ...]
+    # Consulta representativa del router que debe resolverse con el índice
+    consulta: str
+    parametros: Tuple = ()
+    # WHERE de un índice parcial
+    condicion: Optional[str] = None
+
+
+INDICES: List[Indice] = [
+    # citas
+    Indice(
+        "idx_citas_doctor_fecha", "citas", ("Codigo_Doctor", "Fecha_Hora", "Estado"),
+        # el calendario lo recorre doctor por doctor, con citas de cualquier estado
+        "SELECT Codigo, Estado FROM citas WHERE Codigo_Doctor = ? AND Fecha_Hora >= ? AND Fecha_Hora < ? "
+        "ORDER BY Fecha_Hora",
+        (1, "2024-01-01T00:00:00", "2024-01-08T00:00:00"),
+    ),
+    Indice(
+        "idx_citas_activas", "citas", ("Codigo_Doctor", "Fecha_Hora", "Estado"),
+        # verificar_disponibilidad_doctor, Ocupacion y buscar_huecos: solo las
+        # citas activas, que el cierre automático (app/lifecycle.py) mantiene pocas.
+        # Estado va en el índice porque SQLite vuelve a evaluar el NOT IN y así
+        # no lee la tabla
+        f"SELECT Codigo FROM citas WHERE Codigo_Doctor = ? AND Fecha_Hora > ? AND Fecha_Hora < ? "
+        f"AND {condicion_activa()}",
+        (1, "2024-01-01T09:30:00", "2024-01-01T10:30:00"),
+        condicion_activa(),
+    ),
+    Indice(
+        "idx_citas_activas_fecha", "citas", ("Fecha_Hora", "Estado"),
+        # cierre automático de las citas pasadas que siguen activas
+        f"SELECT Codigo FROM citas WHERE Fecha_Hora < ? AND {condicion_activa()} "
+        f"ORDER BY Fecha_Hora LIMIT ?",
+        ("2024-01-01T09:30:00", 500),
+        condicion_activa(),
+    ),
+    Indice(
+        "idx_citas_paciente_fecha", "citas", ("Codigo_Paciente", "Fecha_Hora"),
+        "SELECT * FROM citas WHERE 1=1 AND Codigo_Paciente = ? ORDER BY Fecha_Hora DESC",
+        (1,),
+    ),
+    Indice(
+        "idx_citas_estado_fecha", "citas", ("Estado", "Fecha_Hora"),
+        "SELECT * FROM citas WHERE 1=1 AND Estado = ? ORDER BY Fecha_Hora DESC",
+        ("Programada",),
+    ),
+    Indice(
+        "idx_citas_serie_fecha", "citas", ("Codigo_Serie", "Fecha_Hora"),
+        # citas de una serie y cambios "esta y las siguientes"
+        "SELECT * FROM citas WHERE Codigo_Serie = ? AND Fecha_Hora >= ? ORDER BY Fecha_Hora",
+        (1, "2024-01-01T09:30:00"),
+    ),
+    Indice(
+        "idx_citas_fecha", "citas", ("Fecha_Hora",),
+        # listado paginado (app/pagination.py): página siguiente por cursor
+        "SELECT * FROM citas WHERE 1=1 AND (Fecha_Hora, Codigo) < (?, ?) "
+        "ORDER BY Fecha_Hora DESC, Codigo DESC LIMIT ?",
+        ("2024-01-01T09:30:00", 100, 101),
+    ),
+    # consultas
+    Indice(
+        "idx_consultas_paciente_fecha", "consultas", ("Codigo_Paciente", "Fecha_de_Consulta"),
+        "SELECT Codigo, Fecha_de_Consulta, Examenes_Descripcion, Examenes_Solicitados FROM consultas "
+        "WHERE Codigo_Paciente = ? AND Examenes_Solicitados = 1 ORDER BY Fecha_de_Consulta DESC",
+        (1,),
+    ),
+    Indice(
+        "idx_consultas_doctor_fecha", "consultas", ("Codigo_Doctor", "Fecha_de_Consulta"),
+        "SELECT * FROM consultas WHERE 1=1 AND Codigo_Doctor = ? ORDER BY Fecha_de_Consulta DESC",
+        (1,),
+    ),
+    Indice(
+        "idx_consultas_cita", "consultas", ("Codigo_Cita",),
+        "SELECT Codigo FROM consultas WHERE Codigo_Cita = ?",
+        (1,),
+    ),
+    Indice(
+        "idx_consultas_fecha", "consultas", ("Fecha_de_Consulta",),
+        "SELECT * FROM consultas WHERE 1=1 AND (Fecha_de_Consulta, Codigo) < (?, ?) "
+        "ORDER BY Fecha_de_Consulta DESC, Codigo DESC LIMIT ?",
+        ("2024-01-01T09:30:00", 100, 101),
+    ),
+    # examenes
+    Indice(
+        "idx_examenes_cita_fecha", "examenes", ("Codigo_Cita", "Fecha_Solicitud"),
+        "SELECT * FROM examenes WHERE Codigo_Cita = ? ORDER BY Fecha_Solicitud DESC",
+        (1,),
+    ),
+    Indice(
+        "idx_examenes_consulta_fecha", "examenes", ("Codigo_Consulta", "Fecha_Solicitud"),
+        "SELECT * FROM examenes WHERE Codigo_Consulta = ? ORDER BY Fecha_Solicitud DESC",
+        (1,),
+    ),
+    Indice(
+        "idx_examenes_paciente_fecha", "examenes", ("Codigo_Paciente", "Fecha_Solicitud"),
+        "SELECT * FROM examenes WHERE 1=1 AND Codigo_Paciente = ? ORDER BY Fecha_Solicitud DESC",
+        (1,),
+    ),
+    Indice(
+        "idx_examenes_doctor_fecha", "examenes", ("Codigo_Doctor", "Fecha_Solicitud"),
+        "SELECT * FROM examenes WHERE 1=1 AND Codigo_Doctor = ? ORDER BY Fecha_Solicitud DESC",
+        (1,),
+    ),
+    Indice(
+        "idx_examenes_fecha", "examenes", ("Fecha_Solicitud",),
+        "SELECT * FROM examenes WHERE 1=1 AND (Fecha_Solicitud, Codigo) < (?, ?) "
+        "ORDER BY Fecha_Solicitud DESC, Codigo DESC LIMIT ?",
+        ("2024-01-01T09:30:00", 100, 101),
+    ),
+    # receta
+    Indice(
+        "idx_receta_fecha", "receta", ("Fecha_Receta",),
+        "SELECT * FROM receta WHERE 1=1 AND (Fecha_Receta, Codigo) < (?, ?) "
+        "ORDER BY Fecha_Receta DESC, Codigo DESC LIMIT ?",
+        ("2024-01-01T09:30:00", 100, 101),
+    ),
+    Indice(
+        "idx_receta_paciente_fecha", "receta", ("Codigo_Paciente", "Fecha_Receta"),
+        "SELECT * FROM receta WHERE 1=1 AND Codigo_Paciente = ? ORDER BY Fecha_Receta DESC",
+        (1,),
+    ),
+    Indice(
+        "idx_receta_doctor_fecha", "receta", ("Codigo_Doctor", "Fecha_Receta"),
+        "SELECT * FROM receta WHERE 1=1 AND Codigo_Doctor = ? ORDER BY Fecha_Receta DESC",
+        (1,),
+    ),
+    Indice(
+        "idx_receta_consulta", "receta", ("Codigo_Consulta",),
+        "SELECT Codigo FROM receta WHERE Codigo_Consulta = ?",
+        (1,),
+    ),
+    # historial_medico
+    Indice(
+        "idx_historial_paciente_fecha", "historial_medico", ("Codigo_Paciente", "Fecha_Ingreso"),
+        "SELECT * FROM historial_medico WHERE Codigo_Paciente = ? ORDER BY Fecha_Ingreso DESC",
+        (1,),
+    ),
+    Indice(
+        "idx_historial_fecha", "historial_medico", ("Fecha_Ingreso",),
+        "SELECT * FROM historial_medico WHERE 1=1 AND (Fecha_Ingreso, Codigo_Historial) < (?, ?) "
+        "ORDER BY Fecha_Ingreso DESC, Codigo_Historial DESC LIMIT ?",
+        ("2024-01-01T09:30:00", 100, 101),
+    ),
+    Indice(
+        "idx_historial_consulta", "historial_medico", ("Codigo_Consulta",),
+        "SELECT Codigo_Historial FROM historial_medico WHERE Codigo_Consulta = ?",
+        (1,),
+    ),
+    # doctor y usuarios_sistema
+    Indice(
+        "idx_doctor_identificacion", "doctor", ("Numero_Identificacion",),
+        "SELECT Codigo FROM doctor WHERE Numero_Identificacion = ?",
+        ("X",),
+    ),
+    Indice(
+        "idx_usuarios_doctor", "usuarios_sistema", ("Codigo_Doctor",),
+        "SELECT Codigo FROM usuarios_sistema WHERE Codigo_Doctor = ?",
+        (1,),
+    ),
+]
+
+
+def _columnas_tabla(conn: sqlite3.Connection, tabla: str) -> set:
+    return {fila[1] for fila in conn.execute(f"PRAGMA table_info({tabla})").fetchall()}
+
+
+def crear_indices(
+    conn: sqlite3.Connection,
+    tabla: Optional[str] = None,
+    nombres: Optional[Sequence[str]] = None,
+) -> List[str]:
+    """
+    Crea los índices que falten (de todas las tablas, solo de `tabla` o solo
+    los de `nombres`) y retorna los nombres de los creados.
+
+    Las migraciones indican siempre `nombres`: cada una crea el conjunto de
+    índices con el que se publicó, aunque después se agreguen otros a INDICES.
+
+    Los índices cuya tabla o columnas aún no existen (bases antiguas sin migrar)
+    se omiten con una advertencia. No hace commit: lo gestiona quien llama.
+    """
+    if nombres is not None:
+        desconocidos = set(nombres) - {indice.nombre for indice in INDICES}
+        if desconocidos:
+            raise ValueError(f"Índices no definidos en INDICES: {sorted(desconocidos)}")
+    existentes = {
+        fila[0] for fila in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall()
+    }
+    creados = []
+    for indice in INDICES:
+        if indice.nombre in existentes or (tabla is not None and indice.tabla != tabla):
+            continue
+        if nombres is not None and indice.nombre not in nombres:
+            continue
+        faltantes = set(indice.columnas) - _columnas_tabla(conn, indice.tabla)
+        if faltantes:
+            logger.warning(
+                f"Se omite el índice {indice.nombre}: faltan columnas {sorted(faltantes)} en {indice.tabla}"
+            )
+            continue
+        donde = f" WHERE {indice.condicion}" if indice.condicion else ""
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {indice.nombre} ON {indice.tabla} ({', '.join(indice.columnas)}){donde}"
+        )
+        creados.append(indice.nombre)
+    if creados:
+        # Actualizar estadísticas para que el planificador elija bien entre índices
+        conn.execute("ANALYZE")
+        logger.info(f"Índices creados: {', '.join(creados)}")
+    return creados
+
+
+def plan_consulta(conn: sqlite3.Connection, consulta: str, parametros: Tuple = ()) -> List[str]:
+    """Retorna las líneas de EXPLAIN QUERY PLAN de una consulta"""
+    return [fila[3] for fila in conn.execute(f"EXPLAIN QUERY PLAN {consulta}", parametros).fetchall()]
+
+
+def verificar_indices(conn: sqlite3.Connection) -> List[Tuple[Indice, bool, List[str]]]:
+    """
+    Ejecuta EXPLAIN QUERY PLAN sobre la consulta de cada índice.
+
+    Una consulta pasa la verificación si su plan usa el índice y no contiene un
+    recorrido completo de la tabla ni un B-tree temporal para el ORDER BY.
+    """
+    resultados = []
+    for indice in INDICES:
+        try:
+            plan = plan_consulta(conn, indice.consulta, indice.parametros)
+        except sqlite3.Error as e:
+            resultados.append((indice, False, [str(e)]))
+            continue
+        usa_indice = any(f"INDEX {indice.nombre}" in linea for linea in plan)
+        recorrido = any(linea == f"SCAN {indice.tabla}" for linea in plan)
+        ordena = any("USE TEMP B-TREE" in linea for linea in plan)
+        resultados.append((indice, usa_indice and not recorrido and not ordena, plan))
+    return resultados
@@ -0,0 +1,99 @@
+"""
+Cierre automático de las citas pasadas
+
+Una cita que nadie actualiza queda 'Programada' (o 'Confirmada') para siempre y
+sigue en el conjunto de citas activas que revisan la comprobación de
+disponibilidad y el buscador de huecos (`app/scheduling.py`). `barrer_citas`
+cierra las citas activas que terminaron hace más de AGENDA_BARRIDO_MARGEN
+minutos: las que tienen una consulta registrada pasan a 'Completada' y el resto
+a AGENDA_BARRIDO_ESTADO ('No asistió' por defecto).
+
+Cada lote es un solo UPDATE enviado al escritor (`app/writer.py`) con hasta
+AGENDA_BARRIDO_LOTE citas, para no retener el lock de escritura. Las citas se
+eligen en el índice parcial idx_citas_activas_fecha, que solo contiene las
+activas: el costo depende de las citas por cerrar y no del historial. Las
+versiones, los contadores y los resúmenes se actualizan con sus triggers, como
+en cualquier otro cambio de estado.
+
+`barrido_periodico` es la tarea que lanza el lifespan de la API: barre al
+iniciar y luego cada AGENDA_BARRIDO_INTERVALO segundos (0 la desactiva).
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+import anyio
+
+from app.scheduling import AGENDA_DURACION_CITA, ESTADOS_INACTIVOS, condicion_activa
+from app.writer import run_write
+
+logger = logging.getLogger(__name__)
+
+# Segundos entre dos barridos (0 desactiva el cierre automático)
+AGENDA_BARRIDO_INTERVALO = float(os.getenv("AGENDA_BARRIDO_INTERVALO", "300"))
+
+# Minutos que se espera después del fin de una cita antes de cerrarla
+AGENDA_BARRIDO_MARGEN = int(os.getenv("AGENDA_BARRIDO_MARGEN", "120"))
+
+# Estado de las citas pasadas sin consulta registrada
+AGENDA_BARRIDO_ESTADO = os.getenv("AGENDA_BARRIDO_ESTADO", "No asistió")
+
+# Citas cerradas como máximo por UPDATE
+AGENDA_BARRIDO_LOTE = int(os.getenv("AGENDA_BARRIDO_LOTE", "500"))
+
+
+def limite_barrido(ahora: Optional[datetime] = None) -> datetime:
+    """Las citas activas que empiezan antes de este momento se cierran"""
+    return (ahora or datetime.now()) - timedelta(minutes=AGENDA_DURACION_CITA + AGENDA_BARRIDO_MARGEN)
+
+
+def barrer_citas(ahora: Optional[datetime] = None) -> int:
+    """Cierra las citas activas ya pasadas y retorna cuántas cambiaron"""
+    if AGENDA_BARRIDO_ESTADO not in ESTADOS_INACTIVOS:
+        # Con un estado activo las mismas citas se volverían a elegir sin fin
+        raise ValueError(
+            f"AGENDA_BARRIDO_ESTADO debe ser uno de {', '.join(ESTADOS_INACTIVOS)}: {AGENDA_BARRIDO_ESTADO!r}"
+        )
+    limite = limite_barrido(ahora).isoformat()
+
+    def cerrar(conn):
+        return conn.execute(
+            f"""
+            UPDATE citas SET
+                Estado = CASE
+                    WHEN EXISTS (SELECT 1 FROM consultas WHERE consultas.Codigo_Cita = citas.Codigo)
+                    THEN 'Completada' ELSE ?
+                END,
+                Fecha_Modificacion = ?
+            WHERE Codigo IN (
+                SELECT Codigo FROM citas WHERE Fecha_Hora < ? AND {condicion_activa()}
+                ORDER BY Fecha_Hora LIMIT ?
+            )
+            """,
+            (AGENDA_BARRIDO_ESTADO, datetime.now().isoformat(), limite, AGENDA_BARRIDO_LOTE),
+        ).rowcount
+
+    total = 0
+    while True:
+        cerradas = run_write(cerrar)
+        total += cerradas
+        if cerradas < AGENDA_BARRIDO_LOTE:
+            return total
+
+
+async def barrido_periodico() -> None:
+    """Tarea de fondo del lifespan: barre al iniciar y cada AGENDA_BARRIDO_INTERVALO segundos"""
+    while True:
+        try:
+            cerradas = await anyio.to_thread.run_sync(barrer_citas)
+            if cerradas:
+                logger.info(f"Cierre automático: {cerradas} citas pasadas cerradas")
+        except ValueError as e:
+            logger.error(f"Cierre automático de citas desactivado: {e}")
+            return
+        except Exception as e:
+            # Un error puntual (base bloqueada, escritor ocupado) se reintenta en el siguiente barrido
+            logger.warning(f"Advertencia en el cierre automático de citas: {e}")
+        await asyncio.sleep(AGENDA_BARRIDO_INTERVALO)
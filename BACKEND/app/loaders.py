@@ -0,0 +1,73 @@
+"""
+Carga por lotes de relaciones para los endpoints de listado
+
+En lugar de ejecutar una consulta por cada fila del listado (N+1), se reúnen las
+claves de todas las filas y se obtienen los registros relacionados con una sola
+consulta por relación. Las claves se envían como un único parámetro JSON y se
+expanden con `json_each`, de modo que el texto de la sentencia es siempre el
+mismo (aprovecha la caché de sentencias) y no hay límite de parámetros.
+"""
+import json
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+# Columnas de examenes que se devuelven como Examenes_Asociados de citas y consultas
+COLUMNAS_EXAMEN_ASOCIADO = (
+    "Codigo", "Tipo_Examen", "Fecha_Solicitud", "Fecha_Resultado",
+    "Resultado", "Observaciones", "Estado",
+)
+
+
+def _claves_unicas(claves: Iterable[Any]) -> List[Any]:
+    return list(dict.fromkeys(c for c in claves if c is not None))
+
+
+def cargar_hijos(
+    cursor: sqlite3.Cursor,
+    tabla: str,
+    clave_padre: str,
+    claves: Iterable[Any],
+    columnas: Sequence[str],
+    orden: Optional[str] = None,
+    filtro: Optional[str] = None,
+) -> Dict[Any, List[Dict[str, Any]]]:
+    """
+    Carga las filas de `tabla` cuyo `clave_padre` está en `claves`.
+
+    Retorna un diccionario clave -> lista de filas (con las `columnas` pedidas, sin
+    la columna de agrupación salvo que se incluya en `columnas`). `filtro` es una
+    condición SQL adicional sin parámetros. Las claves sin filas no aparecen en el
+    resultado.
+    """
+    unicas = _claves_unicas(claves)
+    if not unicas:
+        return {}
+    consulta = (
+        f"SELECT {clave_padre} AS _clave, {', '.join(columnas)} FROM {tabla} "
+        f"WHERE {clave_padre} IN (SELECT value FROM json_each(?))"
+    )
+    if filtro:
+        consulta += f" AND {filtro}"
+    if orden:
+        consulta += f" ORDER BY {orden}"
+    cursor.execute(consulta, (json.dumps(unicas),))
+    hijos: Dict[Any, List[Dict[str, Any]]] = {}
+    for fila in cursor.fetchall():
+        registro = dict(fila)
+        clave = registro.pop("_clave")
+        hijos.setdefault(clave, []).append(registro)
+    return hijos
+
+
+def cargar_por_clave(
+    cursor: sqlite3.Cursor,
+    tabla: str,
+    claves: Iterable[Any],
+    columnas: Sequence[str],
+    clave: str = "Codigo",
+) -> Dict[Any, Dict[str, Any]]:
+    """Carga las filas de `tabla` cuya `clave` está en `claves`, indexadas por clave"""
+    return {
+        valor: filas[0]
+        for valor, filas in cargar_hijos(cursor, tabla, clave, claves, columnas).items()
+    }
@@ -0,0 +1,532 @@
+"""
+Migraciones versionadas del esquema de la base de datos
+
+La versión del esquema se guarda en `PRAGMA user_version`. Al iniciar la API (y
+desde `inicializar_tablas.py`) se aplican en orden las migraciones con número
+mayor a la versión actual. Cada migración se confirma en su propia transacción
+junto con el nuevo número de versión, de modo que una migración fallida no deja
+el esquema a medias y se reintenta en el siguiente arranque.
+
+Las reconstrucciones de tablas (renombrar columnas, agregar foreign keys) copian
+los datos por lotes en una tabla `<tabla>_nueva`, confirmando entre lotes para no
+retener el lock de escritura durante toda la copia. La copia se retoma donde
+quedó si el proceso se interrumpe. Solo el último paso (copiar las filas
+restantes, eliminar la tabla antigua y renombrar la nueva) ocurre dentro de la
+transacción de la migración.
+
+Para agregar una migración, añadir una entrada al final de MIGRACIONES con el
+siguiente número de versión. Nunca modificar una migración ya publicada, ni lo
+que usa al ejecutarse: TABLAS (migraciones 1 a 4) y las listas de índices de
+cada migración quedan como se publicaron, y los cambios de estructura, índices
+o triggers van en una migración nueva con su propia definición.
+"""
+import logging
+import os
+import sqlite3
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from app.counters import crear_contadores
+from app.database import DATABASE_URL, crear_conexion
+from app.indices import INDICES, crear_indices
+from app.rollups import crear_resumenes
+from app.schema import get_schema, refrescar_esquema
+from app.search import crear_busqueda
+from app.versions import crear_versiones
+from app.writer import run_write
+
+logger = logging.getLogger(__name__)
+
+# Filas copiadas por transacción al reconstruir una tabla
+DB_MIGRATION_BATCH = int(os.getenv("DB_MIGRATION_BATCH", "5000"))
+
+
+# Estructura de cada tabla tal como la crean las migraciones 1 a 4, en orden de
+# dependencias de foreign keys. No modificar: las tablas y columnas nuevas se
+# crean en su propia migración. `{nombre}` permite crear la misma estructura con
+# otro nombre al reconstruir.
+TABLAS: Dict[str, str] = {
+    "pacientes": """
+        CREATE TABLE IF NOT EXISTS {nombre} (
+            Codigo INTEGER PRIMARY KEY AUTOINCREMENT,
+            Nombre TEXT NOT NULL,
+            Apellidos TEXT NOT NULL,
+            Fecha_Nacimiento DATE,
+            Genero TEXT,
+            Direccion TEXT,
+            Telefono TEXT,
+            Correo TEXT,
+            Numero_Identificacion TEXT UNIQUE,
+            Tipo_Identificacion TEXT,
+            Fecha_Creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+            Fecha_Modificacion DATETIME
+        )
+    """,
+    "doctor": """
+        CREATE TABLE IF NOT EXISTS {nombre} (
+            Codigo INTEGER PRIMARY KEY AUTOINCREMENT,
+            Nombre TEXT NOT NULL,
+            Apellidos TEXT NOT NULL,
+            Especialidad TEXT,
+            Direccion TEXT,
+            Correo TEXT,
+            Genero TEXT,
+            Numero_Celular REAL,
+            Numero_Colegiado TEXT UNIQUE,
+            Numero_Identificacion TEXT,
+            Tipo_Identificacion TEXT,
+            Fecha_Contratacion DATE,
+            Estado TEXT DEFAULT 'Activo',
+            Salario REAL,
+            Fecha_Creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+            Fecha_Modificacion DATETIME
+        )
+    """,
+    "citas": """
+        CREATE TABLE IF NOT EXISTS {nombre} (
+            Codigo INTEGER PRIMARY KEY AUTOINCREMENT,
+            Codigo_Paciente INTEGER NOT NULL,
+            Codigo_Doctor INTEGER NOT NULL,
+            Fecha_Hora DATETIME NOT NULL,
+            Estado TEXT DEFAULT 'Programada',
+            Motivo TEXT,
+            Observaciones TEXT,
+            Fecha_Creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+            Fecha_Modificacion DATETIME,
+            FOREIGN KEY (Codigo_Paciente) REFERENCES pacientes(Codigo),
+            FOREIGN KEY (Codigo_Doctor) REFERENCES doctor(Codigo)
+        )
+    """,
+    "consultas": """
+        CREATE TABLE IF NOT EXISTS {nombre} (
+            Codigo INTEGER PRIMARY KEY AUTOINCREMENT,
+            Codigo_Paciente INTEGER,
+            Codigo_Doctor INTEGER NOT NULL,
+            Codigo_Cita INTEGER,
+            Tipo_de_Consulta TEXT,
+            Fecha_de_Consulta DATETIME NOT NULL,
+            Diagnostico TEXT,
+            Tratamiento TEXT,
+            Observaciones TEXT,
+            Estado TEXT DEFAULT 'Programada',
+            Examenes_Solicitados INTEGER DEFAULT 0,
+            Examenes_Descripcion TEXT,
+            Examenes_Sugeridos INTEGER DEFAULT 0,
+            Examenes_Sugeridos_Descripcion TEXT,
+            Fecha_Creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+            Fecha_Modificacion DATETIME,
+            FOREIGN KEY (Codigo_Paciente) REFERENCES pacientes(Codigo),
+            FOREIGN KEY (Codigo_Doctor) REFERENCES doctor(Codigo),
+            FOREIGN KEY (Codigo_Cita) REFERENCES citas(Codigo)
+        )
+    """,
+    "receta": """
+        CREATE TABLE IF NOT EXISTS {nombre} (
+            Codigo INTEGER PRIMARY KEY AUTOINCREMENT,
+            Codigo_Paciente INTEGER,
+            Codigo_Doctor INTEGER,
+            Codigo_Consulta INTEGER,
+            Nombre_Paciente TEXT,
+            Fecha_Receta DATETIME,
+            Medicamento TEXT,
+            Instrucciones TEXT,
+            Fecha_Creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+            Fecha_Modificacion DATETIME,
+            FOREIGN KEY (Codigo_Consulta) REFERENCES consultas(Codigo),
+            FOREIGN KEY (Codigo_Paciente) REFERENCES pacientes(Codigo),
+            FOREIGN KEY (Codigo_Doctor) REFERENCES doctor(Codigo)
+        )
+    """,
+    "historial_medico": """
+        CREATE TABLE IF NOT EXISTS {nombre} (
+            Codigo_Historial INTEGER PRIMARY KEY AUTOINCREMENT,
+            Codigo_Paciente INTEGER NOT NULL,
+            Codigo_Consulta INTEGER,
+            Tipo_Historial TEXT,
+            Fecha_Ingreso DATETIME NOT NULL,
+            Diagnostico TEXT,
+            Tratamiento TEXT,
+            Observaciones TEXT,
+            Fecha_Creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+            Fecha_Modificacion DATETIME,
+            FOREIGN KEY (Codigo_Paciente) REFERENCES pacientes(Codigo),
+            FOREIGN KEY (Codigo_Consulta) REFERENCES consultas(Codigo)
+        )
+    """,
+    "examenes": """
+        CREATE TABLE IF NOT EXISTS {nombre} (
+            Codigo INTEGER PRIMARY KEY AUTOINCREMENT,
+            Codigo_Paciente INTEGER NOT NULL,
+            Codigo_Doctor INTEGER,
+            Codigo_Consulta INTEGER,
+            Codigo_Cita INTEGER,
+            Tipo_Examen TEXT NOT NULL,
+            Fecha_Solicitud DATETIME NOT NULL,
+            Fecha_Resultado DATETIME,
+            Resultado TEXT,
+            Observaciones TEXT,
+            Estado TEXT DEFAULT 'Pendiente',
+            Fecha_Creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+            Fecha_Modificacion DATETIME,
+            FOREIGN KEY (Codigo_Paciente) REFERENCES pacientes(Codigo),
+            FOREIGN KEY (Codigo_Doctor) REFERENCES doctor(Codigo),
+            FOREIGN KEY (Codigo_Consulta) REFERENCES consultas(Codigo),
+            FOREIGN KEY (Codigo_Cita) REFERENCES citas(Codigo)
+        )
+    """,
+    "usuarios_sistema": """
+        CREATE TABLE IF NOT EXISTS {nombre} (
+            Codigo INTEGER PRIMARY KEY AUTOINCREMENT,
+            Usuario TEXT NOT NULL UNIQUE,
+            Contrasena TEXT NOT NULL,
+            Codigo_Doctor INTEGER,
+            Rol TEXT DEFAULT 'Recepcionista',
+            Activo INTEGER DEFAULT 1,
+            Ultimo_Acceso DATETIME,
+            Fecha_Creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+            Fecha_Modificacion DATETIME,
+            FOREIGN KEY (Codigo_Doctor) REFERENCES doctor(Codigo)
+        )
+    """,
+}
+
+
+class Migracion(NamedTuple):
+    version: int
+    descripcion: str
+    # Se ejecuta dentro de la transacción que fija la nueva versión
+    aplicar: Callable[[sqlite3.Connection], None]
+    # Trabajo previo por lotes, fuera de esa transacción; debe poder retomarse
+    preparar: Optional[Callable[[sqlite3.Connection], None]] = None
+
+
+def existe_tabla(conn: sqlite3.Connection, tabla: str) -> bool:
+    fila = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla,)
+    ).fetchone()
+    return fila is not None
+
+
+def columnas_tabla(conn: sqlite3.Connection, tabla: str) -> List[str]:
+    return [fila[1] for fila in conn.execute(f"PRAGMA table_info({tabla})").fetchall()]
+
+
+def version_actual(conn: sqlite3.Connection) -> int:
+    """Versión del esquema guardada en la base de datos"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+class Reconstruccion:
+    """
+    Reconstruye una tabla antigua con la estructura definida en TABLAS.
+
+    Los índices y triggers que tenía la tabla antigua se vuelven a crear sobre la
+    nueva; los de migraciones que aún no se aplicaron los crea su migración.
+
+    `renombres` indica, para cada columna nueva, de qué columnas antiguas puede
+    tomar su valor (en orden de preferencia) y `defaults` la expresión a usar si
+    ninguna existe. Las columnas sin origen toman el DEFAULT de la tabla.
+    """
+
+    def __init__(self, tabla: str, renombres: Optional[Dict[str, Tuple[str, ...]]] = None,
+                 defaults: Optional[Dict[str, str]] = None):
+        self.tabla = tabla
+        self.nueva = f"{tabla}_nueva"
+        self.renombres = renombres or {}
+        self.defaults = defaults or {}
+        memoria = sqlite3.connect(":memory:")
+        memoria.execute(TABLAS[tabla].format(nombre=tabla))
+        info = memoria.execute(f"PRAGMA table_info({tabla})").fetchall()
+        memoria.close()
+        self.columnas = [fila[1] for fila in info]
+        self.clave = next(fila[1] for fila in info if fila[5] == 1)
+
+    def necesaria(self, conn: sqlite3.Connection) -> bool:
+        """La tabla existe y le falta alguna columna de la estructura actual"""
+        if not existe_tabla(conn, self.tabla):
+            return False
+        return bool(set(self.columnas) - set(columnas_tabla(conn, self.tabla)))
+
+    def _origen(self, columna: str, existentes: Set[str]) -> Optional[str]:
+        candidatas = [c for c in (columna,) + self.renombres.get(columna, ()) if c in existentes]
+        if columna in self.defaults:
+            candidatas.append(self.defaults[columna])
+        if not candidatas:
+            return None
+        if len(candidatas) == 1:
+            return candidatas[0]
+        return f"COALESCE({', '.join(candidatas)})"
+
+    def _mapeo(self, conn: sqlite3.Connection) -> List[Tuple[str, str]]:
+        existentes = set(columnas_tabla(conn, self.tabla))
+        mapeo = []
+        for columna in self.columnas:
+            origen = self._origen(columna, existentes)
+            if origen is not None:
+                mapeo.append((columna, origen))
+        return mapeo
+
+    def _crear_nueva(self, conn: sqlite3.Connection) -> None:
+        if existe_tabla(conn, self.nueva):
+            if columnas_tabla(conn, self.nueva) == self.columnas:
+                return
+            # Restos de una versión anterior del script con otra estructura
+            conn.execute(f"DROP TABLE {self.nueva}")
+        conn.execute(TABLAS[self.tabla].format(nombre=self.nueva))
+
+    def _copiar_lote(self, conn: sqlite3.Connection, limite: Optional[int]) -> int:
+        mapeo = self._mapeo(conn)
+        clave_origen = dict(mapeo)[self.clave]
+        ultima = conn.execute(f"SELECT COALESCE(MAX({self.clave}), -1) FROM {self.nueva}").fetchone()[0]
+        consulta = (
+            f"INSERT INTO {self.nueva} ({', '.join(c for c, _ in mapeo)}) "
+            f"SELECT {', '.join(o for _, o in mapeo)} FROM {self.tabla} "
+            f"WHERE {clave_origen} > ? ORDER BY {clave_origen}"
+        )
+        parametros: Tuple = (ultima,)
+        if limite is not None:
+            consulta += " LIMIT ?"
+            parametros += (limite,)
+        return conn.execute(consulta, parametros).rowcount
+
+    def preparar(self, conn: sqlite3.Connection) -> None:
+        """Copia las filas por lotes, confirmando cada lote por separado"""
+        if not self.necesaria(conn):
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        self._crear_nueva(conn)
+        conn.execute("COMMIT")
+        total = 0
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                copiadas = self._copiar_lote(conn, DB_MIGRATION_BATCH)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            total += copiadas
+            if copiadas < DB_MIGRATION_BATCH:
+                break
+        logger.info(f"Reconstrucción de {self.tabla}: {total} filas copiadas por lotes")
+
+    def aplicar(self, conn: sqlite3.Connection) -> None:
+        """Copia lo que falte y reemplaza la tabla antigua (dentro de la transacción)"""
+        if not self.necesaria(conn):
+            return
+        self._crear_nueva(conn)
+        self._copiar_lote(conn, None)
+        # Índices (los de sqlite_autoindex no tienen sql) y triggers de la tabla
+        # antigua: DROP TABLE los elimina junto con ella
+        indices = [fila[0] for fila in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (self.tabla,)
+        ).fetchall()]
+        triggers = [fila[0] for fila in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (self.tabla,)
+        ).fetchall()]
+        conn.execute(f"DROP TABLE {self.tabla}")
+        conn.execute(f"ALTER TABLE {self.nueva} RENAME TO {self.tabla}")
+        definidos = {indice.nombre for indice in INDICES}
+        crear_indices(conn, self.tabla, [nombre for nombre in indices if nombre in definidos])
+        for sql in triggers:
+            conn.execute(sql)
+
+
+def _crear_esquema_base(conn: sqlite3.Connection) -> None:
+    for nombre, ddl in TABLAS.items():
+        conn.execute(ddl.format(nombre=nombre))
+
+
+def _agregar_columnas(tabla: str, columnas: Dict[str, str]) -> Callable[[sqlite3.Connection], None]:
+    def aplicar(conn: sqlite3.Connection) -> None:
+        existentes = set(columnas_tabla(conn, tabla))
+        for columna, tipo in columnas.items():
+            if columna not in existentes:
+                conn.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {tipo}")
+    return aplicar
+
+
+# Índices de la migración 6 tal como se publicó. Los agregados después a
+# app/indices.py se crean en su propia migración.
+_INDICES_SECUNDARIOS = (
+    "idx_citas_doctor_fecha", "idx_citas_paciente_fecha", "idx_citas_estado_fecha", "idx_citas_fecha",
+    "idx_consultas_paciente_fecha", "idx_consultas_doctor_fecha", "idx_consultas_cita", "idx_consultas_fecha",
+    "idx_examenes_cita_fecha", "idx_examenes_consulta_fecha", "idx_examenes_paciente_fecha",
+    "idx_examenes_doctor_fecha", "idx_examenes_fecha",
+    "idx_receta_fecha", "idx_receta_paciente_fecha", "idx_receta_doctor_fecha", "idx_receta_consulta",
+    "idx_historial_paciente_fecha", "idx_historial_fecha", "idx_historial_consulta",
+    "idx_doctor_identificacion", "idx_usuarios_doctor",
+)
+
+
+def _crear_indices_secundarios(conn: sqlite3.Connection) -> None:
+    crear_indices(conn, nombres=_INDICES_SECUNDARIOS)
+
+
+# Tabla de la migración 11; citas.Codigo_Serie se agrega con ALTER TABLE
+_SERIES_CITAS = """
+    CREATE TABLE IF NOT EXISTS series_citas (
+        Codigo INTEGER PRIMARY KEY AUTOINCREMENT,
+        Codigo_Paciente INTEGER NOT NULL,
+        Codigo_Doctor INTEGER NOT NULL,
+        Fecha_Inicio DATETIME NOT NULL,
+        Frecuencia TEXT NOT NULL,
+        Intervalo INTEGER NOT NULL DEFAULT 1,
+        Repeticiones INTEGER,
+        Fecha_Fin DATE,
+        Motivo TEXT,
+        Fecha_Creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (Codigo_Paciente) REFERENCES pacientes(Codigo),
+        FOREIGN KEY (Codigo_Doctor) REFERENCES doctor(Codigo)
+    )
+"""
+
+
+def _crear_series(conn: sqlite3.Connection) -> None:
+    conn.execute(_SERIES_CITAS)
+    _agregar_columnas("citas", {"Codigo_Serie": "INTEGER REFERENCES series_citas(Codigo)"})(conn)
+    crear_indices(conn, nombres=("idx_citas_serie_fecha",))
+    crear_versiones(conn, "series_citas")
+
+
+def _crear_indices_activas(conn: sqlite3.Connection) -> None:
+    # Con 'No asistió' entre los estados inactivos
+    crear_indices(conn, nombres=("idx_citas_activas", "idx_citas_activas_fecha"))
+
+
+_consultas = Reconstruccion(
+    "consultas",
+    renombres={"Fecha_de_Consulta": ("Fecha_Consulta",)},
+)
+_examenes = Reconstruccion(
+    "examenes",
+    renombres={
+        "Fecha_Solicitud": ("Fecha_Examen", "Fecha_Creacion"),
+        "Resultado": ("Resultados",),
+    },
+    defaults={"Fecha_Solicitud": "datetime('now')"},
+)
+_historial = Reconstruccion(
+    "historial_medico",
+    renombres={
+        "Codigo_Historial": ("Codigo",),
+        "Fecha_Ingreso": ("Fecha_Registro", "Fecha_Creacion"),
+        "Diagnostico": ("Descripcion",),
+    },
+    defaults={"Fecha_Ingreso": "datetime('now')"},
+)
+
+
+MIGRACIONES: List[Migracion] = [
+    Migracion(1, "Esquema base", _crear_esquema_base),
+    Migracion(
+        2, "consultas: Fecha_Consulta -> Fecha_de_Consulta y columnas de exámenes",
+        _consultas.aplicar, _consultas.preparar,
+    ),
+    Migracion(
+        3, "examenes: Fecha_Solicitud, Resultado, Estado y Codigo_Cita con foreign key",
+        _examenes.aplicar, _examenes.preparar,
+    ),
+    Migracion(
+        4, "historial_medico: Codigo_Historial, Fecha_Ingreso y Diagnostico",
+        _historial.aplicar, _historial.preparar,
+    ),
+    Migracion(
+        5, "pacientes: columnas usadas por la API",
+        _agregar_columnas("pacientes", {
+            "Edad": "TEXT",
+            "Numero_Celular": "REAL",
+            "Tipo_Sangre": "TEXT",
+            "Alergias": "TEXT",
+            "Contacto_Emergencia": "TEXT",
+            "Telefono_Emergencia": "REAL",
+            "Codigo_Seguro": "INTEGER",
+        }),
+    ),
+    Migracion(6, "Índices secundarios", _crear_indices_secundarios),
+    Migracion(7, "Versiones de cambios por tabla para los ETag", crear_versiones),
+    Migracion(8, "Contadores de filas por tabla y estado (stats_counters)", crear_contadores),
+    Migracion(9, "Resúmenes diarios por doctor y estado (resumen_diario)", crear_resumenes),
+    Migracion(10, "Búsqueda de texto completo de pacientes (pacientes_fts)", crear_busqueda),
+    Migracion(11, "Series de citas recurrentes (series_citas y citas.Codigo_Serie)", _crear_series),
+    Migracion(12, "Índices parciales de citas activas (cierre automático de citas pasadas)", _crear_indices_activas),
+]
+
+
+def _violaciones_fk(conn: sqlite3.Connection) -> Set[tuple]:
+    return {tuple(fila) for fila in conn.execute("PRAGMA foreign_key_check").fetchall()}
+
+
+def aplicar_migraciones(database: str = DATABASE_URL) -> int:
+    """
+    Aplica las migraciones pendientes, recarga el registro del esquema y retorna
+    la versión final.
+
+    Las foreign keys se desactivan mientras dura cada migración (necesario para
+    reconstruir tablas referenciadas) y antes de confirmar se verifica con
+    `PRAGMA foreign_key_check` que la migración no introdujo violaciones nuevas.
+    """
+    conn = crear_conexion(database)
+    # Autocommit: las transacciones se controlan explícitamente
+    conn.isolation_level = None
+    try:
+        actual = version_actual(conn)
+        for migracion in MIGRACIONES:
+            if migracion.version <= actual:
+                continue
+            logger.info(f"Aplicando migración {migracion.version}: {migracion.descripcion}")
+            conn.execute("PRAGMA foreign_keys = OFF")
+            try:
+                if migracion.preparar is not None:
+                    migracion.preparar(conn)
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    # Otro proceso pudo aplicarla mientras esperábamos el lock
+                    if version_actual(conn) >= migracion.version:
+                        conn.execute("ROLLBACK")
+                        actual = version_actual(conn)
+                        continue
+                    previas = _violaciones_fk(conn)
+                    migracion.aplicar(conn)
+                    nuevas = _violaciones_fk(conn) - previas
+                    if nuevas:
+                        raise sqlite3.IntegrityError(
+                            f"La migración {migracion.version} deja {len(nuevas)} referencias inválidas"
+                        )
+                    conn.execute(f"PRAGMA user_version = {migracion.version}")
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+            finally:
+                conn.execute("PRAGMA foreign_keys = ON")
+            actual = migracion.version
+        # El registro del esquema se carga al arrancar y tras cada migración
+        refrescar_esquema(conn)
+        return actual
+    finally:
+        conn.close()
+
+
+def asegurar_tabla(tabla: str) -> None:
+    """
+    Crea `tabla` con su estructura de TABLAS y sus triggers si el registro del
+    esquema indica que falta (por ejemplo, si alguien la eliminó con la API en
+    marcha). Solo sirve para tablas sin columnas agregadas por migraciones
+    posteriores, como usuarios_sistema.
+
+    En el caso normal no ejecuta ninguna consulta: solo consulta el registro.
+    """
+    if get_schema().tiene_tabla(tabla):
+        return
+    logger.warning(f"La tabla {tabla} no existe. Creándola...")
+
+    def _crear(conn: sqlite3.Connection) -> None:
+        conn.execute(TABLAS[tabla].format(nombre=tabla))
+        crear_versiones(conn, tabla)
+        crear_contadores(conn, tabla)
+        crear_resumenes(conn, tabla)
+        crear_busqueda(conn, tabla)
+        refrescar_esquema(conn)
+
+    run_write(_crear)
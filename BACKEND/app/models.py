@@ -2,7 +2,7 @@
 Modelos Pydantic para validación de datos
 """
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime, date, time
 
 
@@ -138,6 +138,7 @@ class ExamenAsociado(BaseModel):
 
 class Cita(CitaBase):
     Codigo: int
+    Codigo_Serie: Optional[int] = None
     Fecha_Creacion: Optional[datetime] = None
     Fecha_Modificacion: Optional[datetime] = None
     Examenes_Asociados: Optional[List[ExamenAsociado]] = None
@@ -146,6 +147,112 @@ class Cita(CitaBase):
         from_attributes = True
 
 
+class ResultadoCitaLote(BaseModel):
+    Indice: int
+    Codigo_HTTP: int
+    Codigo: Optional[int] = None
+    Detalle: Optional[str] = None
+
+
+class SerieCitasCreate(BaseModel):
+    Codigo_Paciente: int
+    Codigo_Doctor: int
+    Fecha_Inicio: datetime
+    Frecuencia: str
+    Intervalo: int = 1
+    Repeticiones: Optional[int] = None
+    Fecha_Fin: Optional[date] = None
+    Estado: Optional[str] = "Programada"
+    Motivo: Optional[str] = None
+    Observaciones: Optional[str] = None
+
+
+class SerieCitasUpdate(BaseModel):
+    Codigo_Doctor: Optional[int] = None
+    Estado: Optional[str] = None
+    Motivo: Optional[str] = None
+    Observaciones: Optional[str] = None
+
+
+class ResultadoCitaSerie(ResultadoCitaLote):
+    Fecha_Hora: datetime
+
+
+class SerieCitasCreada(BaseModel):
+    Codigo_Serie: Optional[int] = None
+    Citas: List[ResultadoCitaSerie]
+
+
+class SerieCitas(BaseModel):
+    Codigo: int
+    Codigo_Paciente: int
+    Codigo_Doctor: int
+    Fecha_Inicio: datetime
+    Frecuencia: str
+    Intervalo: int
+    Repeticiones: Optional[int] = None
+    Fecha_Fin: Optional[date] = None
+    Motivo: Optional[str] = None
+    Fecha_Creacion: Optional[datetime] = None
+    Citas: List[Cita] = []
+
+
+class OperacionCitasLote(BaseModel):
+    Desde: datetime
+    Hasta: datetime
+    Codigo_Doctor: Optional[int] = None
+    Estado: Optional[str] = None
+    Nuevo_Estado: Optional[str] = None
+    Desplazamiento_Minutos: Optional[int] = None
+
+
+class CambioCitas(BaseModel):
+    Citas_Afectadas: List[int]
+
+
+class CambioSerieCitas(CambioCitas):
+    Codigo_Serie: int
+
+
+class AusenciaDoctor(BaseModel):
+    Codigo_Doctor: int
+    Desde: Optional[datetime] = None
+    Hasta: Optional[datetime] = None
+
+
+class CitaReprogramada(BaseModel):
+    Codigo: int
+    Codigo_Paciente: int
+    Fecha_Hora_Anterior: datetime
+    Codigo_Doctor: Optional[int] = None
+    Fecha_Hora: Optional[datetime] = None
+
+
+class ReprogramacionCitas(BaseModel):
+    Codigo_Doctor: int
+    Simulacion: bool
+    Reprogramadas: List[CitaReprogramada]
+    Sin_Asignar: List[CitaReprogramada]
+
+
+class CitaCalendario(BaseModel):
+    Codigo: int
+    Fecha_Hora: Optional[datetime] = None
+    Estado: Optional[str] = None
+    Motivo: Optional[str] = None
+    Codigo_Doctor: Optional[int] = None
+    Doctor: Optional[str] = None
+    Codigo_Paciente: Optional[int] = None
+    Paciente: Optional[str] = None
+    Codigo_Serie: Optional[int] = None
+
+
+class HuecoDisponible(BaseModel):
+    Codigo_Doctor: int
+    Inicio: datetime
+    Fin: datetime
+
+
 
 class ConsultaBase(BaseModel):
     Codigo_Paciente: Optional[int] = None
@@ -181,6 +288,7 @@ class Consulta(ConsultaBase):
     Codigo: int
     Fecha_Creacion: Optional[datetime] = None
     Fecha_Modificacion: Optional[datetime] = None
+    Examenes_Asociados: Optional[List[ExamenAsociado]] = None
 
     class Config:
         from_attributes = True
@@ -240,10 +348,16 @@ class HistorialUpdate(BaseModel):
     Observaciones: Optional[str] = None
 
 
+class ExamenSolicitado(BaseModel):
+    Fecha_Consulta: Optional[str] = None
+    Descripcion: Optional[str] = None
+
+
 class Historial(HistorialBase):
     Codigo_Historial: int
     Fecha_Creacion: Optional[datetime] = None
     Fecha_Modificacion: Optional[datetime] = None
+    Examenes_Solicitados: Optional[List[ExamenSolicitado]] = None
 
     class Config:
         from_attributes = True
@@ -280,10 +394,31 @@ class ExamenUpdate(BaseModel):
     Estado: Optional[str] = None
 
 
+class CitaInfo(BaseModel):
+    Codigo: int
+    Fecha_Hora: Optional[str] = None
+    Estado: Optional[str] = None
+    Motivo: Optional[str] = None
+
+
+class ConsultaInfo(BaseModel):
+    Codigo: int
+    Fecha_de_Consulta: Optional[str] = None
+    Estado: Optional[str] = None
+    Tipo_de_Consulta: Optional[str] = None
+    Diagnostico: Optional[str] = None
+    Examenes_Solicitados: Optional[bool] = None
+    Examenes_Descripcion: Optional[str] = None
+    Examenes_Sugeridos: Optional[bool] = None
+    Examenes_Sugeridos_Descripcion: Optional[str] = None
+
+
 class Examen(ExamenBase):
     Codigo: int
     Fecha_Creacion: Optional[datetime] = None
     Fecha_Modificacion: Optional[datetime] = None
+    Cita_Info: Optional[CitaInfo] = None
+    Consulta_Info: Optional[ConsultaInfo] = None
 
     class Config:
         from_attributes = True
@@ -319,3 +454,36 @@ class UsuarioSistema(UsuarioSistemaBase):
     class Config:
         from_attributes = True
 
+
+# ==================== DASHBOARD ====================
+class Conteo(BaseModel):
+    Clave: str
+    Total: int
+
+
+class Dashboard(BaseModel):
+    # Total de registros por sección (pacientes, doctores, citas, ...)
+    Totales: Dict[str, int]
+    Examenes_Por_Estado: List[Conteo]
+    # Clave con el mes en formato AAAA-MM, en orden cronológico
+    Citas_Por_Mes: List[Conteo]
+    Usuarios_Por_Rol: List[Conteo]
+
+
+class PuntoSerie(BaseModel):
+    # Día (AAAA-MM-DD) o mes (AAAA-MM) según el periodo pedido
+    Periodo: str
+    # Estado o código de doctor cuando la serie se desglosa; None si no
+    Grupo: Optional[str] = None
+    Total: int
+
+
+# ==================== AUTOCOMPLETADO ====================
+class Sugerencia(BaseModel):
+    # "paciente" o "doctor"
+    Tipo: str
+    Codigo: int
+    # Nombre y apellidos
+    Texto: str
+    # Número de identificación (pacientes) o especialidad (doctores)
+    Detalle: Optional[str] = None
@@ -0,0 +1,182 @@
+"""
+Paginación por cursor (keyset) para los endpoints de listado
+
+Cada listado se ordena por su columna habitual (por ejemplo `Fecha_Hora DESC`) y
+por el código como desempate. En lugar de OFFSET, el cursor guarda los valores de
+la última fila devuelta y la siguiente página empieza justo después de ella con
+una condición `(columna, codigo) < (?, ?)` que SQLite resuelve con el índice: una
+página profunda cuesta lo mismo que la primera.
+
+El cuerpo de la respuesta sigue siendo una lista. La metadata va en cabeceras:
+
+    X-Next-Cursor   Cursor de la página siguiente (ausente en la última página)
+    X-Total-Count   Total de filas que cumplen los filtros (con ?total=true, solo
+                    en la primera página)
+
+Sin filtros el total se lee de `stats_counters` (app/counters.py). Con filtros
+es un `COUNT(*)` que recorre todas las filas que los cumplen, por eso se calcula
+una sola vez, en la petición sin cursor, y no en cada página.
+"""
+import base64
+import json
+import os
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Query, Response
+
+from app.counters import CONTADORES, leer_total
+
+# Tamaño de página por defecto y máximo que acepta el servidor
+API_PAGE_SIZE = int(os.getenv("API_PAGE_SIZE", "100"))
+API_MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", "500"))
+
+CABECERA_CURSOR = "X-Next-Cursor"
+CABECERA_TOTAL = "X-Total-Count"
+
+# Marca del cursor que inicia la zona de filas con la columna de orden en NULL
+_INICIO_NULOS = "nulos"
+
+
+def codificar_cursor(valores: Sequence[Any]) -> str:
+    texto = json.dumps(list(valores), separators=(",", ":"))
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> List[Any]:
+    """Decodifica un cursor recibido del cliente (400 si no es válido)"""
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        if not isinstance(valores, list) or not valores:
+            raise ValueError("cursor vacío")
+        return valores
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+
+
+def _columna_resultado(columna: str) -> str:
+    # "r.Fecha_Receta" -> "Fecha_Receta" (nombre en la fila devuelta)
+    return columna.split(".")[-1]
+
+
+class Paginacion:
+    """
+    Dependencia de FastAPI con los parámetros de paginación de un listado.
+
+    Uso en un router:
+
+        query, params = paginacion.aplicar(cursor, query, params, "Fecha_Hora")
+        cursor.execute(query, params)
+        filas = paginacion.recortar(cursor.fetchall())
+    """
+
+    def __init__(
+        self,
+        response: Response,
+        limit: int = Query(
+            API_PAGE_SIZE, ge=1, le=API_MAX_PAGE_SIZE,
+            description=f"Filas por página (máximo {API_MAX_PAGE_SIZE})"
+        ),
+        cursor: Optional[str] = Query(
+            None, description="Cursor devuelto en la cabecera X-Next-Cursor de la página anterior"
+        ),
+        total: bool = Query(
+            False,
+            description="Incluir el total de filas en la cabecera X-Total-Count (solo en la primera "
+                        "página; con filtros recorre todas las filas que los cumplen)"
+        ),
+    ):
+        self.response = response
+        self.limit = limit
+        self.cursor = cursor
+        self.total = total
+        # Se decodifica al resolver la dependencia: un cursor inválido es un 400
+        self._valores = decodificar_cursor(cursor) if cursor else None
+        self._columna: Optional[str] = None
+        self._clave = "Codigo"
+        self._nulos = False
+        self._zona_nulos = False
+
+    def aplicar(
+        self,
+        db_cursor,
+        query: str,
+        params: List[Any],
+        columna: Optional[str] = None,
+        clave: str = "Codigo",
+        nulos: bool = False,
+        sin_limite: bool = False,
+        tabla: Optional[str] = None,
+    ) -> Tuple[str, List[Any]]:
+        """
+        Agrega al `query` (que termina en sus condiciones WHERE) la condición del
+        cursor, el ORDER BY `columna` DESC, `clave` DESC y el LIMIT.
+
+        `columna` None ordena solo por `clave`. `nulos` indica que la columna
+        admite NULL: esas filas van al final y se recorren en una zona aparte.
+        `sin_limite` omite el LIMIT (exportaciones en streaming, app/streaming.py).
+        Si se pidió el total y es la primera página, lo calcula con los mismos
+        filtros; sin filtros (`params` vacío) y con `tabla` contada en
+        stats_counters lo lee de ahí.
+        """
+        self._columna, self._clave, self._nulos = columna, clave, nulos
+        params = list(params)
+
+        if self.total and self._valores is None:
+            if tabla in CONTADORES and not params:
+                total = leer_total(db_cursor, tabla)
+            else:
+                db_cursor.execute(f"SELECT COUNT(*) FROM ({query})", params)
+                total = db_cursor.fetchone()[0]
+            self.response.headers[CABECERA_TOTAL] = str(total)
+
+        if self._valores is not None:
+            valores = self._valores
+            if columna is None:
+                if len(valores) != 1:
+                    raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+                query += f" AND {clave} < ?"
+                params.append(valores[0])
+            elif valores == [_INICIO_NULOS]:
+                self._zona_nulos = True
+                query += f" AND {columna} IS NULL"
+            elif len(valores) != 2:
+                raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+            elif valores[0] is None:
+                self._zona_nulos = True
+                query += f" AND {columna} IS NULL AND {clave} < ?"
+                params.append(valores[1])
+            elif nulos and sin_limite:
+                # Sin páginas, las filas con NULL siguen a continuación
+                query += f" AND (({columna}, {clave}) < (?, ?) OR {columna} IS NULL)"
+                params.extend(valores)
+            else:
+                query += f" AND ({columna}, {clave}) < (?, ?)"
+                params.extend(valores)
+
+        if columna is None:
+            query += f" ORDER BY {clave} DESC"
+        else:
+            query += f" ORDER BY {columna} DESC, {clave} DESC"
+        if sin_limite:
+            return query, params
+        # Una fila extra indica si existe una página siguiente
+        query += " LIMIT ?"
+        params.append(self.limit + 1)
+        return query, params
+
+    def recortar(self, filas: List[Any]) -> List[Any]:
+        """Deja solo las filas de la página y publica el cursor siguiente"""
+        clave = _columna_resultado(self._clave)
+        if len(filas) > self.limit:
+            filas = filas[:self.limit]
+            ultima = filas[-1]
+            if self._columna is None:
+                valores = [ultima[clave]]
+            else:
+                valores = [ultima[_columna_resultado(self._columna)], ultima[clave]]
+            self.response.headers[CABECERA_CURSOR] = codificar_cursor(valores)
+        elif self._nulos and self.cursor and not self._zona_nulos:
+            # Terminaron las filas con valor: seguir con las que tienen NULL
+            self.response.headers[CABECERA_CURSOR] = codificar_cursor([_INICIO_NULOS])
+        return filas
@@ -0,0 +1,245 @@
+"""
+Resúmenes diarios mantenidos por triggers (tabla `resumen_diario`)
+
+Las gráficas de citas, consultas, exámenes y recetas agrupan por día, doctor y
+estado. En vez de recorrer la tabla en cada petición, `resumen_diario` guarda
+cuántas filas hay por (Tabla, Dia, Codigo_Doctor, Estado) y los triggers AFTER
+INSERT/UPDATE/DELETE lo ajustan en la misma transacción que modifica la tabla,
+igual que los contadores de `app/counters.py`. Una serie para un rango de fechas
+es un recorrido del rango de la clave primaria, proporcional al número de días
+y no al de filas. Además de la fila de cada doctor, cada (día, estado) tiene una
+fila con el total de todos los doctores (`TODOS_LOS_DOCTORES`), que es la que
+leen las series sin filtro ni desglose por doctor.
+
+Si los resúmenes se desajustan, `reconstruir_resumenes` los recalcula desde
+cero: ver `reconciliar_contadores.py`.
+"""
+import sqlite3
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+TABLA_RESUMENES = "resumen_diario"
+
+# Codigo_Doctor de las filas con el total de todos los doctores
+TODOS_LOS_DOCTORES = -1
+
+
+class Resumen(NamedTuple):
+    # Expresiones de la clave; {fila} es NEW, OLD o el nombre de la tabla
+    dia: str
+    doctor: str
+    estado: str
+    # Columnas de las que depende la clave (disparan el trigger de UPDATE)
+    columnas: Tuple[str, ...]
+
+
+# Tablas resumidas. Como en los contadores, las claves nunca son NULL: el día
+# vacío agrupa las filas sin fecha, el doctor 0 las que no tienen doctor y el
+# estado usa el DEFAULT de la columna (las recetas no tienen estado).
+RESUMENES: Dict[str, Resumen] = {
+    "citas": Resumen(
+        "COALESCE(substr({fila}.Fecha_Hora, 1, 10), '')",
+        "COALESCE({fila}.Codigo_Doctor, 0)",
+        "COALESCE({fila}.Estado, 'Programada')",
+        ("Fecha_Hora", "Codigo_Doctor", "Estado"),
+    ),
+    "consultas": Resumen(
+        "COALESCE(substr({fila}.Fecha_de_Consulta, 1, 10), '')",
+        "COALESCE({fila}.Codigo_Doctor, 0)",
+        "COALESCE({fila}.Estado, 'Programada')",
+        ("Fecha_de_Consulta", "Codigo_Doctor", "Estado"),
+    ),
+    "examenes": Resumen(
+        "COALESCE(substr({fila}.Fecha_Solicitud, 1, 10), '')",
+        "COALESCE({fila}.Codigo_Doctor, 0)",
+        "COALESCE({fila}.Estado, 'Pendiente')",
+        ("Fecha_Solicitud", "Codigo_Doctor", "Estado"),
+    ),
+    "receta": Resumen(
+        "COALESCE(substr({fila}.Fecha_Receta, 1, 10), substr({fila}.Fecha_Creacion, 1, 10), '')",
+        "COALESCE({fila}.Codigo_Doctor, 0)",
+        "''",
+        ("Fecha_Receta", "Fecha_Creacion", "Codigo_Doctor"),
+    ),
+}
+
+
+def _clave(resumen: Resumen, fila: str) -> Tuple[str, str, str]:
+    return (
+        resumen.dia.format(fila=fila),
+        resumen.doctor.format(fila=fila),
+        resumen.estado.format(fila=fila),
+    )
+
+
+def _sumar(tabla: str, clave: Tuple[str, str, str], delta: int) -> str:
+    """Ajusta la fila del doctor y la del total de todos los doctores"""
+    dia, doctor, estado = clave
+    return " ".join(
+        f"INSERT INTO {TABLA_RESUMENES} (Tabla, Dia, Codigo_Doctor, Estado, Total) "
+        f"VALUES ('{tabla}', {dia}, {codigo}, {estado}, {delta}) "
+        f"ON CONFLICT (Tabla, Dia, Codigo_Doctor, Estado) DO UPDATE SET Total = Total + ({delta});"
+        for codigo in (doctor, TODOS_LOS_DOCTORES)
+    )
+
+
+def _existe(conn: sqlite3.Connection, tabla: str) -> bool:
+    fila = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla,)
+    ).fetchone()
+    return fila is not None
+
+
+def _crear_tabla(conn: sqlite3.Connection) -> None:
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABLA_RESUMENES} (
+            Tabla TEXT NOT NULL,
+            Dia TEXT NOT NULL,
+            Codigo_Doctor INTEGER NOT NULL,
+            Estado TEXT NOT NULL,
+            Total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (Tabla, Dia, Codigo_Doctor, Estado)
+        ) WITHOUT ROWID
+    """)
+
+
+def crear_triggers(conn: sqlite3.Connection, tabla: str) -> None:
+    """Crea (si faltan) los triggers que mantienen el resumen diario de `tabla`"""
+    resumen = RESUMENES[tabla]
+    anterior = _clave(resumen, "OLD")
+    nueva = _clave(resumen, "NEW")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS resumen_{tabla}_insert
+        AFTER INSERT ON {tabla}
+        BEGIN
+            {_sumar(tabla, nueva, 1)}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS resumen_{tabla}_delete
+        AFTER DELETE ON {tabla}
+        BEGIN
+            {_sumar(tabla, anterior, -1)}
+        END
+    """)
+    # Solo cuando cambia la clave: se descuenta de la anterior y se suma a la nueva
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS resumen_{tabla}_update
+        AFTER UPDATE OF {', '.join(resumen.columnas)} ON {tabla}
+        WHEN ({', '.join(anterior)}) IS NOT ({', '.join(nueva)})
+        BEGIN
+            {_sumar(tabla, anterior, -1)}
+            {_sumar(tabla, nueva, 1)}
+        END
+    """)
+
+
+def reconstruir_resumenes(conn: sqlite3.Connection, tabla: Optional[str] = None) -> int:
+    """
+    Recalcula desde cero el resumen diario de `tabla` (o de todas) y retorna
+    cuántas filas del resumen estaban desajustadas. Debe ejecutarse dentro de
+    una transacción de escritura.
+    """
+    desajustadas = 0
+    for nombre in (tabla,) if tabla else RESUMENES:
+        anteriores = {
+            tuple(fila[:3]): fila[3]
+            for fila in conn.execute(
+                f"SELECT Dia, Codigo_Doctor, Estado, Total FROM {TABLA_RESUMENES} WHERE Tabla = ?",
+                (nombre,),
+            ).fetchall()
+        }
+        conn.execute(f"DELETE FROM {TABLA_RESUMENES} WHERE Tabla = ?", (nombre,))
+        if not _existe(conn, nombre):
+            continue
+        dia, doctor, estado = _clave(RESUMENES[nombre], nombre)
+        correctos = conn.execute(
+            f"SELECT {dia}, {doctor}, {estado}, COUNT(*) FROM {nombre} GROUP BY 1, 2, 3"
+        ).fetchall()
+        todos: Dict[Tuple[str, str], int] = {}
+        for dia_f, _, estado_f, total in correctos:
+            todos[(dia_f, estado_f)] = todos.get((dia_f, estado_f), 0) + total
+        correctos.extend(
+            (dia_f, TODOS_LOS_DOCTORES, estado_f, total) for (dia_f, estado_f), total in todos.items()
+        )
+        conn.executemany(
+            f"INSERT INTO {TABLA_RESUMENES} (Tabla, Dia, Codigo_Doctor, Estado, Total) "
+            f"VALUES (?, ?, ?, ?, ?)",
+            [(nombre, *fila) for fila in correctos],
+        )
+        for fila in correctos:
+            if anteriores.pop(tuple(fila[:3]), 0) != fila[3]:
+                desajustadas += 1
+        # Claves que ya no tienen filas
+        desajustadas += sum(1 for total in anteriores.values() if total)
+    return desajustadas
+
+
+def crear_resumenes(conn: sqlite3.Connection, tabla: Optional[str] = None) -> int:
+    """
+    Crea la tabla de resúmenes y los triggers que falten de `tabla` (o de todas
+    las tablas resumidas que existan) y recalcula sus valores; retorna cuántas
+    filas del resumen estaban desajustadas. Se usa en los mismos puntos que
+    `crear_contadores`.
+    """
+    _crear_tabla(conn)
+    desajustadas = 0
+    for nombre in (tabla,) if tabla else RESUMENES:
+        if nombre not in RESUMENES or not _existe(conn, nombre):
+            continue
+        crear_triggers(conn, nombre)
+        desajustadas += reconstruir_resumenes(conn, nombre)
+    return desajustadas
+
+
+# Agrupaciones de una serie: expresión del periodo y de la columna de desglose
+PERIODOS = {"dia": "Dia", "mes": "substr(Dia, 1, 7)"}
+DESGLOSES = {"estado": "Estado", "doctor": "Codigo_Doctor"}
+
+
+def leer_serie(
+    db_cursor,
+    tabla: str,
+    desde: Optional[str] = None,
+    hasta: Optional[str] = None,
+    codigo_doctor: Optional[int] = None,
+    estado: Optional[str] = None,
+    periodo: str = "dia",
+    por: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Serie de `tabla` como lista de {Periodo, Grupo, Total} ordenada por periodo.
+    `desde` y `hasta` (AAAA-MM-DD) son inclusivos; `por` desglosa cada periodo
+    por estado o por doctor (si no se indica, Grupo es None).
+    """
+    condiciones = ["Tabla = ?", "Dia <> ''"]
+    parametros: List[Any] = [tabla]
+    if desde:
+        condiciones.append("Dia >= ?")
+        parametros.append(desde)
+    if hasta:
+        condiciones.append("Dia <= ?")
+        parametros.append(hasta)
+    if codigo_doctor is not None:
+        condiciones.append("Codigo_Doctor = ?")
+        parametros.append(codigo_doctor)
+    elif por == "doctor":
+        condiciones.append("Codigo_Doctor <> ?")
+        parametros.append(TODOS_LOS_DOCTORES)
+    else:
+        condiciones.append("Codigo_Doctor = ?")
+        parametros.append(TODOS_LOS_DOCTORES)
+    if estado is not None:
+        condiciones.append("Estado = ?")
+        parametros.append(estado)
+
+    grupo = DESGLOSES[por] if por else "NULL"
+    db_cursor.execute(
+        f"SELECT {PERIODOS[periodo]} AS Periodo, {grupo} AS Grupo, SUM(Total) AS Total "
+        f"FROM {TABLA_RESUMENES} WHERE {' AND '.join(condiciones)} "
+        f"GROUP BY 1, 2 HAVING SUM(Total) > 0 ORDER BY 1, 2",
+        parametros,
+    )
+    return [
+        {"Periodo": fila[0], "Grupo": None if fila[1] is None else str(fila[1]), "Total": fila[2]}
+        for fila in db_cursor.fetchall()
+    ]
@@ -5,6 +5,8 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlite3 import Connection
 from typing import Dict, Any
 from app.database import get_db
+from app.migrations import asegurar_tabla
+from app.writer import run_write
 from pydantic import BaseModel
 import logging
 import secrets
@@ -37,32 +39,13 @@ def row_to_dict(row) -> Dict[str, Any]:
     return result
 
 
-def verificar_tabla_usuarios(cursor):
+def verificar_tabla_usuarios():
     """Verifica si la tabla usuarios_sistema existe, si no, la crea"""
-    cursor.execute("""
-        SELECT name FROM sqlite_master 
-        WHERE type='table' AND name='usuarios_sistema'
-    """)
-    if not cursor.fetchone():
-        logger.warning("La tabla usuarios_sistema no existe. Creándola...")
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS usuarios_sistema (
-                Codigo INTEGER PRIMARY KEY AUTOINCREMENT,
-                Usuario TEXT NOT NULL UNIQUE,
-                Contrasena TEXT NOT NULL,
-                Codigo_Doctor INTEGER,
-                Rol TEXT DEFAULT 'Recepcionista',
-                Activo INTEGER DEFAULT 1,
-                Ultimo_Acceso DATETIME,
-                Fecha_Creacion DATETIME,
-                Fecha_Modificacion DATETIME,
-                FOREIGN KEY (Codigo_Doctor) REFERENCES doctor(Codigo)
-            )
-        """)
+    asegurar_tabla("usuarios_sistema")
 
 
 @router.post("/login", response_model=LoginResponse, status_code=status.HTTP_200_OK)
-async def login(credentials: LoginRequest, db: Connection = Depends(get_db)):
+def login(credentials: LoginRequest, db: Connection = Depends(get_db)):
     """
     Autenticar un usuario del sistema
     
@@ -74,8 +57,7 @@ async def login(credentials: LoginRequest, db: Connection = Depends(get_db)):
         cursor = db.cursor()
         
         # Verificar y crear tabla si no existe
-        verificar_tabla_usuarios(cursor)
-        db.commit()
+        verificar_tabla_usuarios()
         
         # Buscar usuario por nombre de usuario
         cursor.execute(
@@ -110,11 +92,11 @@ async def login(credentials: LoginRequest, db: Connection = Depends(get_db)):
         
         # Actualizar último acceso
         from datetime import datetime
-        cursor.execute(
+        ultimo_acceso = (datetime.now().isoformat(), usuario_dict["Codigo"])
+        run_write(lambda conn: conn.execute(
             "UPDATE usuarios_sistema SET Ultimo_Acceso = ? WHERE Codigo = ?",
-            (datetime.now().isoformat(), usuario_dict["Codigo"])
-        )
-        db.commit()
+            ultimo_acceso
+        ).rowcount)
         
         # Remover contraseña del objeto usuario
         usuario_dict.pop("Contrasena", None)
@@ -147,7 +129,7 @@ async def logout():
 
 
 @router.get("/me")
-async def get_current_user(db: Connection = Depends(get_db)):
+def get_current_user(db: Connection = Depends(get_db)):
     """
     Obtener información del usuario actual
     
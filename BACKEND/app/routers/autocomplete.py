@@ -0,0 +1,73 @@
+"""
+Router de autocompletado de pacientes y doctores
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlite3 import Connection, OperationalError
+from typing import List, Optional
+from app.autocomplete import AUTOCOMPLETADOS, get_indice
+from app.database import get_db
+from app.models import Sugerencia
+from app.search import palabras
+from app.serialization import respuesta_modelo
+import logging
+
+logger = logging.getLogger(__name__)
+if not logger.handlers:
+    logging.basicConfig(level=logging.INFO)
+
+router = APIRouter()
+
+# Tabla de cada tipo de sugerencia
+TABLAS_TIPO = {config.tipo: tabla for tabla, config in AUTOCOMPLETADOS.items()}
+
+
+@router.get("/", response_model=List[Sugerencia])
+def autocompletar(
+    q: str = Query(..., min_length=1, description="Texto escrito (cada palabra es un prefijo)"),
+    tipo: Optional[str] = Query(None, description="Limitar a 'paciente' o 'doctor'"),
+    limit: int = Query(10, ge=1, le=50, description="Máximo de sugerencias"),
+    db: Connection = Depends(get_db)
+):
+    """
+    Sugerencias de pacientes y doctores para los selectores
+
+    Busca en un índice en memoria, sin consultar las tablas: cada palabra
+    escrita debe ser el comienzo del nombre, de un apellido o del número de
+    identificación, sin distinguir mayúsculas ni acentos.
+
+    - **q**: Texto escrito
+    - **tipo**: 'paciente' o 'doctor' (por defecto ambos)
+    - **limit**: Máximo de sugerencias (por defecto 10)
+    """
+    if tipo is not None and tipo not in TABLAS_TIPO:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tipo no válido. Opciones: {', '.join(TABLAS_TIPO)}"
+        )
+
+    try:
+        cursor = db.cursor()
+        sugerencias = []
+        for tabla in (TABLAS_TIPO[tipo],) if tipo else AUTOCOMPLETADOS:
+            indice = get_indice(tabla)
+            indice.sincronizar(cursor)
+            sugerencias.extend(indice.buscar(q, limit))
+        if not tipo:
+            # Pacientes y doctores mezclados en orden alfabético
+            sugerencias.sort(key=lambda sugerencia: palabras(sugerencia["Texto"]))
+        return respuesta_modelo(sugerencias[:limit], Sugerencia)
+
+    except HTTPException:
+        raise
+    except OperationalError as e:
+        logger.error(f"Error de base de datos al autocompletar: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Error al acceder a la base de datos"
+        )
+    except Exception as e:
+        logger.error(f"Error inesperado al autocompletar: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Error interno del servidor"
+        )
@@ -1,12 +1,30 @@
 """
 Router para gestión de citas
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
 from sqlite3 import Connection, IntegrityError, OperationalError
 from typing import List, Optional
 from app.database import get_db
-from app.models import Cita, CitaCreate, CitaUpdate
-from datetime import datetime, timedelta
+from app.fields import Expansion, Proyeccion
+from app.pagination import Paginacion
+from app.loaders import COLUMNAS_EXAMEN_ASOCIADO, cargar_hijos
+from app.schema import get_schema
+from app.scheduling import (
+    AGENDA_DURACION_CITA, AGENDA_MAX_DIAS, AGENDA_MAX_LOTE, ESTADOS_INACTIVOS, FRECUENCIAS_SERIE,
+    Ocupacion, buscar_huecos, condicion_activa, convertir_fecha, expandir_serie, rango_conflicto,
+    reasignar_citas
+)
+from app.serialization import respuesta_modelo
+from app.streaming import pide_ndjson, respuesta_ndjson
+from app.versions import Condicional
+from app.writer import run_write
+from app.models import (
+    AusenciaDoctor, CambioCitas, CambioSerieCitas, Cita, CitaCalendario, CitaCreate, CitaUpdate,
+    HuecoDisponible, OperacionCitasLote, ReprogramacionCitas, ResultadoCitaLote, SerieCitas,
+    SerieCitasCreada, SerieCitasCreate, SerieCitasUpdate
+)
+from datetime import date, datetime, timedelta
+from functools import partial
 import logging
 
 
@@ -37,14 +55,14 @@ def verificar_disponibilidad_doctor(
 ) -> None:
     """Verificar que el doctor no tenga otra cita en el mismo horario"""
    
-    fecha_inicio = (fecha_hora - timedelta(minutes=30)).isoformat()
-    fecha_fin = (fecha_hora + timedelta(minutes=30)).isoformat()
+    # Mismo criterio que el buscador de huecos (app/scheduling.py)
+    fecha_inicio, fecha_fin = rango_conflicto(convertir_fecha(fecha_hora))
     
-    query = """
+    query = f"""
         SELECT Codigo FROM citas 
         WHERE Codigo_Doctor = ? 
-        AND Fecha_Hora BETWEEN ? AND ?
-        AND Estado NOT IN ('Cancelada', 'Completada')
+        AND Fecha_Hora > ? AND Fecha_Hora < ?
+        AND {condicion_activa()}
     """
     params = [codigo_doctor, fecha_inicio, fecha_fin]
     
@@ -52,6 +70,9 @@ def verificar_disponibilidad_doctor(
         query += " AND Codigo != ?"
         params.append(codigo_cita_excluir)
     
+    # Con LIMIT 1 la sentencia termina tras la primera fila: si quedara abierta
+    # al lanzar el 409, la conexión del pool seguiría leyendo una instantánea vieja
+    query += " LIMIT 1"
     cursor.execute(query, params)
     cita_existente = cursor.fetchone()
     
@@ -62,9 +83,42 @@ def verificar_disponibilidad_doctor(
         )
 
 
+# Relaciones que se cargan solo con ?include=
+EXPANSIONES_CITA = {"examenes": Expansion("Examenes_Asociados", tablas=("examenes",))}
+
+
+def completar_citas(cursor, citas, examenes: bool = False) -> List[dict]:
+    """Convierte las filas de citas en diccionarios y, si se piden, agrega sus exámenes"""
+    resultado = [dict(row) for row in citas]
+    if not examenes:
+        return resultado
+    
+    # Exámenes de todas las citas en una sola consulta
+    examenes_por_cita = {}
+    if get_schema().tiene_tabla("examenes"):
+        try:
+            examenes_por_cita = cargar_hijos(
+                cursor, "examenes", "Codigo_Cita",
+                (cita["Codigo"] for cita in resultado),
+                COLUMNAS_EXAMEN_ASOCIADO,
+                orden="Fecha_Solicitud DESC",
+            )
+        except Exception as e:
+            logger.warning(f"Error al cargar exámenes de las citas: {e}")
+    
+    for cita_dict in resultado:
+        cita_dict["Examenes_Asociados"] = examenes_por_cita.get(cita_dict["Codigo"], [])
+    
+    return resultado
+
+
 @router.get("/", response_model=List[Cita])
-async def listar_citas(
+def listar_citas(
     db: Connection = Depends(get_db),
+    paginacion: Paginacion = Depends(),
+    proyeccion: Proyeccion = Depends(),
+    ndjson: bool = Depends(pide_ndjson),
+    condicional: Condicional = Depends(),
     estado: Optional[str] = None,
     codigo_doctor: Optional[int] = None,
     codigo_paciente: Optional[int] = None
@@ -72,14 +126,19 @@ async def listar_citas(
     """
     Listar todas las citas con filtros opcionales
     
-    - **estado**: Filtrar por estado (Programada, Confirmada, Cancelada, Completada)
+    - **estado**: Filtrar por estado (Programada, Confirmada, Cancelada, Completada, No asistió)
     - **codigo_doctor**: Filtrar por doctor
     - **codigo_paciente**: Filtrar por paciente
+    - **fields**: Columnas a devolver (por ejemplo, Fecha_Hora,Estado)
+    - **include=examenes**: Agregar los exámenes asociados a cada cita
+    - **formato=ndjson**: Todas las citas en streaming, una por línea
+    - **total=true**: Total en X-Total-Count, solo en la primera página (sin cursor); sin filtros se lee de stats_counters, con filtros recorre todas las filas que los cumplen
     """
     try:
         cursor = db.cursor()
         
-        query = "SELECT * FROM citas WHERE 1=1"
+        columnas = proyeccion.columnas("citas", orden=("Fecha_Hora",), expansiones=EXPANSIONES_CITA)
+        query = f"SELECT {columnas} FROM citas WHERE 1=1"
         params = []
         
         if estado:
@@ -94,47 +153,29 @@ async def listar_citas(
             query += " AND Codigo_Paciente = ?"
             params.append(codigo_paciente)
         
-        query += " ORDER BY Fecha_Hora DESC"
+        no_modificado = condicional.comprobar(cursor, "citas", *proyeccion.tablas(EXPANSIONES_CITA))
+        if no_modificado:
+            return no_modificado
+        
+        query, params = paginacion.aplicar(cursor, query, params, "Fecha_Hora", sin_limite=ndjson, tabla="citas")
+        completar = partial(completar_citas, examenes=proyeccion.incluye("examenes"))
+        if ndjson:
+            return respuesta_ndjson(
+                db, query, params, proyeccion.modelo(Cita), proyeccion.completar(completar),
+                paginacion.response.headers
+            )
         
         cursor.execute(query, params)
-        citas = cursor.fetchall()
+        citas = paginacion.recortar(cursor.fetchall())
         
        
         if not citas:
             return []
         
-     
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='examenes'")
-        tabla_examenes_existe = cursor.fetchone() is not None
-        
-        resultado = []
-        for row in citas:
-            cita_dict = dict(row)
-            codigo_cita = cita_dict.get("Codigo")
-            
-           
-            examenes_asociados = []
-            if codigo_cita and tabla_examenes_existe:
-                try:
-                    cursor.execute("""
-                        SELECT Codigo, Tipo_Examen, Fecha_Solicitud, Fecha_Resultado, 
-                               Resultado, Observaciones, Estado
-                        FROM examenes
-                        WHERE Codigo_Cita = ?
-                        ORDER BY Fecha_Solicitud DESC
-                    """, (codigo_cita,))
-                    examenes_rows = cursor.fetchall()
-                    for examen_row in examenes_rows:
-                        examen_dict = dict(examen_row)
-                        examenes_asociados.append(examen_dict)
-                except Exception as e:
-                    logger.warning(f"Error al cargar exámenes para cita {codigo_cita}: {e}")
-            
-            cita_dict["Examenes_Asociados"] = examenes_asociados
-            resultado.append(cita_dict)
-        
-        return resultado
+        return proyeccion.respuesta(completar(cursor, citas), Cita, paginacion.response.headers)
     
+    except HTTPException:
+        raise
     except OperationalError as e:
         logger.error(f"Error de base de datos al listar citas: {e}")
         raise HTTPException(
@@ -149,12 +190,208 @@ async def listar_citas(
         )
 
 
+@router.get("/disponibilidad", response_model=List[HuecoDisponible])
+def consultar_disponibilidad(
+    codigo_doctor: Optional[int] = Query(None, description="Doctor del que se buscan huecos"),
+    especialidad: Optional[str] = Query(None, description="Buscar entre los doctores activos de la especialidad"),
+    desde: Optional[datetime] = Query(None, description="Inicio del rango (ISO 8601, por defecto ahora)"),
+    hasta: Optional[datetime] = Query(None, description="Fin del rango (ISO 8601, por defecto una semana después)"),
+    duracion: int = Query(AGENDA_DURACION_CITA, ge=5, le=480, description="Minutos del hueco"),
+    limit: int = Query(100, ge=1, le=1000, description="Máximo de huecos"),
+    db: Connection = Depends(get_db)
+):
+    """
+    Huecos libres de uno o varios doctores en un rango de fechas
+
+    Recorre una sola vez las citas de cada doctor en el rango. Los huecos están
+    dentro del horario de atención y ordenados por hora de inicio: con una
+    especialidad, el primero es el primer hueco libre de cualquiera de sus
+    doctores. Todo hueco devuelto pasa la verificación de disponibilidad al
+    crear la cita.
+
+    - **codigo_doctor** o **especialidad**: Doctor o especialidad (al menos uno)
+    - **desde** / **hasta**: Rango de búsqueda (máximo AGENDA_MAX_DIAS días)
+    - **duracion**: Minutos del hueco (por defecto, la duración de una cita)
+    """
+    if codigo_doctor is None and not especialidad:
+        raise HTTPException(
+            status_code=400,
+            detail="Indica codigo_doctor o especialidad"
+        )
+
+    ahora = datetime.now()
+    desde = max(convertir_fecha(desde) or ahora, ahora)
+    hasta = convertir_fecha(hasta) or desde + timedelta(days=7)
+    if hasta <= desde:
+        raise HTTPException(
+            status_code=400,
+            detail="La fecha 'hasta' debe ser posterior a 'desde' y al momento actual"
+        )
+    if hasta - desde > timedelta(days=AGENDA_MAX_DIAS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"El rango no puede superar {AGENDA_MAX_DIAS} días"
+        )
+
+    try:
+        cursor = db.cursor()
+        query = "SELECT Codigo, Estado FROM doctor WHERE 1=1"
+        params = []
+        if codigo_doctor is not None:
+            query += " AND Codigo = ?"
+            params.append(codigo_doctor)
+        if especialidad:
+            query += " AND Especialidad = ? COLLATE NOCASE"
+            params.append(especialidad)
+        cursor.execute(query + " ORDER BY Codigo", params)
+        doctores = cursor.fetchall()
+
+        if codigo_doctor is not None and not especialidad:
+            if not doctores:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Doctor con código {codigo_doctor} no encontrado"
+                )
+            if doctores[0][1] and doctores[0][1] != "Activo":
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"El doctor no está disponible (Estado: {doctores[0][1]})"
+                )
+
+        # Solo los doctores que aceptan citas (mismo criterio que crear_cita)
+        activos = [fila[0] for fila in doctores if not fila[1] or fila[1] == "Activo"]
+        huecos = buscar_huecos(cursor, activos, desde, hasta, duracion, limit)
+        return respuesta_modelo(huecos, HuecoDisponible)
+
+    except HTTPException:
+        raise
+    except OperationalError as e:
+        logger.error(f"Error de base de datos al consultar disponibilidad: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Error al acceder a la base de datos"
+        )
+    except Exception as e:
+        logger.error(f"Error inesperado al consultar disponibilidad: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Error interno del servidor"
+        )
+
+
+# Nombre para mostrar de un paciente o doctor (None si no tiene)
+def _nombre_completo(alias: str) -> str:
+    return f"NULLIF(TRIM(COALESCE({alias}.Nombre, '') || ' ' || COALESCE({alias}.Apellidos, '')), '')"
+
+
+@router.get("/calendario", response_model=List[CitaCalendario])
+def obtener_calendario(
+    desde: date = Query(..., description="Primer día incluido (AAAA-MM-DD)"),
+    hasta: Optional[date] = Query(None, description="Último día incluido (por defecto, el mismo día)"),
+    codigo_doctor: Optional[List[int]] = Query(None, description="Doctores a mostrar (se puede repetir)"),
+    especialidad: Optional[str] = Query(None, description="Solo los doctores de la especialidad"),
+    estado: Optional[str] = Query(None, description="Filtrar por estado"),
+    db: Connection = Depends(get_db),
+    condicional: Condicional = Depends()
+):
+    """
+    Citas de un rango de días para las vistas de agenda (día o semana)
+
+    Devuelve filas compactas con los nombres del paciente y del doctor, en una
+    sola consulta que recorre el rango de fechas de cada doctor en el índice
+    (Codigo_Doctor, Fecha_Hora). Ordenadas por doctor y hora.
+
+    - **desde** / **hasta**: Rango de días, inclusivo (máximo AGENDA_MAX_DIAS)
+    - **codigo_doctor**: Uno o varios doctores (por defecto, todos)
+    - **especialidad**: Solo los doctores de la especialidad
+    - **estado**: Filtrar por estado
+    """
+    hasta = hasta or desde
+    if desde > hasta:
+        raise HTTPException(
+            status_code=400,
+            detail="La fecha 'desde' no puede ser posterior a 'hasta'"
+        )
+    if (hasta - desde).days + 1 > AGENDA_MAX_DIAS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El rango no puede superar {AGENDA_MAX_DIAS} días"
+        )
+
+    try:
+        cursor = db.cursor()
+        no_modificado = condicional.comprobar(cursor, "citas", "doctor", "pacientes")
+        if no_modificado:
+            return no_modificado
+
+        # Los doctores se eligen en una subconsulta para que SQLite recorra el
+        # índice doctor por doctor, ya en el orden de la respuesta
+        doctores = "SELECT Codigo FROM doctor WHERE 1=1"
+        params = []
+        if codigo_doctor:
+            doctores += f" AND Codigo IN ({', '.join('?' for _ in codigo_doctor)})"
+            params.extend(codigo_doctor)
+        if especialidad:
+            doctores += " AND Especialidad = ? COLLATE NOCASE"
+            params.append(especialidad)
+
+        query = f"""
+            SELECT c.Codigo, c.Fecha_Hora, c.Estado, c.Motivo,
+                   c.Codigo_Doctor, {_nombre_completo('d')} AS Doctor,
+                   c.Codigo_Paciente, {_nombre_completo('p')} AS Paciente,
+                   c.Codigo_Serie
+            FROM citas c
+            LEFT JOIN doctor d ON d.Codigo = c.Codigo_Doctor
+            LEFT JOIN pacientes p ON p.Codigo = c.Codigo_Paciente
+            WHERE c.Codigo_Doctor IN ({doctores})
+            AND c.Fecha_Hora >= ? AND c.Fecha_Hora < ?
+        """
+        params.extend([desde.isoformat(), (hasta + timedelta(days=1)).isoformat()])
+        if estado:
+            query += " AND c.Estado = ?"
+            params.append(estado)
+        query += " ORDER BY c.Codigo_Doctor, c.Fecha_Hora"
+
+        cursor.execute(query, params)
+        citas = [dict(fila) for fila in cursor.fetchall()]
+        return respuesta_modelo(citas, CitaCalendario, condicional.response.headers)
+
+    except HTTPException:
+        raise
+    except OperationalError as e:
+        logger.error(f"Error de base de datos al obtener el calendario: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Error al acceder a la base de datos"
+        )
+    except Exception as e:
+        logger.error(f"Error inesperado al obtener el calendario: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Error interno del servidor"
+        )
+
+
 @router.get("/{codigo}", response_model=Cita)
-async def obtener_cita(codigo: int, db: Connection = Depends(get_db)):
-    """Obtener una cita por código"""
+def obtener_cita(
+    codigo: int,
+    db: Connection = Depends(get_db),
+    proyeccion: Proyeccion = Depends(),
+    condicional: Condicional = Depends()
+):
+    """
+    Obtener una cita por código
+    
+    - **fields**: Columnas a devolver
+    - **include=examenes**: Agregar los exámenes asociados
+    """
     try:
         cursor = db.cursor()
-        cursor.execute("SELECT * FROM citas WHERE Codigo = ?", (codigo,))
+        columnas = proyeccion.columnas("citas", expansiones=EXPANSIONES_CITA)
+        no_modificado = condicional.comprobar(cursor, "citas", *proyeccion.tablas(EXPANSIONES_CITA))
+        if no_modificado:
+            return no_modificado
+        cursor.execute(f"SELECT {columnas} FROM citas WHERE Codigo = ?", (codigo,))
         cita = cursor.fetchone()
         
         if not cita:
@@ -163,31 +400,8 @@ async def obtener_cita(codigo: int, db: Connection = Depends(get_db)):
                 detail=f"Cita con código {codigo} no encontrada"
             )
         
-        cita_dict = dict(cita)
-        
-       
-        examenes_asociados = []
-        try:
-          
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='examenes'")
-            if cursor.fetchone():
-                cursor.execute("""
-                    SELECT Codigo, Tipo_Examen, Fecha_Solicitud, Fecha_Resultado, 
-                           Resultado, Observaciones, Estado
-                    FROM examenes
-                    WHERE Codigo_Cita = ?
-                    ORDER BY Fecha_Solicitud DESC
-                """, (codigo,))
-                examenes_rows = cursor.fetchall()
-                for examen_row in examenes_rows:
-                    examen_dict = dict(examen_row)
-                    examenes_asociados.append(examen_dict)
-        except Exception as e:
-            logger.warning(f"Error al cargar exámenes para cita {codigo}: {e}")
-        
-        cita_dict["Examenes_Asociados"] = examenes_asociados
-        
-        return cita_dict
+        cita_dict = completar_citas(cursor, [cita], examenes=proyeccion.incluye("examenes"))[0]
+        return proyeccion.respuesta(cita_dict, Cita, condicional.response.headers)
     
     except HTTPException:
         raise
@@ -200,13 +414,13 @@ async def obtener_cita(codigo: int, db: Connection = Depends(get_db)):
 
 
 @router.post("/", response_model=Cita, status_code=201)
-async def crear_cita(cita: CitaCreate, db: Connection = Depends(get_db)):
+def crear_cita(cita: CitaCreate, db: Connection = Depends(get_db)):
     """
     Crear una nueva cita con validaciones de seguridad
     
     - Valida que paciente y doctor existan
     - Valida que la fecha sea futura
-    - Verifica disponibilidad del doctor
+    - Verifica disponibilidad del doctor en la misma transacción del INSERT
     - Usa transacciones para garantizar integridad
     """
     cursor = db.cursor()
@@ -245,9 +459,6 @@ async def crear_cita(cita: CitaCreate, db: Connection = Depends(get_db)):
                 status_code=400,
                 detail=f"El doctor no está disponible (Estado: {doctor[1]})"
             )
-   
-        if cita.Fecha_Hora:
-            verificar_disponibilidad_doctor(cursor, cita.Codigo_Doctor, cita.Fecha_Hora)
         
         datos = {
             "Codigo_Paciente": cita.Codigo_Paciente,
@@ -264,14 +475,19 @@ async def crear_cita(cita: CitaCreate, db: Connection = Depends(get_db)):
         placeholders = ", ".join(["?" for _ in valores])
         campos_str = ", ".join(campos)
         
-        # Iniciar transacción
-        cursor.execute(
-            f"INSERT INTO citas ({campos_str}) VALUES ({placeholders})",
-            valores
-        )
+        def insertar(conn):
+            # La disponibilidad se verifica en la transacción del escritor
+            # (BEGIN IMMEDIATE): ninguna otra reserva puede ocupar el horario
+            # entre la comprobación y el INSERT
+            if cita.Fecha_Hora:
+                verificar_disponibilidad_doctor(conn.cursor(), cita.Codigo_Doctor, cita.Fecha_Hora)
+            return conn.execute(
+                f"INSERT INTO citas ({campos_str}) VALUES ({placeholders})",
+                valores
+            ).lastrowid
         
-        codigo = cursor.lastrowid
-        db.commit()
+        # La inserción se confirma a través del escritor único
+        codigo = run_write(insertar)
         
         # Obtener la cita creada
         cursor.execute("SELECT * FROM citas WHERE Codigo = ?", (codigo,))
@@ -306,8 +522,699 @@ async def crear_cita(cita: CitaCreate, db: Connection = Depends(get_db)):
         )
 
 
+# Columnas de cada cita creada en lote (las mismas que en crear_cita)
+COLUMNAS_LOTE = ("Codigo_Paciente", "Codigo_Doctor", "Fecha_Hora", "Estado", "Motivo", "Observaciones")
+
+
+@router.post("/bulk", response_model=List[ResultadoCitaLote])
+def crear_citas_lote(
+    citas: List[CitaCreate] = Body(..., description="Citas a crear"),
+    todo_o_nada: bool = Query(False, description="No crear ninguna si alguna falla"),
+    db: Connection = Depends(get_db)
+):
+    """
+    Crear un bloque de citas (campañas, jornadas de vacunación, controles grupales)
+
+    Aplica a cada cita las validaciones de la creación individual, pero con una
+    consulta por conjunto en lugar de varias por cita: pacientes y doctores se
+    comprueban con IN, y los choques de horario contra las citas existentes y
+    entre las del propio lote se detectan en memoria. Las citas válidas se
+    insertan con un solo executemany en una transacción.
+
+    Devuelve un resultado por cita, en el orden recibido, con el código HTTP que
+    habría respondido la creación individual (201, 400, 404 o 409). Con
+    **todo_o_nada**, si alguna falla no se crea ninguna.
+    """
+    if not citas:
+        raise HTTPException(
+            status_code=400,
+            detail="El lote no contiene citas"
+        )
+    if len(citas) > AGENDA_MAX_LOTE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El lote no puede superar {AGENDA_MAX_LOTE} citas"
+        )
+
+    cursor = db.cursor()
+
+    try:
+        resultados = [{"Indice": indice, "Codigo_HTTP": 201} for indice in range(len(citas))]
+
+        def rechazar(indice: int, codigo_http: int, detalle: str) -> None:
+            resultados[indice].update(Codigo_HTTP=codigo_http, Detalle=detalle)
+
+        # Pacientes y doctores del lote con una consulta cada uno
+        codigos_paciente = sorted({cita.Codigo_Paciente for cita in citas})
+        cursor.execute(
+            f"SELECT Codigo FROM pacientes WHERE Codigo IN ({', '.join('?' for _ in codigos_paciente)})",
+            codigos_paciente
+        )
+        pacientes = {fila[0] for fila in cursor.fetchall()}
+        codigos_doctor = sorted({cita.Codigo_Doctor for cita in citas})
+        cursor.execute(
+            f"SELECT Codigo, Estado FROM doctor WHERE Codigo IN ({', '.join('?' for _ in codigos_doctor)})",
+            codigos_doctor
+        )
+        doctores = {fila[0]: fila[1] for fila in cursor.fetchall()}
+
+        candidatas = []
+        for indice, cita in enumerate(citas):
+            try:
+                validar_fecha_futura(cita.Fecha_Hora)
+            except HTTPException as e:
+                rechazar(indice, e.status_code, e.detail)
+                continue
+            if cita.Codigo_Paciente not in pacientes:
+                rechazar(indice, 404, f"Paciente con código {cita.Codigo_Paciente} no encontrado")
+                continue
+            if cita.Codigo_Doctor not in doctores:
+                rechazar(indice, 404, f"Doctor con código {cita.Codigo_Doctor} no encontrado")
+                continue
+            estado_doctor = doctores[cita.Codigo_Doctor]
+            if estado_doctor and estado_doctor != "Activo":
+                rechazar(indice, 400, f"El doctor no está disponible (Estado: {estado_doctor})")
+                continue
+            candidatas.append((indice, cita, convertir_fecha(cita.Fecha_Hora)))
+
+        def insertar(conn):
+            # Los choques se comprueban en la transacción del escritor: ninguna
+            # otra escritura puede ocupar el horario entre la comprobación y el INSERT
+            filas, creadas = [], []
+            if candidatas:
+                ocupacion = Ocupacion.cargar(
+                    conn.cursor(),
+                    sorted({cita.Codigo_Doctor for _, cita, _ in candidatas}),
+                    min(inicio for _, _, inicio in candidatas),
+                    max(inicio for _, _, inicio in candidatas) + timedelta(minutes=AGENDA_DURACION_CITA),
+                )
+            for indice, cita, inicio in candidatas:
+                if ocupacion.choca(cita.Codigo_Doctor, inicio):
+                    rechazar(indice, 409, "El doctor ya tiene una cita programada en ese horario")
+                    continue
+                estado = cita.Estado or "Programada"
+                if estado not in ESTADOS_INACTIVOS:
+                    ocupacion.ocupar(cita.Codigo_Doctor, inicio)
+                filas.append((
+                    cita.Codigo_Paciente, cita.Codigo_Doctor, cita.Fecha_Hora.isoformat(),
+                    estado, cita.Motivo, cita.Observaciones
+                ))
+                creadas.append(indice)
+            if not filas or (todo_o_nada and len(filas) < len(citas)):
+                return []
+            conn.executemany(
+                f"INSERT INTO citas ({', '.join(COLUMNAS_LOTE)}) "
+                f"VALUES ({', '.join('?' for _ in COLUMNAS_LOTE)})",
+                filas
+            )
+            # Con un solo escritor y AUTOINCREMENT, las filas de un executemany
+            # reciben códigos consecutivos que terminan en last_insert_rowid()
+            ultimo = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            return list(zip(creadas, range(ultimo - len(filas) + 1, ultimo + 1)))
+
+        codigos = run_write(insertar)
+        for indice, codigo in codigos:
+            resultados[indice]["Codigo"] = codigo
+        if not codigos:
+            for resultado in resultados:
+                if resultado["Codigo_HTTP"] == 201:
+                    rechazar(resultado["Indice"], 409, "No se creó: otra cita del lote no es válida")
+
+        logger.info(f"Lote de citas: {len(codigos)} creadas de {len(citas)}")
+        return respuesta_modelo(resultados, ResultadoCitaLote)
+
+    except HTTPException:
+        raise
+    except IntegrityError as e:
+        logger.error(f"Error de integridad al crear lote de citas: {e}")
+        raise HTTPException(
+            status_code=400,
+            detail="Error de integridad de datos. Verifica las relaciones."
+        )
+    except Exception as e:
+        logger.error(f"Error inesperado al crear lote de citas: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al crear las citas: {str(e)}"
+        )
+
+
+def verificar_doctor_activo(cursor, codigo_doctor: int) -> None:
+    """Validar que el doctor exista y acepte citas (mismo criterio que crear_cita)"""
+    cursor.execute("SELECT Codigo, Estado FROM doctor WHERE Codigo = ?", (codigo_doctor,))
+    doctor = cursor.fetchone()
+    if not doctor:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Doctor con código {codigo_doctor} no encontrado"
+        )
+    if doctor[1] and doctor[1] != "Activo":
+        raise HTTPException(
+            status_code=400,
+            detail=f"El doctor no está disponible (Estado: {doctor[1]})"
+        )
+
+
+def actualizar_conjunto(conn, filtro: str, params: List, datos: dict, minutos: int = 0) -> List[int]:
+    """
+    Aplica `datos` (y un desplazamiento de `minutos` a Fecha_Hora) a las citas
+    que cumplen `filtro` con un solo UPDATE y retorna sus códigos.
+
+    Se ejecuta dentro de un trabajo del escritor. Antes del UPDATE se comprueban
+    en memoria los choques de las citas que quedan activas en un horario nuevo
+    (otro doctor, otra hora o reactivadas) contra el resto de la agenda; si
+    alguna choca se lanza un 409 y no se modifica ninguna.
+    """
+    filas = conn.execute(
+        f"SELECT Codigo, Codigo_Doctor, Fecha_Hora, Estado FROM citas WHERE {filtro} ORDER BY Fecha_Hora",
+        params
+    ).fetchall()
+    if not filas:
+        return []
+
+    nuevo_doctor = datos.get("Codigo_Doctor")
+    desplazamiento = timedelta(minutes=minutos)
+    liberadas, comprobar = [], []
+    for codigo, doctor, fecha_hora, estado in filas:
+        fecha = convertir_fecha(fecha_hora)
+        if fecha is None:
+            continue
+        destino = nuevo_doctor or doctor
+        se_mueve = destino != doctor or minutos != 0
+        if se_mueve and estado not in ESTADOS_INACTIVOS:
+            liberadas.append((doctor, fecha))
+        if (datos.get("Estado") or estado) not in ESTADOS_INACTIVOS and (se_mueve or estado in ESTADOS_INACTIVOS):
+            comprobar.append((codigo, destino, fecha + desplazamiento))
+
+    if comprobar:
+        ocupacion = Ocupacion.cargar(
+            conn.cursor(),
+            sorted({destino for _, destino, _ in comprobar}),
+            min(fecha for _, _, fecha in comprobar),
+            max(fecha for _, _, fecha in comprobar) + timedelta(minutes=AGENDA_DURACION_CITA),
+        )
+        # Las citas que se mueven dejan libre su horario anterior
+        for doctor, fecha in liberadas:
+            ocupacion.liberar(doctor, fecha)
+        for codigo, destino, fecha in comprobar:
+            if ocupacion.choca(destino, fecha):
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"El doctor ya tiene una cita programada en ese horario "
+                           f"({fecha.isoformat()}, cita {codigo})"
+                )
+            ocupacion.ocupar(destino, fecha)
+
+    asignaciones = [f"{campo} = ?" for campo in datos]
+    valores = list(datos.values())
+    if minutos:
+        # Misma hora local que usa convertir_fecha: sin zona horaria ni fracciones
+        asignaciones.append("Fecha_Hora = strftime('%Y-%m-%dT%H:%M:%S', substr(Fecha_Hora, 1, 19), ?)")
+        valores.append(f"{minutos:+d} minutes")
+    conn.execute(f"UPDATE citas SET {', '.join(asignaciones)} WHERE {filtro}", [*valores, *params])
+    return [fila[0] for fila in filas]
+
+
+@router.put("/bulk", response_model=CambioCitas)
+def actualizar_citas_lote(
+    operacion: OperacionCitasLote,
+    db: Connection = Depends(get_db)
+):
+    """
+    Cambiar el estado o mover de hora un conjunto de citas (un doctor se
+    ausenta, se cierra la consulta un día)
+
+    Selecciona las citas con Fecha_Hora entre **Desde** (inclusive) y **Hasta**
+    (exclusive), opcionalmente de un **Codigo_Doctor** y con un **Estado**, y les
+    aplica **Nuevo_Estado** y/o **Desplazamiento_Minutos** con un solo UPDATE en
+    una transacción. Las citas que quedan activas en otro horario se comprueban
+    antes contra la agenda del doctor; si alguna choca (409) no se modifica
+    ninguna. Devuelve los códigos de las citas modificadas.
+    """
+    if operacion.Nuevo_Estado is None and not operacion.Desplazamiento_Minutos:
+        raise HTTPException(
+            status_code=400,
+            detail="Indica Nuevo_Estado o Desplazamiento_Minutos"
+        )
+    desde, hasta = convertir_fecha(operacion.Desde), convertir_fecha(operacion.Hasta)
+    if hasta <= desde:
+        raise HTTPException(
+            status_code=400,
+            detail="La fecha 'Hasta' debe ser posterior a 'Desde'"
+        )
+    if hasta - desde > timedelta(days=AGENDA_MAX_DIAS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"El rango no puede superar {AGENDA_MAX_DIAS} días"
+        )
+    minutos = operacion.Desplazamiento_Minutos or 0
+    if minutos:
+        # Las citas movidas no pueden quedar en el pasado
+        validar_fecha_futura(desde + timedelta(minutes=minutos))
+
+    try:
+        filtro = "Fecha_Hora >= ? AND Fecha_Hora < ?"
+        params: List = [desde.isoformat(), hasta.isoformat()]
+        if operacion.Codigo_Doctor is not None:
+            filtro += " AND Codigo_Doctor = ?"
+            params.append(operacion.Codigo_Doctor)
+        if operacion.Estado:
+            filtro += " AND Estado = ?"
+            params.append(operacion.Estado)
+
+        datos = {"Fecha_Modificacion": datetime.now().isoformat()}
+        if operacion.Nuevo_Estado is not None:
+            datos["Estado"] = operacion.Nuevo_Estado
+
+        afectadas = run_write(lambda conn: actualizar_conjunto(conn, filtro, params, datos, minutos))
+        logger.info(f"Operación en lote sobre citas: {len(afectadas)} modificadas")
+        return respuesta_modelo({"Citas_Afectadas": afectadas}, CambioCitas)
+
+    except HTTPException:
+        raise
+    except IntegrityError as e:
+        logger.error(f"Error de integridad al modificar citas en lote: {e}")
+        raise HTTPException(
+            status_code=400,
+            detail="Error de integridad de datos"
+        )
+    except Exception as e:
+        logger.error(f"Error inesperado al modificar citas en lote: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Error al modificar las citas"
+        )
+
+
+@router.post("/reprogramar", response_model=ReprogramacionCitas)
+def reprogramar_citas_doctor(
+    ausencia: AusenciaDoctor,
+    simular: bool = Query(False, description="Calcular el plan sin modificar ninguna cita"),
+    db: Connection = Depends(get_db)
+):
+    """
+    Reprogramar las citas de un doctor que se ausenta (Inactivo, Vacaciones o
+    unos días libres)
+
+    Lee una sola vez las citas activas del doctor entre **Desde** (por defecto
+    ahora) y **Hasta** (por defecto AGENDA_MAX_DIAS días después) y la agenda de
+    los doctores activos de su especialidad, y asigna las citas en memoria de la
+    más próxima a la más lejana: a la misma hora con otro doctor libre o, si no
+    hay, al primer hueco posterior de cualquiera de ellos (también del propio
+    doctor después de **Hasta**, si sigue Activo). Todo el plan se aplica en
+    una transacción.
+
+    Con **simular** solo devuelve el plan. Las citas sin hueco en los
+    AGENDA_MAX_DIAS días siguientes a **Hasta** no se modifican y se devuelven
+    en Sin_Asignar.
+    """
+    ahora = datetime.now()
+    desde = max(convertir_fecha(ausencia.Desde) or ahora, ahora)
+    hasta = convertir_fecha(ausencia.Hasta) or desde + timedelta(days=AGENDA_MAX_DIAS)
+    if hasta <= desde:
+        raise HTTPException(
+            status_code=400,
+            detail="La fecha 'Hasta' debe ser posterior a 'Desde' y al momento actual"
+        )
+    if hasta - desde > timedelta(days=AGENDA_MAX_DIAS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"El rango no puede superar {AGENDA_MAX_DIAS} días"
+        )
+    limite_busqueda = hasta + timedelta(days=AGENDA_MAX_DIAS)
+
+    try:
+        cursor = db.cursor()
+        cursor.execute(
+            "SELECT Codigo, Especialidad, Estado FROM doctor WHERE Codigo = ?",
+            (ausencia.Codigo_Doctor,)
+        )
+        doctor = cursor.fetchone()
+        if not doctor:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Doctor con código {ausencia.Codigo_Doctor} no encontrado"
+            )
+
+        def planificar(conn):
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT Codigo, Codigo_Paciente, Fecha_Hora FROM citas "
+                f"WHERE Codigo_Doctor = ? AND Fecha_Hora >= ? AND Fecha_Hora < ? AND {condicion_activa()} "
+                f"ORDER BY Fecha_Hora",
+                (ausencia.Codigo_Doctor, desde.isoformat(), hasta.isoformat())
+            )
+            afectadas = [
+                (fila[0], fila[1], convertir_fecha(fila[2])) for fila in cursor.fetchall()
+                if convertir_fecha(fila[2]) is not None
+            ]
+            if len(afectadas) > AGENDA_MAX_LOTE:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"El doctor tiene {len(afectadas)} citas en el rango; el máximo es {AGENDA_MAX_LOTE}"
+                )
+            if not afectadas:
+                return afectadas, {}
+
+            # Doctores activos de la misma especialidad (mismo criterio que crear_cita)
+            candidatos = {}
+            if doctor[1]:
+                cursor.execute(
+                    "SELECT Codigo, Estado FROM doctor WHERE Especialidad = ? COLLATE NOCASE AND Codigo != ? "
+                    "ORDER BY Codigo",
+                    (doctor[1], ausencia.Codigo_Doctor)
+                )
+                candidatos = {fila[0]: desde for fila in cursor.fetchall() if not fila[1] or fila[1] == "Activo"}
+            if not doctor[2] or doctor[2] == "Activo":
+                # Ausencia de unos días: sus citas pueden pasar a cuando vuelve
+                candidatos[ausencia.Codigo_Doctor] = hasta
+
+            ocupacion = Ocupacion.cargar(cursor, sorted(candidatos), desde, limite_busqueda)
+            # Las citas que se reprograman dejan libre su horario
+            for _, _, inicio in afectadas:
+                ocupacion.liberar(ausencia.Codigo_Doctor, inicio)
+            plan = reasignar_citas(
+                ocupacion, [(codigo, inicio) for codigo, _, inicio in afectadas], candidatos, limite_busqueda
+            )
+            if plan and not simular:
+                modificacion = datetime.now().isoformat()
+                conn.executemany(
+                    "UPDATE citas SET Codigo_Doctor = ?, Fecha_Hora = ?, Fecha_Modificacion = ? WHERE Codigo = ?",
+                    [
+                        (nuevo_doctor, nuevo_inicio.isoformat(), modificacion, codigo)
+                        for codigo, (nuevo_doctor, nuevo_inicio) in plan.items()
+                    ]
+                )
+            return afectadas, plan
+
+        # La simulación lee la agenda en la conexión de lectura; el plan real se
+        # calcula y aplica en la transacción del escritor, sin cambios intermedios
+        afectadas, plan = planificar(db) if simular else run_write(planificar)
+
+        reprogramadas, sin_asignar = [], []
+        for codigo, codigo_paciente, inicio in afectadas:
+            cita = {"Codigo": codigo, "Codigo_Paciente": codigo_paciente, "Fecha_Hora_Anterior": inicio}
+            if codigo in plan:
+                cita["Codigo_Doctor"], cita["Fecha_Hora"] = plan[codigo]
+                reprogramadas.append(cita)
+            else:
+                sin_asignar.append(cita)
+
+        logger.info(
+            f"Reprogramación de citas del doctor {ausencia.Codigo_Doctor}"
+            f"{' (simulación)' if simular else ''}: {len(reprogramadas)} reprogramadas, "
+            f"{len(sin_asignar)} sin hueco"
+        )
+        return respuesta_modelo({
+            "Codigo_Doctor": ausencia.Codigo_Doctor,
+            "Simulacion": simular,
+            "Reprogramadas": reprogramadas,
+            "Sin_Asignar": sin_asignar,
+        }, ReprogramacionCitas)
+
+    except HTTPException:
+        raise
+    except IntegrityError as e:
+        logger.error(f"Error de integridad al reprogramar citas: {e}")
+        raise HTTPException(
+            status_code=400,
+            detail="Error de integridad de datos"
+        )
+    except Exception as e:
+        logger.error(f"Error inesperado al reprogramar citas: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Error al reprogramar las citas"
+        )
+
+
+def _obtener_serie(cursor, codigo_serie: int):
+    cursor.execute("SELECT * FROM series_citas WHERE Codigo = ?", (codigo_serie,))
+    serie = cursor.fetchone()
+    if not serie:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Serie de citas con código {codigo_serie} no encontrada"
+        )
+    return serie
+
+
+@router.post("/series", response_model=SerieCitasCreada)
+def crear_serie_citas(
+    serie: SerieCitasCreate,
+    todo_o_nada: bool = Query(False, description="No crear ninguna cita si alguna choca"),
+    db: Connection = Depends(get_db)
+):
+    """
+    Crear una serie de citas recurrentes (controles semanales, mensuales...)
+
+    Las fechas se calculan en el servidor a partir de la regla (Frecuencia
+    diaria, semanal o mensual, cada Intervalo unidades, hasta Repeticiones
+    citas o hasta Fecha_Fin). Paciente y doctor se validan una vez, los choques
+    de horario de todas las fechas se comprueban en memoria con una consulta, y
+    la serie y sus citas se insertan en una sola transacción.
+
+    Devuelve un resultado por fecha, como la creación en lote: 201 si se creó o
+    409 si el doctor ya tenía una cita a esa hora (esas fechas se omiten). Con
+    **todo_o_nada**, si alguna choca no se crea la serie.
+    """
+    if serie.Frecuencia not in FRECUENCIAS_SERIE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Frecuencia inválida. Use: {', '.join(FRECUENCIAS_SERIE)}"
+        )
+    if serie.Intervalo < 1 or (serie.Repeticiones is not None and serie.Repeticiones < 1):
+        raise HTTPException(
+            status_code=400,
+            detail="Intervalo y Repeticiones deben ser mayores que cero"
+        )
+    if serie.Repeticiones is None and serie.Fecha_Fin is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Indica Repeticiones o Fecha_Fin"
+        )
+    validar_fecha_futura(serie.Fecha_Inicio)
+
+    fechas = expandir_serie(
+        convertir_fecha(serie.Fecha_Inicio), serie.Frecuencia, serie.Intervalo,
+        serie.Repeticiones, serie.Fecha_Fin
+    )
+    if not fechas:
+        raise HTTPException(
+            status_code=400,
+            detail="La regla no produce ninguna cita"
+        )
+    if len(fechas) > AGENDA_MAX_LOTE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"La serie no puede superar {AGENDA_MAX_LOTE} citas"
+        )
+
+    cursor = db.cursor()
+
+    try:
+        cursor.execute("SELECT Codigo FROM pacientes WHERE Codigo = ?", (serie.Codigo_Paciente,))
+        if not cursor.fetchone():
+            raise HTTPException(
+                status_code=404,
+                detail=f"Paciente con código {serie.Codigo_Paciente} no encontrado"
+            )
+        verificar_doctor_activo(cursor, serie.Codigo_Doctor)
+
+        resultados = [
+            {"Indice": indice, "Codigo_HTTP": 201, "Fecha_Hora": fecha}
+            for indice, fecha in enumerate(fechas)
+        ]
+        estado = serie.Estado or "Programada"
+
+        def insertar(conn):
+            # Choques comprobados en la transacción del escritor, como en el lote
+            ocupacion = Ocupacion.cargar(
+                conn.cursor(), [serie.Codigo_Doctor],
+                fechas[0], fechas[-1] + timedelta(minutes=AGENDA_DURACION_CITA),
+            )
+            libres = []
+            for indice, fecha in enumerate(fechas):
+                if ocupacion.choca(serie.Codigo_Doctor, fecha):
+                    resultados[indice].update(
+                        Codigo_HTTP=409, Detalle="El doctor ya tiene una cita programada en ese horario"
+                    )
+                    continue
+                libres.append(indice)
+            if not libres or (todo_o_nada and len(libres) < len(fechas)):
+                return None, []
+            codigo_serie = conn.execute(
+                "INSERT INTO series_citas (Codigo_Paciente, Codigo_Doctor, Fecha_Inicio, Frecuencia, "
+                "Intervalo, Repeticiones, Fecha_Fin, Motivo) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    serie.Codigo_Paciente, serie.Codigo_Doctor, fechas[0].isoformat(), serie.Frecuencia,
+                    serie.Intervalo, serie.Repeticiones,
+                    serie.Fecha_Fin.isoformat() if serie.Fecha_Fin else None, serie.Motivo
+                )
+            ).lastrowid
+            conn.executemany(
+                f"INSERT INTO citas ({', '.join(COLUMNAS_LOTE)}, Codigo_Serie) "
+                f"VALUES ({', '.join('?' for _ in COLUMNAS_LOTE)}, ?)",
+                [
+                    (
+                        serie.Codigo_Paciente, serie.Codigo_Doctor, fechas[indice].isoformat(),
+                        estado, serie.Motivo, serie.Observaciones, codigo_serie
+                    )
+                    for indice in libres
+                ]
+            )
+            # Códigos consecutivos, como en crear_citas_lote
+            ultimo = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            return codigo_serie, list(zip(libres, range(ultimo - len(libres) + 1, ultimo + 1)))
+
+        codigo_serie, codigos = run_write(insertar)
+        for indice, codigo in codigos:
+            resultados[indice]["Codigo"] = codigo
+        if not codigos:
+            for resultado in resultados:
+                if resultado["Codigo_HTTP"] == 201:
+                    resultado.update(Codigo_HTTP=409, Detalle="No se creó: otra cita de la serie choca")
+
+        logger.info(f"Serie de citas {codigo_serie}: {len(codigos)} creadas de {len(fechas)}")
+        return respuesta_modelo({"Codigo_Serie": codigo_serie, "Citas": resultados}, SerieCitasCreada)
+
+    except HTTPException:
+        raise
+    except IntegrityError as e:
+        logger.error(f"Error de integridad al crear serie de citas: {e}")
+        raise HTTPException(
+            status_code=400,
+            detail="Error de integridad de datos. Verifica las relaciones."
+        )
+    except Exception as e:
+        logger.error(f"Error inesperado al crear serie de citas: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al crear la serie de citas: {str(e)}"
+        )
+
+
+@router.get("/series/{codigo_serie}", response_model=SerieCitas)
+def obtener_serie_citas(
+    codigo_serie: int,
+    db: Connection = Depends(get_db),
+    condicional: Condicional = Depends()
+):
+    """Obtener la regla de una serie y sus citas, ordenadas por fecha"""
+    try:
+        cursor = db.cursor()
+        no_modificado = condicional.comprobar(cursor, "citas", "series_citas")
+        if no_modificado:
+            return no_modificado
+        serie = dict(_obtener_serie(cursor, codigo_serie))
+        cursor.execute(
+            "SELECT * FROM citas WHERE Codigo_Serie = ? ORDER BY Fecha_Hora", (codigo_serie,)
+        )
+        serie["Citas"] = [dict(fila) for fila in cursor.fetchall()]
+        return respuesta_modelo(serie, SerieCitas, condicional.response.headers)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error al obtener serie de citas {codigo_serie}: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error al obtener la serie de citas"
+        )
+
+
+def _cambiar_serie(
+    db: Connection, codigo_serie: int, desde: Optional[datetime], datos: dict
+) -> dict:
+    """
+    Aplica `datos` a las citas activas de la serie desde `desde` (por defecto,
+    ahora) con un solo UPDATE y retorna los códigos afectados
+    """
+    cursor = db.cursor()
+    _obtener_serie(cursor, codigo_serie)
+    desde = convertir_fecha(desde) or datetime.now()
+    if datos.get("Codigo_Doctor") is not None:
+        verificar_doctor_activo(cursor, datos["Codigo_Doctor"])
+
+    datos["Fecha_Modificacion"] = datetime.now().isoformat()
+    filtro = f"Codigo_Serie = ? AND Fecha_Hora >= ? AND {condicion_activa()}"
+    params = [codigo_serie, desde.isoformat()]
+    afectadas = run_write(lambda conn: actualizar_conjunto(conn, filtro, params, datos))
+    return {"Codigo_Serie": codigo_serie, "Citas_Afectadas": afectadas}
+
+
+@router.put("/series/{codigo_serie}", response_model=CambioSerieCitas)
+def actualizar_serie_citas(
+    codigo_serie: int,
+    cambios: SerieCitasUpdate,
+    desde: Optional[datetime] = Query(None, description="Fecha_Hora de la primera cita a cambiar (por defecto, ahora)"),
+    db: Connection = Depends(get_db)
+):
+    """
+    Cambiar "esta y las siguientes" citas de una serie
+
+    Aplica el doctor, estado, motivo u observaciones a todas las citas activas
+    de la serie desde **desde** con un solo UPDATE. Si cambia el doctor, se
+    comprueban los choques de todas las citas con su agenda en la misma
+    transacción; si alguna choca (409), no se cambia ninguna. Las citas
+    canceladas o completadas no se modifican.
+    """
+    datos = cambios.model_dump(exclude_unset=True)
+    if not datos:
+        raise HTTPException(
+            status_code=400,
+            detail="No se proporcionaron datos para actualizar"
+        )
+    try:
+        resultado = _cambiar_serie(db, codigo_serie, desde, datos)
+        logger.info(f"Serie de citas {codigo_serie}: {len(resultado['Citas_Afectadas'])} citas actualizadas")
+        return resultado
+
+    except HTTPException:
+        raise
+    except IntegrityError as e:
+        logger.error(f"Error de integridad al actualizar serie de citas {codigo_serie}: {e}")
+        raise HTTPException(
+            status_code=400,
+            detail="Error de integridad de datos"
+        )
+    except Exception as e:
+        logger.error(f"Error inesperado al actualizar serie de citas {codigo_serie}: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Error al actualizar la serie de citas"
+        )
+
+
+@router.delete("/series/{codigo_serie}", response_model=CambioSerieCitas)
+def cancelar_serie_citas(
+    codigo_serie: int,
+    desde: Optional[datetime] = Query(None, description="Fecha_Hora de la primera cita a cancelar (por defecto, ahora)"),
+    db: Connection = Depends(get_db)
+):
+    """
+    Cancelar "esta y las siguientes" citas de una serie
+
+    Marca como Cancelada, con un solo UPDATE, las citas activas de la serie
+    desde **desde**. Las citas no se eliminan y quedan en el historial.
+    """
+    try:
+        resultado = _cambiar_serie(db, codigo_serie, desde, {"Estado": "Cancelada"})
+        logger.info(f"Serie de citas {codigo_serie}: {len(resultado['Citas_Afectadas'])} citas canceladas")
+        return resultado
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error inesperado al cancelar serie de citas {codigo_serie}: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Error al cancelar la serie de citas"
+        )
+
+
 @router.put("/{codigo}", response_model=Cita)
-async def actualizar_cita(
+def actualizar_cita(
     codigo: int,
     cita: CitaUpdate,
     db: Connection = Depends(get_db)
@@ -317,7 +1224,7 @@ async def actualizar_cita(
     
     - Valida que la cita exista
     - Valida fecha futura si se actualiza
-    - Verifica disponibilidad si se cambia la fecha/hora
+    - Verifica disponibilidad si se cambia la fecha/hora, en la misma transacción del UPDATE
     """
     cursor = db.cursor()
     
@@ -354,23 +1261,6 @@ async def actualizar_cita(
                 validar_fecha_futura(fecha_hora)
                 datos["Fecha_Hora"] = fecha_hora.isoformat()
         
-        # Verificar disponibilidad si se cambia doctor o fecha/hora
-        if "Codigo_Doctor" in datos or "Fecha_Hora" in datos:
-            cita_dict = dict(cita_existente)
-            codigo_doctor = datos.get("Codigo_Doctor") or cita_dict.get("Codigo_Doctor")
-            fecha_hora_str = datos.get("Fecha_Hora") or cita_dict.get("Fecha_Hora")
-            
-            if fecha_hora_str and codigo_doctor:
-                try:
-                    if isinstance(fecha_hora_str, str):
-                        fecha_hora = datetime.fromisoformat(fecha_hora_str.replace('Z', '+00:00'))
-                    else:
-                        fecha_hora = fecha_hora_str
-                    verificar_disponibilidad_doctor(cursor, codigo_doctor, fecha_hora, codigo)
-                except ValueError:
-                    # Si no se puede parsear, continuar sin verificar disponibilidad
-                    pass
-        
         # Agregar fecha de modificación
         datos["Fecha_Modificacion"] = datetime.now().isoformat()
         
@@ -379,11 +1269,32 @@ async def actualizar_cita(
         valores = list(datos.values())
         valores.append(codigo)
         
-        cursor.execute(
-            f"UPDATE citas SET {', '.join(campos)} WHERE Codigo = ?",
-            valores
-        )
-        db.commit()
+        def actualizar(conn):
+            # Verificar disponibilidad si se cambia doctor o fecha/hora, o si
+            # una cita cancelada o completada vuelve a ocupar el horario. Se lee
+            # la cita y se verifica en la transacción del escritor, como al crear
+            if "Codigo_Doctor" in datos or "Fecha_Hora" in datos or "Estado" in datos:
+                actual = conn.execute(
+                    "SELECT Codigo_Doctor, Fecha_Hora, Estado FROM citas WHERE Codigo = ?", (codigo,)
+                ).fetchone()
+                if not actual:
+                    raise HTTPException(
+                        status_code=404,
+                        detail=f"Cita con código {codigo} no encontrada"
+                    )
+                codigo_doctor = datos.get("Codigo_Doctor") or actual[0]
+                fecha_hora = convertir_fecha(datos.get("Fecha_Hora") or actual[1])
+                estado = datos.get("Estado") or actual[2]
+                cambia_horario = "Codigo_Doctor" in datos or "Fecha_Hora" in datos or actual[2] in ESTADOS_INACTIVOS
+                # Si no se puede interpretar la fecha, se continúa sin verificar disponibilidad
+                if cambia_horario and codigo_doctor and fecha_hora and estado not in ESTADOS_INACTIVOS:
+                    verificar_disponibilidad_doctor(conn.cursor(), codigo_doctor, fecha_hora, codigo)
+            return conn.execute(
+                f"UPDATE citas SET {', '.join(campos)} WHERE Codigo = ?",
+                valores
+            ).rowcount
+        
+        run_write(actualizar)
         
         # Obtener la cita actualizada
         cursor.execute("SELECT * FROM citas WHERE Codigo = ?", (codigo,))
@@ -412,7 +1323,7 @@ async def actualizar_cita(
 
 
 @router.delete("/{codigo}", status_code=204)
-async def eliminar_cita(codigo: int, db: Connection = Depends(get_db)):
+def eliminar_cita(codigo: int, db: Connection = Depends(get_db)):
     """
     Eliminar una cita (soft delete recomendado en producción)
     
@@ -429,8 +1340,7 @@ async def eliminar_cita(codigo: int, db: Connection = Depends(get_db)):
                 detail=f"Cita con código {codigo} no encontrada"
             )
         
-        cursor.execute("DELETE FROM citas WHERE Codigo = ?", (codigo,))
-        db.commit()
+        run_write(lambda conn: conn.execute("DELETE FROM citas WHERE Codigo = ?", (codigo,)).rowcount)
         
         logger.info(f"Cita {codigo} eliminada exitosamente")
         return None
@@ -5,8 +5,16 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlite3 import Connection, IntegrityError, OperationalError
 from typing import List, Optional
 from app.database import get_db
+from app.fields import Expansion, Proyeccion
+from app.pagination import Paginacion
+from app.loaders import COLUMNAS_EXAMEN_ASOCIADO, cargar_hijos
+from app.schema import get_schema
+from app.streaming import pide_ndjson, respuesta_ndjson
+from app.versions import Condicional
+from app.writer import run_write
 from app.models import Consulta, ConsultaCreate, ConsultaUpdate
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from functools import partial
 import logging
 import re
 
@@ -35,8 +43,7 @@ def crear_examenes_desde_descripcion(
         return []
     
     # Verificar si la tabla examenes existe
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='examenes'")
-    if not cursor.fetchone():
+    if not get_schema().tiene_tabla("examenes"):
         logger.warning("La tabla examenes no existe, no se pueden crear exámenes")
         return []
     
@@ -90,12 +97,53 @@ def crear_examenes_desde_descripcion(
     return examenes_creados
 
 
+# Relaciones que se cargan solo con ?include=
+EXPANSIONES_CONSULTA = {"examenes": Expansion("Examenes_Asociados", tablas=("examenes",))}
+
+
+def completar_consultas(cursor, consultas, examenes: bool = False) -> List[dict]:
+    """Convierte las filas de consultas en diccionarios y, si se piden, agrega sus exámenes"""
+    resultado = [dict(row) for row in consultas]
+    
+    # Exámenes de todas las consultas en una sola consulta
+    examenes_por_consulta = {}
+    if examenes and get_schema().tiene_tabla("examenes"):
+        try:
+            examenes_por_consulta = cargar_hijos(
+                cursor, "examenes", "Codigo_Consulta",
+                (consulta["Codigo"] for consulta in resultado),
+                COLUMNAS_EXAMEN_ASOCIADO,
+                orden="Fecha_Solicitud DESC",
+            )
+        except Exception as e:
+            logger.warning(f"Error al cargar exámenes de las consultas: {e}")
+    
+    for consulta_dict in resultado:
+        # Convertir Examenes_Solicitados de INTEGER (0/1) a boolean
+        if "Examenes_Solicitados" in consulta_dict:
+            consulta_dict["Examenes_Solicitados"] = bool(consulta_dict["Examenes_Solicitados"])
+        # Convertir Examenes_Sugeridos de INTEGER (0/1) a boolean
+        if "Examenes_Sugeridos" in consulta_dict:
+            consulta_dict["Examenes_Sugeridos"] = bool(consulta_dict["Examenes_Sugeridos"])
+        
+        if examenes:
+            consulta_dict["Examenes_Asociados"] = examenes_por_consulta.get(consulta_dict["Codigo"], [])
+    
+    return resultado
+
+
 @router.get("/", response_model=List[Consulta])
-async def listar_consultas(
+def listar_consultas(
     db: Connection = Depends(get_db),
+    paginacion: Paginacion = Depends(),
+    proyeccion: Proyeccion = Depends(),
+    ndjson: bool = Depends(pide_ndjson),
+    condicional: Condicional = Depends(),
     codigo_paciente: Optional[int] = Query(None, description="Filtrar por paciente"),
     codigo_doctor: Optional[int] = Query(None, description="Filtrar por doctor"),
-    estado: Optional[str] = Query(None, description="Filtrar por estado")
+    estado: Optional[str] = Query(None, description="Filtrar por estado"),
+    desde: Optional[date] = Query(None, description="Primer día incluido (AAAA-MM-DD)"),
+    hasta: Optional[date] = Query(None, description="Último día incluido (AAAA-MM-DD)")
 ):
     """
     Listar todas las consultas con filtros opcionales
@@ -103,11 +151,19 @@ async def listar_consultas(
     - **codigo_paciente**: Filtrar por paciente
     - **codigo_doctor**: Filtrar por doctor
     - **estado**: Filtrar por estado
+    - **desde** / **hasta**: Rango de días de Fecha_de_Consulta, inclusivo
+    - **fields**: Columnas a devolver (por ejemplo, Fecha_de_Consulta,Estado)
+    - **include=examenes**: Agregar los exámenes asociados a cada consulta
+    - **formato=ndjson**: Todas las consultas en streaming, una por línea
+    - **total=true**: Total en X-Total-Count, solo en la primera página (sin cursor); sin filtros se lee de stats_counters, con filtros recorre todas las filas que los cumplen
     """
     try:
         cursor = db.cursor()
         
-        query = "SELECT * FROM consultas WHERE 1=1"
+        columnas = proyeccion.columnas(
+            "consultas", orden=("Fecha_de_Consulta",), expansiones=EXPANSIONES_CONSULTA
+        )
+        query = f"SELECT {columnas} FROM consultas WHERE 1=1"
         params = []
         
         if codigo_paciente:
@@ -122,54 +178,37 @@ async def listar_consultas(
             query += " AND Estado = ?"
             params.append(estado)
         
-        query += " ORDER BY Fecha_de_Consulta DESC"
+        if desde:
+            query += " AND Fecha_de_Consulta >= ?"
+            params.append(desde.isoformat())
+        
+        if hasta:
+            query += " AND Fecha_de_Consulta < ?"
+            params.append((hasta + timedelta(days=1)).isoformat())
+        
+        no_modificado = condicional.comprobar(cursor, "consultas", *proyeccion.tablas(EXPANSIONES_CONSULTA))
+        if no_modificado:
+            return no_modificado
+        
+        query, params = paginacion.aplicar(cursor, query, params, "Fecha_de_Consulta", sin_limite=ndjson, tabla="consultas")
+        completar = partial(completar_consultas, examenes=proyeccion.incluye("examenes"))
+        if ndjson:
+            return respuesta_ndjson(
+                db, query, params, proyeccion.modelo(Consulta), proyeccion.completar(completar),
+                paginacion.response.headers
+            )
         
         cursor.execute(query, params)
-        consultas = cursor.fetchall()
+        consultas = paginacion.recortar(cursor.fetchall())
         
         # Si no hay consultas, retornar lista vacía
         if not consultas:
             return []
         
-        # Verificar si la tabla examenes existe
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='examenes'")
-        tabla_examenes_existe = cursor.fetchone() is not None
-        
-        resultado = []
-        for row in consultas:
-            consulta_dict = dict(row)
-            codigo_consulta = consulta_dict.get("Codigo")
-            
-            # Convertir Examenes_Solicitados de INTEGER (0/1) a boolean
-            if "Examenes_Solicitados" in consulta_dict:
-                consulta_dict["Examenes_Solicitados"] = bool(consulta_dict["Examenes_Solicitados"])
-            # Convertir Examenes_Sugeridos de INTEGER (0/1) a boolean
-            if "Examenes_Sugeridos" in consulta_dict:
-                consulta_dict["Examenes_Sugeridos"] = bool(consulta_dict["Examenes_Sugeridos"])
-            
-            # Obtener exámenes asociados a esta consulta desde la tabla examenes
-            examenes_asociados = []
-            if codigo_consulta and tabla_examenes_existe:
-                try:
-                    cursor.execute("""
-                        SELECT Codigo, Tipo_Examen, Fecha_Solicitud, Fecha_Resultado, 
-                               Resultado, Observaciones, Estado
-                        FROM examenes
-                        WHERE Codigo_Consulta = ?
-                        ORDER BY Fecha_Solicitud DESC
-                    """, (codigo_consulta,))
-                    examenes_rows = cursor.fetchall()
-                    for examen_row in examenes_rows:
-                        examen_dict = dict(examen_row)
-                        examenes_asociados.append(examen_dict)
-                except Exception as e:
-                    logger.warning(f"Error al cargar exámenes para consulta {codigo_consulta}: {e}")
-            
-            consulta_dict["Examenes_Asociados"] = examenes_asociados
-            resultado.append(consulta_dict)
-        
-        return resultado
+        return proyeccion.respuesta(completar(cursor, consultas), Consulta, paginacion.response.headers)
     
+    except HTTPException:
+        raise
     except OperationalError as e:
         logger.error(f"Error de base de datos al listar consultas: {e}")
         raise HTTPException(
@@ -185,11 +224,25 @@ async def listar_consultas(
 
 
 @router.get("/{codigo}", response_model=Consulta)
-async def obtener_consulta(codigo: int, db: Connection = Depends(get_db)):
-    """Obtener una consulta por código"""
+def obtener_consulta(
+    codigo: int,
+    db: Connection = Depends(get_db),
+    proyeccion: Proyeccion = Depends(),
+    condicional: Condicional = Depends()
+):
+    """
+    Obtener una consulta por código
+    
+    - **fields**: Columnas a devolver
+    - **include=examenes**: Agregar los exámenes asociados
+    """
     try:
         cursor = db.cursor()
-        cursor.execute("SELECT * FROM consultas WHERE Codigo = ?", (codigo,))
+        columnas = proyeccion.columnas("consultas", expansiones=EXPANSIONES_CONSULTA)
+        no_modificado = condicional.comprobar(cursor, "consultas", *proyeccion.tablas(EXPANSIONES_CONSULTA))
+        if no_modificado:
+            return no_modificado
+        cursor.execute(f"SELECT {columnas} FROM consultas WHERE Codigo = ?", (codigo,))
         consulta = cursor.fetchone()
         
         if not consulta:
@@ -198,37 +251,8 @@ async def obtener_consulta(codigo: int, db: Connection = Depends(get_db)):
                 detail=f"Consulta con código {codigo} no encontrada"
             )
         
-        consulta_dict = dict(consulta)
-        # Convertir Examenes_Solicitados de INTEGER (0/1) a boolean
-        if "Examenes_Solicitados" in consulta_dict:
-            consulta_dict["Examenes_Solicitados"] = bool(consulta_dict["Examenes_Solicitados"])
-        # Convertir Examenes_Sugeridos de INTEGER (0/1) a boolean
-        if "Examenes_Sugeridos" in consulta_dict:
-            consulta_dict["Examenes_Sugeridos"] = bool(consulta_dict["Examenes_Sugeridos"])
-        
-        # Obtener exámenes asociados a esta consulta desde la tabla examenes
-        examenes_asociados = []
-        try:
-            # Verificar si la tabla examenes existe
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='examenes'")
-            if cursor.fetchone():
-                cursor.execute("""
-                    SELECT Codigo, Tipo_Examen, Fecha_Solicitud, Fecha_Resultado, 
-                           Resultado, Observaciones, Estado
-                    FROM examenes
-                    WHERE Codigo_Consulta = ?
-                    ORDER BY Fecha_Solicitud DESC
-                """, (codigo,))
-                examenes_rows = cursor.fetchall()
-                for examen_row in examenes_rows:
-                    examen_dict = dict(examen_row)
-                    examenes_asociados.append(examen_dict)
-        except Exception as e:
-            logger.warning(f"Error al cargar exámenes para consulta {codigo}: {e}")
-        
-        consulta_dict["Examenes_Asociados"] = examenes_asociados
-        
-        return consulta_dict
+        consulta_dict = completar_consultas(cursor, [consulta], examenes=proyeccion.incluye("examenes"))[0]
+        return proyeccion.respuesta(consulta_dict, Consulta, condicional.response.headers)
     
     except HTTPException:
         raise
@@ -241,7 +265,7 @@ async def obtener_consulta(codigo: int, db: Connection = Depends(get_db)):
 
 
 @router.post("/", response_model=Consulta, status_code=201)
-async def crear_consulta(consulta: ConsultaCreate, db: Connection = Depends(get_db)):
+def crear_consulta(consulta: ConsultaCreate, db: Connection = Depends(get_db)):
     """
     Crear una nueva consulta con validaciones
     
@@ -287,34 +311,39 @@ async def crear_consulta(consulta: ConsultaCreate, db: Connection = Depends(get_
         placeholders = ", ".join(["?" for _ in valores])
         campos_str = ", ".join(campos)
         
-        cursor.execute(
-            f"INSERT INTO consultas ({campos_str}) VALUES ({placeholders})",
-            valores
-        )
-        
-        codigo = cursor.lastrowid
-        
-        # Si se marcaron exámenes como solicitados y hay descripción, crear los exámenes
-        if consulta.Examenes_Solicitados and consulta.Examenes_Descripcion:
-            logger.info(f"Creando exámenes para consulta {codigo}. Descripción: {consulta.Examenes_Descripcion}")
-            try:
-                examenes_creados = crear_examenes_desde_descripcion(
-                    cursor,
-                    codigo,
-                    consulta.Codigo_Paciente,
-                    consulta.Codigo_Doctor,
-                    consulta.Examenes_Descripcion,
-                    consulta.Fecha_de_Consulta
-                )
-                if examenes_creados:
-                    logger.info(f"Se crearon {len(examenes_creados)} exámenes para la consulta {codigo}: {examenes_creados}")
-                else:
-                    logger.warning(f"No se crearon exámenes para la consulta {codigo}. Verificar descripción.")
-            except Exception as e:
-                logger.error(f"Error al crear exámenes para consulta {codigo}: {e}", exc_info=True)
-                # No fallar la creación de la consulta si hay error al crear exámenes
+        def _insertar(conn):
+            cursor_escritura = conn.cursor()
+            cursor_escritura.execute(
+                f"INSERT INTO consultas ({campos_str}) VALUES ({placeholders})",
+                valores
+            )
+            
+            codigo = cursor_escritura.lastrowid
+            
+            # Si se marcaron exámenes como solicitados y hay descripción, crear los exámenes
+            if consulta.Examenes_Solicitados and consulta.Examenes_Descripcion:
+                logger.info(f"Creando exámenes para consulta {codigo}. Descripción: {consulta.Examenes_Descripcion}")
+                try:
+                    examenes_creados = crear_examenes_desde_descripcion(
+                        cursor_escritura,
+                        codigo,
+                        consulta.Codigo_Paciente,
+                        consulta.Codigo_Doctor,
+                        consulta.Examenes_Descripcion,
+                        consulta.Fecha_de_Consulta
+                    )
+                    if examenes_creados:
+                        logger.info(f"Se crearon {len(examenes_creados)} exámenes para la consulta {codigo}: {examenes_creados}")
+                    else:
+                        logger.warning(f"No se crearon exámenes para la consulta {codigo}. Verificar descripción.")
+                except Exception as e:
+                    logger.error(f"Error al crear exámenes para consulta {codigo}: {e}", exc_info=True)
+                    # No fallar la creación de la consulta si hay error al crear exámenes
+            
+            return codigo
         
-        db.commit()
+        # La consulta y sus exámenes se confirman juntos a través del escritor único
+        codigo = run_write(_insertar)
         
         cursor.execute("SELECT * FROM consultas WHERE Codigo = ?", (codigo,))
         nueva_consulta = cursor.fetchone()
@@ -350,7 +379,7 @@ async def crear_consulta(consulta: ConsultaCreate, db: Connection = Depends(get_
 
 
 @router.put("/{codigo}", response_model=Consulta)
-async def actualizar_consulta(
+def actualizar_consulta(
     codigo: int,
     consulta: ConsultaUpdate,
     db: Connection = Depends(get_db)
@@ -368,9 +397,7 @@ async def actualizar_consulta(
             )
         
         # Obtener columnas disponibles en la tabla
-        cursor.execute("PRAGMA table_info(consultas)")
-        columnas_info = cursor.fetchall()
-        columnas_disponibles = [col[1] for col in columnas_info]
+        columnas_disponibles = get_schema().columnas("consultas")
         
         # Preparar datos de actualización
         datos = consulta.model_dump(exclude_unset=True)
@@ -440,72 +467,76 @@ async def actualizar_consulta(
         logger.info(f"Ejecutando query: {query}")
         logger.info(f"Valores: {valores}")
         
-        cursor.execute(query, valores)
-        
-        # Obtener la consulta actualizada para obtener los datos necesarios
-        cursor.execute("SELECT * FROM consultas WHERE Codigo = ?", (codigo,))
-        consulta_actualizada = cursor.fetchone()
-        consulta_dict_temp = dict(consulta_actualizada)
-        
-        # Si se marcaron exámenes como solicitados y hay descripción, crear los exámenes
-        # Verificar si Examenes_Solicitados está en los datos y es True (antes de convertir a entero)
-        # O si ya estaba marcado como solicitado en la consulta original
-        examenes_solicitados_en_datos = datos.get("Examenes_Solicitados")
-        examenes_solicitados_original = consulta_dict_temp.get("Examenes_Solicitados")
-        
-        # Convertir a boolean si es necesario (puede venir como True, 1, o "1")
-        if examenes_solicitados_en_datos is not None:
-            if isinstance(examenes_solicitados_en_datos, bool):
-                debe_crear_examenes = examenes_solicitados_en_datos
-            elif isinstance(examenes_solicitados_en_datos, (int, str)):
-                debe_crear_examenes = bool(int(examenes_solicitados_en_datos))
+        def _actualizar(conn):
+            cursor = conn.cursor()
+            cursor.execute(query, valores)
+        
+            # Obtener la consulta actualizada para obtener los datos necesarios
+            cursor.execute("SELECT * FROM consultas WHERE Codigo = ?", (codigo,))
+            consulta_actualizada = cursor.fetchone()
+            consulta_dict_temp = dict(consulta_actualizada)
+        
+            # Si se marcaron exámenes como solicitados y hay descripción, crear los exámenes
+            # Verificar si Examenes_Solicitados está en los datos y es True (antes de convertir a entero)
+            # O si ya estaba marcado como solicitado en la consulta original
+            examenes_solicitados_en_datos = datos.get("Examenes_Solicitados")
+            examenes_solicitados_original = consulta_dict_temp.get("Examenes_Solicitados")
+        
+            # Convertir a boolean si es necesario (puede venir como True, 1, o "1")
+            if examenes_solicitados_en_datos is not None:
+                if isinstance(examenes_solicitados_en_datos, bool):
+                    debe_crear_examenes = examenes_solicitados_en_datos
+                elif isinstance(examenes_solicitados_en_datos, (int, str)):
+                    debe_crear_examenes = bool(int(examenes_solicitados_en_datos))
+                else:
+                    debe_crear_examenes = False
             else:
-                debe_crear_examenes = False
-        else:
-            # Si no está en los datos, usar el valor original
-            debe_crear_examenes = bool(examenes_solicitados_original) if examenes_solicitados_original else False
-        
-        if debe_crear_examenes:
-            # Obtener la descripción (puede venir en los datos nuevos o estar en la consulta original)
-            descripcion = datos.get("Examenes_Descripcion") or consulta_dict_temp.get("Examenes_Descripcion")
-            codigo_paciente = datos.get("Codigo_Paciente") or consulta_dict_temp.get("Codigo_Paciente")
-            codigo_doctor = datos.get("Codigo_Doctor") or consulta_dict_temp.get("Codigo_Doctor")
-            fecha_consulta_str = datos.get("Fecha_de_Consulta") or consulta_dict_temp.get("Fecha_de_Consulta")
+                # Si no está en los datos, usar el valor original
+                debe_crear_examenes = bool(examenes_solicitados_original) if examenes_solicitados_original else False
+        
+            if debe_crear_examenes:
+                # Obtener la descripción (puede venir en los datos nuevos o estar en la consulta original)
+                descripcion = datos.get("Examenes_Descripcion") or consulta_dict_temp.get("Examenes_Descripcion")
+                codigo_paciente = datos.get("Codigo_Paciente") or consulta_dict_temp.get("Codigo_Paciente")
+                codigo_doctor = datos.get("Codigo_Doctor") or consulta_dict_temp.get("Codigo_Doctor")
+                fecha_consulta_str = datos.get("Fecha_de_Consulta") or consulta_dict_temp.get("Fecha_de_Consulta")
             
-            if descripcion and codigo_paciente and codigo_doctor:
-                try:
-                    # Convertir fecha_consulta_str a datetime si es necesario
-                    fecha_consulta = None
-                    if fecha_consulta_str:
-                        if isinstance(fecha_consulta_str, str):
-                            try:
-                                fecha_consulta = datetime.fromisoformat(fecha_consulta_str.replace('Z', '+00:00'))
-                            except:
+                if descripcion and codigo_paciente and codigo_doctor:
+                    try:
+                        # Convertir fecha_consulta_str a datetime si es necesario
+                        fecha_consulta = None
+                        if fecha_consulta_str:
+                            if isinstance(fecha_consulta_str, str):
                                 try:
-                                    fecha_consulta = datetime.strptime(fecha_consulta_str, "%Y-%m-%dT%H:%M:%S")
+                                    fecha_consulta = datetime.fromisoformat(fecha_consulta_str.replace('Z', '+00:00'))
                                 except:
-                                    fecha_consulta = datetime.now()
-                        elif hasattr(fecha_consulta_str, 'isoformat'):
-                            fecha_consulta = fecha_consulta_str
+                                    try:
+                                        fecha_consulta = datetime.strptime(fecha_consulta_str, "%Y-%m-%dT%H:%M:%S")
+                                    except:
+                                        fecha_consulta = datetime.now()
+                            elif hasattr(fecha_consulta_str, 'isoformat'):
+                                fecha_consulta = fecha_consulta_str
                     
-                    logger.info(f"Creando exámenes para consulta {codigo}. Descripción: {descripcion}")
-                    examenes_creados = crear_examenes_desde_descripcion(
-                        cursor,
-                        codigo,
-                        codigo_paciente,
-                        codigo_doctor,
-                        descripcion,
-                        fecha_consulta
-                    )
-                    if examenes_creados:
-                        logger.info(f"Se crearon {len(examenes_creados)} exámenes para la consulta {codigo}: {examenes_creados}")
-                    else:
-                        logger.warning(f"No se crearon exámenes para la consulta {codigo}. Verificar descripción.")
-                except Exception as e:
-                    logger.error(f"Error al crear exámenes para consulta {codigo}: {e}", exc_info=True)
-                    # No fallar la actualización de la consulta si hay error al crear exámenes
-        
-        db.commit()
+                        logger.info(f"Creando exámenes para consulta {codigo}. Descripción: {descripcion}")
+                        examenes_creados = crear_examenes_desde_descripcion(
+                            cursor,
+                            codigo,
+                            codigo_paciente,
+                            codigo_doctor,
+                            descripcion,
+                            fecha_consulta
+                        )
+                        if examenes_creados:
+                            logger.info(f"Se crearon {len(examenes_creados)} exámenes para la consulta {codigo}: {examenes_creados}")
+                        else:
+                            logger.warning(f"No se crearon exámenes para la consulta {codigo}. Verificar descripción.")
+                    except Exception as e:
+                        logger.error(f"Error al crear exámenes para consulta {codigo}: {e}", exc_info=True)
+                        # No fallar la actualización de la consulta si hay error al crear exámenes
+        
+        
+        # La actualización y los exámenes nuevos se confirman juntos a través del escritor único
+        run_write(_actualizar)
         
         # Obtener la consulta actualizada nuevamente después del commit
         cursor.execute("SELECT * FROM consultas WHERE Codigo = ?", (codigo,))
@@ -548,7 +579,7 @@ async def actualizar_consulta(
 
 
 @router.delete("/{codigo}", status_code=204)
-async def eliminar_consulta(codigo: int, db: Connection = Depends(get_db)):
+def eliminar_consulta(codigo: int, db: Connection = Depends(get_db)):
     """
     Eliminar una consulta
     
@@ -565,8 +596,7 @@ async def eliminar_consulta(codigo: int, db: Connection = Depends(get_db)):
                 detail=f"Consulta con código {codigo} no encontrada"
             )
         
-        cursor.execute("DELETE FROM consultas WHERE Codigo = ?", (codigo,))
-        db.commit()
+        run_write(lambda conn: conn.execute("DELETE FROM consultas WHERE Codigo = ?", (codigo,)).rowcount)
         
         logger.info(f"Consulta {codigo} eliminada exitosamente")
         return None
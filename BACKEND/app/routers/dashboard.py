@@ -0,0 +1,184 @@
+"""
+Router con los datos agregados de la pantalla de inicio
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlite3 import Connection, OperationalError
+from typing import Any, Dict, List, Optional
+from datetime import date
+from app.database import get_db
+from app.models import Dashboard, PuntoSerie
+from app.counters import leer_contadores
+from app.rollups import DESGLOSES, PERIODOS, leer_serie
+from app.serialization import respuesta_modelo
+from app.versions import CacheVersionada, Condicional
+import logging
+
+logger = logging.getLogger(__name__)
+if not logger.handlers:
+    logging.basicConfig(level=logging.INFO)
+
+router = APIRouter()
+
+
+# Tabla que cuenta cada tarjeta de la pantalla de inicio
+TABLAS_DASHBOARD = {
+    "pacientes": "pacientes",
+    "doctores": "doctor",
+    "citas": "citas",
+    "consultas": "consultas",
+    "recetas": "receta",
+    "historial": "historial_medico",
+    "examenes": "examenes",
+    "usuarios": "usuarios_sistema",
+}
+
+
+def _serie(desglose: Dict[str, int], orden_clave: bool = False) -> List[Dict[str, Any]]:
+    """Desglose de un contador como lista de {Clave, Total}"""
+    if orden_clave:
+        filas = sorted(desglose.items())
+    else:
+        filas = sorted(desglose.items(), key=lambda item: (-item[1], item[0]))
+    return [{"Clave": clave, "Total": total} for clave, total in filas if clave and total > 0]
+
+
+def calcular_dashboard(cursor) -> Dict[str, Any]:
+    """Totales y series de las gráficas, leídos de los contadores (app/counters.py)"""
+    contadores = leer_contadores(cursor)
+
+    def desglose(tabla: str, grupo: str) -> Dict[str, int]:
+        return contadores.get(tabla, {}).get(grupo, {})
+
+    return {
+        "Totales": {
+            seccion: desglose(tabla, "").get("", 0) for seccion, tabla in TABLAS_DASHBOARD.items()
+        },
+        "Examenes_Por_Estado": _serie(desglose("examenes", "Estado")),
+        "Citas_Por_Mes": _serie(desglose("citas", "Mes"), orden_clave=True),
+        "Usuarios_Por_Rol": _serie(desglose("usuarios_sistema", "Rol")),
+    }
+
+
+# Se recalcula solo cuando cambia alguna de las tablas contadas
+_cache = CacheVersionada(TABLAS_DASHBOARD.values(), calcular_dashboard)
+
+
+@router.get("/", response_model=Dashboard)
+def obtener_dashboard(
+    db: Connection = Depends(get_db),
+    condicional: Condicional = Depends()
+):
+    """
+    Totales por sección y series de las gráficas de la pantalla de inicio
+
+    - **Examenes_Por_Estado**: exámenes agrupados por estado
+    - **Citas_Por_Mes**: citas agrupadas por mes (AAAA-MM)
+    - **Usuarios_Por_Rol**: usuarios agrupados por rol
+    """
+    try:
+        cursor = db.cursor()
+        no_modificado = condicional.comprobar(cursor, *TABLAS_DASHBOARD.values())
+        if no_modificado:
+            return no_modificado
+
+        return respuesta_modelo(_cache.obtener(cursor), Dashboard, condicional.response.headers)
+
+    except HTTPException:
+        raise
+    except OperationalError as e:
+        logger.error(f"Error de base de datos al calcular el dashboard: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Error al acceder a la base de datos"
+        )
+    except Exception as e:
+        logger.error(f"Error inesperado al calcular el dashboard: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Error interno del servidor"
+        )
+
+
+# Tabla resumida de cada serie (app/rollups.py)
+TABLAS_SERIES = {
+    "citas": "citas",
+    "consultas": "consultas",
+    "examenes": "examenes",
+    "recetas": "receta",
+}
+
+
+@router.get("/series/{serie}", response_model=List[PuntoSerie])
+def obtener_serie(
+    serie: str,
+    desde: Optional[date] = Query(None, description="Primer día incluido (AAAA-MM-DD)"),
+    hasta: Optional[date] = Query(None, description="Último día incluido (AAAA-MM-DD)"),
+    codigo_doctor: Optional[int] = Query(None, description="Filtrar por doctor"),
+    estado: Optional[str] = Query(None, description="Filtrar por estado"),
+    periodo: str = Query("dia", description="Agrupar por 'dia' o por 'mes'"),
+    por: Optional[str] = Query(None, description="Desglosar cada periodo por 'estado' o por 'doctor'"),
+    db: Connection = Depends(get_db),
+    condicional: Condicional = Depends()
+):
+    """
+    Serie temporal de citas, consultas, exámenes o recetas para un rango de fechas
+
+    Se lee de los resúmenes diarios por doctor y estado, sin recorrer la tabla.
+    Los días se toman de Fecha_Hora (citas), Fecha_de_Consulta (consultas),
+    Fecha_Solicitud (exámenes) y Fecha_Receta (recetas). Los periodos sin
+    registros no aparecen en la lista.
+    """
+    tabla = TABLAS_SERIES.get(serie)
+    if tabla is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Serie no encontrada. Opciones: {', '.join(TABLAS_SERIES)}"
+        )
+    if periodo not in PERIODOS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Periodo no válido. Opciones: {', '.join(PERIODOS)}"
+        )
+    if por is not None and por not in DESGLOSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Desglose no válido. Opciones: {', '.join(DESGLOSES)}"
+        )
+    if desde and hasta and desde > hasta:
+        raise HTTPException(
+            status_code=400,
+            detail="La fecha 'desde' no puede ser posterior a 'hasta'"
+        )
+
+    try:
+        cursor = db.cursor()
+        no_modificado = condicional.comprobar(cursor, tabla)
+        if no_modificado:
+            return no_modificado
+
+        puntos = leer_serie(
+            cursor,
+            tabla,
+            desde=desde.isoformat() if desde else None,
+            hasta=hasta.isoformat() if hasta else None,
+            codigo_doctor=codigo_doctor,
+            estado=estado,
+            periodo=periodo,
+            por=por,
+        )
+        return respuesta_modelo(puntos, PuntoSerie, condicional.response.headers)
+
+    except HTTPException:
+        raise
+    except OperationalError as e:
+        logger.error(f"Error de base de datos al obtener la serie {serie}: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Error al acceder a la base de datos"
+        )
+    except Exception as e:
+        logger.error(f"Error inesperado al obtener la serie {serie}: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Error interno del servidor"
+        )
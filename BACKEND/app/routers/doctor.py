@@ -4,7 +4,13 @@ Router para gestión de doctores
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlite3 import Connection, IntegrityError, OperationalError
 from typing import List, Optional
+from app.autocomplete import get_indice
 from app.database import get_db
+from app.fields import Proyeccion
+from app.pagination import Paginacion
+from app.streaming import pide_ndjson, respuesta_ndjson
+from app.versions import Condicional, version_tabla
+from app.writer import run_write
 from app.models import Doctor, DoctorCreate, DoctorUpdate
 from datetime import datetime
 import logging
@@ -17,8 +23,12 @@ router = APIRouter()
 
 
 @router.get("/", response_model=List[Doctor])
-async def listar_doctores(
+def listar_doctores(
     db: Connection = Depends(get_db),
+    paginacion: Paginacion = Depends(),
+    proyeccion: Proyeccion = Depends(),
+    ndjson: bool = Depends(pide_ndjson),
+    condicional: Condicional = Depends(),
     especialidad: Optional[str] = Query(None, description="Filtrar por especialidad"),
     estado: Optional[str] = Query(None, description="Filtrar por estado"),
     nombre: Optional[str] = Query(None, description="Filtrar por nombre"),
@@ -30,11 +40,15 @@ async def listar_doctores(
     - **especialidad**: Filtrar por especialidad
     - **estado**: Filtrar por estado (Activo, Inactivo, Vacaciones)
     - **nombre**: Filtrar por nombre (búsqueda parcial)
+    - **fields**: Columnas a devolver (por ejemplo, Nombre,Apellidos,Especialidad)
+    - **formato=ndjson**: Todos los doctores en streaming, uno por línea
+    - **total=true**: Total en X-Total-Count, solo en la primera página (sin cursor); sin filtros se lee de stats_counters, con filtros recorre todas las filas que los cumplen
     """
     try:
         cursor = db.cursor()
         
-        query = "SELECT * FROM doctor WHERE 1=1"
+        columnas = proyeccion.columnas("doctor")
+        query = f"SELECT {columnas} FROM doctor WHERE 1=1"
         params = []
         
         if especialidad:
@@ -53,13 +67,26 @@ async def listar_doctores(
             query += " AND Numero_Identificacion LIKE ?"
             params.append(f"%{numero_identificacion}%")
         
-        query += " ORDER BY Codigo DESC"
+        no_modificado = condicional.comprobar(cursor, "doctor")
+        if no_modificado:
+            return no_modificado
+        
+        query, params = paginacion.aplicar(cursor, query, params, sin_limite=ndjson, tabla="doctor")
+        if ndjson:
+            return respuesta_ndjson(
+                db, query, params, proyeccion.modelo(Doctor), proyeccion.completar(),
+                paginacion.response.headers
+            )
         
         cursor.execute(query, params)
-        doctores = cursor.fetchall()
+        doctores = paginacion.recortar(cursor.fetchall())
         # Convertir Row objects a diccionarios
-        return [{key: row[key] for key in row.keys()} for row in doctores] if doctores else []
+        return proyeccion.respuesta(
+            [{key: row[key] for key in row.keys()} for row in doctores], Doctor, paginacion.response.headers
+        )
     
+    except HTTPException:
+        raise
     except OperationalError as e:
         logger.error(f"Error de base de datos al listar doctores: {e}")
         raise HTTPException(
@@ -75,11 +102,24 @@ async def listar_doctores(
 
 
 @router.get("/{codigo}", response_model=Doctor)
-async def obtener_doctor(codigo: int, db: Connection = Depends(get_db)):
-    """Obtener un doctor por código"""
+def obtener_doctor(
+    codigo: int,
+    db: Connection = Depends(get_db),
+    proyeccion: Proyeccion = Depends(),
+    condicional: Condicional = Depends()
+):
+    """
+    Obtener un doctor por código
+    
+    - **fields**: Columnas a devolver
+    """
     try:
         cursor = db.cursor()
-        cursor.execute("SELECT * FROM doctor WHERE Codigo = ?", (codigo,))
+        columnas = proyeccion.columnas("doctor")
+        no_modificado = condicional.comprobar(cursor, "doctor")
+        if no_modificado:
+            return no_modificado
+        cursor.execute(f"SELECT {columnas} FROM doctor WHERE Codigo = ?", (codigo,))
         doctor = cursor.fetchone()
         
         if not doctor:
@@ -88,7 +128,7 @@ async def obtener_doctor(codigo: int, db: Connection = Depends(get_db)):
                 detail=f"Doctor con código {codigo} no encontrado"
             )
         
-        return dict(doctor)
+        return proyeccion.respuesta(dict(doctor), Doctor, condicional.response.headers)
     
     except HTTPException:
         raise
@@ -101,7 +141,7 @@ async def obtener_doctor(codigo: int, db: Connection = Depends(get_db)):
 
 
 @router.post("/", response_model=Doctor, status_code=201)
-async def crear_doctor(doctor: DoctorCreate, db: Connection = Depends(get_db)):
+def crear_doctor(doctor: DoctorCreate, db: Connection = Depends(get_db)):
     """
     Crear un nuevo doctor con validaciones
     
@@ -166,16 +206,19 @@ async def crear_doctor(doctor: DoctorCreate, db: Connection = Depends(get_db)):
         placeholders = ", ".join(["?" for _ in valores])
         campos_str = ", ".join(campos)
         
-        cursor.execute(
-            f"INSERT INTO doctor ({campos_str}) VALUES ({placeholders})",
-            valores
+        codigo, version = run_write(
+            lambda conn: (
+                conn.execute(
+                    f"INSERT INTO doctor ({campos_str}) VALUES ({placeholders})",
+                    valores
+                ).lastrowid,
+                version_tabla(conn, "doctor"),
+            )
         )
         
-        codigo = cursor.lastrowid
-        db.commit()
-        
         cursor.execute("SELECT * FROM doctor WHERE Codigo = ?", (codigo,))
         nuevo_doctor = cursor.fetchone()
+        get_indice("doctor").guardar(nuevo_doctor, version)
         
         logger.info(f"Doctor {codigo} creado exitosamente")
         return dict(nuevo_doctor)
@@ -200,7 +243,7 @@ async def crear_doctor(doctor: DoctorCreate, db: Connection = Depends(get_db)):
 
 
 @router.put("/{codigo}", response_model=Doctor)
-async def actualizar_doctor(
+def actualizar_doctor(
     codigo: int,
     doctor: DoctorUpdate,
     db: Connection = Depends(get_db)
@@ -269,14 +312,19 @@ async def actualizar_doctor(
         valores = list(datos.values())
         valores.append(codigo)
         
-        cursor.execute(
-            f"UPDATE doctor SET {', '.join(campos)} WHERE Codigo = ?",
-            valores
+        _, version = run_write(
+            lambda conn: (
+                conn.execute(
+                    f"UPDATE doctor SET {', '.join(campos)} WHERE Codigo = ?",
+                    valores
+                ).rowcount,
+                version_tabla(conn, "doctor"),
+            )
         )
-        db.commit()
         
         cursor.execute("SELECT * FROM doctor WHERE Codigo = ?", (codigo,))
         doctor_actualizado = cursor.fetchone()
+        get_indice("doctor").guardar(doctor_actualizado, version)
         
         logger.info(f"Doctor {codigo} actualizado exitosamente")
         return dict(doctor_actualizado)
@@ -301,7 +349,7 @@ async def actualizar_doctor(
 
 
 @router.delete("/{codigo}", status_code=204)
-async def eliminar_doctor(codigo: int, db: Connection = Depends(get_db)):
+def eliminar_doctor(codigo: int, db: Connection = Depends(get_db)):
     """
     Eliminar un doctor
     
@@ -331,8 +379,13 @@ async def eliminar_doctor(codigo: int, db: Connection = Depends(get_db)):
                 f"Eliminando doctor {codigo} con {citas_count} cita(s) relacionada(s)"
             )
         
-        cursor.execute("DELETE FROM doctor WHERE Codigo = ?", (codigo,))
-        db.commit()
+        _, version = run_write(
+            lambda conn: (
+                conn.execute("DELETE FROM doctor WHERE Codigo = ?", (codigo,)).rowcount,
+                version_tabla(conn, "doctor"),
+            )
+        )
+        get_indice("doctor").eliminar(codigo, version)
         
         logger.info(f"Doctor {codigo} eliminado exitosamente")
         return None
@@ -5,8 +5,16 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlite3 import Connection, IntegrityError, OperationalError
 from typing import List, Optional
 from app.database import get_db
+from app.fields import Expansion, Proyeccion
+from app.pagination import Paginacion
+from app.loaders import cargar_por_clave
+from app.schema import get_schema
+from app.streaming import pide_ndjson, respuesta_ndjson
+from app.versions import Condicional
+from app.writer import run_write
 from app.models import Examen, ExamenCreate, ExamenUpdate
 from datetime import datetime
+from functools import partial
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,9 +24,76 @@ if not logger.handlers:
 router = APIRouter()
 
 
+# Relaciones que se cargan solo con ?include=
+EXPANSIONES_EXAMEN = {
+    "cita": Expansion("Cita_Info", ("Codigo_Cita",), ("citas",)),
+    "consulta": Expansion("Consulta_Info", ("Codigo_Consulta",), ("consultas",)),
+}
+
+COLUMNAS_CITA_INFO = ("Codigo", "Fecha_Hora", "Estado", "Motivo")
+COLUMNAS_CONSULTA_INFO = (
+    "Codigo", "Fecha_de_Consulta", "Estado", "Tipo_de_Consulta", "Diagnostico",
+    "Examenes_Solicitados", "Examenes_Descripcion",
+    "Examenes_Sugeridos", "Examenes_Sugeridos_Descripcion",
+)
+
+
+def completar_examenes(cursor, examenes, cita: bool = False, consulta: bool = False) -> List[dict]:
+    """Convierte las filas de exámenes en diccionarios y, si se piden, agrega su cita y su consulta"""
+    examenes_dicts = [dict(row) for row in examenes]
+    
+    # Información de citas y consultas relacionadas: una consulta por relación
+    citas_info = {}
+    if cita:
+        try:
+            citas_info = cargar_por_clave(
+                cursor, "citas",
+                (examen.get("Codigo_Cita") for examen in examenes_dicts),
+                COLUMNAS_CITA_INFO,
+            )
+        except Exception as e:
+            logger.warning(f"Error al cargar información de citas para exámenes: {e}")
+    
+    consultas_info = {}
+    if consulta:
+        try:
+            consultas_info = cargar_por_clave(
+                cursor, "consultas",
+                (examen.get("Codigo_Consulta") for examen in examenes_dicts),
+                [c for c in COLUMNAS_CONSULTA_INFO if get_schema().tiene_columna("consultas", c)],
+            )
+        except Exception as e:
+            logger.warning(f"Error al cargar información de consultas para exámenes: {e}")
+    
+    # Agregar información de cita y consulta a cada examen
+    resultado = []
+    for examen_dict in examenes_dicts:
+        try:
+            # Asegurar que Estado tenga un valor por defecto si es None
+            if "Estado" in examen_dict and examen_dict["Estado"] is None:
+                examen_dict["Estado"] = "Pendiente"
+            
+            if cita:
+                examen_dict["Cita_Info"] = citas_info.get(examen_dict.get("Codigo_Cita"))
+            
+            if consulta:
+                examen_dict["Consulta_Info"] = consultas_info.get(examen_dict.get("Codigo_Consulta"))
+            
+            resultado.append(examen_dict)
+        except Exception as e:
+            logger.warning(f"Error al procesar examen: {e}")
+            continue
+    
+    return resultado
+
+
 @router.get("/", response_model=List[Examen])
-async def listar_examenes(
+def listar_examenes(
     db: Connection = Depends(get_db),
+    paginacion: Paginacion = Depends(),
+    proyeccion: Proyeccion = Depends(),
+    ndjson: bool = Depends(pide_ndjson),
+    condicional: Condicional = Depends(),
     codigo_paciente: Optional[int] = Query(None, description="Filtrar por paciente"),
     codigo_doctor: Optional[int] = Query(None, description="Filtrar por doctor"),
     codigo_consulta: Optional[int] = Query(None, description="Filtrar por consulta"),
@@ -33,11 +108,18 @@ async def listar_examenes(
     - **codigo_consulta**: Filtrar por consulta
     - **codigo_cita**: Filtrar por cita
     - **estado**: Filtrar por estado (Pendiente, Completado, Cancelado)
+    - **fields**: Columnas a devolver (por ejemplo, Tipo_Examen,Estado)
+    - **include**: Relaciones a agregar: cita, consulta
+    - **formato=ndjson**: Todos los exámenes en streaming, uno por línea
+    - **total=true**: Total en X-Total-Count, solo en la primera página (sin cursor); sin filtros se lee de stats_counters, con filtros recorre todas las filas que los cumplen
     """
     try:
         cursor = db.cursor()
         
-        query = "SELECT * FROM examenes WHERE 1=1"
+        columnas = proyeccion.columnas(
+            "examenes", orden=("Fecha_Solicitud",), expansiones=EXPANSIONES_EXAMEN
+        )
+        query = f"SELECT {columnas} FROM examenes WHERE 1=1"
         params = []
         
         if codigo_paciente:
@@ -60,70 +142,32 @@ async def listar_examenes(
             query += " AND Estado = ?"
             params.append(estado)
         
-        query += " ORDER BY Fecha_Solicitud DESC"
+        no_modificado = condicional.comprobar(cursor, "examenes", *proyeccion.tablas(EXPANSIONES_EXAMEN))
+        if no_modificado:
+            return no_modificado
+        
+        query, params = paginacion.aplicar(cursor, query, params, "Fecha_Solicitud", sin_limite=ndjson, tabla="examenes")
+        completar = partial(
+            completar_examenes,
+            cita=proyeccion.incluye("cita"), consulta=proyeccion.incluye("consulta")
+        )
+        if ndjson:
+            return respuesta_ndjson(
+                db, query, params, proyeccion.modelo(Examen), proyeccion.completar(completar),
+                paginacion.response.headers
+            )
         
         cursor.execute(query, params)
-        examenes = cursor.fetchall()
+        examenes = paginacion.recortar(cursor.fetchall())
         
         # Si no hay exámenes, retornar lista vacía
         if not examenes:
             return []
         
-        # Convertir Row objects a diccionarios y agregar información de cita y consulta
-        resultado = []
-        for row in examenes:
-            try:
-                examen_dict = dict(row)
-                # Asegurar que Estado tenga un valor por defecto si es None
-                if examen_dict.get("Estado") is None:
-                    examen_dict["Estado"] = "Pendiente"
-                
-                # Obtener información de la cita si existe
-                if examen_dict.get("Codigo_Cita"):
-                    try:
-                        cursor.execute("""
-                            SELECT Codigo, Fecha_Hora, Estado, Motivo
-                            FROM citas
-                            WHERE Codigo = ?
-                        """, (examen_dict["Codigo_Cita"],))
-                        cita = cursor.fetchone()
-                        if cita:
-                            examen_dict["Cita_Info"] = {
-                                "Codigo": cita[0],
-                                "Fecha_Hora": cita[1],
-                                "Estado": cita[2],
-                                "Motivo": cita[3]
-                            }
-                    except Exception as e:
-                        logger.warning(f"Error al cargar información de cita para examen {examen_dict.get('Codigo')}: {e}")
-                
-                # Obtener información de la consulta si existe
-                if examen_dict.get("Codigo_Consulta"):
-                    try:
-                        cursor.execute("""
-                            SELECT Codigo, Fecha_de_Consulta, Estado, Tipo_de_Consulta, Diagnostico
-                            FROM consultas
-                            WHERE Codigo = ?
-                        """, (examen_dict["Codigo_Consulta"],))
-                        consulta = cursor.fetchone()
-                        if consulta:
-                            examen_dict["Consulta_Info"] = {
-                                "Codigo": consulta[0],
-                                "Fecha_de_Consulta": consulta[1],
-                                "Estado": consulta[2],
-                                "Tipo_de_Consulta": consulta[3],
-                                "Diagnostico": consulta[4]
-                            }
-                    except Exception as e:
-                        logger.warning(f"Error al cargar información de consulta para examen {examen_dict.get('Codigo')}: {e}")
-                
-                resultado.append(examen_dict)
-            except Exception as e:
-                logger.warning(f"Error al procesar examen: {e}")
-                continue
-        
-        return resultado
+        return proyeccion.respuesta(completar(cursor, examenes), Examen, paginacion.response.headers)
     
+    except HTTPException:
+        raise
     except OperationalError as e:
         logger.error(f"Error de base de datos al listar exámenes: {e}", exc_info=True)
         raise HTTPException(
@@ -139,11 +183,25 @@ async def listar_examenes(
 
 
 @router.get("/{codigo}", response_model=Examen)
-async def obtener_examen(codigo: int, db: Connection = Depends(get_db)):
-    """Obtener un examen por código"""
+def obtener_examen(
+    codigo: int,
+    db: Connection = Depends(get_db),
+    proyeccion: Proyeccion = Depends(),
+    condicional: Condicional = Depends()
+):
+    """
+    Obtener un examen por código
+    
+    - **fields**: Columnas a devolver
+    - **include**: Relaciones a agregar: cita, consulta
+    """
     try:
         cursor = db.cursor()
-        cursor.execute("SELECT * FROM examenes WHERE Codigo = ?", (codigo,))
+        columnas = proyeccion.columnas("examenes", expansiones=EXPANSIONES_EXAMEN)
+        no_modificado = condicional.comprobar(cursor, "examenes", *proyeccion.tablas(EXPANSIONES_EXAMEN))
+        if no_modificado:
+            return no_modificado
+        cursor.execute(f"SELECT {columnas} FROM examenes WHERE Codigo = ?", (codigo,))
         examen = cursor.fetchone()
         
         if not examen:
@@ -152,48 +210,11 @@ async def obtener_examen(codigo: int, db: Connection = Depends(get_db)):
                 detail=f"Examen con código {codigo} no encontrado"
             )
         
-        examen_dict = dict(examen)
-        
-        # Obtener información de la cita si existe
-        if examen_dict.get("Codigo_Cita"):
-            try:
-                cursor.execute("""
-                    SELECT Codigo, Fecha_Hora, Estado, Motivo
-                    FROM citas
-                    WHERE Codigo = ?
-                """, (examen_dict["Codigo_Cita"],))
-                cita = cursor.fetchone()
-                if cita:
-                    examen_dict["Cita_Info"] = {
-                        "Codigo": cita[0],
-                        "Fecha_Hora": cita[1],
-                        "Estado": cita[2],
-                        "Motivo": cita[3]
-                    }
-            except Exception as e:
-                logger.warning(f"Error al cargar información de cita para examen {codigo}: {e}")
-        
-        # Obtener información de la consulta si existe
-        if examen_dict.get("Codigo_Consulta"):
-            try:
-                cursor.execute("""
-                    SELECT Codigo, Fecha_de_Consulta, Estado, Tipo_de_Consulta, Diagnostico
-                    FROM consultas
-                    WHERE Codigo = ?
-                """, (examen_dict["Codigo_Consulta"],))
-                consulta = cursor.fetchone()
-                if consulta:
-                    examen_dict["Consulta_Info"] = {
-                        "Codigo": consulta[0],
-                        "Fecha_de_Consulta": consulta[1],
-                        "Estado": consulta[2],
-                        "Tipo_de_Consulta": consulta[3],
-                        "Diagnostico": consulta[4]
-                    }
-            except Exception as e:
-                logger.warning(f"Error al cargar información de consulta para examen {codigo}: {e}")
-        
-        return examen_dict
+        examen_dict = completar_examenes(
+            cursor, [examen],
+            cita=proyeccion.incluye("cita"), consulta=proyeccion.incluye("consulta")
+        )[0]
+        return proyeccion.respuesta(examen_dict, Examen, condicional.response.headers)
     
     except HTTPException:
         raise
@@ -206,7 +227,7 @@ async def obtener_examen(codigo: int, db: Connection = Depends(get_db)):
 
 
 @router.post("/", response_model=Examen, status_code=201)
-async def crear_examen(examen: ExamenCreate, db: Connection = Depends(get_db)):
+def crear_examen(examen: ExamenCreate, db: Connection = Depends(get_db)):
     """
     Crear un nuevo examen con validaciones
     
@@ -269,14 +290,13 @@ async def crear_examen(examen: ExamenCreate, db: Connection = Depends(get_db)):
         placeholders = ", ".join(["?" for _ in valores])
         campos_str = ", ".join(campos)
         
-        cursor.execute(
-            f"INSERT INTO examenes ({campos_str}) VALUES ({placeholders})",
-            valores
+        codigo = run_write(
+            lambda conn: conn.execute(
+                f"INSERT INTO examenes ({campos_str}) VALUES ({placeholders})",
+                valores
+            ).lastrowid
         )
         
-        codigo = cursor.lastrowid
-        db.commit()
-        
         cursor.execute("SELECT * FROM examenes WHERE Codigo = ?", (codigo,))
         nuevo_examen = cursor.fetchone()
         
@@ -303,7 +323,7 @@ async def crear_examen(examen: ExamenCreate, db: Connection = Depends(get_db)):
 
 
 @router.put("/{codigo}", response_model=Examen)
-async def actualizar_examen(
+def actualizar_examen(
     codigo: int,
     examen: ExamenUpdate,
     db: Connection = Depends(get_db)
@@ -362,11 +382,12 @@ async def actualizar_examen(
         valores = list(datos.values())
         valores.append(codigo)
         
-        cursor.execute(
-            f"UPDATE examenes SET {', '.join(campos)} WHERE Codigo = ?",
-            valores
+        run_write(
+            lambda conn: conn.execute(
+                f"UPDATE examenes SET {', '.join(campos)} WHERE Codigo = ?",
+                valores
+            ).rowcount
         )
-        db.commit()
         
         cursor.execute("SELECT * FROM examenes WHERE Codigo = ?", (codigo,))
         examen_actualizado = cursor.fetchone()
@@ -394,7 +415,7 @@ async def actualizar_examen(
 
 
 @router.delete("/{codigo}", status_code=204)
-async def eliminar_examen(codigo: int, db: Connection = Depends(get_db)):
+def eliminar_examen(codigo: int, db: Connection = Depends(get_db)):
     """
     Eliminar un examen
     
@@ -412,8 +433,7 @@ async def eliminar_examen(codigo: int, db: Connection = Depends(get_db)):
                 detail=f"Examen con código {codigo} no encontrado"
             )
         
-        cursor.execute("DELETE FROM examenes WHERE Codigo = ?", (codigo,))
-        db.commit()
+        run_write(lambda conn: conn.execute("DELETE FROM examenes WHERE Codigo = ?", (codigo,)).rowcount)
         
         logger.info(f"Examen {codigo} eliminado exitosamente")
         return None
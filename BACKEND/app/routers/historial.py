@@ -5,8 +5,16 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlite3 import Connection, IntegrityError, OperationalError
 from typing import List, Optional
 from app.database import get_db
+from app.fields import Expansion, Proyeccion
+from app.pagination import Paginacion
+from app.loaders import cargar_hijos
+from app.schema import get_schema
+from app.streaming import pide_ndjson, respuesta_ndjson
+from app.versions import Condicional
+from app.writer import run_write
 from app.models import Historial, HistorialCreate, HistorialUpdate
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from functools import partial
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,81 +24,124 @@ if not logger.handlers:
 router = APIRouter()
 
 
+# Relaciones que se cargan solo con ?include=
+EXPANSIONES_HISTORIAL = {
+    "examenes": Expansion("Examenes_Solicitados", ("Codigo_Paciente",), ("consultas",)),
+}
+
+
+def completar_historiales(cursor, historiales, examenes: bool = False) -> List[dict]:
+    """Convierte las filas de historial en diccionarios y, si se piden, agrega los exámenes solicitados"""
+    historiales_dicts = [dict(row) for row in historiales]
+    if not examenes:
+        return historiales_dicts
+    
+    # Consultas con exámenes solicitados de todos los pacientes del listado,
+    # en una sola consulta (cada paciente se carga una vez aunque se repita)
+    examenes_por_paciente = {}
+    if get_schema().tiene_columna("consultas", "Examenes_Solicitados"):
+        consultas_por_paciente = cargar_hijos(
+            cursor, "consultas", "Codigo_Paciente",
+            (historial.get("Codigo_Paciente") for historial in historiales_dicts),
+            ("Fecha_de_Consulta", "Examenes_Descripcion"),
+            orden="Fecha_de_Consulta DESC",
+            filtro="Examenes_Solicitados = 1",
+        )
+        for codigo_pac, consultas_paciente in consultas_por_paciente.items():
+            examenes_por_paciente[codigo_pac] = [
+                {
+                    "Fecha_Consulta": consulta.get("Fecha_de_Consulta"),
+                    "Descripcion": consulta.get("Examenes_Descripcion")
+                }
+                for consulta in consultas_paciente
+                if consulta.get("Examenes_Descripcion")
+            ]
+    
+    resultado = []
+    for historial_dict in historiales_dicts:
+        try:
+            # Cada historial recibe su propia lista (no compartir entre filas)
+            historial_dict["Examenes_Solicitados"] = list(
+                examenes_por_paciente.get(historial_dict.get("Codigo_Paciente"), [])
+            )
+            
+            resultado.append(historial_dict)
+        except Exception as e:
+            logger.warning(f"Error al procesar historial: {e}")
+            # Continuar con el siguiente historial en lugar de fallar completamente
+            continue
+    
+    return resultado
+
+
 @router.get("/", response_model=List[Historial])
-async def listar_historiales(
+def listar_historiales(
     db: Connection = Depends(get_db),
-    codigo_paciente: Optional[int] = Query(None, description="Filtrar por paciente")
+    paginacion: Paginacion = Depends(),
+    proyeccion: Proyeccion = Depends(),
+    ndjson: bool = Depends(pide_ndjson),
+    condicional: Condicional = Depends(),
+    codigo_paciente: Optional[int] = Query(None, description="Filtrar por paciente"),
+    desde: Optional[date] = Query(None, description="Primer día incluido (AAAA-MM-DD)"),
+    hasta: Optional[date] = Query(None, description="Último día incluido (AAAA-MM-DD)")
 ):
     """
     Listar todos los historiales médicos con filtros opcionales
     
     - **codigo_paciente**: Filtrar por paciente
+    - **desde** / **hasta**: Rango de días de Fecha_Ingreso, inclusivo
+    - **fields**: Columnas a devolver (por ejemplo, Fecha_Ingreso,Diagnostico)
+    - **include=examenes**: Agregar los exámenes solicitados en las consultas del paciente
+    - **formato=ndjson**: Todos los historiales en streaming, uno por línea
+    - **total=true**: Total en X-Total-Count, solo en la primera página (sin cursor); sin filtros se lee de stats_counters, con filtros recorre todas las filas que los cumplen
     """
     try:
         cursor = db.cursor()
         
-        query = "SELECT * FROM historial_medico WHERE 1=1"
+        columnas = proyeccion.columnas(
+            "historial_medico", "Codigo_Historial",
+            orden=("Fecha_Ingreso",), expansiones=EXPANSIONES_HISTORIAL
+        )
+        query = f"SELECT {columnas} FROM historial_medico WHERE 1=1"
         params = []
         
         if codigo_paciente:
             query += " AND Codigo_Paciente = ?"
             params.append(codigo_paciente)
         
-        query += " ORDER BY Fecha_Ingreso DESC"
+        if desde:
+            query += " AND Fecha_Ingreso >= ?"
+            params.append(desde.isoformat())
+        
+        if hasta:
+            query += " AND Fecha_Ingreso < ?"
+            params.append((hasta + timedelta(days=1)).isoformat())
+        
+        no_modificado = condicional.comprobar(cursor, "historial_medico", *proyeccion.tablas(EXPANSIONES_HISTORIAL))
+        if no_modificado:
+            return no_modificado
+        
+        query, params = paginacion.aplicar(
+            cursor, query, params, "Fecha_Ingreso", "Codigo_Historial", sin_limite=ndjson, tabla="historial_medico"
+        )
+        completar = partial(completar_historiales, examenes=proyeccion.incluye("examenes"))
+        if ndjson:
+            return respuesta_ndjson(
+                db, query, params, proyeccion.modelo(Historial), proyeccion.completar(completar),
+                paginacion.response.headers
+            )
         
         cursor.execute(query, params)
-        historiales = cursor.fetchall()
+        historiales = paginacion.recortar(cursor.fetchall())
         
         # Si no hay historiales, retornar lista vacía
         if not historiales:
             return []
         
-        # Verificar si existen las columnas de exámenes (una sola vez antes del loop)
-        cursor.execute("PRAGMA table_info(consultas)")
-        columnas_info = cursor.fetchall()
-        columnas_disponibles = [col[1] for col in columnas_info]
-        tiene_examenes_solicitados = "Examenes_Solicitados" in columnas_disponibles
-        
-        # Obtener consultas con exámenes solicitados para cada paciente
-        resultado = []
-        for row in historiales:
-            try:
-                historial_dict = dict(row)
-                codigo_pac = historial_dict.get("Codigo_Paciente")
-                
-                # Obtener consultas con exámenes solicitados para este paciente
-                if codigo_pac and tiene_examenes_solicitados:
-                    cursor.execute("""
-                        SELECT Codigo, Fecha_de_Consulta, Examenes_Descripcion, Examenes_Solicitados
-                        FROM consultas
-                        WHERE Codigo_Paciente = ? 
-                        AND Examenes_Solicitados = 1
-                        ORDER BY Fecha_de_Consulta DESC
-                    """, (codigo_pac,))
-                    consultas_examenes = cursor.fetchall()
-                    
-                    # Agregar información de exámenes solicitados al historial
-                    examenes_solicitados = []
-                    for consulta in consultas_examenes:
-                        consulta_dict = dict(consulta)
-                        if consulta_dict.get("Examenes_Descripcion"):
-                            examenes_solicitados.append({
-                                "Fecha_Consulta": consulta_dict.get("Fecha_de_Consulta"),
-                                "Descripcion": consulta_dict.get("Examenes_Descripcion")
-                            })
-                    
-                    historial_dict["Examenes_Solicitados"] = examenes_solicitados
-                else:
-                    historial_dict["Examenes_Solicitados"] = []
-                
-                resultado.append(historial_dict)
-            except Exception as e:
-                logger.warning(f"Error al procesar historial: {e}")
-                # Continuar con el siguiente historial en lugar de fallar completamente
-                continue
-        
-        return resultado
+        return proyeccion.respuesta(completar(cursor, historiales), Historial, paginacion.response.headers)
     
+    except HTTPException:
+        raise
     except OperationalError as e:
         logger.error(f"Error de base de datos al listar historiales: {e}", exc_info=True)
         raise HTTPException(
@@ -106,11 +157,27 @@ async def listar_historiales(
 
 
 @router.get("/paciente/{codigo_paciente}", response_model=List[Historial])
-async def obtener_historial_paciente(codigo_paciente: int, db: Connection = Depends(get_db)):
-    """Obtener historial médico completo de un paciente"""
+def obtener_historial_paciente(
+    codigo_paciente: int,
+    db: Connection = Depends(get_db),
+    proyeccion: Proyeccion = Depends(),
+    condicional: Condicional = Depends()
+):
+    """
+    Obtener historial médico completo de un paciente
+    
+    - **fields**: Columnas a devolver
+    - **include=examenes**: Agregar los exámenes solicitados en las consultas del paciente
+    """
     try:
         cursor = db.cursor()
         
+        no_modificado = condicional.comprobar(
+            cursor, "historial_medico", "pacientes", *proyeccion.tablas(EXPANSIONES_HISTORIAL)
+        )
+        if no_modificado:
+            return no_modificado
+        
         # Verificar que el paciente existe
         cursor.execute("SELECT Codigo FROM pacientes WHERE Codigo = ?", (codigo_paciente,))
         if not cursor.fetchone():
@@ -119,12 +186,16 @@ async def obtener_historial_paciente(codigo_paciente: int, db: Connection = Depe
                 detail=f"Paciente con código {codigo_paciente} no encontrado"
             )
         
+        columnas = proyeccion.columnas("historial_medico", "Codigo_Historial", expansiones=EXPANSIONES_HISTORIAL)
         cursor.execute(
-            "SELECT * FROM historial_medico WHERE Codigo_Paciente = ? ORDER BY Fecha_Ingreso DESC",
+            f"SELECT {columnas} FROM historial_medico WHERE Codigo_Paciente = ? ORDER BY Fecha_Ingreso DESC",
             (codigo_paciente,)
         )
         historiales = cursor.fetchall()
-        return [dict(row) for row in historiales] if historiales else []
+        return proyeccion.respuesta(
+            completar_historiales(cursor, historiales, examenes=proyeccion.incluye("examenes")),
+            Historial, condicional.response.headers
+        )
     
     except HTTPException:
         raise
@@ -137,11 +208,25 @@ async def obtener_historial_paciente(codigo_paciente: int, db: Connection = Depe
 
 
 @router.get("/{codigo}", response_model=Historial)
-async def obtener_historial(codigo: int, db: Connection = Depends(get_db)):
-    """Obtener un historial médico por código"""
+def obtener_historial(
+    codigo: int,
+    db: Connection = Depends(get_db),
+    proyeccion: Proyeccion = Depends(),
+    condicional: Condicional = Depends()
+):
+    """
+    Obtener un historial médico por código
+    
+    - **fields**: Columnas a devolver
+    - **include=examenes**: Agregar los exámenes solicitados en las consultas del paciente
+    """
     try:
         cursor = db.cursor()
-        cursor.execute("SELECT * FROM historial_medico WHERE Codigo_Historial = ?", (codigo,))
+        columnas = proyeccion.columnas("historial_medico", "Codigo_Historial", expansiones=EXPANSIONES_HISTORIAL)
+        no_modificado = condicional.comprobar(cursor, "historial_medico", *proyeccion.tablas(EXPANSIONES_HISTORIAL))
+        if no_modificado:
+            return no_modificado
+        cursor.execute(f"SELECT {columnas} FROM historial_medico WHERE Codigo_Historial = ?", (codigo,))
         historial = cursor.fetchone()
         
         if not historial:
@@ -150,7 +235,8 @@ async def obtener_historial(codigo: int, db: Connection = Depends(get_db)):
                 detail=f"Historial con código {codigo} no encontrado"
             )
         
-        return dict(historial)
+        historial_dict = completar_historiales(cursor, [historial], examenes=proyeccion.incluye("examenes"))[0]
+        return proyeccion.respuesta(historial_dict, Historial, condicional.response.headers)
     
     except HTTPException:
         raise
@@ -163,7 +249,7 @@ async def obtener_historial(codigo: int, db: Connection = Depends(get_db)):
 
 
 @router.post("/", response_model=Historial, status_code=201)
-async def crear_historial(historial: HistorialCreate, db: Connection = Depends(get_db)):
+def crear_historial(historial: HistorialCreate, db: Connection = Depends(get_db)):
     """
     Crear un nuevo historial médico con validaciones
     
@@ -196,14 +282,13 @@ async def crear_historial(historial: HistorialCreate, db: Connection = Depends(g
         placeholders = ", ".join(["?" for _ in valores])
         campos_str = ", ".join(campos)
         
-        cursor.execute(
-            f"INSERT INTO historial_medico ({campos_str}) VALUES ({placeholders})",
-            valores
+        codigo = run_write(
+            lambda conn: conn.execute(
+                f"INSERT INTO historial_medico ({campos_str}) VALUES ({placeholders})",
+                valores
+            ).lastrowid
         )
         
-        codigo = cursor.lastrowid
-        db.commit()
-        
         cursor.execute("SELECT * FROM historial_medico WHERE Codigo_Historial = ?", (codigo,))
         nuevo_historial = cursor.fetchone()
         
@@ -230,7 +315,7 @@ async def crear_historial(historial: HistorialCreate, db: Connection = Depends(g
 
 
 @router.put("/{codigo}", response_model=Historial)
-async def actualizar_historial(
+def actualizar_historial(
     codigo: int,
     historial: HistorialUpdate,
     db: Connection = Depends(get_db)
@@ -277,11 +362,12 @@ async def actualizar_historial(
         valores = list(datos.values())
         valores.append(codigo)
         
-        cursor.execute(
-            f"UPDATE historial_medico SET {', '.join(campos)} WHERE Codigo_Historial = ?",
-            valores
+        run_write(
+            lambda conn: conn.execute(
+                f"UPDATE historial_medico SET {', '.join(campos)} WHERE Codigo_Historial = ?",
+                valores
+            ).rowcount
         )
-        db.commit()
         
         cursor.execute("SELECT * FROM historial_medico WHERE Codigo_Historial = ?", (codigo,))
         historial_actualizado = cursor.fetchone()
@@ -309,7 +395,7 @@ async def actualizar_historial(
 
 
 @router.delete("/{codigo}", status_code=204)
-async def eliminar_historial(codigo: int, db: Connection = Depends(get_db)):
+def eliminar_historial(codigo: int, db: Connection = Depends(get_db)):
     """
     Eliminar un historial médico
     
@@ -327,8 +413,7 @@ async def eliminar_historial(codigo: int, db: Connection = Depends(get_db)):
                 detail=f"Historial con código {codigo} no encontrado"
             )
         
-        cursor.execute("DELETE FROM historial_medico WHERE Codigo_Historial = ?", (codigo,))
-        db.commit()
+        run_write(lambda conn: conn.execute("DELETE FROM historial_medico WHERE Codigo_Historial = ?", (codigo,)).rowcount)
         
         logger.info(f"Historial {codigo} eliminado exitosamente")
         return None
@@ -4,7 +4,15 @@ Router para gestión de pacientes
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlite3 import Connection, IntegrityError, OperationalError
 from typing import List, Optional
+from app.autocomplete import get_indice
 from app.database import get_db
+from app.fields import Proyeccion
+from app.pagination import Paginacion
+from app.schema import get_schema
+from app.search import buscar, tabla_fts
+from app.streaming import pide_ndjson, respuesta_ndjson
+from app.versions import Condicional, version_tabla
+from app.writer import run_write
 from app.models import Paciente, PacienteCreate, PacienteUpdate
 from datetime import datetime
 import logging
@@ -83,9 +91,18 @@ def row_to_dict(row) -> dict:
     return result
 
 
+def completar_pacientes(cursor, pacientes) -> List[dict]:
+    """Convierte un lote de filas de pacientes (usado por el streaming NDJSON)"""
+    return [row_to_dict(row) for row in pacientes]
+
+
 @router.get("/", response_model=List[Paciente])
-async def listar_pacientes(
+def listar_pacientes(
     db: Connection = Depends(get_db),
+    paginacion: Paginacion = Depends(),
+    proyeccion: Proyeccion = Depends(),
+    ndjson: bool = Depends(pide_ndjson),
+    condicional: Condicional = Depends(),
     nombre: Optional[str] = Query(None, description="Filtrar por nombre"),
     apellidos: Optional[str] = Query(None, description="Filtrar por apellidos"),
     numero_identificacion: Optional[str] = Query(None, description="Filtrar por número de identificación")
@@ -95,11 +112,15 @@ async def listar_pacientes(
     
     - **nombre**: Filtrar por nombre (búsqueda parcial)
     - **apellidos**: Filtrar por apellidos (búsqueda parcial)
+    - **fields**: Columnas a devolver (por ejemplo, Nombre,Apellidos)
+    - **formato=ndjson**: Todos los pacientes en streaming, uno por línea
+    - **total=true**: Total en X-Total-Count, solo en la primera página (sin cursor); sin filtros se lee de stats_counters, con filtros recorre todas las filas que los cumplen
     """
     try:
         cursor = db.cursor()
         
-        query = "SELECT * FROM pacientes WHERE 1=1"
+        columnas = proyeccion.columnas("pacientes")
+        query = f"SELECT {columnas} FROM pacientes WHERE 1=1"
         params = []
         
         if nombre:
@@ -114,12 +135,23 @@ async def listar_pacientes(
             query += " AND Numero_Identificacion LIKE ?"
             params.append(f"%{numero_identificacion}%")
         
-        query += " ORDER BY Codigo DESC"
+        no_modificado = condicional.comprobar(cursor, "pacientes")
+        if no_modificado:
+            return no_modificado
+        
+        query, params = paginacion.aplicar(cursor, query, params, sin_limite=ndjson, tabla="pacientes")
+        if ndjson:
+            return respuesta_ndjson(
+                db, query, params, proyeccion.modelo(Paciente), proyeccion.completar(completar_pacientes),
+                paginacion.response.headers
+            )
         
         cursor.execute(query, params)
-        pacientes = cursor.fetchall()
-        return [row_to_dict(row) for row in pacientes] if pacientes else []
+        pacientes = paginacion.recortar(cursor.fetchall())
+        return proyeccion.respuesta(completar_pacientes(cursor, pacientes), Paciente, paginacion.response.headers)
     
+    except HTTPException:
+        raise
     except OperationalError as e:
         logger.error(f"Error de base de datos al listar pacientes: {e}")
         raise HTTPException(
@@ -134,12 +166,80 @@ async def listar_pacientes(
         )
 
 
+@router.get("/buscar", response_model=List[Paciente])
+def buscar_pacientes(
+    q: str = Query(..., min_length=1, description="Texto a buscar en nombre, apellidos o identificación"),
+    limit: int = Query(20, ge=1, le=100, description="Máximo de resultados"),
+    db: Connection = Depends(get_db),
+    proyeccion: Proyeccion = Depends(),
+    condicional: Condicional = Depends()
+):
+    """
+    Buscar pacientes por nombre, apellidos o número de identificación
+
+    Cada palabra se busca como prefijo, sin distinguir mayúsculas ni acentos
+    ("jose per" encuentra a "José Pérez"). Los resultados se ordenan por
+    relevancia.
+
+    - **q**: Texto a buscar
+    - **limit**: Máximo de resultados (por defecto 20)
+    - **fields**: Columnas a devolver
+    """
+    try:
+        cursor = db.cursor()
+        columnas = proyeccion.columnas("pacientes")
+        no_modificado = condicional.comprobar(cursor, "pacientes")
+        if no_modificado:
+            return no_modificado
+
+        codigos = buscar(cursor, "pacientes", q, limit, get_schema().tiene_tabla(tabla_fts("pacientes")))
+        pacientes = []
+        if codigos:
+            marcadores = ", ".join("?" for _ in codigos)
+            cursor.execute(f"SELECT {columnas} FROM pacientes WHERE Codigo IN ({marcadores})", codigos)
+            por_codigo = {fila["Codigo"]: fila for fila in cursor.fetchall()}
+            # Mismo orden que la búsqueda (por relevancia)
+            pacientes = [por_codigo[codigo] for codigo in codigos if codigo in por_codigo]
+
+        return proyeccion.respuesta(
+            completar_pacientes(cursor, pacientes), Paciente, condicional.response.headers
+        )
+
+    except HTTPException:
+        raise
+    except OperationalError as e:
+        logger.error(f"Error de base de datos al buscar pacientes: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error al acceder a la base de datos"
+        )
+    except Exception as e:
+        logger.error(f"Error inesperado al buscar pacientes: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error interno del servidor"
+        )
+
+
 @router.get("/{codigo}", response_model=Paciente)
-async def obtener_paciente(codigo: int, db: Connection = Depends(get_db)):
-    """Obtener un paciente por código"""
+def obtener_paciente(
+    codigo: int,
+    db: Connection = Depends(get_db),
+    proyeccion: Proyeccion = Depends(),
+    condicional: Condicional = Depends()
+):
+    """
+    Obtener un paciente por código
+    
+    - **fields**: Columnas a devolver
+    """
     try:
         cursor = db.cursor()
-        cursor.execute("SELECT * FROM pacientes WHERE Codigo = ?", (codigo,))
+        columnas = proyeccion.columnas("pacientes")
+        no_modificado = condicional.comprobar(cursor, "pacientes")
+        if no_modificado:
+            return no_modificado
+        cursor.execute(f"SELECT {columnas} FROM pacientes WHERE Codigo = ?", (codigo,))
         paciente = cursor.fetchone()
         
         if not paciente:
@@ -148,7 +248,7 @@ async def obtener_paciente(codigo: int, db: Connection = Depends(get_db)):
                 detail=f"Paciente con código {codigo} no encontrado"
             )
         
-        return row_to_dict(paciente)
+        return proyeccion.respuesta(row_to_dict(paciente), Paciente, condicional.response.headers)
     
     except HTTPException:
         raise
@@ -161,7 +261,7 @@ async def obtener_paciente(codigo: int, db: Connection = Depends(get_db)):
 
 
 @router.post("/", response_model=Paciente, status_code=201)
-async def crear_paciente(paciente: PacienteCreate, db: Connection = Depends(get_db)):
+def crear_paciente(paciente: PacienteCreate, db: Connection = Depends(get_db)):
     """
     Crear un nuevo paciente con validaciones
     
@@ -216,16 +316,19 @@ async def crear_paciente(paciente: PacienteCreate, db: Connection = Depends(get_
         placeholders = ", ".join(["?" for _ in valores])
         campos_str = ", ".join(campos)
         
-        cursor.execute(
-            f"INSERT INTO pacientes ({campos_str}) VALUES ({placeholders})",
-            valores
+        codigo, version = run_write(
+            lambda conn: (
+                conn.execute(
+                    f"INSERT INTO pacientes ({campos_str}) VALUES ({placeholders})",
+                    valores
+                ).lastrowid,
+                version_tabla(conn, "pacientes"),
+            )
         )
         
-        codigo = cursor.lastrowid
-        db.commit()
-        
         cursor.execute("SELECT * FROM pacientes WHERE Codigo = ?", (codigo,))
         nuevo_paciente = cursor.fetchone()
+        get_indice("pacientes").guardar(nuevo_paciente, version)
         
         logger.info(f"Paciente {codigo} creado exitosamente")
         return row_to_dict(nuevo_paciente)
@@ -250,7 +353,7 @@ async def crear_paciente(paciente: PacienteCreate, db: Connection = Depends(get_
 
 
 @router.put("/{codigo}", response_model=Paciente)
-async def actualizar_paciente(
+def actualizar_paciente(
     codigo: int,
     paciente: PacienteUpdate,
     db: Connection = Depends(get_db)
@@ -308,14 +411,19 @@ async def actualizar_paciente(
         valores = list(datos.values())
         valores.append(codigo)
         
-        cursor.execute(
-            f"UPDATE pacientes SET {', '.join(campos)} WHERE Codigo = ?",
-            valores
+        _, version = run_write(
+            lambda conn: (
+                conn.execute(
+                    f"UPDATE pacientes SET {', '.join(campos)} WHERE Codigo = ?",
+                    valores
+                ).rowcount,
+                version_tabla(conn, "pacientes"),
+            )
         )
-        db.commit()
         
         cursor.execute("SELECT * FROM pacientes WHERE Codigo = ?", (codigo,))
         paciente_actualizado = cursor.fetchone()
+        get_indice("pacientes").guardar(paciente_actualizado, version)
         
         logger.info(f"Paciente {codigo} actualizado exitosamente")
         return row_to_dict(paciente_actualizado)
@@ -340,7 +448,7 @@ async def actualizar_paciente(
 
 
 @router.delete("/{codigo}", status_code=204)
-async def eliminar_paciente(codigo: int, db: Connection = Depends(get_db)):
+def eliminar_paciente(codigo: int, db: Connection = Depends(get_db)):
     """
     Eliminar un paciente
     
@@ -370,8 +478,13 @@ async def eliminar_paciente(codigo: int, db: Connection = Depends(get_db)):
                 f"Eliminando paciente {codigo} con {consultas_count} consulta(s) relacionada(s)"
             )
         
-        cursor.execute("DELETE FROM pacientes WHERE Codigo = ?", (codigo,))
-        db.commit()
+        _, version = run_write(
+            lambda conn: (
+                conn.execute("DELETE FROM pacientes WHERE Codigo = ?", (codigo,)).rowcount,
+                version_tabla(conn, "pacientes"),
+            )
+        )
+        get_indice("pacientes").eliminar(codigo, version)
         
         logger.info(f"Paciente {codigo} eliminado exitosamente")
         return None
@@ -5,8 +5,15 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlite3 import Connection, IntegrityError, OperationalError
 from typing import List, Optional
 from app.database import get_db
+from app.fields import Proyeccion
+from app.pagination import Paginacion
+from app.schema import get_schema
+from app.serialization import RespuestaJSON
+from app.streaming import pide_ndjson, respuesta_ndjson
+from app.versions import Condicional
+from app.writer import run_write
 from app.models import Receta, RecetaCreate, RecetaUpdate
-from datetime import datetime
+from datetime import date, datetime, timedelta
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,21 +24,34 @@ router = APIRouter()
 
 
 @router.get("/", response_model=List[Receta])
-async def listar_recetas(
+def listar_recetas(
     db: Connection = Depends(get_db),
+    paginacion: Paginacion = Depends(),
+    proyeccion: Proyeccion = Depends(),
+    ndjson: bool = Depends(pide_ndjson),
+    condicional: Condicional = Depends(),
     codigo_paciente: Optional[int] = Query(None, description="Filtrar por paciente"),
-    codigo_doctor: Optional[int] = Query(None, description="Filtrar por doctor")
+    codigo_doctor: Optional[int] = Query(None, description="Filtrar por doctor"),
+    codigo_consulta: Optional[int] = Query(None, description="Filtrar por consulta"),
+    desde: Optional[date] = Query(None, description="Primer día incluido (AAAA-MM-DD)"),
+    hasta: Optional[date] = Query(None, description="Último día incluido (AAAA-MM-DD)")
 ):
     """
     Listar todas las recetas con filtros opcionales
     
     - **codigo_paciente**: Filtrar por paciente
     - **codigo_doctor**: Filtrar por doctor
+    - **codigo_consulta**: Filtrar por consulta
+    - **desde** / **hasta**: Rango de días de Fecha_Receta, inclusivo
+    - **fields**: Columnas a devolver (por ejemplo, Medicamento,Fecha_Receta)
+    - **formato=ndjson**: Todas las recetas en streaming, una por línea
+    - **total=true**: Total en X-Total-Count, solo en la primera página (sin cursor); sin filtros se lee de stats_counters, con filtros recorre todas las filas que los cumplen
     """
     try:
         cursor = db.cursor()
         
-        query = "SELECT * FROM receta WHERE 1=1"
+        columnas = proyeccion.columnas("receta", orden=("Fecha_Receta",))
+        query = f"SELECT {columnas} FROM receta WHERE 1=1"
         params = []
         
         if codigo_paciente:
@@ -42,12 +62,35 @@ async def listar_recetas(
             query += " AND Codigo_Doctor = ?"
             params.append(codigo_doctor)
         
-        query += " ORDER BY Fecha_Receta DESC"
+        if codigo_consulta:
+            query += " AND Codigo_Consulta = ?"
+            params.append(codigo_consulta)
+        
+        if desde:
+            query += " AND Fecha_Receta >= ?"
+            params.append(desde.isoformat())
+        
+        if hasta:
+            query += " AND Fecha_Receta < ?"
+            params.append((hasta + timedelta(days=1)).isoformat())
+        
+        no_modificado = condicional.comprobar(cursor, "receta")
+        if no_modificado:
+            return no_modificado
+        
+        query, params = paginacion.aplicar(cursor, query, params, "Fecha_Receta", nulos=True, sin_limite=ndjson, tabla="receta")
+        if ndjson:
+            return respuesta_ndjson(
+                db, query, params, proyeccion.modelo(Receta), proyeccion.completar(),
+                paginacion.response.headers
+            )
         
         cursor.execute(query, params)
-        recetas = cursor.fetchall()
-        return [dict(row) for row in recetas] if recetas else []
+        recetas = paginacion.recortar(cursor.fetchall())
+        return proyeccion.respuesta([dict(row) for row in recetas], Receta, paginacion.response.headers)
     
+    except HTTPException:
+        raise
     except OperationalError as e:
         logger.error(f"Error de base de datos al listar recetas: {e}")
         raise HTTPException(
@@ -63,9 +106,14 @@ async def listar_recetas(
 
 
 @router.get("/completas", response_model=List[dict])
-async def listar_recetas_completas(
+def listar_recetas_completas(
     db: Connection = Depends(get_db),
-    codigo_doctor: Optional[int] = Query(None, description="Filtrar por doctor")
+    paginacion: Paginacion = Depends(),
+    condicional: Condicional = Depends(),
+    codigo_paciente: Optional[int] = Query(None, description="Filtrar por paciente"),
+    codigo_doctor: Optional[int] = Query(None, description="Filtrar por doctor"),
+    desde: Optional[date] = Query(None, description="Primer día incluido (AAAA-MM-DD)"),
+    hasta: Optional[date] = Query(None, description="Último día incluido (AAAA-MM-DD)")
 ):
     """
     Listar todas las recetas con información completa de las tablas relacionadas
@@ -76,23 +124,29 @@ async def listar_recetas_completas(
     - Doctor (Nombre, Apellidos, Especialidad, etc.)
     - Consulta (si está asociada)
     
+    - **codigo_paciente**: Filtrar por paciente (opcional)
     - **codigo_doctor**: Filtrar por doctor (opcional)
+    - **desde** / **hasta**: Rango de días de Fecha_Receta, inclusivo (opcional)
+    - **total=true**: Total en X-Total-Count, solo en la primera página (sin cursor); sin filtros se lee de stats_counters, con filtros recorre todas las filas que los cumplen
     """
     try:
         cursor = db.cursor()
         
         # Verificar que la tabla existe
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='receta'")
-        if not cursor.fetchone():
+        esquema = get_schema()
+        if not esquema.tiene_tabla("receta"):
             logger.error("La tabla 'receta' no existe en la base de datos")
             raise HTTPException(
                 status_code=500,
                 detail="La tabla de recetas no existe en la base de datos"
             )
         
+        no_modificado = condicional.comprobar(cursor, "receta", "pacientes", "doctor", "consultas")
+        if no_modificado:
+            return no_modificado
+        
         # Verificar qué columnas de exámenes existen en consultas
-        cursor.execute("PRAGMA table_info(consultas)")
-        columnas_consulta = [col[1] for col in cursor.fetchall()]
+        columnas_consulta = esquema.columnas("consultas")
         
         # Construir SELECT dinámicamente según las columnas disponibles
         campos_examenes = []
@@ -145,18 +199,30 @@ async def listar_recetas_completas(
         
         params = []
         
+        if codigo_paciente:
+            query += " AND r.Codigo_Paciente = ?"
+            params.append(codigo_paciente)
+        
         if codigo_doctor:
             query += " AND r.Codigo_Doctor = ?"
             params.append(codigo_doctor)
         
-        query += " ORDER BY r.Fecha_Receta DESC"
+        if desde:
+            query += " AND r.Fecha_Receta >= ?"
+            params.append(desde.isoformat())
+        
+        if hasta:
+            query += " AND r.Fecha_Receta < ?"
+            params.append((hasta + timedelta(days=1)).isoformat())
+        
+        query, params = paginacion.aplicar(cursor, query, params, "r.Fecha_Receta", "r.Codigo", nulos=True, tabla="receta")
         
         logger.info(f"Ejecutando query: {query}")
         logger.info(f"Parámetros: {params}")
         
         try:
             cursor.execute(query, params)
-            rows = cursor.fetchall()
+            rows = paginacion.recortar(cursor.fetchall())
         except Exception as query_error:
             logger.error(f"Error al ejecutar query: {query_error}", exc_info=True)
             raise HTTPException(
@@ -238,8 +304,10 @@ async def listar_recetas_completas(
                 continue
         
         logger.info(f"Recetas procesadas exitosamente: {len(recetas_completas)}")
-        return recetas_completas
+        return RespuestaJSON(content=recetas_completas, headers=paginacion.response.headers)
     
+    except HTTPException:
+        raise
     except OperationalError as e:
         logger.error(f"Error de base de datos al listar recetas completas: {e}", exc_info=True)
         raise HTTPException(
@@ -255,11 +323,24 @@ async def listar_recetas_completas(
 
 
 @router.get("/{codigo}", response_model=Receta)
-async def obtener_receta(codigo: int, db: Connection = Depends(get_db)):
-    """Obtener una receta por código"""
+def obtener_receta(
+    codigo: int,
+    db: Connection = Depends(get_db),
+    proyeccion: Proyeccion = Depends(),
+    condicional: Condicional = Depends()
+):
+    """
+    Obtener una receta por código
+    
+    - **fields**: Columnas a devolver
+    """
     try:
         cursor = db.cursor()
-        cursor.execute("SELECT * FROM receta WHERE Codigo = ?", (codigo,))
+        columnas = proyeccion.columnas("receta")
+        no_modificado = condicional.comprobar(cursor, "receta")
+        if no_modificado:
+            return no_modificado
+        cursor.execute(f"SELECT {columnas} FROM receta WHERE Codigo = ?", (codigo,))
         receta = cursor.fetchone()
         
         if not receta:
@@ -268,7 +349,7 @@ async def obtener_receta(codigo: int, db: Connection = Depends(get_db)):
                 detail=f"Receta con código {codigo} no encontrada"
             )
         
-        return dict(receta)
+        return proyeccion.respuesta(dict(receta), Receta, condicional.response.headers)
     
     except HTTPException:
         raise
@@ -281,7 +362,7 @@ async def obtener_receta(codigo: int, db: Connection = Depends(get_db)):
 
 
 @router.post("/", response_model=Receta, status_code=201)
-async def crear_receta(receta: RecetaCreate, db: Connection = Depends(get_db)):
+def crear_receta(receta: RecetaCreate, db: Connection = Depends(get_db)):
     """
     Crear una nueva receta con validaciones
     
@@ -383,9 +464,11 @@ async def crear_receta(receta: RecetaCreate, db: Connection = Depends(get_db)):
         logger.info(f"Valores: {valores}")
         
         try:
-            cursor.execute(
-                f"INSERT INTO receta ({campos_str}) VALUES ({placeholders})",
-                valores
+            codigo = run_write(
+                lambda conn: conn.execute(
+                    f"INSERT INTO receta ({campos_str}) VALUES ({placeholders})",
+                    valores
+                ).lastrowid
             )
         except Exception as insert_error:
             logger.error(f"Error al ejecutar INSERT: {insert_error}", exc_info=True)
@@ -393,9 +476,6 @@ async def crear_receta(receta: RecetaCreate, db: Connection = Depends(get_db)):
             logger.error(f"Valores: {valores}")
             raise
         
-        codigo = cursor.lastrowid
-        db.commit()
-        
         cursor.execute("SELECT * FROM receta WHERE Codigo = ?", (codigo,))
         nueva_receta = cursor.fetchone()
         
@@ -435,7 +515,7 @@ async def crear_receta(receta: RecetaCreate, db: Connection = Depends(get_db)):
 
 
 @router.put("/{codigo}", response_model=Receta)
-async def actualizar_receta(
+def actualizar_receta(
     codigo: int,
     receta: RecetaUpdate,
     db: Connection = Depends(get_db)
@@ -498,11 +578,12 @@ async def actualizar_receta(
         valores = list(datos.values())
         valores.append(codigo)
         
-        cursor.execute(
-            f"UPDATE receta SET {', '.join(campos)} WHERE Codigo = ?",
-            valores
+        run_write(
+            lambda conn: conn.execute(
+                f"UPDATE receta SET {', '.join(campos)} WHERE Codigo = ?",
+                valores
+            ).rowcount
         )
-        db.commit()
         
         cursor.execute("SELECT * FROM receta WHERE Codigo = ?", (codigo,))
         receta_actualizada = cursor.fetchone()
@@ -530,7 +611,7 @@ async def actualizar_receta(
 
 
 @router.delete("/{codigo}", status_code=204)
-async def eliminar_receta(codigo: int, db: Connection = Depends(get_db)):
+def eliminar_receta(codigo: int, db: Connection = Depends(get_db)):
     """
     Eliminar una receta
     
@@ -548,8 +629,7 @@ async def eliminar_receta(codigo: int, db: Connection = Depends(get_db)):
                 detail=f"Receta con código {codigo} no encontrada"
             )
         
-        cursor.execute("DELETE FROM receta WHERE Codigo = ?", (codigo,))
-        db.commit()
+        run_write(lambda conn: conn.execute("DELETE FROM receta WHERE Codigo = ?", (codigo,)).rowcount)
         
         logger.info(f"Receta {codigo} eliminada exitosamente")
         return None
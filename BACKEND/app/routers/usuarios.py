@@ -6,6 +6,11 @@ from fastapi.responses import FileResponse
 from sqlite3 import Connection, IntegrityError, OperationalError
 from typing import List, Optional, Dict, Any
 from app.database import get_db, DATABASE_URL
+from app.migrations import asegurar_tabla
+from app.pagination import Paginacion
+from app.serialization import respuesta_modelo
+from app.versions import Condicional
+from app.writer import run_write
 from app.models import UsuarioSistema, UsuarioSistemaCreate, UsuarioSistemaUpdate
 from datetime import datetime
 import logging
@@ -31,33 +36,16 @@ def row_to_dict(row) -> Dict[str, Any]:
     return result
 
 
-def verificar_tabla_usuarios(cursor):
+def verificar_tabla_usuarios():
     """Verifica si la tabla usuarios_sistema existe, si no, la crea"""
-    cursor.execute("""
-        SELECT name FROM sqlite_master 
-        WHERE type='table' AND name='usuarios_sistema'
-    """)
-    if not cursor.fetchone():
-        logger.warning("La tabla usuarios_sistema no existe. Creándola...")
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS usuarios_sistema (
-                Codigo INTEGER PRIMARY KEY AUTOINCREMENT,
-                Usuario TEXT NOT NULL UNIQUE,
-                Contrasena TEXT NOT NULL,
-                Codigo_Doctor INTEGER,
-                Rol TEXT DEFAULT 'Recepcionista',
-                Activo INTEGER DEFAULT 1,
-                Ultimo_Acceso DATETIME,
-                Fecha_Creacion DATETIME,
-                Fecha_Modificacion DATETIME,
-                FOREIGN KEY (Codigo_Doctor) REFERENCES doctor(Codigo)
-            )
-        """)
+    asegurar_tabla("usuarios_sistema")
 
 
 @router.get("/", response_model=List[UsuarioSistema])
-async def listar_usuarios(
+def listar_usuarios(
     db: Connection = Depends(get_db),
+    paginacion: Paginacion = Depends(),
+    condicional: Condicional = Depends(),
     rol: Optional[str] = Query(None, description="Filtrar por rol"),
     activo: Optional[bool] = Query(None, description="Filtrar por estado activo")
 ):
@@ -66,13 +54,13 @@ async def listar_usuarios(
     
     - **rol**: Filtrar por rol (Admin, Doctor, Recepcionista, etc.)
     - **activo**: Filtrar por estado activo (true/false)
+    - **total=true**: Total en X-Total-Count, solo en la primera página (sin cursor); sin filtros se lee de stats_counters, con filtros recorre todas las filas que los cumplen
     """
     try:
         cursor = db.cursor()
         
         # Verificar y crear tabla si no existe
-        verificar_tabla_usuarios(cursor)
-        db.commit()
+        verificar_tabla_usuarios()
         
         query = "SELECT * FROM usuarios_sistema WHERE 1=1"
         params = []
@@ -85,12 +73,22 @@ async def listar_usuarios(
             query += " AND Activo = ?"
             params.append(1 if activo else 0)
         
-        query += " ORDER BY Codigo DESC"
+        no_modificado = condicional.comprobar(cursor, "usuarios_sistema")
+        if no_modificado:
+            return no_modificado
+        
+        query, params = paginacion.aplicar(cursor, query, params, tabla="usuarios_sistema")
         
         cursor.execute(query, params)
-        usuarios = cursor.fetchall()
-        return [row_to_dict(row) for row in usuarios] if usuarios else []
+        usuarios = paginacion.recortar(cursor.fetchall())
+        if not usuarios:
+            return []
+        return respuesta_modelo(
+            [row_to_dict(row) for row in usuarios], UsuarioSistema, paginacion.response.headers
+        )
     
+    except HTTPException:
+        raise
     except OperationalError as e:
         logger.error(f"Error de base de datos al listar usuarios: {e}", exc_info=True)
         raise HTTPException(
@@ -106,14 +104,13 @@ async def listar_usuarios(
 
 
 @router.get("/{codigo}", response_model=UsuarioSistema)
-async def obtener_usuario(codigo: int, db: Connection = Depends(get_db)):
+def obtener_usuario(codigo: int, db: Connection = Depends(get_db)):
     """Obtener un usuario por código"""
     try:
         cursor = db.cursor()
         
         # Verificar y crear tabla si no existe
-        verificar_tabla_usuarios(cursor)
-        db.commit()
+        verificar_tabla_usuarios()
         
         cursor.execute("SELECT * FROM usuarios_sistema WHERE Codigo = ?", (codigo,))
         usuario = cursor.fetchone()
@@ -137,7 +134,7 @@ async def obtener_usuario(codigo: int, db: Connection = Depends(get_db)):
 
 
 @router.post("/", response_model=UsuarioSistema, status_code=201)
-async def crear_usuario(usuario: UsuarioSistemaCreate, db: Connection = Depends(get_db)):
+def crear_usuario(usuario: UsuarioSistemaCreate, db: Connection = Depends(get_db)):
     """
     Crear un nuevo usuario del sistema con validaciones
     
@@ -150,8 +147,7 @@ async def crear_usuario(usuario: UsuarioSistemaCreate, db: Connection = Depends(
     
     try:
         # Verificar y crear tabla si no existe
-        verificar_tabla_usuarios(cursor)
-        db.commit()
+        verificar_tabla_usuarios()
         
         # Validar que el nombre de usuario no existe
         cursor.execute("SELECT Codigo FROM usuarios_sistema WHERE Usuario = ?", (usuario.Usuario,))
@@ -200,14 +196,13 @@ async def crear_usuario(usuario: UsuarioSistemaCreate, db: Connection = Depends(
         placeholders = ", ".join(["?" for _ in valores])
         campos_str = ", ".join(campos)
         
-        cursor.execute(
-            f"INSERT INTO usuarios_sistema ({campos_str}) VALUES ({placeholders})",
-            valores
+        codigo = run_write(
+            lambda conn: conn.execute(
+                f"INSERT INTO usuarios_sistema ({campos_str}) VALUES ({placeholders})",
+                valores
+            ).lastrowid
         )
         
-        codigo = cursor.lastrowid
-        db.commit()
-        
         cursor.execute("SELECT * FROM usuarios_sistema WHERE Codigo = ?", (codigo,))
         nuevo_usuario = cursor.fetchone()
         
@@ -240,7 +235,7 @@ async def crear_usuario(usuario: UsuarioSistemaCreate, db: Connection = Depends(
 
 
 @router.put("/{codigo}", response_model=UsuarioSistema)
-async def actualizar_usuario(
+def actualizar_usuario(
     codigo: int,
     usuario: UsuarioSistemaUpdate,
     db: Connection = Depends(get_db)
@@ -254,8 +249,7 @@ async def actualizar_usuario(
     
     try:
         # Verificar y crear tabla si no existe
-        verificar_tabla_usuarios(cursor)
-        db.commit()
+        verificar_tabla_usuarios()
         
         # Verificar que existe
         cursor.execute("SELECT * FROM usuarios_sistema WHERE Codigo = ?", (codigo,))
@@ -312,11 +306,12 @@ async def actualizar_usuario(
         valores = list(datos.values())
         valores.append(codigo)
         
-        cursor.execute(
-            f"UPDATE usuarios_sistema SET {', '.join(campos)} WHERE Codigo = ?",
-            valores
+        run_write(
+            lambda conn: conn.execute(
+                f"UPDATE usuarios_sistema SET {', '.join(campos)} WHERE Codigo = ?",
+                valores
+            ).rowcount
         )
-        db.commit()
         
         cursor.execute("SELECT * FROM usuarios_sistema WHERE Codigo = ?", (codigo,))
         usuario_actualizado = cursor.fetchone()
@@ -350,7 +345,7 @@ async def actualizar_usuario(
 
 
 @router.delete("/{codigo}", status_code=204)
-async def eliminar_usuario(codigo: int, db: Connection = Depends(get_db)):
+def eliminar_usuario(codigo: int, db: Connection = Depends(get_db)):
     """
     Eliminar un usuario del sistema
     
@@ -361,8 +356,7 @@ async def eliminar_usuario(codigo: int, db: Connection = Depends(get_db)):
     
     try:
         # Verificar y crear tabla si no existe
-        verificar_tabla_usuarios(cursor)
-        db.commit()
+        verificar_tabla_usuarios()
         
         # Verificar que existe
         cursor.execute("SELECT Codigo FROM usuarios_sistema WHERE Codigo = ?", (codigo,))
@@ -372,8 +366,7 @@ async def eliminar_usuario(codigo: int, db: Connection = Depends(get_db)):
                 detail=f"Usuario con código {codigo} no encontrado"
             )
         
-        cursor.execute("DELETE FROM usuarios_sistema WHERE Codigo = ?", (codigo,))
-        db.commit()
+        run_write(lambda conn: conn.execute("DELETE FROM usuarios_sistema WHERE Codigo = ?", (codigo,)).rowcount)
         
         logger.info(f"Usuario {codigo} eliminado exitosamente")
         return None
@@ -398,7 +391,7 @@ async def eliminar_usuario(codigo: int, db: Connection = Depends(get_db)):
 
 
 @router.post("/backup")
-async def crear_backup():
+def crear_backup():
     """
     Crear una copia de seguridad de la base de datos
     
@@ -467,7 +460,7 @@ async def crear_backup():
 
 
 @router.get("/backup/download/{filename}")
-async def descargar_backup(filename: str):
+def descargar_backup(filename: str):
     """
     Descargar un archivo de backup específico
     
@@ -517,7 +510,7 @@ async def descargar_backup(filename: str):
 
 
 @router.get("/backup/list")
-async def listar_backups():
+def listar_backups():
     """
     Listar todos los archivos de backup disponibles
     """
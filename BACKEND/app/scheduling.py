@@ -0,0 +1,300 @@
+"""
+Disponibilidad de los doctores: citas que ocupan un horario y huecos libres
+
+Una cita activa (estado fuera de ESTADOS_INACTIVOS) ocupa a su doctor desde
+Fecha_Hora durante AGENDA_DURACION_CITA minutos. Una cita nueva de `duracion`
+minutos que empieza en `inicio` choca con las que empiezan en el intervalo
+abierto (inicio - AGENDA_DURACION_CITA, inicio + duracion): esa es la comprobación
+de `verificar_disponibilidad_doctor` y la que usa el buscador de huecos, de modo
+que todo hueco sugerido se puede reservar.
+
+`Ocupacion` guarda, por doctor, los inicios ordenados de sus citas activas en
+un rango: `choca` es una búsqueda binaria, `ocupar` agrega una cita aceptada y
+`liberar` quita una que se mueve, de modo que un lote de citas nuevas se comprueba contra las existentes y entre
+sí sin una consulta por cita.
+
+`reasignar_citas` reparte las citas de un doctor que se ausenta entre los
+huecos de otros doctores con un algoritmo voraz sobre la misma `Ocupacion`.
+
+`expandir_serie` calcula las fechas de una serie de citas recurrentes (diaria,
+semanal o mensual) a partir de su regla, sin consultar la base de datos.
+
+`buscar_huecos` recorre una sola vez, en orden, las citas de cada doctor en el
+rango pedido (un recorrido del índice parcial idx_citas_activas) y devuelve los
+huecos dentro del horario de atención (AGENDA_HORA_INICIO a AGENDA_HORA_FIN),
+alineados a AGENDA_INTERVALO minutos. Con varios doctores, los huecos se mezclan
+por hora de inicio, así que el primero de la lista es el primero disponible.
+"""
+import bisect
+import calendar
+import heapq
+import os
+from datetime import date, datetime, time, timedelta
+from itertools import groupby, islice
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Minutos que ocupa cada cita (la tabla no guarda la duración)
+AGENDA_DURACION_CITA = int(os.getenv("AGENDA_DURACION_CITA", "30"))
+
+# Horario de atención (HH:MM) y separación entre los inicios de los huecos
+AGENDA_HORA_INICIO = time.fromisoformat(os.getenv("AGENDA_HORA_INICIO", "08:00"))
+AGENDA_HORA_FIN = time.fromisoformat(os.getenv("AGENDA_HORA_FIN", "18:00"))
+AGENDA_INTERVALO = int(os.getenv("AGENDA_INTERVALO", "15"))
+
+# Días que puede abarcar una búsqueda de huecos
+AGENDA_MAX_DIAS = int(os.getenv("AGENDA_MAX_DIAS", "31"))
+
+# Máximo de citas de una creación en lote o de una serie
+AGENDA_MAX_LOTE = int(os.getenv("AGENDA_MAX_LOTE", "1000"))
+
+# Frecuencias de las series de citas
+FRECUENCIAS_SERIE: Tuple[str, ...] = ("diaria", "semanal", "mensual")
+
+# Citas que no ocupan el horario del doctor. Los índices parciales de citas
+# activas (app/indices.py) se crean con esta lista: si cambia, hay que recrearlos
+ESTADOS_INACTIVOS: Tuple[str, ...] = ("Cancelada", "Completada", "No asistió")
+
+
+def convertir_fecha(valor: Any) -> Optional[datetime]:
+    """Fecha_Hora guardada (texto ISO 8601) como datetime sin zona horaria"""
+    if valor is None or isinstance(valor, datetime):
+        fecha = valor
+    else:
+        try:
+            fecha = datetime.fromisoformat(str(valor).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if fecha is not None and fecha.tzinfo is not None:
+        fecha = fecha.replace(tzinfo=None)
+    return fecha
+
+
+def rango_conflicto(inicio: datetime, duracion: int = AGENDA_DURACION_CITA) -> Tuple[str, str]:
+    """
+    Límites exclusivos de Fecha_Hora de las citas que chocan con una cita de
+    `duracion` minutos que empieza en `inicio`
+    """
+    desde = inicio - timedelta(minutes=AGENDA_DURACION_CITA)
+    hasta = inicio + timedelta(minutes=duracion)
+    return desde.isoformat(), hasta.isoformat()
+
+
+def condicion_activa() -> str:
+    """Condición SQL de las citas que ocupan el horario"""
+    return f"Estado NOT IN ({', '.join(repr(estado) for estado in ESTADOS_INACTIVOS)})"
+
+
+def _sumar_meses(fecha: datetime, meses: int) -> datetime:
+    """`fecha` `meses` después; el día se ajusta al último del mes si no existe (31 -> 30)"""
+    indice = fecha.month - 1 + meses
+    anio, mes = fecha.year + indice // 12, indice % 12 + 1
+    return fecha.replace(year=anio, month=mes, day=min(fecha.day, calendar.monthrange(anio, mes)[1]))
+
+
+def expandir_serie(
+    inicio: datetime,
+    frecuencia: str,
+    intervalo: int = 1,
+    repeticiones: Optional[int] = None,
+    fecha_fin: Optional[date] = None,
+    limite: int = AGENDA_MAX_LOTE,
+) -> List[datetime]:
+    """
+    Fechas de las citas de una serie: desde `inicio`, cada `intervalo` días,
+    semanas o meses, hasta completar `repeticiones` o pasar `fecha_fin`
+    (inclusive), lo que ocurra antes.
+
+    Cada fecha se calcula desde `inicio` y no desde la anterior, así una serie
+    mensual del 31 cae el 28 (o 29) de febrero y vuelve al 31 en marzo. Devuelve
+    como máximo `limite` + 1 fechas, para que quien llama detecte el exceso.
+    """
+    fechas: List[datetime] = []
+    numero = 0
+    while len(fechas) <= limite and (repeticiones is None or numero < repeticiones):
+        if frecuencia == "mensual":
+            fecha = _sumar_meses(inicio, numero * intervalo)
+        else:
+            dias = intervalo * (7 if frecuencia == "semanal" else 1)
+            fecha = inicio + timedelta(days=numero * dias)
+        if fecha_fin is not None and fecha.date() > fecha_fin:
+            break
+        fechas.append(fecha)
+        numero += 1
+    return fechas
+
+
+def _segundos(momento: datetime) -> int:
+    """Momento como segundos desde el día 1 del calendario (aritmética entera)"""
+    return momento.toordinal() * 86400 + momento.hour * 3600 + momento.minute * 60 + momento.second
+
+
+def _momento(segundos: int) -> datetime:
+    dia, resto = divmod(segundos, 86400)
+    return datetime.fromordinal(dia) + timedelta(seconds=resto)
+
+
+def _huecos_doctor(
+    codigo_doctor: int,
+    ocupadas: Sequence[int],
+    desde: int,
+    hasta: int,
+    duracion: int,
+) -> Iterator[Tuple[int, int, int]]:
+    """
+    Huecos libres de un doctor entre `desde` y `hasta`, en orden, como tuplas
+    (inicio, doctor, fin). `ocupadas` son los inicios de sus citas, ordenados;
+    todos los momentos en segundos (`_segundos`).
+    """
+    largo = duracion * 60
+    ocupacion = AGENDA_DURACION_CITA * 60
+    paso = AGENDA_INTERVALO * 60
+    apertura_dia = AGENDA_HORA_INICIO.hour * 3600 + AGENDA_HORA_INICIO.minute * 60
+    cierre_dia = AGENDA_HORA_FIN.hour * 3600 + AGENDA_HORA_FIN.minute * 60
+    # Las citas que terminan antes de `desde` no afectan a ningún hueco
+    siguiente = bisect.bisect_right(ocupadas, desde - ocupacion)
+    dia = desde - desde % 86400
+    while dia <= hasta:
+        apertura = dia + apertura_dia
+        cierre = min(dia + cierre_dia, hasta)
+        # Primer inicio alineado a AGENDA_INTERVALO desde la apertura
+        inicio = apertura + max(0, -(-(desde - apertura) // paso)) * paso
+        while inicio + largo <= cierre:
+            # Citas que terminan antes del inicio del hueco ya no importan
+            while siguiente < len(ocupadas) and ocupadas[siguiente] + ocupacion <= inicio:
+                siguiente += 1
+            if siguiente < len(ocupadas) and ocupadas[siguiente] < inicio + largo:
+                # El hueco choca con la cita: se continúa cuando termina
+                fin_cita = ocupadas[siguiente] + ocupacion
+                inicio = apertura + -(-(fin_cita - apertura) // paso) * paso
+                continue
+            yield inicio, codigo_doctor, inicio + largo
+            inicio += largo
+        dia += 86400
+
+
+class Ocupacion:
+    """Inicios (en segundos) de las citas activas de cada doctor, ordenados"""
+
+    def __init__(self):
+        self._inicios: Dict[int, List[int]] = {}
+
+    @classmethod
+    def cargar(cls, db_cursor, doctores: Sequence[int], desde: datetime, hasta: datetime) -> "Ocupacion":
+        """Citas activas de los `doctores` que ocupan algún momento entre `desde` y `hasta`"""
+        ocupacion = cls()
+        if not doctores:
+            return ocupacion
+        # Las citas que empiezan poco antes de `desde` pueden ocupar su comienzo
+        limite_inferior, _ = rango_conflicto(desde, 0)
+        marcadores = ", ".join("?" for _ in doctores)
+        db_cursor.execute(
+            f"SELECT Codigo_Doctor, Fecha_Hora FROM citas "
+            f"WHERE Codigo_Doctor IN ({marcadores}) AND Fecha_Hora > ? AND Fecha_Hora < ? "
+            f"AND {condicion_activa()} ORDER BY Codigo_Doctor, Fecha_Hora",
+            [*doctores, limite_inferior, hasta.isoformat()],
+        )
+        for codigo, filas in groupby(db_cursor.fetchall(), key=lambda fila: fila[0]):
+            fechas = (convertir_fecha(fila[1]) for fila in filas)
+            # Con zonas horarias distintas el orden del texto puede no ser el real
+            ocupacion._inicios[codigo] = sorted(_segundos(fecha) for fecha in fechas if fecha is not None)
+        return ocupacion
+
+    def inicios(self, codigo_doctor: int) -> List[int]:
+        return self._inicios.get(codigo_doctor, [])
+
+    def choca(self, codigo_doctor: int, inicio: datetime, duracion: int = AGENDA_DURACION_CITA) -> bool:
+        """Si una cita de `duracion` minutos en `inicio` choca con alguna (ver `rango_conflicto`)"""
+        inicios = self.inicios(codigo_doctor)
+        segundos = _segundos(inicio)
+        posicion = bisect.bisect_right(inicios, segundos - AGENDA_DURACION_CITA * 60)
+        return posicion < len(inicios) and inicios[posicion] < segundos + duracion * 60
+
+    def ocupar(self, codigo_doctor: int, inicio: datetime) -> None:
+        bisect.insort(self._inicios.setdefault(codigo_doctor, []), _segundos(inicio))
+
+    def liberar(self, codigo_doctor: int, inicio: datetime) -> None:
+        """Quita una cita que se mueve o cambia de doctor (si estaba cargada)"""
+        inicios = self.inicios(codigo_doctor)
+        segundos = _segundos(inicio)
+        posicion = bisect.bisect_left(inicios, segundos)
+        if posicion < len(inicios) and inicios[posicion] == segundos:
+            del inicios[posicion]
+
+
+def buscar_huecos(
+    db_cursor,
+    doctores: Sequence[int],
+    desde: datetime,
+    hasta: datetime,
+    duracion: int = AGENDA_DURACION_CITA,
+    limite: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Huecos libres de `duracion` minutos de los `doctores` entre `desde` y
+    `hasta`, ordenados por inicio (y doctor), como {Codigo_Doctor, Inicio, Fin}
+    """
+    if not doctores or desde >= hasta:
+        return []
+    ocupacion = Ocupacion.cargar(db_cursor, doctores, desde, hasta)
+
+    # Los huecos de cada doctor ya salen en orden: se mezclan sin ordenar todo
+    mezclados = heapq.merge(*(
+        _huecos_doctor(codigo, ocupacion.inicios(codigo), _segundos(desde), _segundos(hasta), duracion)
+        for codigo in doctores
+    ))
+    return [
+        {"Codigo_Doctor": codigo, "Inicio": _momento(inicio), "Fin": _momento(fin)}
+        for inicio, codigo, fin in islice(mezclados, limite)
+    ]
+
+
+def reasignar_citas(
+    ocupacion: Ocupacion,
+    citas: Sequence[Tuple[int, datetime]],
+    candidatos: Dict[int, datetime],
+    hasta: datetime,
+) -> Dict[int, Tuple[int, datetime]]:
+    """
+    Nuevo doctor y horario de las `citas` ((codigo, inicio), ordenadas por
+    inicio) entre los `candidatos` ({doctor: desde cuándo puede atenderlas}),
+    sin pasar de `hasta`.
+
+    Algoritmo voraz: cada cita se queda a la misma hora con el candidato libre
+    que menos citas lleva recibidas; si ninguno está libre, va al primer hueco
+    posterior de cualquiera de ellos. Cada asignación ocupa su horario en
+    `ocupacion`, así que las siguientes la respetan. Las citas sin hueco no
+    aparecen en el resultado.
+    """
+    recibidas = {doctor: 0 for doctor in candidatos}
+    # La agenda solo se llena y las citas llegan en orden: un hueco buscado
+    # antes no puede aparecer después, así que cada búsqueda sigue donde terminó
+    # la anterior en lugar de recorrer otra vez la agenda desde la cita
+    busqueda = {doctor: _segundos(disponible) for doctor, disponible in candidatos.items()}
+    plan: Dict[int, Tuple[int, datetime]] = {}
+    for codigo, inicio in citas:
+        libres = [
+            doctor for doctor, disponible in candidatos.items()
+            if disponible <= inicio and not ocupacion.choca(doctor, inicio)
+        ]
+        if libres:
+            doctor = min(libres, key=lambda candidato: (recibidas[candidato], candidato))
+            nuevo = inicio
+        else:
+            primero = next(heapq.merge(*(
+                _huecos_doctor(
+                    candidato, ocupacion.inicios(candidato),
+                    max(_segundos(inicio), busqueda[candidato]), _segundos(hasta), AGENDA_DURACION_CITA,
+                )
+                for candidato in candidatos
+            )), None)
+            if primero is None:
+                # Tampoco habrá hueco para las citas siguientes
+                break
+            segundos, doctor, _ = primero
+            for candidato in busqueda:
+                busqueda[candidato] = max(busqueda[candidato], segundos)
+            nuevo = _momento(segundos)
+        ocupacion.ocupar(doctor, nuevo)
+        recibidas[doctor] += 1
+        plan[codigo] = (doctor, nuevo)
+    return plan
@@ -0,0 +1,77 @@
+"""
+Registro en memoria del esquema de la base de datos
+
+Guarda qué tablas existen y qué columnas tiene cada una. Se carga una vez al
+iniciar la aplicación (al terminar las migraciones) y solo se vuelve a cargar
+cuando se aplica una migración, de modo que los routers pueden consultar el
+esquema sin ejecutar `sqlite_master` ni `PRAGMA table_info` en cada petición.
+"""
+import logging
+import sqlite3
+import threading
+from typing import Dict, FrozenSet
+
+from app.database import get_pool
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaRegistry:
+    """Tablas y columnas de la base de datos, compartidas por todo el proceso"""
+
+    def __init__(self):
+        self._tablas: Dict[str, FrozenSet[str]] = {}
+        self._cargado = False
+        self._lock = threading.Lock()
+
+    @property
+    def cargado(self) -> bool:
+        return self._cargado
+
+    def cargar(self, conn: sqlite3.Connection) -> None:
+        """Lee el catálogo de la base de datos y reemplaza el registro completo"""
+        nombres = [
+            fila[0] for fila in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+            ).fetchall()
+        ]
+        tablas = {
+            nombre: frozenset(fila[1] for fila in conn.execute(f"PRAGMA table_info({nombre})").fetchall())
+            for nombre in nombres
+        }
+        with self._lock:
+            # Reemplazo atómico: los lectores ven el esquema anterior o el nuevo
+            self._tablas = tablas
+            self._cargado = True
+        logger.info(f"Esquema cargado: {len(tablas)} tablas")
+
+    def tiene_tabla(self, tabla: str) -> bool:
+        return tabla in self._tablas
+
+    def columnas(self, tabla: str) -> FrozenSet[str]:
+        return self._tablas.get(tabla, frozenset())
+
+    def tiene_columna(self, tabla: str, columna: str) -> bool:
+        return columna in self.columnas(tabla)
+
+
+_registro = SchemaRegistry()
+
+
+def get_schema() -> SchemaRegistry:
+    """
+    Retorna el registro global del esquema.
+
+    Si aún no se cargó (por ejemplo, en scripts que no pasan por el lifespan)
+    se carga bajo demanda con una conexión del pool.
+    """
+    if not _registro.cargado:
+        with get_pool().connection() as conn:
+            _registro.cargar(conn)
+    return _registro
+
+
+def refrescar_esquema(conn: sqlite3.Connection) -> SchemaRegistry:
+    """Vuelve a cargar el registro (se llama al terminar las migraciones)"""
+    _registro.cargar(conn)
+    return _registro
@@ -0,0 +1,183 @@
+"""
+Búsqueda de texto completo con FTS5 (tabla virtual `<tabla>_fts`)
+
+Un filtro `LIKE '%texto%'` no puede usar índices: recorre la tabla completa en
+cada búsqueda y no encuentra "Jose" si se guardó "José". Para las tablas de
+BUSQUEDAS se crea una tabla FTS5 de contenido externo (los datos siguen solo en
+la tabla original; el índice guarda los términos) con el tokenizador `unicode61`
+sin diacríticos, de modo que las mayúsculas y los acentos no importan. Los
+triggers AFTER INSERT/UPDATE/DELETE la mantienen sincronizada en la misma
+transacción que modifica la tabla.
+
+Cada palabra buscada es un prefijo ("jos per" encuentra a "José Pérez"). Para
+ordenar por relevancia no se usa `ORDER BY rank`: bm25 recorre todas las filas
+que coinciden (decenas de miles para un nombre común en un millón de pacientes).
+Se leen como máximo BUSQUEDA_CANDIDATOS filas, primero las que contienen las
+palabras completas y luego las que solo las contienen como prefijo, y se ordenan
+en Python: más palabras exactas primero y, a igualdad, el texto más corto (como
+la normalización por longitud de bm25).
+
+Si SQLite se compiló sin FTS5, no se crea el índice y `buscar` recurre a LIKE.
+"""
+import logging
+import os
+import re
+import sqlite3
+import unicodedata
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Columnas indexadas de cada tabla con búsqueda de texto completo
+BUSQUEDAS: Dict[str, Tuple[str, ...]] = {
+    "pacientes": ("Nombre", "Apellidos", "Numero_Identificacion"),
+}
+
+# Filas coincidentes que se leen y ordenan por relevancia en cada búsqueda
+BUSQUEDA_CANDIDATOS = int(os.getenv("BUSQUEDA_CANDIDATOS", "200"))
+
+# Sin diacríticos: "jose" coincide con "José"; prefijos de 1 a 3 caracteres
+# indexados para que las búsquedas mientras se escribe no recorran el índice
+_OPCIONES_FTS = "tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3'"
+
+# Palabras de la búsqueda, con la misma separación que el tokenizador unicode61
+_PALABRA = re.compile(r"\w+", re.UNICODE)
+
+
+def tabla_fts(tabla: str) -> str:
+    return f"{tabla}_fts"
+
+
+def _existe(conn: sqlite3.Connection, tabla: str) -> bool:
+    fila = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla,)
+    ).fetchone()
+    return fila is not None
+
+
+def crear_triggers(conn: sqlite3.Connection, tabla: str) -> None:
+    """Crea (si faltan) los triggers que mantienen sincronizado el índice de `tabla`"""
+    fts = tabla_fts(tabla)
+    columnas = BUSQUEDAS[tabla]
+    lista = ", ".join(columnas)
+    nuevos = ", ".join(f"NEW.{columna}" for columna in columnas)
+    anteriores = ", ".join(f"OLD.{columna}" for columna in columnas)
+    # En una tabla de contenido externo, para quitar una fila del índice hay que
+    # indicar los valores que se indexaron (el comando 'delete')
+    agregar = f"INSERT INTO {fts} (rowid, {lista}) VALUES (NEW.Codigo, {nuevos});"
+    quitar = f"INSERT INTO {fts} ({fts}, rowid, {lista}) VALUES ('delete', OLD.Codigo, {anteriores});"
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS busqueda_{tabla}_insert
+        AFTER INSERT ON {tabla}
+        BEGIN
+            {agregar}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS busqueda_{tabla}_delete
+        AFTER DELETE ON {tabla}
+        BEGIN
+            {quitar}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS busqueda_{tabla}_update
+        AFTER UPDATE OF Codigo, {lista} ON {tabla}
+        BEGIN
+            {quitar}
+            {agregar}
+        END
+    """)
+
+
+def crear_busqueda(conn: sqlite3.Connection, tabla: Optional[str] = None) -> None:
+    """
+    Crea el índice de texto completo y los triggers que falten de `tabla` (o de
+    todas las tablas de BUSQUEDAS que existan) y lo reconstruye desde la tabla.
+    Se usa en los mismos puntos que `crear_contadores`.
+    """
+    for nombre in (tabla,) if tabla else BUSQUEDAS:
+        if nombre not in BUSQUEDAS or not _existe(conn, nombre):
+            continue
+        fts = tabla_fts(nombre)
+        try:
+            conn.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                    {', '.join(BUSQUEDAS[nombre])},
+                    content = '{nombre}', content_rowid = 'Codigo', {_OPCIONES_FTS}
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            # SQLite sin FTS5: la búsqueda usa LIKE
+            logger.warning(f"No se pudo crear el índice de búsqueda {fts}: {e}")
+            return
+        crear_triggers(conn, nombre)
+        conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+
+def palabras(texto: Optional[str]) -> List[str]:
+    """Palabras de `texto` en minúsculas y sin diacríticos, como las indexa FTS5"""
+    if not texto:
+        return []
+    texto = str(texto)
+    if texto.isascii():
+        # Sin acentos que quitar (la mayoría de los documentos y muchos nombres)
+        return _PALABRA.findall(texto.lower())
+    descompuesto = unicodedata.normalize("NFKD", texto)
+    sin_marcas = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return _PALABRA.findall(sin_marcas.casefold())
+
+
+def expresion_fts(texto: str, prefijos: bool = True) -> Optional[str]:
+    """
+    Convierte el texto del usuario en una consulta MATCH: deben aparecer todas
+    las palabras, como prefijo o completas. Retorna None si no hay palabras.
+    """
+    buscadas = _PALABRA.findall(texto)
+    if not buscadas:
+        return None
+    sufijo = "*" if prefijos else ""
+    return " ".join(f'"{palabra}"{sufijo}' for palabra in buscadas)
+
+
+def _relevancia(buscadas: Sequence[str], fila: Sequence) -> Tuple[int, int, int]:
+    # fila = (rowid, columnas indexadas...); menor es más relevante
+    texto = [palabra for valor in fila[1:] for palabra in palabras(valor)]
+    exactas = sum(1 for buscada in buscadas if buscada in texto)
+    return (-exactas, len(texto), fila[0])
+
+
+def buscar(db_cursor, tabla: str, texto: str, limite: int, usar_fts: bool = True) -> List[int]:
+    """
+    Códigos de las filas de `tabla` que coinciden con `texto`, de la más a la
+    menos relevante. Sin índice FTS5, filtra con LIKE por cada palabra.
+    """
+    buscadas = palabras(texto)
+    if not buscadas:
+        return []
+    if not usar_fts:
+        columnas = BUSQUEDAS[tabla]
+        originales = _PALABRA.findall(texto)
+        condicion = "(" + " OR ".join(f"{columna} LIKE ?" for columna in columnas) + ")"
+        db_cursor.execute(
+            f"SELECT Codigo FROM {tabla} WHERE {' AND '.join([condicion] * len(originales))} "
+            f"ORDER BY Codigo LIMIT ?",
+            [f"%{palabra}%" for palabra in originales for _ in columnas] + [limite],
+        )
+        return [fila[0] for fila in db_cursor.fetchall()]
+
+    fts = tabla_fts(tabla)
+    candidatos: Dict[int, tuple] = {}
+    # Primero las filas con las palabras completas. Las que solo las tienen como
+    # prefijo quedan siempre detrás, así que se leen solo si faltan resultados
+    for prefijos in (False, True):
+        db_cursor.execute(
+            f"SELECT rowid, {', '.join(BUSQUEDAS[tabla])} FROM {fts} WHERE {fts} MATCH ? LIMIT ?",
+            (expresion_fts(texto, prefijos), BUSQUEDA_CANDIDATOS),
+        )
+        for fila in db_cursor.fetchall():
+            candidatos.setdefault(fila[0], tuple(fila))
+        if len(candidatos) >= limite:
+            break
+    ordenados = sorted(candidatos.values(), key=lambda fila: _relevancia(buscadas, fila))
+    return [fila[0] for fila in ordenados[:limite]]
@@ -0,0 +1,154 @@
+"""
+Serialización directa de filas de la base de datos a JSON
+
+FastAPI valida cada registro que devuelve un endpoint contra su response_model,
+lo convierte de nuevo a diccionario y luego a JSON. Para las filas que salen de
+nuestras propias tablas esa validación no aporta nada y en los listados grandes
+es la mayor parte del tiempo de la petición.
+
+Este módulo recorre una vez los campos de cada modelo (al primer uso) y arma un
+serializador que solo copia los campos del modelo, aplica los valores por
+defecto y las pocas conversiones que haría Pydantic (fechas ISO 8601 con 'T',
+enteros 0/1 a booleanos, enteros a float). El resultado se escribe directamente
+a bytes con orjson si está instalado, o con json de la biblioteca estándar.
+
+Los routers conservan su response_model, así que el esquema de OpenAPI no cambia.
+"""
+import json
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Mapping, Optional, Type, Union, get_args, get_origin
+
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+Conversion = Callable[[Any], Any]
+
+
+def dumps(contenido: Any) -> bytes:
+    """Codifica `contenido` como JSON en bytes"""
+    if HAS_ORJSON:
+        return orjson.dumps(contenido, default=str)
+    return json.dumps(
+        contenido, ensure_ascii=False, separators=(",", ":"), default=str
+    ).encode("utf-8")
+
+
+def _fecha_hora(valor: Any) -> Any:
+    # SQLite guarda "2024-01-01 09:30:00" (CURRENT_TIMESTAMP) o "2024-01-01T09:30:00"
+    if isinstance(valor, str):
+        if len(valor) == 10:
+            return valor + "T00:00:00"
+        if len(valor) > 10 and valor[10] == " ":
+            return valor[:10] + "T" + valor[11:]
+        return valor
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return valor
+
+
+def _fecha(valor: Any) -> Any:
+    if isinstance(valor, str):
+        return valor[:10]
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return valor
+
+
+def _decimal(valor: Any) -> Any:
+    return float(valor) if isinstance(valor, int) else valor
+
+
+# Conversiones por tipo de campo; el resto de tipos se copia tal cual
+_CONVERSIONES: Dict[Any, Conversion] = {
+    datetime: _fecha_hora,
+    date: _fecha,
+    bool: bool,
+    float: _decimal,
+}
+
+
+def _sin_optional(tipo: Any) -> Any:
+    if get_origin(tipo) is Union:
+        argumentos = [arg for arg in get_args(tipo) if arg is not type(None)]
+        if len(argumentos) == 1:
+            return argumentos[0]
+    return tipo
+
+
+def _conversion(tipo: Any) -> Optional[Conversion]:
+    tipo = _sin_optional(tipo)
+    if get_origin(tipo) is list:
+        interna = _conversion(get_args(tipo)[0])
+        if interna is None:
+            return None
+        return lambda valores: [None if v is None else interna(v) for v in valores]
+    if isinstance(tipo, type) and issubclass(tipo, BaseModel):
+        return serializador(tipo).fila
+    return _CONVERSIONES.get(tipo)
+
+
+class SerializadorFilas:
+    """Convierte registros (diccionarios) al esquema JSON de un modelo sin validarlos"""
+
+    def __init__(self, modelo: Type[BaseModel]):
+        self.modelo = modelo
+        self._campos = [
+            (
+                nombre,
+                _conversion(campo.annotation),
+                None if campo.is_required() else campo.get_default(call_default_factory=True),
+            )
+            for nombre, campo in modelo.model_fields.items()
+        ]
+
+    def fila(self, registro: Mapping[str, Any]) -> Dict[str, Any]:
+        salida = {}
+        for nombre, convertir, defecto in self._campos:
+            valor = registro.get(nombre, defecto)
+            if valor is not None and convertir is not None:
+                valor = convertir(valor)
+            salida[nombre] = valor
+        return salida
+
+    def filas(self, registros: List[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+        fila = self.fila
+        return [fila(registro) for registro in registros]
+
+
+@lru_cache(maxsize=None)
+def serializador(modelo: Type[BaseModel]) -> SerializadorFilas:
+    """Serializador del modelo, creado una sola vez por proceso"""
+    return SerializadorFilas(modelo)
+
+
+class RespuestaJSON(Response):
+    """Respuesta JSON codificada con `dumps` (orjson si está disponible)"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def respuesta_modelo(
+    registros: Union[Mapping[str, Any], List[Mapping[str, Any]]],
+    modelo: Type[BaseModel],
+    headers: Optional[Mapping[str, str]] = None,
+) -> RespuestaJSON:
+    """
+    Respuesta con uno o varios registros confiables (leídos de la base de datos)
+    en el esquema de `modelo`, sin pasar por la validación del response_model.
+    """
+    conversor = serializador(modelo)
+    if isinstance(registros, Mapping):
+        contenido: Any = conversor.fila(registros)
+    else:
+        contenido = conversor.filas(registros)
+    return RespuestaJSON(content=contenido, headers=headers)
@@ -0,0 +1,88 @@
+"""
+Respuestas en streaming (NDJSON) para exportar listados completos
+
+Con `?formato=ndjson` o la cabecera `Accept: application/x-ndjson` un listado
+devuelve todas las filas que cumplen los filtros, una por línea en JSON, sin el
+límite de página. Las filas se leen del cursor de SQLite con `fetchmany` y se
+escriben en la respuesta lote a lote, así que la memoria usada no depende del
+tamaño de la tabla.
+"""
+import logging
+import os
+import sqlite3
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Type
+
+from fastapi import Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from app.serialization import dumps, serializador
+
+logger = logging.getLogger(__name__)
+
+MEDIA_NDJSON = "application/x-ndjson"
+
+# Filas leídas del cursor (y procesadas) por cada lote del streaming
+API_STREAM_BATCH = int(os.getenv("API_STREAM_BATCH", "500"))
+
+# Convierte un lote de filas en registros completos (relaciones, conversiones).
+# Recibe un cursor propio para las consultas de las relaciones.
+Completar = Callable[[sqlite3.Cursor, List[sqlite3.Row]], List[Dict[str, Any]]]
+
+
+def pide_ndjson(
+    request: Request,
+    formato: Optional[str] = Query(
+        None, pattern="^(json|ndjson)$",
+        description="'ndjson' devuelve el listado completo en streaming, una fila por línea"
+    ),
+) -> bool:
+    """Dependencia: indica si el cliente pidió la respuesta en NDJSON"""
+    if formato is not None:
+        return formato == "ndjson"
+    return MEDIA_NDJSON in request.headers.get("accept", "")
+
+
+def _lineas(registros: List[Dict[str, Any]], modelo: Optional[Type[BaseModel]]) -> bytes:
+    if modelo is not None:
+        # Mismo esquema que la respuesta JSON del endpoint (response_model)
+        registros = serializador(modelo).filas(registros)
+    return b"".join(dumps(r) + b"\n" for r in registros)
+
+
+def respuesta_ndjson(
+    conn: sqlite3.Connection,
+    query: str,
+    params: List[Any],
+    modelo: Optional[Type[BaseModel]] = None,
+    completar: Optional[Completar] = None,
+    headers: Optional[Mapping[str, str]] = None,
+) -> StreamingResponse:
+    """
+    Ejecuta `query` en `conn` y devuelve sus filas como NDJSON a medida que se leen.
+
+    `conn` es la conexión de la petición (`get_db`): FastAPI la devuelve al pool
+    después de enviar la respuesta completa, así que sigue disponible durante el
+    envío. Tomar otra conexión del pool retendría dos por exportación y con el
+    pool lleno las exportaciones se bloquearían entre sí hasta DB_POOL_TIMEOUT.
+    """
+    def generar() -> Iterator[bytes]:
+        cursor = conn.cursor()
+        enviadas = 0
+        try:
+            cursor.execute(query, params)
+            while True:
+                lote = cursor.fetchmany(API_STREAM_BATCH)
+                if not lote:
+                    break
+                registros = completar(conn.cursor(), lote) if completar else [dict(f) for f in lote]
+                yield _lineas(registros, modelo)
+                enviadas += len(lote)
+        except Exception as e:
+            # El código de estado ya se envió: se corta la respuesta y se registra
+            logger.error(f"Error en streaming tras {enviadas} filas: {e}", exc_info=True)
+            raise
+        finally:
+            cursor.close()
+
+    return StreamingResponse(generar(), media_type=MEDIA_NDJSON, headers=headers)
@@ -0,0 +1,173 @@
+"""
+Versiones de cambios por tabla y GET condicionales (ETag / If-None-Match)
+
+La tabla `cambios_tablas` guarda un contador por tabla que los triggers
+incrementan en cada INSERT, UPDATE o DELETE, venga el cambio de la API, de un
+script o de otra herramienta. Leer esas versiones es una búsqueda por clave
+primaria, mucho más barata que el listado.
+
+Los endpoints de lectura derivan su ETag de las versiones de las tablas que usan
+(incluidas las de las relaciones de `include`) y de la URL completa. Si el
+cliente envía un `If-None-Match` que coincide, responden `304 Not Modified` sin
+ejecutar la consulta. El navegador revalida y reutiliza su copia por sí solo
+gracias a `Cache-Control: no-cache`, sin cambios en el frontend.
+"""
+import hashlib
+import sqlite3
+import threading
+import uuid
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from fastapi import Request, Response
+
+TABLA_VERSIONES = "cambios_tablas"
+
+# Tablas cuyos cambios se cuentan
+TABLAS_VERSIONADAS = (
+    "pacientes",
+    "doctor",
+    "citas",
+    "series_citas",
+    "consultas",
+    "receta",
+    "historial_medico",
+    "examenes",
+    "usuarios_sistema",
+)
+
+_OPERACIONES = ("INSERT", "UPDATE", "DELETE")
+
+# Distingue los ETag de cada arranque del proceso: un cambio de código o de base
+# de datos entre arranques no puede reutilizar una copia guardada por el cliente
+_INSTANCIA = uuid.uuid4().hex
+
+
+def crear_versiones(conn: sqlite3.Connection, tabla: Optional[str] = None) -> None:
+    """
+    Crea la tabla de versiones y los triggers de `tabla` (o de todas las tablas
+    versionadas que existan). Es idempotente; se usa en las migraciones y al
+    reconstruir o recrear una tabla, ya que sus triggers se eliminan con ella.
+    """
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABLA_VERSIONES} (
+            Tabla TEXT PRIMARY KEY,
+            Version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    for nombre in (tabla,) if tabla else TABLAS_VERSIONADAS:
+        if nombre not in TABLAS_VERSIONADAS:
+            continue
+        existe = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (nombre,)
+        ).fetchone()
+        if not existe:
+            continue
+        conn.execute(f"INSERT OR IGNORE INTO {TABLA_VERSIONES} (Tabla) VALUES (?)", (nombre,))
+        for operacion in _OPERACIONES:
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS version_{nombre}_{operacion.lower()}
+                AFTER {operacion} ON {nombre}
+                BEGIN
+                    UPDATE {TABLA_VERSIONES} SET Version = Version + 1 WHERE Tabla = '{nombre}';
+                END
+            """)
+
+
+def leer_versiones(db_cursor, tablas: Sequence[str]) -> Dict[str, int]:
+    """Versión actual de cada una de `tablas`"""
+    marcadores = ", ".join("?" for _ in tablas)
+    db_cursor.execute(
+        f"SELECT Tabla, Version FROM {TABLA_VERSIONES} WHERE Tabla IN ({marcadores})",
+        list(tablas),
+    )
+    return {fila[0]: fila[1] for fila in db_cursor.fetchall()}
+
+
+def version_tabla(conn: sqlite3.Connection, tabla: str) -> int:
+    """
+    Versión de `tabla` vista desde la conexión. Dentro de una operación de
+    escritura incluye los cambios de esa operación.
+    """
+    fila = conn.execute(f"SELECT Version FROM {TABLA_VERSIONES} WHERE Tabla = ?", (tabla,)).fetchone()
+    return fila[0] if fila else 0
+
+
+class CacheVersionada:
+    """
+    Resultado calculado en el servidor que se reutiliza mientras no cambien las
+    versiones de sus tablas: un cambio lo invalida de inmediato, sin plazo fijo.
+    """
+
+    def __init__(self, tablas: Sequence[str], calcular: Callable[[Any], Any]):
+        self.tablas = tuple(tablas)
+        self._calcular = calcular
+        self._versiones: Optional[Dict[str, int]] = None
+        self._valor: Any = None
+        self._lock = threading.Lock()
+
+    def obtener(self, db_cursor) -> Any:
+        versiones = leer_versiones(db_cursor, self.tablas)
+        with self._lock:
+            if versiones == self._versiones:
+                return self._valor
+        # Si otra escritura ocurre mientras se calcula, el valor queda guardado con
+        # las versiones anteriores y se recalcula en la siguiente petición
+        valor = self._calcular(db_cursor)
+        with self._lock:
+            self._versiones, self._valor = versiones, valor
+        return valor
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._versiones, self._valor = None, None
+
+
+def _coincide(etag: str, if_none_match: str) -> bool:
+    # Comparación débil (RFC 9110): se ignora el prefijo W/
+    for candidato in if_none_match.split(","):
+        candidato = candidato.strip()
+        if candidato.startswith("W/"):
+            candidato = candidato[2:]
+        if candidato == "*" or candidato == etag:
+            return True
+    return False
+
+
+class Condicional:
+    """
+    Dependencia de FastAPI para responder GET condicionales.
+
+    Uso en un router, antes de ejecutar la consulta:
+
+        no_modificado = condicional.comprobar(cursor, "citas", *proyeccion.tablas(EXPANSIONES_CITA))
+        if no_modificado:
+            return no_modificado
+    """
+
+    def __init__(self, request: Request, response: Response):
+        self.request = request
+        self.response = response
+
+    def etag(self, versiones: Dict[str, int]) -> str:
+        clave = "|".join([
+            _INSTANCIA,
+            str(self.request.url.path),
+            str(self.request.url.query),
+            # La misma URL puede responder JSON o NDJSON según Accept
+            self.request.headers.get("accept", ""),
+            *(f"{tabla}={version}" for tabla, version in sorted(versiones.items())),
+        ])
+        return f'"{hashlib.sha1(clave.encode()).hexdigest()[:20]}"'
+
+    def comprobar(self, db_cursor, *tablas: str) -> Optional[Response]:
+        """
+        Calcula el ETag con las versiones de `tablas` y lo agrega a la respuesta.
+        Retorna una respuesta 304 si el cliente ya tiene esa versión.
+        """
+        etag = self.etag(leer_versiones(db_cursor, tablas))
+        cabeceras = {"ETag": etag, "Cache-Control": "no-cache"}
+        self.response.headers.update(cabeceras)
+        if_none_match = self.request.headers.get("if-none-match")
+        if if_none_match and _coincide(etag, if_none_match):
+            return Response(status_code=304, headers=cabeceras)
+        return None
@@ -0,0 +1,228 @@
+"""
+Escritor único con group commit para SQLite
+
+SQLite admite un solo escritor a la vez. En lugar de que cada petición abra su
+propia transacción y compita por el lock de escritura, los routers envían sus
+modificaciones a un thread escritor dedicado. El escritor agrupa las
+operaciones que llegan mientras se confirma el lote anterior y las confirma
+con un único COMMIT (group commit). Cada operación corre dentro de su propio
+SAVEPOINT, de modo que un error solo deshace esa operación y se entrega a quien
+la envió; el resto del lote se confirma normalmente.
+
+Uso desde un router:
+
+    def _insertar(conn):
+        cursor = conn.execute("INSERT INTO ...", valores)
+        return cursor.lastrowid
+
+    codigo = run_write(_insertar)
+
+Las funciones enviadas reciben la conexión del escritor y no deben llamar a
+commit() ni rollback(): la transacción la gestiona el escritor.
+"""
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional
+
+from app.database import DATABASE_URL, DB_POOL_TIMEOUT, crear_conexion, get_pool
+
+logger = logging.getLogger(__name__)
+
+# Máximo de operaciones confirmadas en un mismo COMMIT
+DB_WRITE_BATCH = int(os.getenv("DB_WRITE_BATCH", "64"))
+
+_DETENER = object()
+
+
+class _Operacion:
+    __slots__ = ("fn", "future")
+
+    def __init__(self, fn: Callable[[sqlite3.Connection], Any]):
+        self.fn = fn
+        self.future: Future = Future()
+
+
+class WriteQueue:
+    """Cola de escrituras atendida por un único thread con group commit"""
+
+    def __init__(self, database: str = DATABASE_URL, max_batch: int = DB_WRITE_BATCH):
+        self.database = database
+        self.max_batch = max(1, max_batch)
+        self._cola: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._operaciones = 0
+        self._errores = 0
+        self._lotes = 0
+        self._lote_maximo = 0
+
+    def start(self) -> None:
+        """Abre la conexión del escritor y arranca su thread"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            conn = crear_conexion(self.database)
+            # Autocommit: el escritor controla BEGIN/COMMIT explícitamente
+            conn.isolation_level = None
+            self._conn = conn
+            self._thread = threading.Thread(target=self._bucle, name="sqlite-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Procesa las operaciones pendientes y detiene el thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._cola.put(_DETENER)
+        thread.join(timeout)
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def submit(self, fn: Callable[[sqlite3.Connection], Any]) -> Future:
+        """Encola una operación y retorna un Future con su resultado"""
+        if self._thread is None:
+            self.start()
+        operacion = _Operacion(fn)
+        self._cola.put(operacion)
+        return operacion.future
+
+    def run(self, fn: Callable[[sqlite3.Connection], Any], timeout: Optional[float] = DB_POOL_TIMEOUT) -> Any:
+        """Encola una operación y espera su resultado (o re-lanza su excepción)"""
+        future = self.submit(fn)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            # Quien llama recibe un error: la operación no debe confirmarse después
+            # (un reintento duplicaría la escritura). Si el escritor ya la empezó,
+            # cancel() no tiene efecto y la operación termina normalmente.
+            future.cancel()
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas del escritor: operaciones, lotes y tamaño medio de lote"""
+        with self._lock:
+            return {
+                "operaciones": self._operaciones,
+                "errores": self._errores,
+                "lotes": self._lotes,
+                "lote_maximo": self._lote_maximo,
+                "lote_medio": round(self._operaciones / self._lotes, 2) if self._lotes else 0,
+                "pendientes": self._cola.qsize(),
+            }
+
+    def _bucle(self) -> None:
+        detener = False
+        while not detener:
+            primera = self._cola.get()
+            if primera is _DETENER:
+                break
+            lote = [primera]
+            # Tomar todo lo que se acumuló mientras se confirmaba el lote anterior
+            while len(lote) < self.max_batch:
+                try:
+                    siguiente = self._cola.get_nowait()
+                except queue.Empty:
+                    break
+                if siguiente is _DETENER:
+                    detener = True
+                    break
+                lote.append(siguiente)
+            self._ejecutar_lote(lote)
+
+    def _ejecutar_lote(self, lote: List[_Operacion]) -> None:
+        conn = self._conn
+        resultados = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for operacion in lote:
+                # Una operación cancelada por quien dejó de esperarla no se ejecuta;
+                # desde aquí la operación está en curso y ya no se puede cancelar
+                if not operacion.future.set_running_or_notify_cancel():
+                    continue
+                resultados.append((operacion, None, None))
+                conn.execute("SAVEPOINT operacion")
+                try:
+                    resultado = operacion.fn(conn)
+                    conn.execute("RELEASE operacion")
+                    resultados[-1] = (operacion, resultado, None)
+                except BaseException as e:
+                    resultados[-1] = (operacion, None, e)
+                    conn.execute("ROLLBACK TO operacion")
+                    conn.execute("RELEASE operacion")
+            conn.execute("COMMIT")
+        except Exception as e:
+            # Un error fuera de las operaciones (BEGIN, SAVEPOINT, ROLLBACK TO o
+            # COMMIT: disco lleno, error de E/S) deshace el lote completo. Se
+            # entrega a todas sus operaciones y el thread sigue atendiendo la cola.
+            logger.error(f"Error en el lote de {len(lote)} escrituras: {e}")
+            try:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            ejecutadas = {id(operacion) for operacion, _, _ in resultados}
+            resultados = [(operacion, None, error or e) for operacion, _, error in resultados]
+            # Las que no llegaron a ejecutarse también reciben el error
+            for operacion in lote:
+                if id(operacion) not in ejecutadas and operacion.future.set_running_or_notify_cancel():
+                    resultados.append((operacion, None, e))
+
+        errores = 0
+        for operacion, resultado, error in resultados:
+            if error is not None:
+                errores += 1
+                operacion.future.set_exception(error)
+            else:
+                operacion.future.set_result(resultado)
+
+        with self._lock:
+            self._operaciones += len(resultados)
+            self._errores += errores
+            self._lotes += 1
+            self._lote_maximo = max(self._lote_maximo, len(resultados))
+
+
+_writer: Optional[WriteQueue] = None
+_writer_lock = threading.Lock()
+
+
+def init_writer(database: str = DATABASE_URL) -> WriteQueue:
+    """Crea y arranca el escritor global (se llama desde el lifespan)"""
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.stop()
+        _writer = WriteQueue(database)
+        _writer.start()
+        return _writer
+
+
+def get_writer() -> WriteQueue:
+    """Retorna el escritor global, creándolo bajo demanda si aún no existe"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = WriteQueue(get_pool().database)
+    return _writer
+
+
+def close_writer() -> None:
+    """Detiene el escritor global procesando lo pendiente"""
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.stop()
+            _writer = None
+
+
+def run_write(fn: Callable[[sqlite3.Connection], Any]) -> Any:
+    """Ejecuta una modificación en el escritor y espera su resultado"""
+    return get_writer().run(fn)
@@ -0,0 +1,1678 @@
+#!/usr/bin/env python3
+"""
+Benchmarks de rendimiento de la API
+
+Ejecuta la aplicación en proceso (sin levantar uvicorn) contra una base de datos
+temporal con datos sintéticos, de modo que los resultados no dependen de la red
+ni tocan la base de datos real.
+
+Escenarios:
+    latencia    Latencia p50/p99 de peticiones rápidas mientras corren listados
+                pesados, comparando handlers async que llaman a sqlite3 en el
+                event loop (modelo anterior) contra handlers ejecutados en el
+                pool de threads (modelo actual).
+    escrituras  Escrituras por segundo con muchos clientes concurrentes,
+                comparando un COMMIT por petición en conexiones del pool
+                (modelo anterior) contra el escritor único con group commit.
+    consultas   Número de sentencias SQL que ejecuta cada endpoint de listado.
+                Falla si algún endpoint supera su máximo (consultas N+1).
+    paginacion  Recorre todos los listados página a página y compara el tiempo
+                de la primera página con el de las páginas profundas. Falla si
+                se pierden o repiten filas.
+    proyeccion  Bytes y tiempo de los listados completos frente a ?fields= y
+                sin las relaciones opcionales de ?include=.
+    streaming   Memoria máxima al exportar todas las citas: lista completa
+                validada en memoria (modelo anterior) contra NDJSON por lotes.
+    dashboard   Carga de la pantalla de inicio: los siete listados completos que
+                descargaba antes frente a /api/dashboard, y cálculo de los
+                agregados con COUNT/GROUP BY frente a los contadores mantenidos
+                por triggers. Falla si los totales no coinciden.
+    condicional Tiempo de un listado completo frente a su revalidación con
+                If-None-Match (304 sin ejecutar la consulta). Falla si tras una
+                escritura se sigue respondiendo 304.
+    serializacion
+                Filas por segundo de listar_citas validando cada registro con
+                el response_model (modelo anterior) contra la serialización
+                directa de filas confiables. Falla si el JSON no coincide.
+    series      Series por día, mes, doctor y estado calculadas con GROUP BY
+                sobre las tablas frente a los resúmenes diarios mantenidos por
+                triggers. Falla si alguna serie no coincide.
+    busqueda    Búsqueda de pacientes con LIKE '%texto%' (modelo anterior)
+                frente al índice FTS5. Falla si algún resultado no contiene
+                las palabras buscadas.
+    autocompletado
+                Descarga de todos los pacientes para filtrar en el navegador
+                (modelo anterior) frente a /api/autocomplete, y microsegundos
+                por búsqueda y por actualización del índice en memoria. Falla
+                si faltan sugerencias o alguna no contiene las palabras.
+    calendario  Vista de una semana de agenda: todas las citas, pacientes y
+                doctores filtrados en el navegador (modelo anterior) frente a
+                /api/citas/calendario. Falla si las citas no coinciden o si la
+                consulta no usa el índice (Codigo_Doctor, Fecha_Hora).
+    lote        Un bloque de citas (jornada de vacunación) creado con un POST por
+                cita (modelo anterior) frente a un solo POST /api/citas/bulk.
+                Falla si algún resultado por cita difiere del de la creación
+                individual.
+    reservas    Cientos de reservas simultáneas del mismo doctor y horario:
+                comprobación en una conexión de lectura y INSERT después
+                (modelo anterior) frente a POST /api/citas, que comprueba e
+                inserta en la misma transacción del escritor; y cambios de
+                horario simultáneos con PUT. Falla si quedan dos citas activas
+                que chocan o si se acepta más de una reserva del horario.
+    estados     Un día completo de agenda cancelado y después movido al día
+                siguiente con un PUT por cita (modelo anterior) frente a un
+                solo PUT /api/citas/bulk. Falla si las citas modificadas o sus
+                horarios finales no coinciden.
+    recurrentes Controles semanales de pacientes crónicos: un POST por cita y un
+                PUT por cita para cancelar "esta y las siguientes" (modelo
+                anterior) frente a POST y DELETE /api/citas/series. Falla si
+                algún resultado por cita o las citas canceladas difieren.
+    cierre      Citas pasadas que siguen activas cerradas por el barrido
+                automático (app/lifecycle.py): tiempo del barrido, tamaño del
+                conjunto de citas activas antes y después, y comprobación de
+                disponibilidad con el índice completo (modelo anterior) frente
+                al índice parcial. Falla si queda alguna cita pasada activa, si
+                cambia una cita futura o si una cita con consulta no termina
+                'Completada'.
+    ausencias   Agenda de un doctor que sale de vacaciones repartida entre los
+                de su especialidad: buscar hueco y hacer un PUT por cita
+                (modelo anterior) frente a un solo POST /api/citas/reprogramar.
+                Falla si la simulación no coincide con el plan aplicado, si
+                cambia alguna cita al simular o si quedan citas que chocan.
+    disponibilidad
+                Primera cita libre de una especialidad intentando reservar
+                horario por horario hasta que no hay 409 (modelo anterior)
+                frente a /api/citas/disponibilidad. Falla si el primer hueco no
+                coincide o si algún hueco devuelto no pasa la verificación.
+
+Uso:
+    python benchmark_api.py latencia
+    python benchmark_api.py latencia --citas 20000 --concurrencia 50
+    python benchmark_api.py escrituras --clientes 50 --operaciones 200
+    python benchmark_api.py consultas
+    python benchmark_api.py paginacion --citas 50000 --limite 100
+    python benchmark_api.py proyeccion
+    python benchmark_api.py streaming --citas 50000
+    python benchmark_api.py serializacion --rondas 50
+    python benchmark_api.py condicional
+    python benchmark_api.py dashboard --citas 20000
+    python benchmark_api.py series --citas 50000
+    python benchmark_api.py busqueda --pacientes 1000000
+    python benchmark_api.py autocompletado --pacientes 200000
+    python benchmark_api.py calendario --citas 100000
+    python benchmark_api.py lote --tamano 500
+    python benchmark_api.py reservas --reservas 300
+    python benchmark_api.py estados --doctores 40
+    python benchmark_api.py recurrentes --series 20 --repeticiones 26
+    python benchmark_api.py cierre --citas 100000
+    python benchmark_api.py ausencias --dias 5 --ocupacion 0.7
+    python benchmark_api.py disponibilidad --dias 14 --ocupacion 0.95
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from typing import List, Tuple
+
+import anyio
+import httpx
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from pydantic import TypeAdapter
+from fastapi.concurrency import run_in_threadpool
+
+from app import database, migrations, writer
+from app.fields import Proyeccion
+from app.pagination import API_MAX_PAGE_SIZE, Paginacion
+from app.streaming import respuesta_ndjson
+from app.versions import Condicional
+from app.models import Cita
+from app.rollups import DESGLOSES, RESUMENES, leer_serie
+from app.autocomplete import cargar_indices, get_indice
+from app.lifecycle import AGENDA_BARRIDO_ESTADO, barrer_citas, limite_barrido
+from app.scheduling import (
+    AGENDA_DURACION_CITA, AGENDA_HORA_FIN, AGENDA_HORA_INICIO, AGENDA_INTERVALO, AGENDA_MAX_DIAS,
+    condicion_activa
+)
+from app.search import buscar, palabras
+from app.routers import citas
+
+
+NOMBRES = [
+    "María", "José", "Juan", "Ana", "Luis", "Carmen", "Jorge", "Lucía", "Andrés", "Sofía",
+    "Martín", "Valentina", "Diego", "Camila", "Raúl", "Inés", "Óscar", "Patricia", "Héctor", "Elena",
+]
+APELLIDOS = [
+    "García", "Rodríguez", "González", "Fernández", "López", "Martínez", "Sánchez", "Pérez",
+    "Gómez", "Martín", "Jiménez", "Ruiz", "Hernández", "Díaz", "Moreno", "Muñoz", "Álvarez",
+    "Romero", "Alonso", "Gutiérrez", "Navarro", "Torres", "Domínguez", "Vázquez", "Ramos",
+    "Gil", "Ramírez", "Serrano", "Blanco", "Suárez",
+]
+
+
+def preparar_base(ruta: str, n_citas: int, n_pacientes: int = 500, n_doctores: int = 40):
+    """Crea una base de datos temporal con datos sintéticos"""
+    migrations.aplicar_migraciones(ruta)
+    conn = database.crear_conexion(ruta)
+    cursor = conn.cursor()
+
+    cursor.executemany(
+        "INSERT INTO pacientes (Nombre, Apellidos, Numero_Identificacion) VALUES (?, ?, ?)",
+        (
+            (random.choice(NOMBRES), f"{random.choice(APELLIDOS)} {random.choice(APELLIDOS)}", f"ID{i:08d}")
+            for i in range(n_pacientes)
+        )
+    )
+    especialidades = ["Medicina General", "Cardiología", "Pediatría", "Dermatología"]
+    cursor.executemany(
+        "INSERT INTO doctor (Nombre, Apellidos, Especialidad, Estado) VALUES (?, ?, ?, 'Activo')",
+        [(f"Doctor{i}", f"Apellido{i}", especialidades[i % len(especialidades)]) for i in range(n_doctores)]
+    )
+    inicio = datetime(2024, 1, 1, 8, 0)
+    estados = ["Programada", "Confirmada", "Completada", "Cancelada"]
+    cursor.executemany(
+        "INSERT INTO citas (Codigo_Paciente, Codigo_Doctor, Fecha_Hora, Estado, Motivo) VALUES (?, ?, ?, ?, ?)",
+        [
+            (
+                random.randint(1, n_pacientes),
+                random.randint(1, n_doctores),
+                (inicio + timedelta(minutes=30 * i)).isoformat(),
+                random.choice(estados),
+                "Control",
+            )
+            for i in range(n_citas)
+        ]
+    )
+    # Una consulta por cada dos citas, con dos exámenes cada una
+    cursor.execute(
+        """
+        INSERT INTO consultas (Codigo_Paciente, Codigo_Doctor, Codigo_Cita, Fecha_de_Consulta,
+                               Estado, Examenes_Solicitados, Examenes_Descripcion)
+        SELECT Codigo_Paciente, Codigo_Doctor, Codigo, Fecha_Hora, 'Completada', 1, 'Hemograma, Glucosa'
+        FROM citas WHERE Codigo % 2 = 0
+        """
+    )
+    for tipo in ("Hemograma", "Glucosa"):
+        cursor.execute(
+            """
+            INSERT INTO examenes (Codigo_Paciente, Codigo_Doctor, Codigo_Consulta, Codigo_Cita,
+                                  Tipo_Examen, Fecha_Solicitud)
+            SELECT Codigo_Paciente, Codigo_Doctor, Codigo, Codigo_Cita, ?, Fecha_de_Consulta
+            FROM consultas
+            """,
+            (tipo,)
+        )
+    cursor.execute(
+        """
+        INSERT INTO receta (Codigo_Paciente, Codigo_Doctor, Codigo_Consulta, Fecha_Receta, Medicamento)
+        SELECT Codigo_Paciente, Codigo_Doctor, Codigo, Fecha_de_Consulta, 'Paracetamol'
+        FROM consultas
+        """
+    )
+    cursor.executemany(
+        "INSERT INTO historial_medico (Codigo_Paciente, Fecha_Ingreso, Diagnostico) VALUES (?, ?, ?)",
+        [(random.randint(1, n_pacientes), inicio.isoformat(), "Control") for _ in range(min(n_pacientes, 5000) * 2)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def percentil(valores, p: float) -> float:
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+def listar(conn):
+    """Primera página (la más grande permitida) de listar_citas con sus exámenes"""
+    # Petición sin If-None-Match: siempre se ejecuta la consulta
+    peticion = Request({"type": "http", "method": "GET", "path": "/api/citas/", "query_string": b"", "headers": []})
+    return citas.listar_citas(
+        db=conn,
+        paginacion=Paginacion(Response(), limit=API_MAX_PAGE_SIZE, cursor=None, total=False),
+        proyeccion=Proyeccion(fields=None, include="examenes"),
+        ndjson=False, condicional=Condicional(peticion, Response()),
+        estado=None, codigo_doctor=None, codigo_paciente=None
+    )
+
+
+def app_comparacion() -> FastAPI:
+    """App con los dos modelos de ejecución sobre el mismo handler de listado"""
+    app = FastAPI()
+
+    @app.get("/bloqueante/citas")
+    async def citas_bloqueante():
+        # Modelo anterior: sqlite3 síncrono dentro de un handler async
+        with database.get_pool().connection() as conn:
+            return listar(conn)
+
+    @app.get("/hilos/citas")
+    async def citas_hilos():
+        def trabajo():
+            with database.get_pool().connection() as conn:
+                return listar(conn)
+        return await run_in_threadpool(trabajo)
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+async def medir_latencia(cliente: httpx.AsyncClient, ruta_pesada: str, concurrencia: int, rondas: int):
+    """Mantiene listados pesados en curso y mide la latencia de /ping mientras tanto"""
+    latencias = []
+    terminado = asyncio.Event()
+
+    async def pesada():
+        while not terminado.is_set():
+            await cliente.get(ruta_pesada)
+            # El transporte en proceso no cede el control como lo haría un socket
+            await asyncio.sleep(0)
+
+    async def rapida():
+        for _ in range(rondas):
+            # La petición "llega" al terminar la pausa; si el event loop está
+            # bloqueado, el retraso hasta atenderla cuenta como latencia
+            llegada = time.perf_counter() + 0.005
+            await asyncio.sleep(0.005)
+            await cliente.get("/ping")
+            latencias.append((time.perf_counter() - llegada) * 1000)
+
+    carga = [asyncio.create_task(pesada()) for _ in range(concurrencia)]
+    await asyncio.sleep(0)
+    await asyncio.gather(*(rapida() for _ in range(concurrencia)))
+    terminado.set()
+    await asyncio.gather(*carga)
+    return latencias
+
+
+async def escenario_latencia(args):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = database.DB_MAX_WORKERS
+    app = app_comparacion()
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        print(f"{'modelo':<12} {'p50 (ms)':>10} {'p99 (ms)':>10} {'max (ms)':>10}")
+        for modelo in ("bloqueante", "hilos"):
+            latencias = await medir_latencia(cliente, f"/{modelo}/citas", args.concurrencia, args.rondas)
+            print(
+                f"{modelo:<12} {statistics.median(latencias):>10.2f} "
+                f"{percentil(latencias, 99):>10.2f} {max(latencias):>10.2f}"
+            )
+
+
+def medir_escrituras(escribir, clientes: int, operaciones: int):
+    """Lanza `clientes` threads que insertan `operaciones` citas cada uno"""
+    errores = 0
+
+    def cliente(indice: int):
+        nonlocal errores
+        inicio = datetime(2030, 1, 1) + timedelta(days=indice)
+        for i in range(operaciones):
+            valores = (1, 1, (inicio + timedelta(minutes=i)).isoformat(), "Programada", "Benchmark")
+            try:
+                escribir(valores)
+            except Exception:
+                errores += 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clientes) as ejecutor:
+        list(ejecutor.map(cliente, range(clientes)))
+    return time.perf_counter() - t0, errores
+
+
+def escenario_escrituras(args):
+    insertar = "INSERT INTO citas (Codigo_Paciente, Codigo_Doctor, Fecha_Hora, Estado, Motivo) VALUES (?, ?, ?, ?, ?)"
+
+    def por_conexion(valores):
+        # Modelo anterior: cada petición abre su transacción y hace COMMIT
+        with database.get_pool().connection() as conn:
+            conn.execute(insertar, valores)
+            conn.commit()
+
+    def escritor_unico(valores):
+        writer.run_write(lambda conn: conn.execute(insertar, valores).lastrowid)
+
+    total = args.clientes * args.operaciones
+    print(f"{'modelo':<16} {'segundos':>10} {'escrituras/s':>14} {'errores':>8}")
+    for modelo, escribir in (("commit/petición", por_conexion), ("escritor único", escritor_unico)):
+        segundos, errores = medir_escrituras(escribir, args.clientes, args.operaciones)
+        print(f"{modelo:<16} {segundos:>10.2f} {total / segundos:>14.0f} {errores:>8}")
+    print(f"Lotes del escritor: {writer.get_writer().stats()}")
+
+
+# Máximo de sentencias SQL por petición de listado, independiente del número de filas
+# (la primera es la lectura de las versiones de las tablas para el ETag)
+SENTENCIAS_MAXIMAS = {
+    "/api/citas/?include=examenes": 3,
+    "/api/consultas/?include=examenes": 3,
+    "/api/examenes/?include=cita,consulta": 4,
+    "/api/historial/?include=examenes": 3,
+    "/api/citas/calendario?desde=2024-01-01": 2,
+}
+
+
+async def escenario_consultas(args):
+    import main as api
+
+    sentencias = []
+
+    def db_trazada():
+        with database.get_pool().connection() as conn:
+            conn.set_trace_callback(sentencias.append)
+            try:
+                yield conn
+            finally:
+                conn.set_trace_callback(None)
+
+    api.app.dependency_overrides[database.get_db] = db_trazada
+    fallos = 0
+    transporte = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        print(f"{'endpoint':<38} {'filas':>8} {'sentencias':>11} {'máximo':>8}")
+        for ruta, maximo in SENTENCIAS_MAXIMAS.items():
+            sentencias.clear()
+            respuesta = await cliente.get(ruta)
+            respuesta.raise_for_status()
+            correcto = len(sentencias) <= maximo
+            fallos += not correcto
+            print(
+                f"{ruta:<38} {len(respuesta.json()):>8} {len(sentencias):>11} {maximo:>8}"
+                f"{'' if correcto else '  ✗ N+1'}"
+            )
+    api.app.dependency_overrides.clear()
+    return 1 if fallos else 0
+
+
+# Listados recorridos por el escenario de paginación y su clave única
+LISTADOS_PAGINADOS = {
+    "/api/citas/": "Codigo",
+    "/api/consultas/": "Codigo",
+    "/api/examenes/": "Codigo",
+    "/api/historial/": "Codigo_Historial",
+    "/api/pacientes/": "Codigo",
+}
+
+
+async def escenario_paginacion(args):
+    import main as api
+
+    fallos = 0
+    transporte = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        print(
+            f"{'endpoint':<18} {'total':>7} {'leídas':>7} {'páginas':>8} "
+            f"{'primera ms':>11} {'profundas ms':>13}"
+        )
+        for ruta, clave in LISTADOS_PAGINADOS.items():
+            params = {"limit": args.limite, "total": "true"}
+            vistos, tiempos, total = set(), [], None
+            leidas = 0
+            while True:
+                inicio = time.perf_counter()
+                respuesta = await cliente.get(ruta, params=params)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+                respuesta.raise_for_status()
+                if total is None:
+                    total = int(respuesta.headers["x-total-count"])
+                    params.pop("total")
+                filas = respuesta.json()
+                leidas += len(filas)
+                vistos.update(fila[clave] for fila in filas)
+                cursor = respuesta.headers.get("x-next-cursor")
+                if not cursor:
+                    break
+                params["cursor"] = cursor
+            correcto = leidas == len(vistos) == total
+            fallos += not correcto
+            profundas = statistics.median(tiempos[1:]) if len(tiempos) > 1 else 0.0
+            print(
+                f"{ruta:<18} {total:>7} {leidas:>7} {len(tiempos):>8} "
+                f"{tiempos[0]:>11.2f} {profundas:>13.2f}"
+                f"{'' if correcto else '  ✗ filas perdidas o repetidas'}"
+            )
+    return 1 if fallos else 0
+
+
+# Pares (petición completa, petición reducida) del escenario de proyección
+PETICIONES_PROYECCION = [
+    ("/api/pacientes/?limit=500", "/api/pacientes/?limit=500&fields=Nombre,Apellidos"),
+    ("/api/doctores/?limit=500", "/api/doctores/?limit=500&fields=Nombre,Apellidos,Especialidad"),
+    ("/api/citas/?limit=500&include=examenes", "/api/citas/?limit=500"),
+    ("/api/consultas/?limit=500&include=examenes", "/api/consultas/?limit=500&fields=Fecha_de_Consulta,Estado"),
+]
+
+
+async def escenario_proyeccion(args):
+    import main as api
+
+    transporte = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        print(f"{'petición':<62} {'KB':>8} {'ms':>8}")
+        for peticiones in PETICIONES_PROYECCION:
+            for ruta in peticiones:
+                tiempos = []
+                for _ in range(args.rondas):
+                    inicio = time.perf_counter()
+                    respuesta = await cliente.get(ruta)
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                    respuesta.raise_for_status()
+                print(f"{ruta:<62} {len(respuesta.content) / 1024:>8.1f} {statistics.median(tiempos):>8.2f}")
+
+
+# Listados que descargaba la pantalla de inicio y su clave en los totales del dashboard
+LISTADOS_DASHBOARD = {
+    "/api/pacientes/": "pacientes",
+    "/api/doctores/": "doctores",
+    "/api/citas/": "citas",
+    "/api/consultas/": "consultas",
+    "/api/recetas/": "recetas",
+    "/api/examenes/": "examenes",
+    "/api/usuarios/": "usuarios",
+}
+
+
+async def escenario_dashboard(args):
+    import main as api
+    from app.routers import dashboard
+
+    transporte = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        # Modelo anterior: todas las páginas de cada listado, como getAllPages
+        inicio = time.perf_counter()
+        peticiones, enviados, filas = 0, 0, {}
+        for ruta, seccion in LISTADOS_DASHBOARD.items():
+            params = {"limit": API_MAX_PAGE_SIZE}
+            filas[seccion] = 0
+            while True:
+                respuesta = await cliente.get(ruta, params=params)
+                respuesta.raise_for_status()
+                peticiones += 1
+                enviados += len(respuesta.content)
+                filas[seccion] += len(respuesta.json())
+                cursor = respuesta.headers.get("x-next-cursor")
+                if not cursor:
+                    break
+                params["cursor"] = cursor
+        resultados = [("listados", peticiones, enviados, time.perf_counter() - inicio)]
+
+        for modelo in ("dashboard", "dashboard caché"):
+            if modelo == "dashboard":
+                dashboard._cache.invalidar()
+            inicio = time.perf_counter()
+            respuesta = await cliente.get("/api/dashboard/")
+            respuesta.raise_for_status()
+            resultados.append((modelo, 1, len(respuesta.content), time.perf_counter() - inicio))
+
+    print(f"{'modelo':<16} {'peticiones':>10} {'KB':>10} {'ms':>10}")
+    for modelo, peticiones, enviados, segundos in resultados:
+        print(f"{modelo:<16} {peticiones:>10} {enviados / 1024:>10.1f} {segundos * 1000:>10.2f}")
+
+    totales = respuesta.json()["Totales"]
+    distintos = {seccion: (n, totales[seccion]) for seccion, n in filas.items() if totales[seccion] != n}
+    if distintos:
+        print(f"ERROR: totales distintos (listado, dashboard): {distintos}")
+        return 1
+
+    def recorriendo_tablas(cursor):
+        # Modelo anterior: COUNT(*) y GROUP BY sobre las tablas en cada cálculo
+        def serie(tabla, clave, orden="Total DESC, Clave"):
+            cursor.execute(
+                f"SELECT {clave} AS Clave, COUNT(*) AS Total FROM {tabla} GROUP BY 1 ORDER BY {orden}"
+            )
+            return [dict(fila) for fila in cursor.fetchall()]
+
+        cursor.execute("SELECT " + ", ".join(
+            f"(SELECT COUNT(*) FROM {tabla}) AS {seccion}" for seccion, tabla in dashboard.TABLAS_DASHBOARD.items()
+        ))
+        return {
+            "Totales": dict(cursor.fetchone()),
+            "Examenes_Por_Estado": serie("examenes", "COALESCE(Estado, 'Pendiente')"),
+            "Citas_Por_Mes": serie("citas", "substr(Fecha_Hora, 1, 7)", orden="Clave"),
+            "Usuarios_Por_Rol": serie("usuarios_sistema", "COALESCE(Rol, 'Recepcionista')"),
+        }
+
+    print(f"\n{'agregados':<16} {'ms':>10}")
+    calculados = {}
+    with database.get_pool().connection() as conn:
+        for modelo, calcular in (("COUNT/GROUP BY", recorriendo_tablas), ("contadores", dashboard.calcular_dashboard)):
+            inicio = time.perf_counter()
+            calculados[modelo] = calcular(conn.cursor())
+            print(f"{modelo:<16} {(time.perf_counter() - inicio) * 1000:>10.2f}")
+    if calculados["COUNT/GROUP BY"] != calculados["contadores"]:
+        print("ERROR: los contadores no coinciden con COUNT/GROUP BY")
+        return 1
+    return 0
+
+
+# Listados que cargan las vistas del frontend al montarse
+PETICIONES_CONDICIONALES = [
+    "/api/pacientes/?limit=500",
+    "/api/doctores/?limit=500",
+    "/api/citas/?limit=500&include=examenes",
+    "/api/consultas/?limit=500&include=examenes",
+    "/api/examenes/?limit=500&include=cita,consulta",
+]
+
+
+async def escenario_condicional(args):
+    import main as api
+
+    def mediana_ms(tiempos):
+        return statistics.median(tiempos) * 1000
+
+    transporte = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        print(f"{'petición':<48} {'KB':>8} {'ms 200':>8} {'ms 304':>8}")
+        for ruta in PETICIONES_CONDICIONALES:
+            completa, revalidada = [], []
+            for _ in range(args.rondas):
+                inicio = time.perf_counter()
+                respuesta = await cliente.get(ruta)
+                completa.append(time.perf_counter() - inicio)
+                respuesta.raise_for_status()
+                etag = respuesta.headers["ETag"]
+                inicio = time.perf_counter()
+                no_modificada = await cliente.get(ruta, headers={"If-None-Match": etag})
+                revalidada.append(time.perf_counter() - inicio)
+                assert no_modificada.status_code == 304, no_modificada.status_code
+            print(
+                f"{ruta:<48} {len(respuesta.content) / 1024:>8.1f} "
+                f"{mediana_ms(completa):>8.2f} {mediana_ms(revalidada):>8.2f}"
+            )
+
+        # Un cambio en una relación incluida invalida el ETag del listado
+        ruta = "/api/citas/?limit=500&include=examenes"
+        etag = (await cliente.get(ruta)).headers["ETag"]
+        actualizar = "UPDATE examenes SET Estado = 'Completado' WHERE Codigo = (SELECT MIN(Codigo) FROM examenes)"
+        await anyio.to_thread.run_sync(writer.run_write, lambda conn: conn.execute(actualizar))
+        respuesta = await cliente.get(ruta, headers={"If-None-Match": etag})
+        if respuesta.status_code != 200:
+            print(f"ERROR: {ruta} responde {respuesta.status_code} tras modificar un examen")
+            return 1
+    return 0
+
+
+def medir_memoria(exportar) -> Tuple[float, float, int]:
+    """Segundos, MB máximos asignados y bytes generados por `exportar`"""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    generados = exportar()
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return segundos, pico / 1024 / 1024, generados
+
+
+def escenario_streaming(args):
+    query = "SELECT * FROM citas ORDER BY Fecha_Hora DESC, Codigo DESC"
+
+    def lista_completa():
+        # Modelo anterior: todas las filas en memoria, validadas y serializadas de una vez
+        with database.get_pool().connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query)
+            filas = citas.completar_citas(cursor, cursor.fetchall(), examenes=True)
+            adaptador = TypeAdapter(List[Cita])
+            return len(adaptador.dump_json(adaptador.validate_python(filas)))
+
+    def ndjson():
+        with database.get_pool().connection() as conn:
+            respuesta = respuesta_ndjson(conn, query, [], Cita, partial(citas.completar_citas, examenes=True))
+
+            async def consumir():
+                # Los bloques se descartan al enviarse, como al escribirlos en el socket
+                enviados = 0
+                async for bloque in respuesta.body_iterator:
+                    enviados += len(bloque)
+                return enviados
+
+            return asyncio.run(consumir())
+
+    print(f"{'modelo':<16} {'segundos':>10} {'MB máx.':>10} {'MB enviados':>12}")
+    for modelo, exportar in (("lista completa", lista_completa), ("ndjson", ndjson)):
+        segundos, pico, generados = medir_memoria(exportar)
+        print(f"{modelo:<16} {segundos:>10.2f} {pico:>10.1f} {generados / 1024 / 1024:>12.1f}")
+
+
+async def escenario_serializacion(args):
+    campo = create_response_field(name="Response_Listar_Citas", type_=List[Cita])
+
+    async def validada(conn) -> bytes:
+        # Modelo anterior: el handler devolvía los registros y FastAPI los validaba
+        # con el response_model antes de codificarlos
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT * FROM citas ORDER BY Fecha_Hora DESC, Codigo DESC LIMIT ?", (API_MAX_PAGE_SIZE,)
+        )
+        registros = citas.completar_citas(cursor, cursor.fetchall(), examenes=True)
+        contenido = await serialize_response(field=campo, response_content=registros)
+        return JSONResponse(contenido).body
+
+    async def directa(conn) -> bytes:
+        return listar(conn).body
+
+    cuerpos = {}
+    print(f"{'modelo':<14} {'filas/s':>10} {'ms/página':>10}")
+    for modelo, pagina in (("validada", validada), ("directa", directa)):
+        with database.get_pool().connection() as conn:
+            cuerpos[modelo] = await pagina(conn)
+            inicio = time.perf_counter()
+            for _ in range(args.rondas):
+                await pagina(conn)
+            segundos = time.perf_counter() - inicio
+        filas = len(json.loads(cuerpos[modelo]))
+        print(f"{modelo:<14} {filas * args.rondas / segundos:>10.0f} {segundos / args.rondas * 1000:>10.2f}")
+
+    if json.loads(cuerpos["validada"]) != json.loads(cuerpos["directa"]):
+        print("ERROR: la serialización directa no coincide con la del response_model")
+        return 1
+    return 0
+
+
+# Series que piden las gráficas: (tabla, filtros de leer_serie)
+SERIES = [
+    ("citas", {"periodo": "dia", "desde": "2024-02-01", "hasta": "2024-03-31"}),
+    ("citas", {"periodo": "mes", "por": "estado"}),
+    ("consultas", {"periodo": "dia", "por": "doctor", "desde": "2024-01-01", "hasta": "2024-01-31"}),
+    ("examenes", {"periodo": "mes", "estado": "Pendiente"}),
+    ("receta", {"periodo": "dia", "codigo_doctor": 1}),
+]
+
+
+def serie_recorriendo_tabla(cursor, tabla, desde=None, hasta=None, codigo_doctor=None,
+                            estado=None, periodo="dia", por=None):
+    """Modelo anterior: GROUP BY sobre la tabla en cada petición"""
+    resumen = RESUMENES[tabla]
+    columnas = {
+        "Dia": resumen.dia.format(fila=tabla),
+        "Codigo_Doctor": resumen.doctor.format(fila=tabla),
+        "Estado": resumen.estado.format(fila=tabla),
+    }
+    condiciones, parametros = [f"{columnas['Dia']} <> ''"], []
+    for columna, operador, valor in (("Dia", ">=", desde), ("Dia", "<=", hasta),
+                                     ("Codigo_Doctor", "=", codigo_doctor), ("Estado", "=", estado)):
+        if valor is not None:
+            condiciones.append(f"{columnas[columna]} {operador} ?")
+            parametros.append(valor)
+    periodo_sql = columnas["Dia"] if periodo == "dia" else f"substr({columnas['Dia']}, 1, 7)"
+    grupo = columnas[DESGLOSES[por]] if por else "NULL"
+    cursor.execute(
+        f"SELECT {periodo_sql}, {grupo}, COUNT(*) FROM {tabla} "
+        f"WHERE {' AND '.join(condiciones)} GROUP BY 1, 2 ORDER BY 1, 2",
+        parametros,
+    )
+    return [
+        {"Periodo": fila[0], "Grupo": None if fila[1] is None else str(fila[1]), "Total": fila[2]}
+        for fila in cursor.fetchall()
+    ]
+
+
+def escenario_series(args):
+    print(f"{'serie':<36} {'puntos':>7} {'GROUP BY ms':>12} {'resumen ms':>11}")
+    errores = 0
+    with database.get_pool().connection() as conn:
+        cursor = conn.cursor()
+        for tabla, filtros in SERIES:
+            tiempos = {}
+            for modelo, leer in (("GROUP BY", serie_recorriendo_tabla), ("resumen", leer_serie)):
+                muestras = []
+                for _ in range(args.rondas):
+                    inicio = time.perf_counter()
+                    puntos = leer(cursor, tabla, **filtros)
+                    muestras.append(time.perf_counter() - inicio)
+                tiempos[modelo] = (statistics.median(muestras) * 1000, puntos)
+            nombre = tabla + " " + ",".join(f"{k}={v}" for k, v in filtros.items() if k != "desde")
+            print(f"{nombre[:36]:<36} {len(tiempos['resumen'][1]):>7} "
+                  f"{tiempos['GROUP BY'][0]:>12.2f} {tiempos['resumen'][0]:>11.2f}")
+            if tiempos["GROUP BY"][1] != tiempos["resumen"][1]:
+                print(f"ERROR: la serie de {tabla} no coincide con GROUP BY")
+                errores += 1
+    return 1 if errores else 0
+
+
+# Textos que se escriben en el buscador de pacientes (con y sin acentos, prefijos)
+TEXTOS_BUSQUEDA = ["maria", "jose per", "gonzalez", "ma", "fernandez rodriguez", "sofía muñoz", "ID0000123"]
+
+
+async def escenario_busqueda(args):
+    import main as api
+
+    def coincide(texto, paciente):
+        # Cada palabra buscada es prefijo de alguna palabra del paciente
+        texto_paciente = palabras(" ".join(
+            str(paciente[columna] or "") for columna in ("Nombre", "Apellidos", "Numero_Identificacion")
+        ))
+        return all(any(p.startswith(b) for p in texto_paciente) for b in palabras(texto))
+
+    print(f"{'texto':<22} {'LIKE ms':>9} {'filas':>6} {'FTS5 ms':>9} {'filas':>6} {'endpoint ms':>12}")
+    errores = 0
+    transporte = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        for texto in TEXTOS_BUSQUEDA:
+            fila = [texto]
+            with database.get_pool().connection() as conn:
+                cursor = conn.cursor()
+                for usar_fts in (False, True):
+                    tiempos = []
+                    for _ in range(args.rondas):
+                        inicio = time.perf_counter()
+                        codigos = buscar(cursor, "pacientes", texto, 20, usar_fts)
+                        tiempos.append(time.perf_counter() - inicio)
+                    fila.extend([statistics.median(tiempos) * 1000, len(codigos)])
+
+            tiempos = []
+            for _ in range(args.rondas):
+                inicio = time.perf_counter()
+                respuesta = await cliente.get("/api/pacientes/buscar", params={"q": texto})
+                tiempos.append(time.perf_counter() - inicio)
+            respuesta.raise_for_status()
+            fila.append(statistics.median(tiempos) * 1000)
+            print("{:<22} {:>9.2f} {:>6} {:>9.2f} {:>6} {:>12.2f}".format(*fila))
+
+            incorrectos = [p["Codigo"] for p in respuesta.json() if not coincide(texto, p)]
+            if incorrectos:
+                print(f"ERROR: resultados de '{texto}' sin las palabras buscadas: {incorrectos[:5]}")
+                errores += 1
+    return 1 if errores else 0
+
+
+# Textos que se escriben en los selectores de paciente, letra a letra
+TEXTOS_AUTOCOMPLETADO = ["j", "jo", "jos", "jose", "jose p", "jose pe", "ID00001", "muñoz g", "zzz"]
+
+
+async def escenario_autocompletado(args):
+    import main as api
+
+    transporte = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        # Modelo anterior: todos los pacientes con las columnas del selector
+        inicio = time.perf_counter()
+        peticiones, enviados, pacientes = 0, 0, []
+        params = {"limit": API_MAX_PAGE_SIZE, "fields": "Nombre,Apellidos,Numero_Identificacion"}
+        while True:
+            respuesta = await cliente.get("/api/pacientes/", params=params)
+            respuesta.raise_for_status()
+            peticiones += 1
+            enviados += len(respuesta.content)
+            pacientes.extend(respuesta.json())
+            cursor = respuesta.headers.get("x-next-cursor")
+            if not cursor:
+                break
+            params["cursor"] = cursor
+        print(f"Listado completo: {peticiones} peticiones, {enviados / 1024:.0f} KB, "
+              f"{(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+        indice = get_indice("pacientes")
+        with database.get_pool().connection() as conn:
+            inicio = time.perf_counter()
+            cargar_indices(conn.cursor())
+        print(f"Carga del índice: {len(indice)} pacientes en {(time.perf_counter() - inicio) * 1000:.0f} ms\n")
+
+        def palabras_paciente(paciente):
+            texto = " ".join(str(paciente[c] or "") for c in ("Nombre", "Apellidos", "Numero_Identificacion"))
+            return palabras(texto)
+
+        print(f"{'texto':<12} {'coinciden':>9} {'índice µs':>10} {'endpoint ms':>12}")
+        errores = 0
+        for texto in TEXTOS_AUTOCOMPLETADO:
+            tiempos = []
+            for _ in range(args.rondas):
+                inicio = time.perf_counter()
+                sugerencias = indice.buscar(texto, 10)
+                tiempos.append(time.perf_counter() - inicio)
+            buscado = statistics.median(tiempos) * 1_000_000
+
+            tiempos = []
+            for _ in range(min(args.rondas, 50)):
+                inicio = time.perf_counter()
+                respuesta = await cliente.get("/api/autocomplete/", params={"q": texto, "tipo": "paciente"})
+                tiempos.append(time.perf_counter() - inicio)
+            respuesta.raise_for_status()
+
+            # Lo que filtraba el navegador: cada palabra es prefijo de alguna del paciente
+            coinciden = {
+                p["Codigo"] for p in pacientes
+                if all(any(w.startswith(b) for w in palabras_paciente(p)) for b in palabras(texto))
+            }
+            print(f"{texto:<12} {len(coinciden):>9} {buscado:>10.1f} {statistics.median(tiempos) * 1000:>12.2f}")
+            codigos = [s["Codigo"] for s in respuesta.json()]
+            if len(codigos) != min(10, len(coinciden)) or not set(codigos) <= coinciden:
+                print(f"ERROR: sugerencias incorrectas para '{texto}': {codigos}")
+                errores += 1
+
+        # Alta y baja incrementales, como las aplican los routers
+        fila = {"Codigo": 10 ** 9, "Nombre": "Zoe", "Apellidos": "Prueba", "Numero_Identificacion": None}
+        inicio = time.perf_counter()
+        for version in range(indice.version + 1, indice.version + 1 + 2 * args.rondas, 2):
+            indice.guardar(fila, version)
+            indice.eliminar(fila["Codigo"], version + 1)
+        print(f"\nAlta + baja en el índice: {(time.perf_counter() - inicio) / args.rondas * 1_000_000:.0f} µs")
+    return 1 if errores else 0
+
+
+async def descargar_todo(cliente, ruta: str, params: dict):
+    """Todas las páginas de un listado: (filas, peticiones, bytes)"""
+    params = dict(params, limit=API_MAX_PAGE_SIZE)
+    filas, peticiones, enviados = [], 0, 0
+    while True:
+        respuesta = await cliente.get(ruta, params=params)
+        respuesta.raise_for_status()
+        peticiones += 1
+        enviados += len(respuesta.content)
+        filas.extend(respuesta.json())
+        cursor = respuesta.headers.get("x-next-cursor")
+        if not cursor:
+            return filas, peticiones, enviados
+        params["cursor"] = cursor
+
+
+async def escenario_calendario(args):
+    import main as api
+
+    # Semana en medio del rango de las citas sintéticas (una cada 30 minutos)
+    desde = (datetime(2024, 1, 1) + timedelta(minutes=15 * args.citas)).date()
+    hasta = desde + timedelta(days=6)
+    transporte = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        # Modelo anterior: todas las citas más pacientes y doctores para los nombres
+        inicio = time.perf_counter()
+        peticiones, enviados = 0, 0
+        descargas = {}
+        for ruta, campos in (
+            ("/api/citas/", "Codigo,Fecha_Hora,Estado,Motivo,Codigo_Doctor,Codigo_Paciente"),
+            ("/api/pacientes/", "Codigo,Nombre,Apellidos"),
+            ("/api/doctores/", "Codigo,Nombre,Apellidos"),
+        ):
+            filas, n, tam = await descargar_todo(cliente, ruta, {"fields": campos})
+            descargas[ruta] = filas
+            peticiones += n
+            enviados += tam
+        semana = [
+            cita for cita in descargas["/api/citas/"]
+            if desde.isoformat() <= cita["Fecha_Hora"][:10] <= hasta.isoformat()
+        ]
+        anterior = (time.perf_counter() - inicio) * 1000
+        print(f"Listados completos: {peticiones} peticiones, {enviados / 1024:.0f} KB, "
+              f"{anterior:.0f} ms -> {len(semana)} citas")
+
+        params = {"desde": desde.isoformat(), "hasta": hasta.isoformat()}
+        tiempos = []
+        for _ in range(args.rondas):
+            inicio = time.perf_counter()
+            respuesta = await cliente.get("/api/citas/calendario", params=params)
+            tiempos.append(time.perf_counter() - inicio)
+        respuesta.raise_for_status()
+        calendario = respuesta.json()
+        print(f"Calendario: 1 petición, {len(respuesta.content) / 1024:.0f} KB, "
+              f"{statistics.median(tiempos) * 1000:.2f} ms -> {len(calendario)} citas")
+
+    errores = 0
+    if sorted(c["Codigo"] for c in calendario) != sorted(c["Codigo"] for c in semana):
+        print("ERROR: las citas del calendario no coinciden con las de la semana")
+        errores += 1
+    with database.get_pool().connection() as conn:
+        plan = [fila[3] for fila in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT c.Codigo FROM citas c WHERE c.Codigo_Doctor IN (SELECT Codigo FROM doctor) "
+            "AND c.Fecha_Hora >= ? AND c.Fecha_Hora < ? ORDER BY c.Codigo_Doctor, c.Fecha_Hora",
+            (desde.isoformat(), hasta.isoformat()),
+        ).fetchall()]
+    print("Plan: " + " | ".join(plan))
+    if not any("idx_citas_doctor_fecha" in paso for paso in plan) or any("TEMP B-TREE" in paso for paso in plan):
+        print("ERROR: la consulta del calendario no usa el índice (Codigo_Doctor, Fecha_Hora)")
+        errores += 1
+    return 1 if errores else 0
+
+
+async def escenario_lote(args):
+    import main as api
+
+    # Jornada de vacunación: horarios al azar de los próximos días, con choques
+    # entre citas del propio lote y algún paciente inexistente
+    manana = datetime.combine((datetime.now() + timedelta(days=1)).date(), AGENDA_HORA_INICIO)
+    lote = [
+        {
+            "Codigo_Paciente": random.randint(1, 510),
+            "Codigo_Doctor": random.randint(1, 40),
+            "Fecha_Hora": (manana + timedelta(days=random.randint(0, 4),
+                                              minutes=AGENDA_INTERVALO * random.randint(0, 39))).isoformat(),
+            "Motivo": "Vacunación",
+        }
+        for _ in range(args.tamano)
+    ]
+
+    def borrar_lote(codigos):
+        writer.run_write(lambda conn: conn.executemany(
+            "DELETE FROM citas WHERE Codigo = ?", [(codigo,) for codigo in codigos]
+        ).rowcount)
+
+    transporte = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        inicio = time.perf_counter()
+        individuales = []
+        for cita in lote:
+            respuesta = await cliente.post("/api/citas/", json=cita)
+            individuales.append((respuesta.status_code, respuesta.json().get("Codigo")))
+        anterior = (time.perf_counter() - inicio) * 1000
+        borrar_lote([codigo for estado, codigo in individuales if estado == 201])
+
+        inicio = time.perf_counter()
+        respuesta = await cliente.post("/api/citas/bulk", json=lote)
+        en_lote = (time.perf_counter() - inicio) * 1000
+        respuesta.raise_for_status()
+        resultados = respuesta.json()
+
+    creadas = sum(1 for estado, _ in individuales if estado == 201)
+    print(f"{'modelo':<14} {'peticiones':>10} {'creadas':>8} {'ms':>9}")
+    print(f"{'individual':<14} {len(lote):>10} {creadas:>8} {anterior:>9.0f}")
+    print(f"{'bulk':<14} {1:>10} {sum(1 for r in resultados if r['Codigo']):>8} {en_lote:>9.0f}")
+
+    distintos = [
+        i for i, (resultado, (estado, _)) in enumerate(zip(resultados, individuales))
+        if resultado["Codigo_HTTP"] != estado
+    ]
+    if distintos:
+        print(f"ERROR: {len(distintos)} citas con resultado distinto al individual, p. ej. {lote[distintos[0]]}")
+        return 1
+    return 0
+
+
+def choques_activos(doctor: int, desde: datetime, hasta: datetime) -> int:
+    """Pares de citas activas del doctor que chocan entre sí en el rango"""
+    with database.get_pool().connection() as conn:
+        filas = conn.execute(
+            f"SELECT Fecha_Hora FROM citas WHERE Codigo_Doctor = ? AND Fecha_Hora >= ? AND Fecha_Hora < ? "
+            f"AND {condicion_activa()} ORDER BY Fecha_Hora",
+            (doctor, desde.isoformat(), hasta.isoformat()),
+        ).fetchall()
+    inicios = [datetime.fromisoformat(fila[0]) for fila in filas]
+    duracion = timedelta(minutes=AGENDA_DURACION_CITA)
+    return sum(1 for anterior, siguiente in zip(inicios, inicios[1:]) if siguiente - anterior < duracion)
+
+
+async def escenario_reservas(args):
+    import main as api
+
+    anyio.to_thread.current_default_thread_limiter().total_tokens = database.DB_MAX_WORKERS
+    # Todas piden el mismo doctor a la misma hora o pocos minutos después
+    manana = datetime.combine((datetime.now() + timedelta(days=1)).date(), AGENDA_HORA_INICIO)
+    pedidas = [manana + timedelta(minutes=random.choice((0, 0, 0, 5, 10))) for _ in range(args.reservas)]
+    fin = manana + timedelta(hours=1)
+    insertar = "INSERT INTO citas (Codigo_Paciente, Codigo_Doctor, Fecha_Hora, Estado, Motivo) VALUES (?, ?, ?, ?, ?)"
+
+    def reservar_anterior(doctor: int, fecha: datetime) -> int:
+        # Modelo anterior: SELECT en una conexión de lectura y, después, el INSERT
+        with database.get_pool().connection() as conn:
+            try:
+                citas.verificar_disponibilidad_doctor(conn.cursor(), doctor, fecha)
+            except HTTPException as e:
+                return e.status_code
+        writer.run_write(lambda conn: conn.execute(insertar, (1, doctor, fecha.isoformat(), "Programada", "Reserva")))
+        return 201
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(args.reservas, 64)) as ejecutor:
+        anteriores = list(ejecutor.map(partial(reservar_anterior, 1), pedidas))
+    anterior = (time.perf_counter() - inicio) * 1000
+
+    transporte = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=60) as cliente:
+        inicio = time.perf_counter()
+        respuestas = await asyncio.gather(*(
+            cliente.post("/api/citas/", json={
+                "Codigo_Paciente": 1, "Codigo_Doctor": 2, "Fecha_Hora": fecha.isoformat(), "Motivo": "Reserva"
+            })
+            for fecha in pedidas
+        ))
+        actual = (time.perf_counter() - inicio) * 1000
+
+        # Citas del doctor 3 en días distintos que intentan moverse al mismo horario
+        creadas = await asyncio.gather(*(
+            cliente.post("/api/citas/", json={
+                "Codigo_Paciente": 1, "Codigo_Doctor": 3,
+                "Fecha_Hora": (manana + timedelta(days=1 + n // 30, minutes=AGENDA_DURACION_CITA * (n % 30))).isoformat(),
+            })
+            for n in range(args.reservas)
+        ))
+        inicio = time.perf_counter()
+        movidas = await asyncio.gather(*(
+            cliente.put(f"/api/citas/{respuesta.json()['Codigo']}", json={"Fecha_Hora": fecha.isoformat()})
+            for respuesta, fecha in zip(creadas, pedidas)
+        ))
+        mover = (time.perf_counter() - inicio) * 1000
+
+    def resumen(codigos):
+        return {codigo: codigos.count(codigo) for codigo in sorted(set(codigos))}
+
+    print(f"{'modelo':<22} {'peticiones':>10} {'ms':>8}  códigos HTTP")
+    print(f"{'anterior (sin HTTP)':<22} {len(pedidas):>10} {anterior:>8.0f}  {resumen(anteriores)}")
+    print(f"{'actual (POST)':<22} {len(pedidas):>10} {actual:>8.0f}  "
+          f"{resumen([r.status_code for r in respuestas])}")
+    print(f"{'actual (PUT)':<22} {len(pedidas):>10} {mover:>8.0f}  "
+          f"{resumen([r.status_code for r in movidas])}")
+    print(f"Choques entre citas activas: anterior {choques_activos(1, manana, fin)}, "
+          f"actual {choques_activos(2, manana, fin) + choques_activos(3, manana, fin)}")
+
+    errores = 0
+    for doctor, aceptadas in ((2, sum(1 for r in respuestas if r.status_code == 201)),
+                              (3, sum(1 for r in movidas if r.status_code == 200))):
+        if choques_activos(doctor, manana, fin) or aceptadas != 1:
+            print(f"ERROR: doctor {doctor}: {aceptadas} reservas aceptadas del mismo horario")
+            errores += 1
+    return 1 if errores else 0
+
+
+async def escenario_estados(args):
+    import main as api
+
+    # Agenda completa de mañana para los primeros doctores: una cita tras otra
+    dia = datetime.combine((datetime.now() + timedelta(days=1)).date(), AGENDA_HORA_INICIO)
+    horarios = list(horarios_agenda(dia, 1))
+    agenda = [
+        {"Codigo_Paciente": random.randint(1, 500), "Codigo_Doctor": doctor, "Fecha_Hora": momento.isoformat()}
+        for doctor in range(1, args.doctores + 1)
+        for momento in horarios[::AGENDA_DURACION_CITA // AGENDA_INTERVALO or 1]
+    ]
+    rango = {"Desde": dia.date().isoformat() + "T00:00:00", "Hasta": (dia + timedelta(days=1)).date().isoformat() + "T00:00:00"}
+
+    def restaurar(codigos, fechas):
+        writer.run_write(lambda conn: conn.executemany(
+            "UPDATE citas SET Estado = 'Programada', Fecha_Hora = ? WHERE Codigo = ?",
+            [(fechas[codigo], codigo) for codigo in codigos]
+        ).rowcount)
+
+    def horarios_actuales(codigos):
+        with database.get_pool().connection() as conn:
+            return {
+                fila[0]: (fila[1], fila[2]) for fila in conn.execute(
+                    f"SELECT Codigo, Fecha_Hora, Estado FROM citas WHERE Codigo IN ({', '.join('?' for _ in codigos)})",
+                    codigos,
+                ).fetchall()
+            }
+
+    transporte = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        respuesta = await cliente.post("/api/citas/bulk", json=agenda)
+        respuesta.raise_for_status()
+        codigos = [resultado["Codigo"] for resultado in respuesta.json() if resultado["Codigo"]]
+        originales = {codigo: fecha for codigo, (fecha, _) in horarios_actuales(codigos).items()}
+
+        tiempos, finales = {}, {}
+        for operacion, cambio in (
+            ("cancelar", lambda fecha: {"Estado": "Cancelada"}),
+            ("mover +1 día", lambda fecha: {"Fecha_Hora": (datetime.fromisoformat(fecha) + timedelta(days=1)).isoformat()}),
+        ):
+            inicio = time.perf_counter()
+            for codigo in codigos:
+                (await cliente.put(f"/api/citas/{codigo}", json=cambio(originales[codigo]))).raise_for_status()
+            anterior = (time.perf_counter() - inicio) * 1000
+            esperado = horarios_actuales(codigos)
+            restaurar(codigos, originales)
+
+            cuerpo = {**rango, "Nuevo_Estado": "Cancelada"} if operacion == "cancelar" else \
+                {**rango, "Desplazamiento_Minutos": 24 * 60}
+            inicio = time.perf_counter()
+            respuesta = await cliente.put("/api/citas/bulk", json=cuerpo)
+            en_lote = (time.perf_counter() - inicio) * 1000
+            respuesta.raise_for_status()
+            afectadas = respuesta.json()["Citas_Afectadas"]
+            tiempos[operacion] = (anterior, en_lote, len(afectadas))
+            finales[operacion] = (esperado, horarios_actuales(codigos), sorted(afectadas))
+            restaurar(codigos, originales)
+
+    print(f"{'operación':<14} {'citas':>6} {'PUT por cita ms':>16} {'bulk ms':>9}")
+    for operacion, (anterior, en_lote, afectadas) in tiempos.items():
+        print(f"{operacion:<14} {afectadas:>6} {anterior:>16.0f} {en_lote:>9.1f}")
+
+    errores = 0
+    for operacion, (esperado, obtenido, afectadas) in finales.items():
+        if afectadas != sorted(codigos) or esperado != obtenido:
+            print(f"ERROR: {operacion}: el resultado del lote difiere del de un PUT por cita")
+            errores += 1
+    return 1 if errores else 0
+
+
+async def escenario_recurrentes(args):
+    import main as api
+
+    # Controles semanales a la misma hora; algunos chocan con citas existentes
+    manana = datetime.combine((datetime.now() + timedelta(days=1)).date(), AGENDA_HORA_INICIO)
+    series = [
+        {
+            "Codigo_Paciente": random.randint(1, 500),
+            "Codigo_Doctor": random.randint(1, 40),
+            "Fecha_Inicio": (manana + timedelta(days=random.randint(0, 6),
+                                                minutes=AGENDA_INTERVALO * random.randint(0, 39))).isoformat(),
+            "Frecuencia": "semanal",
+            "Repeticiones": args.repeticiones,
+            "Motivo": "Control",
+        }
+        for _ in range(args.series)
+    ]
+    # "Esta y las siguientes" desde la mitad de la serie
+    corte = args.repeticiones // 2
+
+    def fechas(serie):
+        inicio = datetime.fromisoformat(serie["Fecha_Inicio"])
+        return [inicio + timedelta(weeks=n) for n in range(args.repeticiones)]
+
+    def borrar(codigos):
+        writer.run_write(lambda conn: conn.executemany(
+            "DELETE FROM citas WHERE Codigo = ?", [(codigo,) for codigo in codigos]
+        ).rowcount)
+
+    transporte = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        inicio = time.perf_counter()
+        individuales = []
+        for serie in series:
+            datos = {k: serie[k] for k in ("Codigo_Paciente", "Codigo_Doctor", "Motivo")}
+            for fecha in fechas(serie):
+                respuesta = await cliente.post("/api/citas/", json={**datos, "Fecha_Hora": fecha.isoformat()})
+                individuales.append((respuesta.status_code, respuesta.json().get("Codigo"), fecha))
+        crear_anterior = (time.perf_counter() - inicio) * 1000
+        canceladas_anterior = set()
+        inicio = time.perf_counter()
+        for numero in range(len(series)):
+            por_serie = individuales[numero * args.repeticiones:(numero + 1) * args.repeticiones]
+            for indice in range(corte, len(por_serie)):
+                estado, codigo, _ = por_serie[indice]
+                if estado == 201:
+                    await cliente.put(f"/api/citas/{codigo}", json={"Estado": "Cancelada"})
+                    canceladas_anterior.add((numero, indice))
+        cancelar_anterior = (time.perf_counter() - inicio) * 1000
+        borrar([codigo for estado, codigo, _ in individuales if estado == 201])
+
+        inicio = time.perf_counter()
+        creadas = []
+        for serie in series:
+            respuesta = await cliente.post("/api/citas/series", json=serie)
+            respuesta.raise_for_status()
+            creadas.append(respuesta.json())
+        crear_series = (time.perf_counter() - inicio) * 1000
+        canceladas_series = set()
+        inicio = time.perf_counter()
+        for numero, (serie, creada) in enumerate(zip(series, creadas)):
+            if creada["Codigo_Serie"] is None:
+                continue
+            desde = fechas(serie)[corte].isoformat()
+            respuesta = await cliente.delete(f"/api/citas/series/{creada['Codigo_Serie']}", params={"desde": desde})
+            afectadas = set(respuesta.json()["Citas_Afectadas"])
+            canceladas_series.update(
+                (numero, cita["Indice"]) for cita in creada["Citas"] if cita["Codigo"] in afectadas
+            )
+        cancelar_series = (time.perf_counter() - inicio) * 1000
+
+    total = len(individuales)
+    print(f"{'modelo':<14} {'peticiones':>10} {'creadas':>8} {'crear ms':>9} {'cancelar ms':>12}")
+    print(f"{'individual':<14} {total + len(canceladas_anterior):>10} "
+          f"{sum(1 for e, _, _ in individuales if e == 201):>8} {crear_anterior:>9.0f} {cancelar_anterior:>12.0f}")
+    print(f"{'series':<14} {2 * len(series):>10} "
+          f"{sum(1 for c in creadas for cita in c['Citas'] if cita['Codigo']):>8} "
+          f"{crear_series:>9.0f} {cancelar_series:>12.0f}")
+
+    errores = 0
+    estados = [cita["Codigo_HTTP"] for creada in creadas for cita in creada["Citas"]]
+    distintos = [i for i, ((estado, _, _), nuevo) in enumerate(zip(individuales, estados)) if estado != nuevo]
+    if distintos:
+        print(f"ERROR: {len(distintos)} citas con resultado distinto al individual, p. ej. {individuales[distintos[0]][2]}")
+        errores += 1
+    if canceladas_series != canceladas_anterior:
+        print(f"ERROR: las citas canceladas difieren ({len(canceladas_series)} frente a {len(canceladas_anterior)})")
+        errores += 1
+    return 1 if errores else 0
+
+
+def escenario_cierre(args):
+    # Las citas sintéticas empiezan en 2024: las pasadas con estado activo son
+    # las que nadie cerró
+    ahora = datetime.now()
+    limite = limite_barrido(ahora).isoformat()
+    activa = condicion_activa()
+
+    def estados():
+        with database.get_pool().connection() as conn:
+            return dict(conn.execute("SELECT Codigo, Estado FROM citas").fetchall())
+
+    def comprobaciones(indice: str) -> float:
+        """Mediana en µs de la consulta de verificar_disponibilidad_doctor en horarios futuros"""
+        with database.get_pool().connection() as conn:
+            cursor = conn.cursor()
+            tiempos = []
+            for _ in range(args.rondas):
+                momento = ahora + timedelta(days=random.randint(1, 30), minutes=15 * random.randint(0, 40))
+                desde = (momento - timedelta(minutes=AGENDA_DURACION_CITA)).isoformat()
+                hasta = (momento + timedelta(minutes=AGENDA_DURACION_CITA)).isoformat()
+                inicio = time.perf_counter()
+                cursor.execute(
+                    f"SELECT Codigo FROM citas INDEXED BY {indice} WHERE Codigo_Doctor = ? "
+                    f"AND Fecha_Hora > ? AND Fecha_Hora < ? AND {activa} LIMIT 1",
+                    (random.randint(1, 40), desde, hasta),
+                ).fetchone()
+                tiempos.append(time.perf_counter() - inicio)
+        return statistics.median(tiempos) * 1e6
+
+    with database.get_pool().connection() as conn:
+        conn.execute("ANALYZE")
+        con_consulta = {fila[0] for fila in conn.execute(
+            "SELECT Codigo_Cita FROM consultas WHERE Codigo_Cita IS NOT NULL"
+        ).fetchall()}
+        plan = [fila[3] for fila in conn.execute(
+            f"EXPLAIN QUERY PLAN SELECT Codigo FROM citas WHERE Fecha_Hora < ? AND {activa} "
+            f"ORDER BY Fecha_Hora LIMIT ?",
+            (limite, 500),
+        ).fetchall()]
+    antes = estados()
+    completo_antes = comprobaciones("idx_citas_doctor_fecha")
+
+    inicio = time.perf_counter()
+    cerradas = barrer_citas(ahora)
+    barrido = (time.perf_counter() - inicio) * 1000
+    inicio = time.perf_counter()
+    repetidas = barrer_citas(ahora)
+    sin_cambios = (time.perf_counter() - inicio) * 1000
+    despues = estados()
+
+    with database.get_pool().connection() as conn:
+        conn.execute("ANALYZE")
+        activas_antes = sum(1 for codigo, estado in antes.items() if estado in ("Programada", "Confirmada"))
+        activas_despues = conn.execute(f"SELECT COUNT(*) FROM citas WHERE {activa}").fetchone()[0]
+        try:
+            paginas = dict(conn.execute(
+                "SELECT name, COUNT(*) FROM dbstat WHERE name IN ('idx_citas_doctor_fecha', 'idx_citas_activas') "
+                "GROUP BY name"
+            ).fetchall())
+        except sqlite3.OperationalError:
+            # SQLite compilado sin la tabla virtual dbstat
+            paginas = {}
+    parcial = comprobaciones("idx_citas_activas")
+
+    print(f"Barrido: {cerradas} citas cerradas en {barrido:.0f} ms; segundo barrido {sin_cambios:.1f} ms")
+    print(f"Citas activas: {activas_antes} antes, {activas_despues} después (de {len(antes)})")
+    if paginas:
+        print(f"Páginas del índice: {paginas['idx_citas_doctor_fecha']} idx_citas_doctor_fecha (todas las citas), "
+              f"{paginas['idx_citas_activas']} idx_citas_activas")
+    print(f"Comprobación de disponibilidad: {completo_antes:.1f} µs con idx_citas_doctor_fecha, "
+          f"{parcial:.1f} µs con idx_citas_activas")
+    print("Plan: " + " | ".join(plan))
+
+    errores = 0
+    with database.get_pool().connection() as conn:
+        pendientes = conn.execute(f"SELECT COUNT(*) FROM citas WHERE Fecha_Hora < ? AND {activa}", (limite,)).fetchone()[0]
+        futuras = {fila[0] for fila in conn.execute("SELECT Codigo FROM citas WHERE Fecha_Hora >= ?", (limite,)).fetchall()}
+    if pendientes or repetidas:
+        print(f"ERROR: quedan {pendientes} citas pasadas activas")
+        errores += 1
+    if any(antes[codigo] != despues[codigo] for codigo in futuras):
+        print("ERROR: el barrido cambió citas que aún no terminan")
+        errores += 1
+    cambiadas = [codigo for codigo in antes if antes[codigo] != despues[codigo]]
+    if len(cambiadas) != cerradas or any(
+        despues[codigo] != ("Completada" if codigo in con_consulta else AGENDA_BARRIDO_ESTADO) for codigo in cambiadas
+    ):
+        print("ERROR: el estado final de alguna cita cerrada no corresponde")
+        errores += 1
+    if not any("idx_citas_activas_fecha" in paso for paso in plan):
+        print("ERROR: el barrido no usa el índice parcial de citas activas")
+        errores += 1
+    return 1 if errores else 0
+
+
+def horarios_agenda(dia: datetime, dias: int):
+    """Inicios posibles de una cita en el horario de atención, día a día"""
+    for n in range(dias):
+        momento = datetime.combine((dia + timedelta(days=n)).date(), AGENDA_HORA_INICIO)
+        cierre = datetime.combine(momento.date(), AGENDA_HORA_FIN)
+        while momento + timedelta(minutes=AGENDA_DURACION_CITA) <= cierre:
+            yield momento
+            momento += timedelta(minutes=AGENDA_INTERVALO)
+
+
+async def escenario_ausencias(args):
+    import main as api
+
+    especialidad = "Cardiología"
+    manana = datetime.combine((datetime.now() + timedelta(days=1)).date(), datetime.min.time())
+    with database.get_pool().connection() as conn:
+        doctores = [fila[0] for fila in conn.execute(
+            "SELECT Codigo FROM doctor WHERE Especialidad = ? ORDER BY Codigo", (especialidad,)
+        ).fetchall()]
+    ausente = doctores[0]
+
+    # El doctor que se ausenta tiene la agenda llena; el resto, en parte
+    futuras = [
+        (1, codigo, momento.isoformat(), random.choice(["Programada", "Confirmada"]), "Control")
+        for codigo in doctores
+        for momento in horarios_agenda(manana, args.dias)
+        if momento.minute % AGENDA_DURACION_CITA == 0 and (codigo == ausente or random.random() < args.ocupacion)
+    ]
+    writer.run_write(lambda conn: conn.executemany(
+        "INSERT INTO citas (Codigo_Paciente, Codigo_Doctor, Fecha_Hora, Estado, Motivo) VALUES (?, ?, ?, ?, ?)",
+        futuras,
+    ).rowcount)
+    fin_agenda = manana + timedelta(days=args.dias + AGENDA_MAX_DIAS + 1)
+
+    def agenda():
+        with database.get_pool().connection() as conn:
+            return {
+                fila[0]: (fila[1], fila[2]) for fila in conn.execute(
+                    f"SELECT Codigo, Codigo_Doctor, Fecha_Hora FROM citas WHERE Fecha_Hora >= ? AND {condicion_activa()}",
+                    (manana.isoformat(),),
+                ).fetchall()
+            }
+
+    def restaurar(originales):
+        writer.run_write(lambda conn: conn.executemany(
+            "UPDATE citas SET Codigo_Doctor = ?, Fecha_Hora = ? WHERE Codigo = ?",
+            [(doctor, fecha, codigo) for codigo, (doctor, fecha) in originales.items()],
+        ).rowcount)
+
+    errores = 0
+    transporte = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        (await cliente.put(f"/api/doctores/{ausente}", json={"Estado": "Vacaciones"})).raise_for_status()
+        originales = agenda()
+        afectadas = sorted(
+            (fecha, codigo) for codigo, (doctor, fecha) in originales.items() if doctor == ausente
+        )
+        print(f"{len(doctores)} doctores de {especialidad}; el doctor {ausente} tiene "
+              f"{len(afectadas)} citas en {args.dias} días\n")
+
+        # Modelo anterior: por cada cita, el primer hueco de la especialidad y un PUT
+        inicio = time.perf_counter()
+        peticiones, movidas = 0, 0
+        for fecha, codigo in afectadas:
+            desde = datetime.fromisoformat(fecha)
+            respuesta = await cliente.get("/api/citas/disponibilidad", params={
+                "especialidad": especialidad, "desde": desde.isoformat(),
+                "hasta": (desde + timedelta(days=AGENDA_MAX_DIAS)).isoformat(), "limit": 1,
+            })
+            peticiones += 1
+            huecos = respuesta.json()
+            if not huecos:
+                continue
+            respuesta = await cliente.put(f"/api/citas/{codigo}", json={
+                "Codigo_Doctor": huecos[0]["Codigo_Doctor"], "Fecha_Hora": huecos[0]["Inicio"]
+            })
+            peticiones += 1
+            movidas += respuesta.status_code == 200
+        anterior = (time.perf_counter() - inicio) * 1000, peticiones, movidas, len(afectadas) - movidas
+        restaurar(originales)
+
+        resultados = {}
+        for simular in (True, False):
+            inicio = time.perf_counter()
+            respuesta = await cliente.post(
+                "/api/citas/reprogramar", params={"simular": simular},
+                json={"Codigo_Doctor": ausente, "Desde": manana.isoformat(),
+                      "Hasta": (manana + timedelta(days=args.dias)).isoformat()},
+            )
+            tiempo = (time.perf_counter() - inicio) * 1000
+            respuesta.raise_for_status()
+            resultados[simular] = (tiempo, respuesta.json())
+            if simular and agenda() != originales:
+                print("ERROR: la simulación modificó citas")
+                errores += 1
+
+    print(f"{'modelo':<26} {'peticiones':>10} {'ms':>9} {'reprogramadas':>14} {'sin hueco':>10}")
+    print(f"{'GET + PUT por cita':<26} {anterior[1]:>10} {anterior[0]:>9.0f} {anterior[2]:>14} {anterior[3]:>10}")
+    for simular, (tiempo, plan) in resultados.items():
+        nombre = "reprogramar (simulación)" if simular else "reprogramar"
+        print(f"{nombre:<26} {1:>10} {tiempo:>9.1f} {len(plan['Reprogramadas']):>14} {len(plan['Sin_Asignar']):>10}")
+
+    simulado, aplicado = resultados[True][1], resultados[False][1]
+    if simulado["Reprogramadas"] != aplicado["Reprogramadas"]:
+        print("ERROR: el plan simulado no coincide con el aplicado")
+        errores += 1
+    finales = agenda()
+    if any(
+        finales[cita["Codigo"]] != (cita["Codigo_Doctor"], cita["Fecha_Hora"]) for cita in aplicado["Reprogramadas"]
+    ):
+        print("ERROR: alguna cita no quedó con el doctor y el horario del plan")
+        errores += 1
+    choques = sum(choques_activos(codigo, manana, fin_agenda) for codigo in doctores)
+    if choques:
+        print(f"ERROR: {choques} pares de citas activas chocan después de reprogramar")
+        errores += 1
+    return 1 if errores else 0
+
+
+async def escenario_disponibilidad(args):
+    import main as api
+
+    especialidad = "Cardiología"
+    manana = datetime.combine((datetime.now() + timedelta(days=1)).date(), datetime.min.time())
+    with database.get_pool().connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT Codigo FROM doctor WHERE Especialidad = ? ORDER BY Codigo", (especialidad,))
+        doctores = [fila[0] for fila in cursor.fetchall()]
+
+    # Agenda futura casi llena: citas de media hora en el horario de atención
+    futuras = []
+    for codigo in doctores:
+        for momento in horarios_agenda(manana, args.dias):
+            if momento.minute % AGENDA_DURACION_CITA == 0 and random.random() < args.ocupacion:
+                estado = "Cancelada" if random.random() < 0.05 else random.choice(["Programada", "Confirmada"])
+                futuras.append((1, codigo, momento.isoformat(), estado, "Control"))
+    writer.run_write(lambda conn: conn.executemany(
+        "INSERT INTO citas (Codigo_Paciente, Codigo_Doctor, Fecha_Hora, Estado, Motivo) VALUES (?, ?, ?, ?, ?)",
+        futuras,
+    ).rowcount)
+    print(f"{len(doctores)} doctores de {especialidad}, {len(futuras)} citas en {args.dias} días\n")
+
+    errores = 0
+    transporte = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        params = {"especialidad": especialidad, "desde": manana.isoformat(),
+                  "hasta": (manana + timedelta(days=args.dias)).isoformat()}
+        for limite in (1, 1000):
+            tiempos = []
+            for _ in range(args.rondas):
+                inicio = time.perf_counter()
+                respuesta = await cliente.get("/api/citas/disponibilidad", params={**params, "limit": limite})
+                tiempos.append(time.perf_counter() - inicio)
+            respuesta.raise_for_status()
+            print(f"Buscador (limit={limite}): {len(respuesta.json())} huecos, "
+                  f"{statistics.median(tiempos) * 1000:.2f} ms")
+            if limite == 1:
+                primero = respuesta.json()[:1]
+        huecos = respuesta.json()
+
+        # Modelo anterior: intentar reservar cada horario con cada doctor hasta
+        # que el servidor acepta uno (cada intento rechazado es un 409)
+        inicio = time.perf_counter()
+        intentos, reservada = 0, None
+        for momento in horarios_agenda(manana, args.dias):
+            for codigo in doctores:
+                intentos += 1
+                respuesta = await cliente.post("/api/citas/", json={
+                    "Codigo_Paciente": 1, "Codigo_Doctor": codigo, "Fecha_Hora": momento.isoformat()
+                })
+                if respuesta.status_code == 201:
+                    reservada = (codigo, momento.isoformat())
+                    break
+            if reservada:
+                break
+        print(f"Prueba y error: {intentos} peticiones, {(time.perf_counter() - inicio) * 1000:.1f} ms "
+              f"-> doctor {reservada[0]} a las {reservada[1]}")
+        if [(h["Codigo_Doctor"], h["Inicio"]) for h in primero] != [reservada]:
+            print(f"ERROR: el primer hueco {primero} no coincide con la reserva {reservada}")
+            errores += 1
+
+    # Cada hueco devuelto (salvo el ya reservado) debe poder reservarse
+    with database.get_pool().connection() as conn:
+        cursor = conn.cursor()
+        for hueco in huecos[1:]:
+            try:
+                citas.verificar_disponibilidad_doctor(
+                    cursor, hueco["Codigo_Doctor"], datetime.fromisoformat(hueco["Inicio"])
+                )
+            except HTTPException:
+                print(f"ERROR: el hueco {hueco} choca con una cita")
+                errores += 1
+                break
+    return 1 if errores else 0
+
+
+def main():
+    # Los routers configuran logging en INFO al importarse; aquí solo interesan las tablas
+    logging.getLogger().setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser(description="Benchmarks de la API del centro médico")
+    subparsers = parser.add_subparsers(dest="escenario", required=True)
+
+    p_latencia = subparsers.add_parser("latencia", help="p99 de peticiones concurrentes")
+    p_latencia.add_argument("--citas", type=int, default=5000)
+    p_latencia.add_argument("--concurrencia", type=int, default=20)
+    p_latencia.add_argument("--rondas", type=int, default=20)
+
+    p_escrituras = subparsers.add_parser("escrituras", help="escrituras/s con clientes concurrentes")
+    p_escrituras.add_argument("--citas", type=int, default=1000)
+    p_escrituras.add_argument("--clientes", type=int, default=50)
+    p_escrituras.add_argument("--operaciones", type=int, default=100)
+
+    p_consultas = subparsers.add_parser("consultas", help="sentencias SQL por endpoint de listado")
+    p_consultas.add_argument("--citas", type=int, default=2000)
+
+    p_paginacion = subparsers.add_parser("paginacion", help="recorrido completo por cursor")
+    p_paginacion.add_argument("--citas", type=int, default=5000)
+    p_paginacion.add_argument("--limite", type=int, default=100)
+
+    p_proyeccion = subparsers.add_parser("proyeccion", help="payload con ?fields= e ?include=")
+    p_proyeccion.add_argument("--citas", type=int, default=5000)
+    p_proyeccion.add_argument("--rondas", type=int, default=10)
+
+    p_streaming = subparsers.add_parser("streaming", help="memoria de una exportación completa")
+    p_streaming.add_argument("--citas", type=int, default=20000)
+
+    p_dashboard = subparsers.add_parser("dashboard", help="pantalla de inicio: listados vs agregados")
+    p_dashboard.add_argument("--citas", type=int, default=5000)
+
+    p_condicional = subparsers.add_parser("condicional", help="listados completos vs revalidación 304")
+    p_condicional.add_argument("--citas", type=int, default=5000)
+    p_condicional.add_argument("--rondas", type=int, default=10)
+
+    p_serializacion = subparsers.add_parser("serializacion", help="filas/s validadas frente a directas")
+    p_serializacion.add_argument("--citas", type=int, default=5000)
+    p_serializacion.add_argument("--rondas", type=int, default=20)
+
+    p_series = subparsers.add_parser("series", help="series temporales: GROUP BY vs resúmenes diarios")
+    p_series.add_argument("--citas", type=int, default=20000)
+    p_series.add_argument("--rondas", type=int, default=20)
+
+    p_busqueda = subparsers.add_parser("busqueda", help="búsqueda de pacientes: LIKE vs FTS5")
+    p_busqueda.add_argument("--citas", type=int, default=1000)
+    p_busqueda.add_argument("--pacientes", type=int, default=200000)
+    p_busqueda.add_argument("--rondas", type=int, default=20)
+
+    p_autocompletado = subparsers.add_parser("autocompletado", help="selectores: listado completo vs índice en memoria")
+    p_autocompletado.add_argument("--citas", type=int, default=1000)
+    p_autocompletado.add_argument("--pacientes", type=int, default=100000)
+    p_autocompletado.add_argument("--rondas", type=int, default=200)
+
+    p_calendario = subparsers.add_parser("calendario", help="vista semanal: listados completos vs calendario")
+    p_calendario.add_argument("--citas", type=int, default=50000)
+    p_calendario.add_argument("--rondas", type=int, default=20)
+
+    p_lote = subparsers.add_parser("lote", help="bloque de citas: un POST por cita vs /api/citas/bulk")
+    p_lote.add_argument("--citas", type=int, default=1000)
+    p_lote.add_argument("--tamano", type=int, default=500)
+
+    p_reservas = subparsers.add_parser("reservas", help="reservas simultáneas del mismo horario")
+    p_reservas.add_argument("--citas", type=int, default=1000)
+    p_reservas.add_argument("--reservas", type=int, default=300)
+
+    p_estados = subparsers.add_parser("estados", help="día de agenda: un PUT por cita vs PUT /api/citas/bulk")
+    p_estados.add_argument("--citas", type=int, default=1000)
+    p_estados.add_argument("--doctores", type=int, default=40)
+
+    p_recurrentes = subparsers.add_parser("recurrentes", help="series de citas: un POST por cita vs /api/citas/series")
+    p_recurrentes.add_argument("--citas", type=int, default=1000)
+    p_recurrentes.add_argument("--series", type=int, default=20)
+    p_recurrentes.add_argument("--repeticiones", type=int, default=26)
+
+    p_cierre = subparsers.add_parser("cierre", help="citas pasadas: cierre automático e índice parcial")
+    p_cierre.add_argument("--citas", type=int, default=100000)
+    p_cierre.add_argument("--rondas", type=int, default=2000)
+
+    p_ausencias = subparsers.add_parser("ausencias", help="vacaciones de un doctor: un PUT por cita vs /api/citas/reprogramar")
+    p_ausencias.add_argument("--citas", type=int, default=1000)
+    p_ausencias.add_argument("--dias", type=int, default=5)
+    p_ausencias.add_argument("--ocupacion", type=float, default=0.7)
+
+    p_disponibilidad = subparsers.add_parser("disponibilidad", help="primer hueco libre: prueba y error vs buscador")
+    p_disponibilidad.add_argument("--citas", type=int, default=1000)
+    p_disponibilidad.add_argument("--dias", type=int, default=14)
+    p_disponibilidad.add_argument("--ocupacion", type=float, default=0.95)
+    p_disponibilidad.add_argument("--rondas", type=int, default=20)
+
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "benchmark.db")
+        print(f"Preparando base de datos temporal con {args.citas} citas...")
+        preparar_base(ruta, args.citas, n_pacientes=getattr(args, "pacientes", 500))
+        database.init_pool(ruta)
+        writer.init_writer(ruta)
+        try:
+            if args.escenario == "latencia":
+                asyncio.run(escenario_latencia(args))
+            elif args.escenario == "escrituras":
+                escenario_escrituras(args)
+            elif args.escenario == "consultas":
+                return asyncio.run(escenario_consultas(args))
+            elif args.escenario == "paginacion":
+                return asyncio.run(escenario_paginacion(args))
+            elif args.escenario == "proyeccion":
+                asyncio.run(escenario_proyeccion(args))
+            elif args.escenario == "streaming":
+                escenario_streaming(args)
+            elif args.escenario == "dashboard":
+                return asyncio.run(escenario_dashboard(args))
+            elif args.escenario == "condicional":
+                return asyncio.run(escenario_condicional(args))
+            elif args.escenario == "serializacion":
+                return asyncio.run(escenario_serializacion(args))
+            elif args.escenario == "series":
+                return escenario_series(args)
+            elif args.escenario == "busqueda":
+                return asyncio.run(escenario_busqueda(args))
+            elif args.escenario == "autocompletado":
+                return asyncio.run(escenario_autocompletado(args))
+            elif args.escenario == "calendario":
+                return asyncio.run(escenario_calendario(args))
+            elif args.escenario == "lote":
+                return asyncio.run(escenario_lote(args))
+            elif args.escenario == "reservas":
+                return asyncio.run(escenario_reservas(args))
+            elif args.escenario == "estados":
+                return asyncio.run(escenario_estados(args))
+            elif args.escenario == "recurrentes":
+                return asyncio.run(escenario_recurrentes(args))
+            elif args.escenario == "cierre":
+                return escenario_cierre(args)
+            elif args.escenario == "ausencias":
+                return asyncio.run(escenario_ausencias(args))
+            elif args.escenario == "disponibilidad":
+                return asyncio.run(escenario_disponibilidad(args))
+        finally:
+            writer.close_writer()
+            database.close_pool()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
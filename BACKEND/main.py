@@ -6,11 +6,17 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError, HTTPException as FastAPIHTTPException
 from contextlib import asynccontextmanager
-from app.routers import pacientes, doctor, citas, consultas, receta, historial, examenes, usuarios, auth
+from app.routers import pacientes, doctor, citas, consultas, receta, historial, examenes, usuarios, auth, dashboard, autocomplete
+from app.autocomplete import cargar_indices
+from app.lifecycle import AGENDA_BARRIDO_INTERVALO, barrido_periodico
+from app.database import init_pool, close_pool, get_pool, DB_MAX_WORKERS
+from app.writer import init_writer, close_writer, get_writer
+from app.migrations import aplicar_migraciones
 from sqlite3 import OperationalError, DatabaseError
 import logging
 import traceback
 import asyncio
+import anyio
 
 # Configurar logging
 logging.basicConfig(
@@ -44,22 +50,47 @@ async def lifespan(app: FastAPI):
     """
     # Startup
     logger.info("Iniciando aplicación...")
+    # Los handlers síncronos se ejecutan en el pool de threads de anyio;
+    # su tamaño limita cuántas operaciones de base de datos corren en paralelo
+    anyio.to_thread.current_default_thread_limiter().total_tokens = DB_MAX_WORKERS
+    pool = init_pool()
+    # Llevar el esquema a la última versión antes de atender peticiones
+    version = aplicar_migraciones(pool.database)
+    logger.info(f"Esquema de base de datos en versión {version}")
+    # Todas las escrituras pasan por un único thread escritor con group commit
+    init_writer(pool.database)
     try:
         # Verificar que la base de datos existe y es accesible
-        import sqlite3
-        from app.database import DATABASE_URL
-        conn = sqlite3.connect(DATABASE_URL)
-        conn.close()
-        logger.info("Base de datos verificada correctamente")
+        with pool.connection() as conn:
+            conn.execute("SELECT 1").fetchone()
+        logger.info(f"Base de datos verificada correctamente (pool de {pool.max_size} conexiones)")
     except Exception as e:
         logger.warning(f"Advertencia al verificar base de datos: {e}")
+    try:
+        # Índices en memoria de autocompletado; si fallan se cargan en la primera búsqueda
+        with pool.connection() as conn:
+            cargar_indices(conn.cursor())
+    except Exception as e:
+        logger.warning(f"Advertencia al cargar los índices de autocompletado: {e}")
+    # Cierre automático de las citas pasadas que siguen activas
+    barrido = asyncio.create_task(barrido_periodico()) if AGENDA_BARRIDO_INTERVALO > 0 else None
     
     yield
     
     # Shutdown
     logger.info("Cerrando aplicación...")
+    if barrido is not None:
+        # Un barrido en curso termina en el escritor antes de close_writer
+        barrido.cancel()
+        try:
+            await barrido
+        except asyncio.CancelledError:
+            pass
     # Dar tiempo para que las conexiones se cierren correctamente
     await asyncio.sleep(0.1)
+    # Confirmar las escrituras pendientes antes de cerrar las conexiones
+    close_writer()
+    close_pool()
 
 
 app = FastAPI(
@@ -84,7 +115,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["*"],
+    # Con credenciales el navegador no acepta "*": las cabeceras se listan
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "ETag"],
 )
 
 # Incluir routers
@@ -97,6 +129,8 @@ app.include_router(receta.router, prefix="/api/recetas", tags=["Recetas"])
 app.include_router(historial.router, prefix="/api/historial", tags=["Historial Médico"])
 app.include_router(examenes.router, prefix="/api/examenes", tags=["Exámenes de Laboratorio"])
 app.include_router(usuarios.router, prefix="/api/usuarios", tags=["Usuarios del Sistema"])
+app.include_router(dashboard.router, prefix="/api/dashboard", tags=["Dashboard"])
+app.include_router(autocomplete.router, prefix="/api/autocomplete", tags=["Autocompletado"])
 
 
 @app.get("/")
@@ -177,23 +211,21 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 
 
 @app.get("/api/health")
-async def health_check():
+def health_check():
     """Endpoint de salud que verifica la conexión a la base de datos"""
     try:
-        import sqlite3
-        from app.database import DATABASE_URL
+        pool = get_pool()
         
         # Verificar conexión a la base de datos
-        conn = sqlite3.connect(DATABASE_URL)
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1")
-        cursor.fetchone()
-        conn.close()
+        with pool.connection() as conn:
+            conn.execute("SELECT 1").fetchone()
         
         return {
             "status": "ok",
             "message": "API funcionando correctamente",
-            "database": "conectada"
+            "database": "conectada",
+            "pool": pool.stats(),
+            "escritor": get_writer().stats()
         }
     except Exception as e:
         logger.error(f"Error en health check: {e}", exc_info=True)
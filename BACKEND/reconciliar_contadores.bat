@@ -0,0 +1,24 @@
+@echo off
+REM Script para recalcular los contadores de filas y resúmenes diarios (Windows)
+
+echo ========================================
+echo Reconciliar Contadores de Filas
+echo ========================================
+echo.
+
+REM Cambiar al directorio del script
+cd /d "%~dp0"
+
+REM Verificar que Python esté disponible
+python --version >nul 2>&1
+if errorlevel 1 (
+    echo [ERROR] Python no está instalado o no está en el PATH
+    pause
+    exit /b 1
+)
+
+REM Ejecutar el script
+python reconciliar_contadores.py %*
+
+pause
+
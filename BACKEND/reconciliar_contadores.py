@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Script para recalcular los contadores de filas (tabla stats_counters) y los
+resúmenes diarios (tabla resumen_diario)
+
+Los mantienen los triggers de cada tabla (app/counters.py y app/rollups.py). Este
+script vuelve a crear los triggers que falten, recalcula los valores desde cero
+recorriendo las tablas y muestra los contadores que estaban desajustados. Se
+puede ejecutar con la API en marcha: el recálculo ocurre en una sola transacción
+de escritura.
+
+Uso:
+    python reconciliar_contadores.py
+    python reconciliar_contadores.py --tabla citas
+    python reconciliar_contadores.py --verificar
+"""
+import argparse
+import sqlite3
+import sys
+
+from app.counters import CONTADORES, crear_contadores
+from app.migrations import aplicar_migraciones
+from app.rollups import crear_resumenes
+
+DATABASE_URL = "v1siscentro.db"
+
+
+def reconciliar(tabla=None, verificar=False) -> int:
+    """Recalcula contadores y resúmenes y retorna cuántos estaban desajustados"""
+    # Asegura que existan la tabla de contadores y los triggers
+    aplicar_migraciones(DATABASE_URL)
+
+    conn = sqlite3.connect(DATABASE_URL, timeout=30)
+    conn.isolation_level = None
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            diferencias = crear_contadores(conn, tabla)
+            resumenes = crear_resumenes(conn, tabla)
+            # Con --verificar solo se informa: los contadores quedan como estaban
+            conn.execute("ROLLBACK" if verificar else "COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+    if resumenes:
+        accion = "desajustadas" if verificar else "corregidas"
+        print(f"{'⚠' if verificar else '✓'} {resumenes} filas del resumen diario {accion}")
+    if not diferencias:
+        print("✓ Todos los contadores son correctos")
+        return resumenes
+
+    print(f"{'tabla':<18} {'grupo':<8} {'clave':<16} {'anterior':>9} {'correcto':>9}")
+    for nombre, grupo, clave, anterior, correcto in diferencias:
+        print(f"{nombre:<18} {grupo or '(total)':<8} {clave:<16} {anterior:>9} {correcto:>9}")
+    if verificar:
+        print(f"\n⚠ {len(diferencias)} contadores desajustados (sin cambios, ejecute sin --verificar)")
+    else:
+        print(f"\n✓ {len(diferencias)} contadores corregidos")
+    return len(diferencias) + resumenes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Recalcular los contadores de filas y los resúmenes diarios de la base de datos",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  python reconciliar_contadores.py
+  python reconciliar_contadores.py --tabla examenes
+  python reconciliar_contadores.py --verificar
+        """
+    )
+    parser.add_argument(
+        "-t", "--tabla",
+        choices=sorted(CONTADORES),
+        default=None,
+        help="Recalcular solo los contadores de esta tabla"
+    )
+    parser.add_argument(
+        "--verificar",
+        action="store_true",
+        help="Solo mostrar los contadores desajustados, sin corregirlos"
+    )
+
+    args = parser.parse_args()
+
+    try:
+        desajustados = reconciliar(tabla=args.tabla, verificar=args.verificar)
+    except sqlite3.Error as e:
+        print(f"✗ Error: {e}")
+        sys.exit(1)
+    # Con --verificar, el código de salida indica si hay contadores desajustados
+    sys.exit(1 if args.verificar and desajustados else 0)
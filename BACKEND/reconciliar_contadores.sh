@@ -0,0 +1,20 @@
+#!/bin/bash
+# Script para recalcular los contadores de filas y resúmenes diarios (Linux/Mac)
+
+echo "========================================"
+echo "Reconciliar Contadores de Filas"
+echo "========================================"
+echo ""
+
+# Cambiar al directorio del script
+cd "$(dirname "$0")"
+
+# Verificar que Python esté disponible
+if ! command -v python3 &> /dev/null; then
+    echo "[ERROR] Python 3 no está instalado"
+    exit 1
+fi
+
+# Ejecutar el script
+python3 reconciliar_contadores.py "$@"
+
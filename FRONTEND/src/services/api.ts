@@ -1,4 +1,4 @@
-import axios, { type AxiosInstance, type AxiosResponse } from 'axios'
+import axios, { type AxiosInstance, type AxiosRequestConfig, type AxiosResponse } from 'axios'
 
 const api: AxiosInstance = axios.create({
   baseURL: import.meta.env.VITE_API_URL || 'http://localhost:8000',
@@ -59,4 +59,52 @@ api.interceptors.response.use(
   }
 )
 
+// Filas por página en las tablas de la interfaz (los listados grandes se cargan
+// de a una página con "Cargar más")
+export const TAMANO_PAGINA_LISTADO = 50
+
+// Tamaño de página que se pide al recorrer un listado completo (máximo del servidor)
+const TAMANO_PAGINA = 500
+
+/**
+ * Obtiene una página de un listado paginado por cursor: la primera sin
+ * `cursor`, o la que sigue al cursor devuelto por la anterior (ver
+ * `siguienteCursor`).
+ */
+export function getPage<T>(
+  url: string,
+  cursor?: string | null,
+  config: AxiosRequestConfig = {}
+): Promise<AxiosResponse<T[]>> {
+  const params = { limit: TAMANO_PAGINA_LISTADO, ...config.params, ...(cursor ? { cursor } : {}) }
+  return api.get<T[]>(url, { ...config, params })
+}
+
+// Cursor de la página siguiente (cabecera X-Next-Cursor) o null en la última
+export function siguienteCursor(response: AxiosResponse): string | null {
+  return response.headers['x-next-cursor'] || null
+}
+
+/**
+ * Obtiene todas las páginas de un listado paginado por cursor.
+ * Solo para listas acotadas: catálogos pequeños (doctores, usuarios) o
+ * listados filtrados por un registro (las recetas de una consulta). Los
+ * listados que crecen con el historial de la clínica usan `getPage`.
+ */
+export async function getAllPages<T>(
+  url: string,
+  config: AxiosRequestConfig = {}
+): Promise<AxiosResponse<T[]>> {
+  const params = { limit: TAMANO_PAGINA, ...config.params }
+  let response = await api.get<T[]>(url, { ...config, params })
+  const data = [...response.data]
+  let cursor = siguienteCursor(response)
+  while (cursor) {
+    response = await api.get<T[]>(url, { ...config, params: { ...params, cursor } })
+    data.push(...response.data)
+    cursor = siguienteCursor(response)
+  }
+  return { ...response, data }
+}
+
 export default api
@@ -0,0 +1,13 @@
+import api from './api'
+
+export interface Sugerencia {
+  Tipo: 'paciente' | 'doctor'
+  Codigo: number
+  Texto: string // nombre y apellidos
+  Detalle: string | null // identificación del paciente o especialidad del doctor
+}
+
+// Sugerencias mientras se escribe en los selectores de paciente y doctor
+export function autocompletar(q: string, tipo?: 'paciente' | 'doctor', limit = 10) {
+  return api.get<Sugerencia[]>('/api/autocomplete', { params: { q, tipo, limit } })
+}
@@ -1,4 +1,4 @@
-import api from './api'
+import api, { getPage } from './api'
 
 export interface Cita {
   Codigo: number
@@ -8,6 +8,7 @@ export interface Cita {
   Estado?: string
   Motivo?: string
   Observaciones?: string
+  Codigo_Serie?: number | null // Serie de citas recurrentes a la que pertenece
   Fecha_Creacion?: string
   Fecha_Modificacion?: string
 }
@@ -34,16 +35,69 @@ export interface CitaFilters {
   estado?: string
   codigo_doctor?: number
   codigo_paciente?: number
+  fields?: string // Columnas separadas por comas
+  include?: string // Relaciones a incluir separadas por comas
 }
 
-export function getCitas(filters?: CitaFilters) {
+// Una página del listado: la siguiente se pide con siguienteCursor(respuesta)
+export function getCitas(filters?: CitaFilters, cursor?: string | null) {
   const params = new URLSearchParams()
   if (filters?.estado) params.append('estado', filters.estado)
   if (filters?.codigo_doctor) params.append('codigo_doctor', filters.codigo_doctor.toString())
   if (filters?.codigo_paciente) params.append('codigo_paciente', filters.codigo_paciente.toString())
+  if (filters?.fields) params.append('fields', filters.fields)
+  if (filters?.include) params.append('include', filters.include)
   
   const query = params.toString()
-  return api.get<Cita[]>(`/api/citas${query ? `?${query}` : ''}`)
+  return getPage<Cita>(`/api/citas${query ? `?${query}` : ''}`, cursor)
+}
+
+export interface CitaCalendario {
+  Codigo: number
+  Fecha_Hora: string
+  Estado: string | null
+  Motivo: string | null
+  Codigo_Doctor: number
+  Doctor: string | null // Nombre y apellidos
+  Codigo_Paciente: number
+  Paciente: string | null
+  Codigo_Serie: number | null
+}
+
+export interface FiltrosCalendario {
+  desde: string // AAAA-MM-DD
+  hasta?: string // AAAA-MM-DD inclusive, por defecto el mismo día
+  codigo_doctor?: number[]
+  especialidad?: string
+  estado?: string
+}
+
+// Citas de la agenda visible (día o semana), ordenadas por doctor y hora
+export function getCalendario(filtros: FiltrosCalendario) {
+  return api.get<CitaCalendario[]>('/api/citas/calendario', {
+    params: filtros,
+    paramsSerializer: { indexes: null }, // codigo_doctor=1&codigo_doctor=2
+  })
+}
+
+export interface HuecoDisponible {
+  Codigo_Doctor: number
+  Inicio: string
+  Fin: string
+}
+
+export interface FiltrosDisponibilidad {
+  codigo_doctor?: number
+  especialidad?: string // Doctores activos de la especialidad (al menos uno de los dos)
+  desde?: string // ISO 8601, por defecto ahora
+  hasta?: string // ISO 8601, por defecto una semana después
+  duracion?: number // Minutos
+  limit?: number
+}
+
+// Huecos libres ordenados por hora de inicio: el primero es la primera cita posible
+export function getDisponibilidad(filtros: FiltrosDisponibilidad) {
+  return api.get<HuecoDisponible[]>('/api/citas/disponibilidad', { params: filtros })
 }
 
 export function getCita(codigo: number) {
@@ -54,6 +108,122 @@ export function createCita(data: CitaCreate) {
   return api.post<Cita>('/api/citas', data)
 }
 
+export interface ResultadoCitaLote {
+  Indice: number // Posición de la cita en el lote
+  Codigo_HTTP: number // 201 si se creó; si no, el error de la creación individual
+  Codigo: number | null
+  Detalle: string | null
+}
+
+export function createCitasBulk(citas: CitaCreate[], todoONada = false) {
+  return api.post<ResultadoCitaLote[]>('/api/citas/bulk', citas, { params: { todo_o_nada: todoONada } })
+}
+
+export interface OperacionCitasLote {
+  Desde: string // ISO 8601, inclusive
+  Hasta: string // ISO 8601, exclusive
+  Codigo_Doctor?: number
+  Estado?: string // Solo las citas con este estado
+  Nuevo_Estado?: string
+  Desplazamiento_Minutos?: number // Mover las citas (negativo: antes)
+}
+
+export interface CambioCitas {
+  Citas_Afectadas: number[]
+}
+
+// Un solo UPDATE en el servidor; 409 si alguna cita movida choca (no se cambia ninguna)
+export function updateCitasBulk(operacion: OperacionCitasLote) {
+  return api.put<CambioCitas>('/api/citas/bulk', operacion)
+}
+
+export interface SerieCitasCreate {
+  Codigo_Paciente: number
+  Codigo_Doctor: number
+  Fecha_Inicio: string // Primera cita (ISO 8601)
+  Frecuencia: 'diaria' | 'semanal' | 'mensual'
+  Intervalo?: number // Cada cuántos días, semanas o meses (por defecto 1)
+  Repeticiones?: number // Número de citas (o Fecha_Fin, al menos uno)
+  Fecha_Fin?: string // AAAA-MM-DD inclusive
+  Estado?: string
+  Motivo?: string
+  Observaciones?: string
+}
+
+export interface SerieCitasCreada {
+  Codigo_Serie: number | null // null si no se creó ninguna cita
+  Citas: (ResultadoCitaLote & { Fecha_Hora: string })[]
+}
+
+export interface SerieCitas {
+  Codigo: number
+  Codigo_Paciente: number
+  Codigo_Doctor: number
+  Fecha_Inicio: string
+  Frecuencia: string
+  Intervalo: number
+  Repeticiones: number | null
+  Fecha_Fin: string | null
+  Motivo: string | null
+  Fecha_Creacion: string | null
+  Citas: Cita[]
+}
+
+export interface SerieCitasUpdate {
+  Codigo_Doctor?: number
+  Estado?: string
+  Motivo?: string
+  Observaciones?: string
+}
+
+export interface CambioSerieCitas extends CambioCitas {
+  Codigo_Serie: number
+}
+
+// Las fechas de la serie se calculan en el servidor
+export function createSerieCitas(data: SerieCitasCreate, todoONada = false) {
+  return api.post<SerieCitasCreada>('/api/citas/series', data, { params: { todo_o_nada: todoONada } })
+}
+
+export function getSerieCitas(codigoSerie: number) {
+  return api.get<SerieCitas>(`/api/citas/series/${codigoSerie}`)
+}
+
+// "Esta y las siguientes": desde es la Fecha_Hora de la primera cita a cambiar
+export function updateSerieCitas(codigoSerie: number, data: SerieCitasUpdate, desde?: string) {
+  return api.put<CambioSerieCitas>(`/api/citas/series/${codigoSerie}`, data, { params: { desde } })
+}
+
+export function cancelSerieCitas(codigoSerie: number, desde?: string) {
+  return api.delete<CambioSerieCitas>(`/api/citas/series/${codigoSerie}`, { params: { desde } })
+}
+
+export interface AusenciaDoctor {
+  Codigo_Doctor: number
+  Desde?: string // ISO 8601, por defecto ahora
+  Hasta?: string // ISO 8601, exclusive
+}
+
+export interface CitaReprogramada {
+  Codigo: number
+  Codigo_Paciente: number
+  Fecha_Hora_Anterior: string
+  Codigo_Doctor: number | null // null en Sin_Asignar
+  Fecha_Hora: string | null
+}
+
+export interface ReprogramacionCitas {
+  Codigo_Doctor: number
+  Simulacion: boolean
+  Reprogramadas: CitaReprogramada[]
+  Sin_Asignar: CitaReprogramada[] // Sin hueco: no se modificaron
+}
+
+// Reparte las citas del doctor entre los de su especialidad; con simular solo devuelve el plan
+export function reprogramarCitasDoctor(ausencia: AusenciaDoctor, simular = false) {
+  return api.post<ReprogramacionCitas>('/api/citas/reprogramar', ausencia, { params: { simular } })
+}
+
 export function updateCita(codigo: number, data: CitaUpdate) {
   return api.put<Cita>(`/api/citas/${codigo}`, data)
 }
@@ -1,4 +1,4 @@
-import api from './api'
+import api, { getAllPages, getPage } from './api'
 
 export interface ExamenAsociado {
   Codigo: number
@@ -71,16 +71,30 @@ export interface ConsultaFilters {
   codigo_paciente?: number
   codigo_doctor?: number
   estado?: string
+  desde?: string // AAAA-MM-DD inclusive
+  hasta?: string // AAAA-MM-DD inclusive
+  fields?: string // Columnas separadas por comas
+  include?: string // Relaciones a incluir separadas por comas
 }
 
-export function getConsultas(filters?: ConsultaFilters) {
+// Una página del listado: la siguiente se pide con siguienteCursor(respuesta)
+export function getConsultas(filters?: ConsultaFilters, cursor?: string | null) {
   const params = new URLSearchParams()
   if (filters?.codigo_paciente) params.append('codigo_paciente', filters.codigo_paciente.toString())
   if (filters?.codigo_doctor) params.append('codigo_doctor', filters.codigo_doctor.toString())
   if (filters?.estado) params.append('estado', filters.estado)
+  if (filters?.desde) params.append('desde', filters.desde)
+  if (filters?.hasta) params.append('hasta', filters.hasta)
+  if (filters?.fields) params.append('fields', filters.fields)
+  if (filters?.include) params.append('include', filters.include)
   
   const query = params.toString()
-  return api.get<Consulta[]>(`/api/consultas${query ? `?${query}` : ''}`)
+  return getPage<Consulta>(`/api/consultas${query ? `?${query}` : ''}`, cursor)
+}
+
+// Todas las consultas de un paciente (selector de consulta al crear una receta)
+export function getConsultasPaciente(codigoPaciente: number) {
+  return getAllPages<Consulta>('/api/consultas', { params: { codigo_paciente: codigoPaciente } })
 }
 
 export function getConsulta(codigo: number) {
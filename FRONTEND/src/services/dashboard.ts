@@ -0,0 +1,36 @@
+import api from './api'
+
+export interface Conteo {
+  Clave: string
+  Total: number
+}
+
+export interface Dashboard {
+  Totales: Record<string, number>
+  Examenes_Por_Estado: Conteo[]
+  Citas_Por_Mes: Conteo[] // Clave en formato AAAA-MM
+  Usuarios_Por_Rol: Conteo[]
+}
+
+export function getDashboard() {
+  return api.get<Dashboard>('/api/dashboard')
+}
+
+export interface PuntoSerie {
+  Periodo: string // AAAA-MM-DD o AAAA-MM según el periodo
+  Grupo: string | null // estado o código de doctor si se pide un desglose
+  Total: number
+}
+
+export interface FiltrosSerie {
+  desde?: string
+  hasta?: string
+  codigo_doctor?: number
+  estado?: string
+  periodo?: 'dia' | 'mes'
+  por?: 'estado' | 'doctor'
+}
+
+export function getSerie(serie: 'citas' | 'consultas' | 'examenes' | 'recetas', filtros: FiltrosSerie = {}) {
+  return api.get<PuntoSerie[]>(`/api/dashboard/series/${serie}`, { params: filtros })
+}
@@ -1,4 +1,4 @@
-import api from './api'
+import api, { getAllPages } from './api'
 
 export interface Doctor {
   Codigo: number
@@ -51,8 +51,11 @@ export interface DoctorUpdate {
   Salario?: number
 }
 
+// Columnas que necesitan los selectores de doctor (?fields=)
+export const CAMPOS_SELECTOR_DOCTOR = 'Nombre,Apellidos,Especialidad,Estado,Numero_Identificacion'
+
 export function getDoctores(params?: Record<string, unknown>) {
-  return api.get<Doctor[]>('/api/doctores', { params })
+  return getAllPages<Doctor>('/api/doctores', { params })
 }
 
 export function getDoctor(codigo: number) {
@@ -1,4 +1,4 @@
-import api from './api'
+import api, { getAllPages, getPage } from './api'
 
 export interface CitaInfo {
   Codigo: number
@@ -71,18 +71,28 @@ export interface ExamenFilters {
   codigo_consulta?: number
   codigo_cita?: number
   estado?: string
+  fields?: string // Columnas separadas por comas
+  include?: string // Relaciones a incluir separadas por comas
 }
 
-export function getExamenes(filters?: ExamenFilters) {
+// Una página del listado: la siguiente se pide con siguienteCursor(respuesta)
+export function getExamenes(filters?: ExamenFilters, cursor?: string | null) {
   const params = new URLSearchParams()
   if (filters?.codigo_paciente) params.append('codigo_paciente', filters.codigo_paciente.toString())
   if (filters?.codigo_doctor) params.append('codigo_doctor', filters.codigo_doctor.toString())
   if (filters?.codigo_consulta) params.append('codigo_consulta', filters.codigo_consulta.toString())
   if (filters?.codigo_cita) params.append('codigo_cita', filters.codigo_cita.toString())
   if (filters?.estado) params.append('estado', filters.estado)
+  if (filters?.fields) params.append('fields', filters.fields)
+  if (filters?.include) params.append('include', filters.include)
   
   const query = params.toString()
-  return api.get<Examen[]>(`/api/examenes${query ? `?${query}` : ''}`)
+  return getPage<Examen>(`/api/examenes${query ? `?${query}` : ''}`, cursor)
+}
+
+// Todos los exámenes de una consulta
+export function getExamenesConsulta(codigoConsulta: number) {
+  return getAllPages<Examen>('/api/examenes', { params: { codigo_consulta: codigoConsulta } })
 }
 
 export function getExamen(codigo: number) {
@@ -1,4 +1,4 @@
-import api from './api'
+import api, { getPage } from './api'
 
 export interface ExamenSolicitado {
   Fecha_Consulta?: string
@@ -35,14 +35,23 @@ export interface HistorialUpdate {
 
 export interface HistorialFilters {
   codigo_paciente?: number
+  desde?: string // AAAA-MM-DD inclusive
+  hasta?: string // AAAA-MM-DD inclusive
+  fields?: string // Columnas separadas por comas
+  include?: string // Relaciones a incluir separadas por comas
 }
 
-export function getHistoriales(filters?: HistorialFilters) {
+// Una página del listado: la siguiente se pide con siguienteCursor(respuesta)
+export function getHistoriales(filters?: HistorialFilters, cursor?: string | null) {
   const params = new URLSearchParams()
   if (filters?.codigo_paciente) params.append('codigo_paciente', filters.codigo_paciente.toString())
+  if (filters?.desde) params.append('desde', filters.desde)
+  if (filters?.hasta) params.append('hasta', filters.hasta)
+  if (filters?.fields) params.append('fields', filters.fields)
+  if (filters?.include) params.append('include', filters.include)
   
   const query = params.toString()
-  return api.get<Historial[]>(`/api/historial${query ? `?${query}` : ''}`)
+  return getPage<Historial>(`/api/historial${query ? `?${query}` : ''}`, cursor)
 }
 
 export function getHistorialPaciente(codigoPaciente: number) {
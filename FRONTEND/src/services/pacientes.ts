@@ -1,4 +1,4 @@
-import api from './api'
+import api, { getAllPages } from './api'
 
 export interface Paciente {
   Codigo: number
@@ -51,8 +51,16 @@ export interface PacienteUpdate {
   Tipo_Identificacion?: string
 }
 
+// Columnas que necesitan los selectores de paciente (?fields=)
+export const CAMPOS_SELECTOR_PACIENTE = 'Nombre,Apellidos,Numero_Identificacion'
+
 export function getPacientes(params?: Record<string, unknown>) {
-  return api.get<Paciente[]>('/api/pacientes/', { params })
+  return getAllPages<Paciente>('/api/pacientes/', { params })
+}
+
+// Búsqueda por nombre, apellidos o identificación (sin distinguir acentos)
+export function buscarPacientes(q: string, limit = 20) {
+  return api.get<Paciente[]>('/api/pacientes/buscar', { params: { q, limit } })
 }
 
 export function getPaciente(codigo: number) {
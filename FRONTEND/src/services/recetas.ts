@@ -1,4 +1,4 @@
-import api from './api'
+import api, { getAllPages, getPage } from './api'
 
 export interface Receta {
   Codigo: number
@@ -36,15 +36,28 @@ export interface RecetaUpdate {
 export interface RecetaFilters {
   codigo_paciente?: number
   codigo_doctor?: number
+  desde?: string // AAAA-MM-DD inclusive
+  hasta?: string // AAAA-MM-DD inclusive
 }
 
-export function getRecetas(filters?: RecetaFilters) {
+function parametrosRecetas(filters?: RecetaFilters) {
   const params = new URLSearchParams()
   if (filters?.codigo_paciente) params.append('codigo_paciente', filters.codigo_paciente.toString())
   if (filters?.codigo_doctor) params.append('codigo_doctor', filters.codigo_doctor.toString())
-  
-  const query = params.toString()
-  return api.get<Receta[]>(`/api/recetas${query ? `?${query}` : ''}`)
+  if (filters?.desde) params.append('desde', filters.desde)
+  if (filters?.hasta) params.append('hasta', filters.hasta)
+  return params.toString()
+}
+
+// Una página del listado: la siguiente se pide con siguienteCursor(respuesta)
+export function getRecetas(filters?: RecetaFilters, cursor?: string | null) {
+  const query = parametrosRecetas(filters)
+  return getPage<Receta>(`/api/recetas${query ? `?${query}` : ''}`, cursor)
+}
+
+// Todas las recetas de una consulta
+export function getRecetasConsulta(codigoConsulta: number) {
+  return getAllPages<Receta>('/api/recetas', { params: { codigo_consulta: codigoConsulta } })
 }
 
 export function getReceta(codigo: number) {
@@ -96,10 +109,8 @@ export interface RecetaCompleta {
   } | null
 }
 
-export function getRecetasCompletas(codigo_doctor?: number) {
-  const params = new URLSearchParams()
-  if (codigo_doctor) params.append('codigo_doctor', codigo_doctor.toString())
-  
-  const query = params.toString()
-  return api.get<RecetaCompleta[]>(`/api/recetas/completas${query ? `?${query}` : ''}`)
+// Una página del listado: la siguiente se pide con siguienteCursor(respuesta)
+export function getRecetasCompletas(filters?: RecetaFilters, cursor?: string | null) {
+  const query = parametrosRecetas(filters)
+  return getPage<RecetaCompleta>(`/api/recetas/completas${query ? `?${query}` : ''}`, cursor)
 }
@@ -1,4 +1,4 @@
-import api from './api'
+import api, { getAllPages } from './api'
 
 export interface UsuarioSistema {
   Codigo: number
@@ -39,7 +39,7 @@ export function getUsuarios(filters?: UsuarioSistemaFilters) {
   if (filters?.activo !== undefined) params.append('activo', filters.activo.toString())
   
   const query = params.toString()
-  return api.get<UsuarioSistema[]>(`/api/usuarios${query ? `?${query}` : ''}`)
+  return getAllPages<UsuarioSistema>(`/api/usuarios${query ? `?${query}` : ''}`)
 }
 
 export function getUsuario(codigo: number) {